@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Activity profile benchmark
+Learns per-aircraft profiles (src/activity.py) from several synthetic days
+fed one poll at a time, like the ingester does, then scores a 12h window
+with and without them.
+
+The same seed gives the same tails on the same sorties every day, so the
+fleet's night flyers are regulars. A set of "surprise" tails gets its
+history from a day-only fleet (same ICAOs, no night sorties) and flies at
+night only in the scored window.
+
+The run fails if surprise tails do not come out clearly more novel than
+regulars, if the streaming and list scorers disagree with profiles loaded,
+if the profiles lower the night score for the surprise tails alone, if
+a save/load round trip changes any novelty, or if novelty drops once the
+scored reports are folded into the profiles (as the ingester does before
+the scorer runs): for the surprise tails, and for a first-ever 45-minute
+night sortie in a new cell, which must stay near its novelty before.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from bench_streaming_scores import StreamingClickHouse, fleet_now
+from activity import ActivityProfiles
+from calculate_panic import PanicScoreCalculator
+from tracks import PositionColumns, epoch_seconds
+
+
+def polls(fleet: SyntheticFleet, interval: int):
+    """Reports grouped into one batch per poll interval, as the ingester stores them"""
+    by_poll = defaultdict(list)
+    for pos in fleet.iter_positions(interval):
+        by_poll[int(epoch_seconds(pos["timestamp"]) // interval)].append(pos)
+    for poll in sorted(by_poll):
+        rows = by_poll[poll]
+        yield ([r["icao_hex"] for r in rows], np.full(len(rows), float(poll * interval)),
+               [r["lat"] for r in rows], [r["lon"] for r in rows], [r["on_ground"] for r in rows])
+
+
+def first_night_sortie(icao: str, after: float, interval: int):
+    """(epoch, lat, lon, icao, on_ground) reports: 45 minutes orbiting at 02:00 local near 45°S, then a landing"""
+    start = (after // 86400 + 1) * 86400
+    lon = 2 * 15.0 + 0.5
+    reports = []
+    for t in np.arange(start, start + 45 * 60 + 1, interval):
+        angle = (t - start) / 600 * np.pi
+        reports.append((float(t), -45.5 + 0.2 * np.sin(angle), lon + 0.2 * np.cos(angle), icao, False))
+    reports.append((reports[-1][0] + interval, -45.5, lon, icao, True))
+    return reports
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-aircraft activity profiles and novelty")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=7, help="History days before the scored window")
+    parser.add_argument("--surprise", type=int, default=20, help="Night tails with day-only history")
+    parser.add_argument("--interval", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    today = SyntheticFleet(size=args.size, background=0, seed=args.seed, hours=24)
+    night = [a["icao_hex"].upper() for a in today.aircraft if a["kind"] == "night"]
+    surprise = set(night[:args.surprise])
+    regulars = set(night[args.surprise:])
+    failures = []
+
+    profiles = ActivityProfiles()
+    rows = snapshots = 0
+    seconds = 0.0
+    for day in range(args.days, 0, -1):
+        epoch = today.epoch - timedelta(days=day)
+        for fleet, keep in ((SyntheticFleet(size=args.size, background=0, seed=args.seed, hours=24, epoch=epoch),
+                             lambda icao: icao not in surprise),
+                            (SyntheticFleet(size=args.size, background=0, seed=args.seed, hours=24, epoch=epoch,
+                                            night_fraction=0.0), lambda icao: icao in surprise)):
+            for icaos, times, lats, lons, ground in polls(fleet, args.interval):
+                mask = [keep(i) for i in icaos]
+                if not any(mask):
+                    continue
+                pick = np.flatnonzero(mask)
+                batch = ([icaos[i] for i in pick], times[pick], [lats[i] for i in pick],
+                         [lons[i] for i in pick], [ground[i] for i in pick])
+                start = time.perf_counter()
+                profiles.update(*batch)
+                seconds += time.perf_counter() - start
+                rows += len(pick)
+                snapshots += 1
+    arrays = sum(a.nbytes for a in (profiles.hour_minutes, profiles.sorties, profiles.last_seen, profiles.airborne,
+                                    profiles.sortie_start, profiles.cell_keys, profiles.cell_minutes))
+    print(f"{args.size} aircraft, {args.days} days of history at {args.interval}s\n")
+    print(f"  update: {rows} reports in {snapshots} polls, {seconds:.2f}s "
+          f"({rows / seconds / 1e6:.2f}M reports/s, {seconds / snapshots * 1e3:.2f}ms per poll)")
+    print(f"  profiles: {len(profiles)} aircraft, {len(profiles.cell_keys)} (aircraft, cell) counts, "
+          f"{arrays / 1024:.0f}KB of arrays")
+
+    # Novelty of the scored window's aircraft
+    positions = PositionColumns()
+    for row in StreamingClickHouse(today, args.interval).execute_iter("", {}):
+        positions.add_row(row)
+    start = time.perf_counter()
+    novelty = profiles.novelty(positions)
+    seconds = time.perf_counter() - start
+    print(f"  novelty: {len(novelty)} aircraft, {len(positions)} reports in {seconds * 1e3:.1f}ms")
+    surprise_scores = sorted(novelty[i] for i in surprise if i in novelty)
+    regular_scores = sorted(novelty[i] for i in regulars if i in novelty)
+    median = lambda v: v[len(v) // 2] if v else float("nan")
+    print(f"    surprise night tails: median {median(surprise_scores):.2f} (min {surprise_scores[0]:.2f})")
+    print(f"    regular night tails:  median {median(regular_scores):.2f} (max {regular_scores[-1]:.2f})")
+    if not surprise_scores or median(surprise_scores) < 0.6 or median(regular_scores) > 0.2:
+        failures.append("surprise tails not clearly more novel than regulars")
+
+    directory = tempfile.mkdtemp(prefix="activity-")
+    try:
+        path = os.path.join(directory, "profiles.npz")
+        profiles.save(path)
+        reloaded = ActivityProfiles.load(path).novelty(positions)
+        print(f"  saved: {os.path.getsize(path) / 1024:.0f}KB")
+        if reloaded != novelty:
+            failures.append("novelty changed across save/load")
+
+        # The ingester has folded the window in by the time it is scored
+        folded = ActivityProfiles.load(path)
+        for batch in polls(today, args.interval):
+            folded.update(*batch)
+        after = sorted(v for i, v in folded.novelty(positions).items() if i in surprise)
+        print(f"    with the window folded in: surprise median {median(after):.2f}")
+        if median(after) < median(surprise_scores) - 0.05:
+            failures.append(f"surprise tails fall to {median(after):.2f} once their window is in the profiles")
+
+        # A first-ever night sortie: 45 minutes orbiting a cell the tail never flew
+        folded = ActivityProfiles.load(path)
+        icao = min(surprise)
+        orbit = first_night_sortie(icao, folded.last_seen[folded.index[icao]], args.interval)
+        sortie = PositionColumns()
+        for row in orbit:
+            if not row[4]:
+                sortie.add(icao, datetime.fromtimestamp(row[0], timezone.utc), row[1], row[2], 9000, False, "", "")
+        before = folded.novelty(sortie)[icao]
+        for row in orbit:
+            folded.update([icao], [row[0]], [row[1]], [row[2]], [row[4]])
+        after = folded.novelty(sortie)[icao]
+        print(f"    first night sortie of {icao}: novelty {before:.2f} before folding in, {after:.2f} after")
+        if after < 0.75 or abs(after - before) > 0.05:
+            failures.append(f"first night sortie scores {after:.2f} once folded in ({before:.2f} before)")
+    finally:
+        shutil.rmtree(directory)
+
+    # 12h scores with and without profiles, streaming and list mode
+    now = fleet_now(today)
+    calculator = PanicScoreCalculator(ch_client=StreamingClickHouse(today, args.interval), profiles=profiles)
+    results = {}
+    for streaming in (True, False):
+        result = quiet(calculator.calculate_panic_score, hours=12, now=now, streaming=streaming)
+        result.pop("timestamp")
+        results[streaming] = result
+    if results[True] != results[False]:
+        diff = [k for k in results[True] if results[True][k] != results[False][k]]
+        failures.append(f"streaming and list scores differ with profiles: {diff}")
+
+    def night(client, with_profiles: bool):
+        """(list-mode, streaming) night components for the 12h window"""
+        scorer = PanicScoreCalculator(ch_client=client, profiles=profiles if with_profiles else None)
+        pipeline = scorer.pipeline
+        state = pipeline.score_rows(scorer.iter_recent_flight_rows(hours=12, now=now, columns=pipeline.columns))
+        return scorer.calculate_night_flight_score(scorer.get_recent_flights(hours=12, now=now)), \
+            pipeline.finish(state, profiles=scorer.profiles)["night"]
+
+    (plain, _), (profiled, streamed) = night(calculator.ch_client, False), night(calculator.ch_client, True)
+    if profiled != streamed:
+        failures.append("streaming and list night contexts differ with profiles")
+    print(f"\n  12h night score {plain[0]:.1f} -> {profiled[0]:.1f} with profiles (weighted count "
+          f"{plain[1]['weighted_count']:.1f} -> {profiled[1]['weighted_count']:.1f}, routine discount "
+          f"{profiled[1]['routine_discount']:.1f})")
+
+    # Only the surprise tails: the profiles must leave their night weight almost whole
+    alone = SyntheticFleet(size=args.size, background=0, seed=args.seed, hours=24)
+    alone.aircraft = [a for a in alone.aircraft if a["icao_hex"].upper() in surprise]
+    client = StreamingClickHouse(alone, args.interval)
+    (base, _), (kept, _) = night(client, False), night(client, True)
+    share = kept[1].get("weighted_count", 0) / max(base[1].get("weighted_count", 0), 1e-9)
+    print(f"  surprise tails alone: night score {base[0]:.1f} -> {kept[0]:.1f}, "
+          f"{share:.0%} of their night weight kept")
+    if share < 0.8:
+        failures.append(f"profiles discounted novel night flights to {share:.0%}")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("\n✓ Novel tails stand out from regulars, streaming matches list mode, profiles round-trip")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+ADS-B Exchange import benchmark
+Generates a synthetic basic-ac-db.json.gz and compares the old
+load-everything path with the streaming importer on wall time and peak RSS
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(BENCH_DIR, "..", "scripts")
+
+# Realistic-looking type strings; a few percent are priority types
+COMMON_TYPES = ["Boeing 737-800", "Airbus A320-214", "Cessna 172S", "Piper PA-28", "Embraer E175",
+                "Boeing 787-9", "Airbus A321neo", "Beech King Air 350", "Cirrus SR22", "Bombardier CRJ-900"]
+PRIORITY_SAMPLES = ["Boeing KC-135R", "Boeing C-17A", "Lockheed C-130J", "Lockheed MC-130J", "Boeing P-8A",
+                    "Boeing RC-135V", "Boeing B-52H", "Airbus A400M", "Boeing E-3B", "Bell-Boeing CV-22B"]
+
+
+def generate(path: str, records: int, layout: str, seed: int):
+    rng = random.Random(seed)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        if layout == "object":
+            f.write("{")
+        for i in range(records):
+            icao = f"{rng.getrandbits(24):06x}"
+            aircraft_type = rng.choice(PRIORITY_SAMPLES) if rng.random() < 0.03 else rng.choice(COMMON_TYPES)
+            registration = f"N{rng.randint(100, 99999)}"
+            if layout == "object":
+                f.write(("," if i else "") + json.dumps(icao) + ":" + json.dumps(
+                    {"r": registration, "t": aircraft_type, "f": "00", "d": "", "desc": aircraft_type}))
+            else:
+                f.write(json.dumps({
+                    "icao": icao, "reg": registration, "icaotype": "", "year": "2001",
+                    "manufacturer": "", "model": aircraft_type, "ownop": "Example Owner LLC",
+                    "faa_pia": False, "faa_ladd": False, "short_type": "L2J", "mil": False,
+                }) + "\n")
+        if layout == "object":
+            f.write("}")
+
+
+def run_child(mode: str, path: str, workers: int):
+    """Run one import in this (fresh) process and print timing + peak RSS as JSON"""
+    sys.path.insert(0, SCRIPTS_DIR)
+    import expand_aircraft_db as ead
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        # The pre-streaming path: whole file in memory, substring loop per key
+        with open(path, "rb") as f:
+            db = json.loads(gzip.decompress(f.read()))
+        count = 0
+        for _, data in db.items():
+            aircraft_type = data.get("t", "")
+            if any(p in aircraft_type for p in ead.PRIORITY_TYPES):
+                count += 1
+    else:
+        count = 0
+        with ead.open_adsbexchange_stream(path) as stream:
+            for _ in ead.iter_adsbexchange_matches(stream, set(), workers=workers):
+                count += 1
+    elapsed = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(json.dumps({"matches": count, "seconds": elapsed, "peak_rss_mb": peak_kb / 1024,
+                      "worker_peak_rss_mb": children_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ADS-B Exchange import benchmark")
+    parser.add_argument("--records", type=int, default=500000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "PATH", "WORKERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], int(args.child[2]))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for layout in ("object", "ndjson"):
+            path = os.path.join(tmp, f"basic-ac-db-{layout}.json.gz")
+            generate(path, args.records, layout, args.seed)
+            print(f"{layout}: {args.records} records, {os.path.getsize(path) / 1024 / 1024:.1f}MB gzipped")
+
+            modes = ["legacy", "streaming"] if layout == "object" else ["streaming"]
+            for mode in modes:
+                out = subprocess.check_output(
+                    [sys.executable, __file__, "--child", mode, path, str(args.workers)]
+                )
+                r = json.loads(out.decode().strip().splitlines()[-1])
+                print(f"  {mode:<10} {r['seconds']:>6.2f}s  peak RSS {r['peak_rss_mb']:>6.1f}MB  "
+                      f"({r['matches']} matches)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Airlift scorer benchmark
+Times the two halves of the airlift score against what they replace:
+
+- type classification over --rows position rows (default 10M, the
+  synthetic day's rows cycled): the old per-row substring scan over the
+  airlift type list against airlift_class(), resolved once per type
+- mission detection and scoring (src/airlift.py) over the day's position
+  columns, next to the per-aircraft airborne time the scorer used before
+
+The run fails unless every synthetic shuttle leg flown wholly inside the
+window comes out as a mission between its two bases, and every mission
+is a real leg (orbiting aircraft produce none).
+"""
+
+import argparse
+import os
+import sys
+import time
+from itertools import cycle, islice
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from airlift import AIRLIFT_TYPES, airlift_class, flights_and_missions, score_airlift
+from tracks import PositionColumns, epoch_seconds, great_circle_m
+
+# Mission end points snap to a grid cell and the last report is a poll short of the base
+BASE_TOLERANCE_KM = 75
+
+
+def per_row_scan(types) -> int:
+    """The previous list-mode check, one scan of the type list per row"""
+    families = list(AIRLIFT_TYPES)
+    return sum(1 for aircraft_type in types if any(t in aircraft_type for t in families))
+
+
+def per_type_lookup(types) -> int:
+    return sum(1 for aircraft_type in types if airlift_class(aircraft_type) is not None)
+
+
+def airborne_runs(fleet: SyntheticFleet, aircraft, interval: int):
+    """
+    Sampled airborne stretches from the motion model as
+    {first sample time: (origin, destination, landed both ends in window)}
+    """
+    runs, run = {}, []
+    for t in range(0, fleet.window_seconds + interval, interval):
+        if t < fleet.window_seconds and fleet.is_airborne(aircraft, t):
+            run.append(t)
+            continue
+        if run:
+            inside = run[0] > 0 and t < fleet.window_seconds
+            runs[run[0]] = (fleet.position_at(aircraft, run[0])[:2], fleet.position_at(aircraft, run[-1])[:2], inside)
+        run = []
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Airlift classification and missions")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Rows to classify")
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between reports")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    fleet = SyntheticFleet(size=args.size, background=0, seed=args.seed, hours=args.hours)
+    rows = fleet.recent_flight_rows(args.interval)
+    print(f"{args.size} aircraft, {args.hours}h at {args.interval}s: {len(rows)} rows\n")
+
+    types = [row[12] for row in rows]
+    start = time.perf_counter()
+    scanned = per_row_scan(islice(cycle(types), args.rows))
+    scan_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    looked_up = per_type_lookup(islice(cycle(types), args.rows))
+    lookup_seconds = time.perf_counter() - start
+    print(f"  classify {args.rows} rows")
+    print(f"    per-row scan    {scan_seconds * 1000:>8.1f}ms  ({scan_seconds / args.rows * 1e9:.0f}ns per row)")
+    print(f"    per-type lookup {lookup_seconds * 1000:>8.1f}ms  ({lookup_seconds / args.rows * 1e9:.0f}ns per row)")
+
+    positions = PositionColumns()
+    aircraft = {}
+    for row in rows:
+        positions.add_row(row)
+        if airlift_class(row[12]) is not None:
+            aircraft.setdefault(row[0], bool(row[10]))
+    start = time.perf_counter()
+    airborne = positions.airborne_minutes(aircraft)
+    airborne_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    score, context = score_airlift(positions, aircraft)
+    mission_seconds = time.perf_counter() - start
+    print(f"  {len(aircraft)} airlift aircraft")
+    print(f"    airborne time   {airborne_seconds * 1000:>8.1f}ms")
+    print(f"    missions+score  {mission_seconds * 1000:>8.1f}ms  ({context['sorties']} sorties, score {score:.0f})")
+    for c in context["corridors"][:3]:
+        print(f"      {c['sorties']} {c['family']} sorties {c['origin']} -> {c['destination']}")
+
+    failures = []
+    if scanned != looked_up:
+        failures.append(f"per-type lookup found {looked_up} airlift rows, per-row scan {scanned}")
+    if any(abs(airborne[icao] - minutes) > 1e-9 for icao, minutes in
+           flights_and_missions(positions, aircraft)[0].items()):
+        failures.append("airborne time differs from PositionColumns.airborne_minutes")
+
+    # Every aircraft, so orbits get the chance to produce false missions
+    _, missions = flights_and_missions(positions, positions.index)
+    by_icao = {}
+    for m in missions:
+        by_icao.setdefault(m.icao_hex, []).append(m)
+    window_start = epoch_seconds(fleet.window_start)
+    for a in fleet.aircraft:
+        icao = a["icao_hex"].upper()
+        runs = airborne_runs(fleet, a, args.interval) if a["model"] == "shuttle" else {}
+        found = set()
+        for m in by_icao.get(icao, []):
+            run = runs.get(round(m.takeoff - window_start))
+            if run is None:
+                failures.append(f"{icao} ({a['kind']}): mission at {m.takeoff:.0f} is not a synthetic leg")
+                continue
+            found.add(round(m.takeoff - window_start))
+            origin, destination, _ = run
+            off = max(great_circle_m(*m.origin, *origin), great_circle_m(*m.destination, *destination)) / 1000
+            if off > BASE_TOLERANCE_KM:
+                failures.append(f"{icao}: mission base {off:.0f}km from the synthetic base")
+        # Legs cut by the window edges may go either way; whole legs must be found
+        missed = [t for t, (_, _, inside) in runs.items() if inside and t not in found]
+        if missed:
+            failures.append(f"{icao}: {len(missed)} completed legs not detected as missions")
+
+    for failure in failures[:20]:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"\n✓ {len(missions)} missions match the shuttle legs; "
+          f"classification {scan_seconds / lookup_seconds:.1f}x faster per type than per row")
+
+
+if __name__ == "__main__":
+    main()
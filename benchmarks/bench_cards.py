@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Share-card rendering benchmark
+Renders cards and social texts (src/cards.py) for a batch of synthetic
+regions three times: cold, unchanged (every card from the cache) and with
+a share of the regions' scores changed (only those re-rendered). Reports
+wall time per batch and per card, in-process and with a worker pool.
+
+The run fails if a batch renders anything other than the changed regions,
+if a card is not a 1200x630 PNG, or if a tweet is over the limit.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from cards import CARD_SIZE, TWEET_LIMIT, CardRenderer, region_slug
+
+FLAGS = ["🇺🇸", "🇬🇧", "🇫🇷", "🇩🇪", "🇹🇷", "🇷🇺", "🇨🇳", "🇮🇱"]
+
+
+def synthetic_scores(regions: int, seed: int):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(regions):
+        parts = [f"{' '.join(rng.sample(FLAGS, rng.randint(2, 5)))} jets converging"]
+        if rng.random() < 0.5:
+            parts.append(f"{rng.randint(3, 40)} gov flights during night hours")
+        if rng.random() < 0.3:
+            parts.append(f"{rng.randint(2, 14)} C-17 sorties 25.0°N 51.5°E → 37.0°N 35.5°E")
+        rows.append({
+            "region": f"Region {i:03d}",
+            "window_hours": 12,
+            "overall_panic_score": rng.randint(0, 100),
+            "night_flight_score": rng.uniform(0, 100),
+            "convergence_score": rng.uniform(0, 100),
+            "airlift_score": rng.uniform(0, 100),
+            "vip_movement_score": rng.uniform(0, 100),
+            "formation_score": rng.uniform(0, 100),
+            "flight_count": rng.randint(100, 200000),
+            "countries_involved": rng.randint(1, 30),
+            "narrative": "⚠️ " + " • ".join(parts),
+            "trend_delta": rng.uniform(-20, 20),
+        })
+    return rows
+
+
+def png_size(path: str):
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if header[:8] != b"\x89PNG\r\n\x1a\n":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch share-card rendering with caching")
+    parser.add_argument("--regions", type=int, default=150)
+    parser.add_argument("--changed", type=float, default=0.1, help="Share of regions changed between runs")
+    parser.add_argument("--workers", default="1,4", help="Comma-separated pool sizes")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = synthetic_scores(args.regions, args.seed)
+    rng = random.Random(args.seed + 1)
+    changed = rng.sample(range(args.regions), int(args.regions * args.changed))
+    updated = [dict(row) for row in rows]
+    for i in changed:
+        updated[i]["overall_panic_score"] = (updated[i]["overall_panic_score"] + 7) % 101
+
+    print(f"{args.regions} regions, {len(changed)} changed between batches ({os.cpu_count()} CPUs)\n")
+    failures = []
+    for workers in (int(w) for w in args.workers.split(",")):
+        directory = tempfile.mkdtemp(prefix="cards-")
+        renderer = CardRenderer(directory, workers=workers)
+        try:
+            batches = [("cold", renderer.render(rows), args.regions),
+                       ("unchanged", renderer.render(rows), 0),
+                       ("changed", renderer.render(updated), len(changed))]
+            for name, batch, expected in batches:
+                per_card = batch["seconds"] / batch["rendered"] * 1000 if batch["rendered"] else 0
+                print(f"  workers={workers:<2} {name:<10} {batch['seconds'] * 1000:>8.1f}ms  "
+                      f"{batch['rendered']:>4} rendered, {batch['cached']:>4} cached"
+                      + (f"  ({per_card:.1f}ms per card)" if per_card else ""))
+                if batch["rendered"] != expected:
+                    failures.append(f"workers={workers} {name}: rendered {batch['rendered']}, expected {expected}")
+
+            with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+                index = json.load(f)
+            for row in updated:
+                entry = index.get(region_slug(row["region"]))
+                if entry is None or entry["overall"] != row["overall_panic_score"]:
+                    failures.append(f"{row['region']}: index does not point at the current card")
+                    continue
+                if png_size(os.path.join(directory, f"{entry['key']}.png")) != CARD_SIZE:
+                    failures.append(f"{row['region']}: card is not a {CARD_SIZE} PNG")
+                tweet = renderer.texts(row["region"])["tweet"]
+                if len(tweet) > TWEET_LIMIT:
+                    failures.append(f"{row['region']}: tweet is {len(tweet)} characters")
+        finally:
+            renderer.close()
+            shutil.rmtree(directory)
+        print()
+
+    for failure in failures[:20]:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"✓ Only changed regions re-rendered; cards and texts valid for {args.regions} regions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Formation detector benchmark
+Times the formation detector (src/formation.py) on a synthetic window of
+the whole tracked fleet: collecting PositionColumns row by row as the
+scorer does, then detect_formations(). A smaller fleet is checked against
+a brute-force all-pairs join per time slice; the run fails if the encounters differ or if the synthetic
+tanker/bomber pairs are not reported with the right kind.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from formation import (BUCKET_SECONDS, FEET_PER_METRE, FORMATION_ALTITUDE_FT, FORMATION_DISTANCE_KM,
+                       FORMATION_MIN_MINUTES, KM_PER_DEGREE, MAX_GAP_BUCKETS, MAX_SKEW_SECONDS,
+                       detect_formations)
+from tracks import PositionColumns
+
+
+def collect(fleet: SyntheticFleet, interval: int):
+    rows = fleet.recent_flight_rows(interval)
+    tracks = PositionColumns()
+    start = time.perf_counter()
+    for row in rows:
+        tracks.add_row(row)
+    return tracks, len(rows), time.perf_counter() - start
+
+
+def brute_force(tracks: PositionColumns):
+    """Same encounters from an all-pairs distance matrix per slice and a Python run scan"""
+    ids = np.array(tracks.ids)
+    times = np.array(tracks.times)
+    lats = np.array(tracks.lats, dtype=np.float64)
+    lons = np.array(tracks.lons, dtype=np.float64)
+    altitudes = np.array(tracks.altitudes, dtype=np.float64)
+    buckets = np.floor(times / BUCKET_SECONDS).astype(np.int64)
+
+    # Earliest report per aircraft per slice
+    first = {}
+    for i in np.lexsort((times, ids, buckets)):
+        first.setdefault((buckets[i], ids[i]), i)
+    by_bucket = defaultdict(list)
+    for (bucket, _), i in first.items():
+        by_bucket[bucket].append(i)
+
+    pair_buckets = defaultdict(list)
+    for bucket, members in sorted(by_bucket.items()):
+        m = np.array(members)
+        mean_lat = np.radians((lats[m][:, None] + lats[m][None, :]) / 2)
+        dx = (lons[m][None, :] - lons[m][:, None]) * np.cos(mean_lat) * KM_PER_DEGREE
+        dy = (lats[m][None, :] - lats[m][:, None]) * KM_PER_DEGREE
+        close = ((dx * dx + dy * dy <= FORMATION_DISTANCE_KM ** 2)
+                 & (np.abs(altitudes[m][None, :] - altitudes[m][:, None]) * FEET_PER_METRE <= FORMATION_ALTITUDE_FT)
+                 & (np.abs(times[m][None, :] - times[m][:, None]) <= MAX_SKEW_SECONDS))
+        for i, j in zip(*np.nonzero(np.triu(close, k=1))):
+            a, b = sorted((int(ids[m[i]]), int(ids[m[j]])))
+            pair_buckets[(a, b)].append(bucket)
+
+    encounters = []
+    for (a, b), seen in sorted(pair_buckets.items()):
+        run = [seen[0]]
+        for bucket in seen[1:] + [None]:
+            if bucket is not None and bucket - run[-1] <= MAX_GAP_BUCKETS + 1:
+                run.append(bucket)
+                continue
+            minutes = (run[-1] - run[0] + 1) * BUCKET_SECONDS / 60
+            if minutes >= FORMATION_MIN_MINUTES:
+                encounters.append((a, b, float(run[0] * BUCKET_SECONDS), minutes))
+            run = [bucket]
+    return encounters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Formation / rendezvous detection")
+    parser.add_argument("--size", type=int, default=3000, help="Tracked fleet size for timing")
+    parser.add_argument("--check-size", type=int, default=300, help="Fleet size for the brute-force check")
+    parser.add_argument("--formations", type=int, default=6, help="Synthetic pairs in the fleet")
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between reports")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    fleet = SyntheticFleet(size=args.size, background=0, seed=args.seed, formations=args.formations)
+    tracks, rows, collect_seconds = collect(fleet, args.interval)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        encounters = detect_formations(tracks)
+        timings.append(time.perf_counter() - start)
+    detect_seconds = min(timings)
+
+    print(f"{args.size} aircraft, 12h window, {rows} rows ({len(tracks)} slice reports)\n")
+    print(f"  collect           {collect_seconds * 1000:>8.1f}ms  ({collect_seconds / rows * 1e6:.2f}us per row)")
+    print(f"  detect            {detect_seconds * 1000:>8.1f}ms  ({len(encounters)} encounters)")
+    for e in encounters:
+        print(f"    {e.kind:<10} {e.type_a:<16} + {e.type_b:<16} {e.minutes:>5.0f} min  "
+              f"({e.lat:.2f}, {e.lon:.2f})")
+
+    failures = 0
+    kinds = {frozenset((e.icao_a, e.icao_b)): e.kind for e in encounters}
+    pairs = defaultdict(list)
+    for aircraft in fleet.aircraft:
+        if aircraft["kind"] == "formation":
+            pairs[(aircraft["sortie_start"], aircraft["center_lat"])].append(aircraft)
+    for members in pairs.values():
+        key = frozenset(a["icao_hex"].upper() for a in members)
+        expected = "rendezvous" if any("KC-135" in a["aircraft_type"] for a in members) else "formation"
+        if kinds.get(key) != expected:
+            print(f"✗ Synthetic {expected} pair {sorted(key)} reported as {kinds.get(key)}")
+            failures += 1
+
+    check, _, _ = collect(SyntheticFleet(size=args.check_size, background=0, seed=args.seed,
+                                         formations=args.formations), args.interval)
+    got = [(check.index[e.icao_a], check.index[e.icao_b], e.start, e.minutes) for e in detect_formations(check)]
+    expected = brute_force(check)
+    if got != expected:
+        print(f"✗ detect() found {len(got)} encounters, brute force {len(expected)} "
+              f"(fleet of {args.check_size})")
+        failures += 1
+
+    if failures:
+        sys.exit(1)
+    print(f"\n✓ Synthetic pairs classified; {len(expected)} encounters match brute force "
+          f"at {args.check_size} aircraft")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Geofence benchmark
+Builds thousands of random star-shaped fences over the North Atlantic /
+Europe box, classifies batches of random positions with FenceIndex
+(src/geofence.py) and checks every (point, fence) pair against brute-force
+ray casting over each fence's full edge list. The run fails on any mismatch.
+
+Throughput is reported two ways: point-fence checks per second (points x
+fences, what a naive loop would have to do) and the candidate pairs the grid
+actually left to test. A second pass drives GeofenceTracker through
+consecutive batches and checks its entry/exit events against set differences.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from geofence import FenceIndex, GeofenceTracker, points_in_edges, polygon_edges
+
+# lat_min, lat_max, lon_min, lon_max
+BOX = (25.0, 65.0, -80.0, 40.0)
+
+
+def random_fences(rng: np.random.Generator, count: int):
+    fences = []
+    for i in range(count):
+        vertices = int(rng.integers(4, 33))
+        angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+        radii = rng.uniform(0.05, 1.5) * rng.uniform(0.4, 1.0, vertices)
+        lat = rng.uniform(BOX[0] + 2, BOX[1] - 2)
+        lon = rng.uniform(BOX[2] + 2, BOX[3] - 2)
+        fences.append({
+            "fence_id": f"f{i:05d}",
+            "polygon": list(zip(lat + radii * np.sin(angles), lon + radii * np.cos(angles))),
+        })
+    return fences
+
+
+def random_points(rng: np.random.Generator, count: int):
+    return rng.uniform(BOX[0], BOX[1], count), rng.uniform(BOX[2], BOX[3], count)
+
+
+def brute_force(fences, lats, lons) -> set:
+    """(point, fence) pairs inside, testing each fence against the points in its bounding box"""
+    pairs = set()
+    for fence_idx, fence in enumerate(fences):
+        edges = polygon_edges(fence["polygon"])
+        box = ((lats >= edges[:, 1].min()) & (lats <= edges[:, 1].max())
+               & (lons >= edges[:, 0].min()) & (lons <= edges[:, 0].max()))
+        candidates = np.flatnonzero(box)
+        inside = candidates[points_in_edges(lons[candidates], lats[candidates], edges)]
+        pairs.update((int(p), fence_idx) for p in inside)
+    return pairs
+
+
+def check_tracker(index: FenceIndex, rng: np.random.Generator, aircraft: int, batches: int) -> int:
+    """Random walk `aircraft` aircraft through `batches` batches; returns mismatching batches"""
+    icaos = rng.choice(1 << 24, aircraft, replace=False)
+    lats, lons = random_points(rng, aircraft)
+    tracker = GeofenceTracker(index)
+    inside: set = set()
+    failures = 0
+    for _ in range(batches):
+        lats = np.clip(lats + rng.normal(0, 0.3, aircraft), BOX[0], BOX[1])
+        lons = np.clip(lons + rng.normal(0, 0.3, aircraft), BOX[2], BOX[3])
+        # Each batch carries a random subset of the fleet, as a poll would
+        present = np.flatnonzero(rng.random(aircraft) < 0.8)
+        rows, fences, kinds = tracker.update(icaos[present], lats[present], lons[present])
+
+        points, point_fences = index.classify(lats[present], lons[present])
+        now = {(int(f), int(icaos[present][p])) for p, f in zip(points, point_fences)}
+        seen = set(icaos[present].tolist())
+        before = {pair for pair in inside if pair[1] in seen}
+        events = {(int(f), int(icaos[present][r]), int(k)) for r, f, k in zip(rows, fences, kinds)}
+        expected = {(f, i, 1) for f, i in now - before} | {(f, i, -1) for f, i in before - now}
+        failures += events != expected
+        inside = (inside - before) | now
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geofence classification throughput")
+    parser.add_argument("--fences", type=int, default=5000)
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--batches", type=int, default=5, help="Timed classify() calls")
+    parser.add_argument("--cell", type=float, default=0.25, help="Grid cell size in degrees")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    fences = random_fences(rng, args.fences)
+    vertices = sum(len(f["polygon"]) for f in fences)
+
+    start = time.perf_counter()
+    index = FenceIndex(fences, cell_degrees=args.cell)
+    build = time.perf_counter() - start
+    print(f"{args.fences} fences ({vertices} vertices), {args.points} points per batch, 1 core\n")
+    print(f"  index build       {build:>8.2f}s  {len(index.cell_keys)} cells, "
+          f"{int(index.entry_full.sum())} full / {int((~index.entry_full).sum())} boundary entries")
+
+    batches = [random_points(rng, args.points) for _ in range(args.batches)]
+    index.classify(*batches[0])
+    elapsed = candidates = edge_tests = 0
+    for lats, lons in batches:
+        start = time.perf_counter()
+        index.classify(lats, lons)
+        elapsed += time.perf_counter() - start
+        candidates += index.last_candidates
+        edge_tests += index.last_edge_tests
+
+    checks = args.points * args.fences * args.batches
+    print(f"  classify          {elapsed / args.batches * 1000:>8.1f}ms per batch")
+    print(f"  point-fence checks {checks / elapsed / 1e6:>9.1f}M/s (points x fences)")
+    print(f"  grid candidates   {candidates / elapsed / 1e6:>8.2f}M/s  "
+          f"({candidates / args.batches:.0f} per batch, {edge_tests / args.batches:.0f} edge tests)")
+
+    lats, lons = batches[0]
+    points, point_fences = index.classify(lats, lons)
+    got = set(zip(points.tolist(), point_fences.tolist()))
+    start = time.perf_counter()
+    expected = brute_force(fences, lats, lons)
+    brute = time.perf_counter() - start
+    print(f"  brute force       {brute * 1000:>8.1f}ms (bounding box + ray cast per fence)")
+
+    failures = 0
+    if got != expected:
+        print(f"\n✗ classify() disagrees with brute force: {len(got - expected)} extra, "
+              f"{len(expected - got)} missing of {len(expected)} pairs")
+        failures += 1
+    tracker_failures = check_tracker(index, rng, aircraft=min(args.points, 20000), batches=10)
+    if tracker_failures:
+        print(f"✗ GeofenceTracker events wrong in {tracker_failures} of 10 batches")
+        failures += 1
+    if failures:
+        sys.exit(1)
+    print(f"\n✓ {len(expected)} inside pairs match brute force; tracker events match over 10 batches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Latest-state table benchmark
+Drives src/latest_state.py the way a long-running ingester does: a restart
+with a larger tracked set, then days of hourly batches in which a core fleet
+keeps flying and newly discovered aircraft come and go. A reader in another
+process looks aircraft up and scans the table throughout.
+
+The run fails if the reader process dies (a SIGBUS from a table truncated
+under its mmap), if a restart loses a record, if any aircraft in a batch
+cannot be read back after it, if aircraft not seen for
+LATEST_STATE_RETAIN_HOURS survive a rebuild, or if the table grows beyond
+twice what the live aircraft need.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from latest_state import LatestStateReader, LatestStateWriter, _capacity
+
+# Looks up and scans until the writer removes the stop file
+READER = """
+import os, sys
+sys.path.insert(0, sys.argv[1])
+from latest_state import LatestStateReader
+reader = LatestStateReader(sys.argv[2])
+reads = 0
+while os.path.exists(sys.argv[3]):
+    for state in reader.positions():
+        reader.get(state["icao"])
+        reads += 1
+print(reads)
+"""
+
+
+def batch(icaos, timestamp, rng: random.Random):
+    return [{
+        "icao_hex": f"{icao:06X}", "timestamp": timestamp, "lat": rng.uniform(-60, 70),
+        "lon": rng.uniform(-180, 180), "altitude": rng.randrange(0, 12000), "ground_speed": 220,
+        "heading": rng.randrange(360), "on_ground": 0,
+    } for icao in icaos]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latest-state table: restarts, reclaim and growth")
+    parser.add_argument("--core", type=int, default=500, help="Aircraft flying every hour")
+    parser.add_argument("--discovered", type=int, default=200, help="New aircraft per hour, seen for one hour")
+    parser.add_argument("--hours", type=int, default=72)
+    parser.add_argument("--retain-hours", type=float, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "latest_state")
+        stop = os.path.join(directory, "running")
+        start = 1_700_000_000
+        core = list(range(0xA00000, 0xA00000 + args.core))
+
+        writer = LatestStateWriter(path, capacity=args.core // 4, retain_hours=args.retain_hours)
+        writer.publish(batch(core[:args.core // 4], start, rng))
+        open(stop, "w").close()
+        reader_process = subprocess.Popen([sys.executable, "-c", READER, os.path.join(BENCH_DIR, "..", "src"),
+                                           path, stop], stdout=subprocess.PIPE, text=True)
+        local = LatestStateReader(path)
+        before = {s["icao"]: s for s in local.positions()}
+
+        # Restart with the tracked set grown 4x, as after seed_aircraft.py
+        writer.close()
+        writer = LatestStateWriter(path, capacity=args.core + 1024, retain_hours=args.retain_hours)
+        after = {s["icao"]: s for s in local.positions()}
+        print(f"restart: {len(before)} aircraft, table {_capacity(args.core // 4)} -> {writer.capacity} slots, "
+              f"{len(after)} kept")
+        if after != before or local.capacity != writer.capacity:
+            failures.append(f"restart kept {len(after)} of {len(before)} records "
+                            f"(reader sees {local.capacity} slots, writer {writer.capacity})")
+
+        # Days of hourly batches: the core fleet plus aircraft seen for one hour only
+        next_icao, largest, missing = 0xB00000, 0, 0
+        publish_seconds = 0.0
+        for hour in range(args.hours):
+            now = start + (hour + 1) * 3600
+            discovered = list(range(next_icao, next_icao + args.discovered))
+            next_icao += args.discovered
+            rows = batch(core + discovered, now, rng)
+            began = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                writer.publish(rows)
+            publish_seconds += time.perf_counter() - began
+            largest = max(largest, writer.capacity)
+            for row in rows:
+                state = local.get(int(row["icao_hex"], 16))
+                missing += state is None or (state["timestamp"], state["lat"], state["lon"]) != (
+                    row["timestamp"], row["lat"], row["lon"])
+        # Whatever went stale since the last rebuild goes with the next one
+        with contextlib.redirect_stdout(io.StringIO()):
+            writer.compact()
+        states = local.positions()
+        stale = sum(1 for s in states if s["timestamp"] < now - writer.retain_seconds)
+        live = args.core + args.discovered * (int(args.retain_hours) + 1)
+        rows_total = args.hours * (args.core + args.discovered)
+        print(f"{args.hours} hourly batches of {args.core} + {args.discovered} new aircraft: "
+              f"{rows_total / publish_seconds / 1000:.0f}k rows/s, {writer.rebuilds - 1} rebuilds, "
+              f"at most {largest} slots, {len(states)} aircraft held after a final compaction "
+              f"(up to {live} seen within {args.retain_hours:g}h), {missing} not read back")
+        if missing:
+            failures.append(f"{missing} written records not read back as written")
+        if stale:
+            failures.append(f"{stale} aircraft unseen for over {args.retain_hours:g}h still held")
+        if largest > 2 * _capacity(live):
+            failures.append(f"table grew to {largest} slots for {live} live aircraft")
+
+        os.remove(stop)
+        reads, _ = reader_process.communicate(timeout=60)
+        print(f"reader process: {reads.strip() or '-'} lookups, exit {reader_process.returncode}")
+        if reader_process.returncode != 0:
+            failures.append(f"reader process exited with {reader_process.returncode}")
+        local.close()
+        writer.close()
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("\n✓ Readers follow every rebuild, stale aircraft are reclaimed and nothing is dropped")
+
+
+if __name__ == "__main__":
+    main()
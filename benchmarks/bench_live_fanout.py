@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Live fan-out load test
+Starts src/live_fanout.py in a subprocess, opens N concurrent SSE clients
+with a mix of map viewports, publishes synthetic ingest batches and reports
+delivery latency, bytes on the wire and server memory
+
+Fails if a malformed /ingest batch (valid JSON of the wrong shape) gets
+anything but a 400, or changes the server's aircraft or batch counts.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from live_fanout import encode_row
+
+# Typical map views: world, continents, and a handful of zoomed-in hotspots
+VIEWPORT_PRESETS = [
+    (-90, -180, 90, 180),
+    (35, -25, 72, 45),      # Europe
+    (15, -130, 60, -60),    # North America
+    (12, 25, 42, 65),       # Middle East
+    (44, 22, 53, 41),       # Ukraine
+    (20, 100, 50, 150),     # East Asia
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class Client:
+    """One SSE subscriber; records receive latency of each diff event"""
+
+    def __init__(self):
+        self.latencies = []
+        self.bytes = 0
+        self.snapshot = False
+
+    async def run(self, port: int, bbox, ready: asyncio.Event):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        query = ",".join(str(v) for v in bbox)
+        writer.write(f"GET /stream?bbox={query} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await reader.readuntil(b"\r\n\r\n")
+        ready.set()
+        try:
+            while True:
+                event = await reader.readuntil(b"\n\n")
+                received = time.time()
+                self.bytes += len(event)
+                if event.startswith(b"event: snapshot"):
+                    self.snapshot = True
+                elif event.startswith(b"event: diff"):
+                    # "t" follows "seq" in the payload; avoid a full JSON parse per client
+                    start = event.index(b'"t":') + 4
+                    sent = float(event[start:event.index(b",", start)])
+                    self.latencies.append(received - sent)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def connect_all(port: int, count: int, seed: int):
+    rng = random.Random(seed)
+    clients, tasks = [], []
+    for i in range(count):
+        if rng.random() < 0.8:
+            bbox = rng.choice(VIEWPORT_PRESETS)
+        else:
+            lat, lon = rng.uniform(-50, 60), rng.uniform(-170, 160)
+            bbox = (lat, lon, lat + rng.uniform(2, 15), lon + rng.uniform(2, 20))
+        client, ready = Client(), asyncio.Event()
+        clients.append(client)
+        tasks.append(asyncio.ensure_future(client.run(port, bbox, ready)))
+        await ready.wait()
+    return clients, tasks
+
+
+async def request(port: int, method: str, path: str, body: bytes = b"") -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+async def publish(port: int, rows) -> float:
+    body = json.dumps(rows, separators=(",", ":")).encode()
+    start = time.perf_counter()
+    await request(port, "POST", "/ingest", body)
+    return time.perf_counter() - start
+
+
+async def health(port: int) -> dict:
+    response = await request(port, "GET", "/health")
+    return json.loads(response.partition(b"\r\n\r\n")[2])
+
+
+async def reject_malformed(port: int, valid_row) -> list:
+    """Post batches of the wrong shape; each must get a 400 and change nothing"""
+    failures = []
+    before = await health(port)
+    for batch in ({"rows": []}, [{"icao_hex": "ABC123"}], [["ABC123"]], [valid_row, [1, 2, 3]],
+                  [valid_row[:1] + [None] + valid_row[2:]], [["XYZ", *valid_row[1:]]], "rows"):
+        response = await request(port, "POST", "/ingest", json.dumps(batch).encode())
+        status = response.split(b" ", 2)[1].decode() if response else "no response"
+        if status != "400":
+            failures.append(f"malformed batch {json.dumps(batch)[:60]} got {status}")
+    after = await health(port)
+    if (after["aircraft"], after["batches"]) != (before["aircraft"], before["batches"]):
+        failures.append(f"malformed batches changed the server: {before} -> {after}")
+    return failures
+
+
+async def run(args):
+    port = free_port()
+    env = dict(os.environ, LIVE_FANOUT_PORT=str(port))
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "..", "src", "live_fanout.py")],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(50):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        fleet = SyntheticFleet(size=args.fleet, background=0, seed=args.seed)
+        step = fleet.window_seconds // (args.batches + 1)
+
+        # Seed the server so clients get a non-empty snapshot
+        seed_rows = [encode_row(r) for r in snapshot_rows(fleet, 0)]
+        await publish(port, seed_rows)
+        failures = await reject_malformed(port, seed_rows[0])
+
+        start = time.perf_counter()
+        clients, tasks = await connect_all(port, args.clients, args.seed)
+        connect_time = time.perf_counter() - start
+        print(f"Connected {len(clients)} clients in {connect_time:.1f}s "
+              f"(server RSS {rss_mb(server.pid):.0f}MB)")
+
+        ingest_times = []
+        for i in range(1, args.batches + 1):
+            rows = [encode_row(r) for r in snapshot_rows(fleet, i * step)]
+            ingest_times.append(await publish(port, rows))
+            await asyncio.sleep(args.interval)
+
+        await asyncio.sleep(1.0)
+        server_rss = rss_mb(server.pid)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        latencies = sorted(l for c in clients for l in c.latencies)
+        total_bytes = sum(c.bytes for c in clients)
+        print(f"Batches published:   {args.batches} × {args.fleet} aircraft")
+        print(f"Publish+fan-out:     median {statistics.median(ingest_times) * 1000:.0f}ms, "
+              f"max {max(ingest_times) * 1000:.0f}ms")
+        print(f"Clients w/ snapshot: {sum(c.snapshot for c in clients)}")
+        print(f"Diff events:         {len(latencies)}")
+        if latencies:
+            print(f"Delivery latency:    p50 {latencies[len(latencies) // 2] * 1000:.0f}ms, "
+                  f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f}ms")
+        print(f"Bytes delivered:     {total_bytes / 1024 / 1024:.1f}MB "
+              f"({total_bytes / max(1, len(clients)) / 1024:.1f}KB per client)")
+        print(f"Server RSS:          {server_rss:.0f}MB")
+        print(f"Malformed batches:   {'rejected with 400' if not failures else 'NOT rejected'}")
+        return failures
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def snapshot_rows(fleet: SyntheticFleet, t: float):
+    """flight_positions-shaped rows for every airborne tracked aircraft at t"""
+    rows = []
+    for aircraft in fleet.aircraft:
+        if not fleet.is_airborne(aircraft, t):
+            continue
+        lat, lon, heading = fleet.position_at(aircraft, t)
+        rows.append({
+            "timestamp": fleet.window_start.timestamp() + t,
+            "icao_hex": aircraft["icao_hex"].upper(),
+            "callsign": aircraft["callsign"],
+            "lat": lat, "lon": lon,
+            "altitude": aircraft["altitude"],
+            "ground_speed": aircraft["speed"],
+            "heading": int(heading),
+            "on_ground": 0,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live fan-out SSE load test")
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--fleet", type=int, default=2000, help="Tracked aircraft")
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between batches")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if args.clients + 100 > hard:
+        print(f"Warning: fd limit {hard} is too low for {args.clients} clients")
+
+    failures = asyncio.run(run(args))
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Multi-window scoring benchmark
+Scores the 1h/6h/12h/24h windows once per window (four scans) and with
+calculate_multi_window_scores (one scan of the 24h window), checks that
+every window's row is identical, and compares wall time
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from bench_streaming_scores import StreamingClickHouse, fleet_now
+from calculate_panic import PanicScoreCalculator
+
+# Keys only the multi-window rows carry
+TREND_KEYS = ("trend_delta", "component_deltas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Separate vs single-pass multi-window scoring")
+    parser.add_argument("--sizes", default="100,1000", help="Comma-separated tracked fleet sizes")
+    parser.add_argument("--windows", default="1,6,12,24", help="Horizons in hours")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--interval", type=int, default=60)
+    args = parser.parse_args()
+
+    horizons = sorted(int(h) for h in args.windows.split(",") if h)
+    failures = 0
+
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        fleet = SyntheticFleet(size=size, background=0, seed=args.seed, hours=max(horizons))
+        calculator = PanicScoreCalculator(ch_client=StreamingClickHouse(fleet, args.interval))
+        now = fleet_now(fleet)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            separate = [calculator.calculate_panic_score(hours=h, now=now) for h in horizons]
+            separate_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            combined = calculator.calculate_multi_window_scores(horizons=horizons, now=now)
+            combined_seconds = time.perf_counter() - start
+
+        print(f"size {size:>5}: {len(horizons)} scans {separate_seconds * 1000:>8.1f}ms  "
+              f"one pass {combined_seconds * 1000:>8.1f}ms  ({separate_seconds / combined_seconds:.2f}x)")
+        for single, row in zip(separate, combined):
+            single = dict(single, timestamp=None)
+            row = {k: v for k, v in row.items() if k not in TREND_KEYS}
+            row["timestamp"] = None
+            same = single == row
+            failures += not same
+            print(f"    {row['window_hours']:>3}h  {row['flight_count']:>8} rows  overall "
+                  f"{row['overall_panic_score']:>3}  {'identical' if same else 'MISMATCH'}")
+
+    if failures:
+        print(f"\n✗ {failures} mismatches")
+        sys.exit(1)
+    print("\n✓ Every window matches calculate_panic_score for that window")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Notification dispatcher benchmark
+Runs src/notify.py end to end against stand-ins: panic_scores and
+geofence_events rows come from InMemoryClickHouse, and Telegram, Discord and
+Twitter are one local HTTP server that fails a few requests on purpose
+(a 429 with Retry-After, 500s, a 503).
+
+The scenario fires a burst of threshold crossings and geofence entries,
+stops the dispatcher while messages are still queued, and restarts it on the
+same outbox. A second burst has regions staying high (no new alert),
+climbing further (alert again) and dropping and recrossing (alert again),
+and a geofence event that becomes visible only after later-stamped ones
+were polled, as when a sharded ingester worker flushes late.
+
+The run fails unless every expected alert went out in exactly one delivered
+message per channel, the stand-ins received exactly what the outbox
+recorded as sent, no channel ever exceeded its token bucket, and the retry
+after the 429 waited for Retry-After.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from stand_ins import InMemoryClickHouse
+from notify import DiscordChannel, Dispatcher, Outbox, TelegramChannel, TwitterChannel, _epoch
+
+# Bucket sizes for the stand-in channels (real limits would make the run take hours)
+RATES = {"telegram": (2.0, 2), "discord": (4.0, 4), "twitter": (1.0, 1)}
+# Status codes the stand-in answers with before it starts accepting, per channel
+FAULTS = {"telegram": [429], "discord": [500, 500], "twitter": [503]}
+RETRY_AFTER_SECONDS = 1.0
+
+
+def start_stand_in_apis():
+    """One local HTTP server answering the three APIs' post endpoints; records every request"""
+    received = []
+    faults = {name: list(codes) for name, codes in FAULTS.items()}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            channel = ("telegram" if self.path.endswith("/sendMessage") else
+                       "twitter" if self.path == "/2/tweets" else "discord")
+            text = body.get("text", body.get("content"))
+            with lock:
+                status = faults[channel].pop(0) if faults[channel] else 200
+                received.append((channel, time.monotonic(), status, text))
+            reply = b'{"ok": true}'
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", str(int(RETRY_AFTER_SECONDS)))
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, received
+
+
+def stand_in_clickhouse(scores, fence_events):
+    client = InMemoryClickHouse()
+    client.on_select("FROM panic_scores", lambda p: [
+        tuple(r[c] for c in ("timestamp", "region", "window_hours", "overall_panic_score", "night_flight_score",
+                              "convergence_score", "airlift_score", "vip_movement_score", "formation_score",
+                              "flight_count", "countries_involved", "narrative", "trend_delta"))
+        for r in sorted(scores, key=lambda r: (r["timestamp"], r["region"]))
+        if _epoch(r["timestamp"]) > p["since"] and r["window_hours"] == p["hours"]
+    ])
+    client.on_select("FROM geofence_events", lambda p: [
+        (r["timestamp"], r["fence_id"], r["fence"], r["icao_hex"], r["callsign"], r["event"])
+        for r in sorted(fence_events, key=lambda r: r["timestamp"]) if _epoch(r["timestamp"]) > p["since"]
+    ])
+    return client
+
+
+def score_row(region: str, score: int, at: datetime, hours: int = 12):
+    return {"timestamp": at, "region": region, "window_hours": hours, "overall_panic_score": score,
+            "night_flight_score": 40.0, "convergence_score": 70.0, "airlift_score": 20.0,
+            "vip_movement_score": 10.0, "formation_score": 0.0, "flight_count": 1200,
+            "countries_involved": 6, "narrative": f"⚠️ {region}: jets converging", "trend_delta": 5.0}
+
+
+def fence_row(i: int, at: datetime):
+    return {"timestamp": at, "fence_id": f"f{i % 3}", "fence": f"Fence {i % 3}",
+            "icao_hex": f"AE{i:04X}", "callsign": f"RCH{i:03d}", "event": "enter"}
+
+
+def make_channels(base_url: str):
+    channels = [TelegramChannel("TOKEN", "@chat", base_url), DiscordChannel(f"{base_url}/discord"),
+                TwitterChannel("TOKEN", base_url)]
+    for channel in channels:
+        channel.bucket.rate, channel.bucket.burst = RATES[channel.name]
+        channel.bucket.tokens = channel.bucket.burst
+    return channels
+
+
+def interrupted(summary) -> bool:
+    """Some messages went out and some alerts are still waiting: time for the restart"""
+    return (any(s["sent"] for s in summary.values())
+            and any(s["pending_alerts"] or s["queued"] for s in summary.values()))
+
+
+def drained(summary) -> bool:
+    return bool(summary) and not any(s["pending_alerts"] or s["queued"] for s in summary.values())
+
+
+async def run_phase(dispatcher: Dispatcher, client, feed, done, timeout: float = 60.0):
+    """Run the dispatcher while feed() adds rows; stop once done(outbox summary)"""
+    task = asyncio.ensure_future(dispatcher.run(client, poll_seconds=0.1))
+    await asyncio.sleep(0.05)
+    await feed()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not done(dispatcher.outbox.summary()):
+        await asyncio.sleep(0.02)
+    dispatcher.stop()
+    await task
+
+
+def rate_violations(times, rate: float, burst: int):
+    """Request pairs closer together than the bucket allows"""
+    times = sorted(times)
+    violations = []
+    for i, start in enumerate(times):
+        for j in range(i, len(times)):
+            span = times[j] - start
+            # 50ms slack for timer and scheduling jitter
+            if j - i + 1 > burst + rate * (span + 0.05):
+                violations.append((j - i + 1, span))
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end notification dispatch against stand-in APIs")
+    parser.add_argument("--regions", type=int, default=30, help="Regions crossing the threshold in the first burst")
+    parser.add_argument("--fence-events", type=int, default=20)
+    parser.add_argument("--coalesce", type=float, default=0.3, help="Coalescing window in seconds")
+    args = parser.parse_args()
+
+    server, received = start_stand_in_apis()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    directory = tempfile.mkdtemp(prefix="notify-")
+    path = os.path.join(directory, "outbox.sqlite3")
+    scores, fence_events = [], []
+    client = stand_in_clickhouse(scores, fence_events)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    regions = [f"Region {i:03d}" for i in range(args.regions)]
+    climbers, droppers = regions[:10], regions[10:15]
+    expected = Counter()
+
+    async def first_burst():
+        # Spread over a few polls, like runs landing while the dispatcher works
+        for step in range(3):
+            at = now - timedelta(minutes=30 - step)
+            scores.extend(score_row(r, 40 + step * 10, at) for r in regions)
+            scores.extend(score_row(r, 99, at, hours=1) for r in regions)
+            fence_events.extend(fence_row(i, at) for i in range(step, args.fence_events, 3))
+            await asyncio.sleep(0.15)
+        expected["panic"] += len(regions)
+        expected["geofence"] += args.fence_events
+
+    async def second_burst():
+        at = now - timedelta(minutes=20)
+        scores.extend(score_row(r, 62, at) for r in regions[15:])
+        scores.extend(score_row(r, 72, at) for r in climbers)
+        scores.extend(score_row(r, 45, at) for r in droppers)
+        await asyncio.sleep(0.15)
+        at += timedelta(minutes=1)
+        scores.extend(score_row(r, 61, at) for r in droppers)
+        fence_events.extend(fence_row(1000 + i, at) for i in range(10))
+        # A sharded worker flushing after the dispatcher polled: stamped
+        # before events already alerted on, visible only now
+        await asyncio.sleep(0.15)
+        fence_events.append(fence_row(2000, at - timedelta(seconds=3)))
+        expected["panic"] += len(climbers) + len(droppers)
+        expected["geofence"] += 11
+
+    failures = []
+    phases = []
+    try:
+        for name, feed, done in (("first run", first_burst, interrupted), ("restarted", second_burst, drained)):
+            outbox = Outbox(path)
+            dispatcher = Dispatcher(make_channels(base_url), outbox, coalesce_seconds=args.coalesce,
+                                    backoff_seconds=0.2)
+            start, seen = time.monotonic(), len(received)
+            asyncio.run(run_phase(dispatcher, client, feed, done))
+            phases.append((start, time.monotonic()))
+            summary = outbox.summary()
+            print(f"  {name:<10} {time.monotonic() - start:5.1f}s  {len(received) - seen:>3} requests  "
+                  f"stats {dispatcher.stats}")
+            for channel, s in sorted(summary.items()):
+                print(f"    {channel:<9} {s['alerts_sent']:>3} alerts in {s['sent']:>2} messages sent, "
+                      f"{s['pending_alerts']} pending, {s['queued']} queued, {s['failed']} failed")
+            if not done(summary):
+                failures.append(f"{name}: timed out")
+            if name == "restarted":
+                db = outbox.db
+                sent_texts = defaultdict(Counter)
+                for channel, text in db.execute("SELECT channel, text FROM messages WHERE sent_at IS NOT NULL"):
+                    sent_texts[channel][text] += 1
+                kinds = db.execute(
+                    "SELECT a.channel, a.kind, count(*) FROM alerts a JOIN messages m ON a.message_id = m.id "
+                    "WHERE m.sent_at IS NOT NULL GROUP BY a.channel, a.kind").fetchall()
+                unsent = db.execute(
+                    "SELECT count(*) FROM alerts a LEFT JOIN messages m ON a.message_id = m.id "
+                    "WHERE m.sent_at IS NULL").fetchone()[0]
+            outbox.close()
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory)
+
+    delivered = defaultdict(Counter)
+    for channel, _, status, text in received:
+        if status == 200:
+            delivered[channel][text] += 1
+
+    for channel in RATES:
+        kinds_here = ("panic",) if channel == "twitter" else ("panic", "geofence")
+        for kind in kinds_here:
+            got = next((n for c, k, n in kinds if c == channel and k == kind), 0)
+            if got != expected[kind]:
+                failures.append(f"{channel}: {got} {kind} alerts delivered, expected {expected[kind]}")
+        if delivered[channel] != sent_texts[channel]:
+            failures.append(f"{channel}: stand-in received {sum(delivered[channel].values())} messages, "
+                            f"outbox recorded {sum(sent_texts[channel].values())} as sent")
+        rate, burst = RATES[channel]
+        for start, end in phases:
+            times = [t for c, t, _, _ in received if c == channel and start <= t <= end]
+            violations = rate_violations(times, rate, burst)
+            if violations:
+                failures.append(f"{channel}: {len(violations)} request windows over the bucket, e.g. "
+                                f"{violations[0][0]} in {violations[0][1]:.2f}s")
+    if unsent:
+        failures.append(f"{unsent} alerts never sent")
+
+    telegram = [(t, status) for c, t, status, _ in received if c == "telegram"]
+    after_429 = [t for (t0, s0), (t, _) in zip(telegram, telegram[1:]) if s0 == 429 and t - t0 < RETRY_AFTER_SECONDS]
+    if after_429:
+        failures.append("telegram retried before Retry-After")
+
+    alerts = sum(expected[k] for k in ("panic", "geofence"))
+    messages = sum(sum(c.values()) for c in delivered.values())
+    print(f"\n  {alerts} alerts per channel (twitter: {expected['panic']}) -> {messages} messages in total, "
+          f"{sum(1 for r in received if r[2] != 200)} injected failures retried")
+
+    for failure in failures[:20]:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✓ Every alert delivered once across the restart, within rate limits, after retries")
+
+
+if __name__ == "__main__":
+    main()
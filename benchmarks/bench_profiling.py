@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Cycle profiling benchmark
+Measures what the profiling hooks (src/profiling.py) cost when disarmed and
+when armed, on the scorer's run_once and an ingester poll over a synthetic
+fleet, and checks what an armed cycle writes.
+
+The run fails if a disarmed cycle costs more than a microsecond, if sampling
+alone slows a run by more than 20%, if arming by SIGUSR1 or the score
+daemon's profile command does not profile exactly the requested number of
+cycles, or if a profile is missing its tags, its scorer frames or its
+allocation snapshot, or is not valid speedscope JSON. The scorer runs its
+components on SCORE_THREADS=4 threads, and their samples must show up too.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import signal
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from run import make_calculator, make_ingester
+from profiling import CycleProfiler, top_frames
+import profiling
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def timed(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        quiet(fn)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def check_profile(directory: str, cycle_id: str, frames: tuple, failures: list) -> dict:
+    """Load one cycle's files; returns its metadata"""
+    base = os.path.join(directory, cycle_id)
+    with open(base + ".json") as f:
+        meta = json.load(f)
+    with open(base + ".speedscope.json") as f:
+        document = json.load(f)
+    shared = len(document["shared"]["frames"])
+    for profile in document["profiles"]:
+        if len(profile["samples"]) != len(profile["weights"]) or \
+                any(i >= shared for sample in profile["samples"] for i in sample):
+            failures.append(f"{cycle_id}: malformed speedscope profile {profile['name']!r}")
+    units = [p["unit"] for p in document["profiles"]]
+    if units != ["milliseconds", "bytes"]:
+        failures.append(f"{cycle_id}: profiles {units}, expected time and allocations")
+    samples, top = top_frames(base + ".collapsed", limit=1000)
+    if samples != meta["samples"] or samples == 0:
+        failures.append(f"{cycle_id}: {samples} collapsed samples, metadata says {meta['samples']}")
+    with open(base + ".collapsed") as f:
+        text = f.read()
+    missing = [name for name in frames if name + " (" not in text]
+    if missing:
+        failures.append(f"{cycle_id}: no samples in {missing}")
+    if "rows" not in meta["tags"] or meta.get("allocations", {}).get("peak_bytes", 0) <= 0:
+        failures.append(f"{cycle_id}: missing row tags or allocation totals: {meta}")
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profiling hook overhead and output")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--interval", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=1_000_000, help="Disarmed cycles to time")
+    args = parser.parse_args()
+
+    os.environ["SCORE_WINDOWS"] = "12"
+    # Components on the pipeline's own threads, which the profile must follow
+    os.environ["SCORE_THREADS"] = "4"
+    os.environ["PROFILE_CYCLES"] = "2"
+    directory = tempfile.mkdtemp(prefix="profiles-")
+    profiler = profiling._profiler = CycleProfiler(directory)
+    failures = []
+
+    fleet = SyntheticFleet(size=args.size, seed=42)
+    calculator = make_calculator(fleet, args.interval)
+    ingester = make_ingester(fleet, fleet.states_payload())
+    print(f"{args.size} aircraft, {len(fleet.recent_flight_rows(args.interval))} position rows\n")
+
+    try:
+        # Disarmed: the hook on every cycle of every loop
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            with profiler.cycle("poll") as cycle:
+                cycle.tag(rows=1)
+        hooked = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            pass
+        bare = time.perf_counter() - start
+        per_cycle = (hooked - bare) / args.calls
+        print(f"  disarmed hook: {per_cycle * 1e9:.0f}ns per cycle")
+        if per_cycle > 1e-6:
+            failures.append(f"disarmed hook costs {per_cycle * 1e9:.0f}ns per cycle")
+
+        # Disarmed and sampled runs alternate, so drift hits both alike
+        quiet(calculator.run_once)
+        plain, sampling = [], []
+        for _ in range(args.repeat):
+            plain.append(timed(calculator.run_once, 1))
+            profiler.arm(1, allocations=False)
+            sampling.append(timed(calculator.run_once, 1))
+        baseline, sampled = statistics.median(plain), statistics.median(sampling)
+        profiler.allocations = True
+        profiler.written.clear()
+
+        # SIGUSR1 arms PROFILE_CYCLES (2): the third run is not profiled
+        profiler.install_signal()
+        os.kill(os.getpid(), signal.SIGUSR1)
+        armed = [timed(calculator.run_once, 1) for _ in range(3)]
+        written = list(profiler.written)
+        print(f"  run_once: {baseline * 1e3:.0f}ms disarmed, {sampled * 1e3:.0f}ms sampled "
+              f"({sampled / baseline - 1:+.0%}), {armed[0] * 1e3:.0f}ms sampled with tracemalloc "
+              f"({armed[0] / baseline - 1:+.0%}), {armed[2] * 1e3:.0f}ms once disarmed again")
+        if sampled > baseline * 1.2:
+            failures.append(f"sampling slowed run_once by {sampled / baseline - 1:.0%}")
+        if len(written) != 2 or profiler.remaining:
+            failures.append(f"SIGUSR1 profiled {len(written)} runs, expected 2")
+        for cycle_id in written:
+            meta = check_profile(directory, cycle_id, ("run_once", "calculate_panic_score"), failures)
+            with open(os.path.join(directory, cycle_id + ".collapsed")) as f:
+                workers = sum(int(line.rpartition(" ")[2]) for line in f if line.startswith("score_"))
+            if not workers:
+                failures.append(f"{cycle_id}: no samples from the score-* component threads")
+        if written:
+            print(f"  {written[-1]}: {meta['samples']} samples ({workers} on component threads), "
+                  f"{meta['tags']['rows']} rows tagged, "
+                  f"peak {meta['allocations']['peak_bytes'] / 1e6:.1f}MB traced")
+
+        # The daemon's control command, without the socket
+        from score_daemon import ScoreDaemon
+        daemon = ScoreDaemon(calculator=calculator, path=os.path.join(directory, "score.sock"))
+        state = daemon.handle({"command": "profile", "cycles": 1, "interval_ms": 1})
+        quiet(daemon.run)
+        quiet(daemon.run)
+        if not state["ok"] or state["remaining"] != 1 or len(profiler.written) != 3:
+            failures.append(f"profile command: {state}, {len(profiler.written) - 2} runs profiled, expected 1")
+        else:
+            meta = check_profile(directory, profiler.written[-1], ("run_once",), failures)
+            print(f"  daemon profile command at 1ms: {meta['samples']} samples over {meta['seconds']:.2f}s")
+
+        # An ingester poll, hooked the way run_continuous hooks it
+        profiler.arm(1, interval_ms=1)
+        with profiler.cycle("poll") as cycle:
+            result = quiet(ingester.poll_once)
+            cycle.tag(aircraft=result.get("total_aircraft", 0), rows=result.get("stored_records", 0))
+        meta = check_profile(directory, profiler.written[-1], ("poll_once", "filter_tracked_aircraft"), failures)
+        print(f"  poll: {meta['tags']['aircraft']} aircraft, {meta['samples']} samples; top self time:")
+        samples, top = top_frames(os.path.join(directory, profiler.written[-1] + ".collapsed"), limit=3)
+        for own, _, frame in top:
+            print(f"    {own / samples:>5.0%}  {frame}")
+    finally:
+        shutil.rmtree(directory)
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("\n✓ Disarmed hooks are free, arming profiles exactly the requested cycles with tags and allocations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Position quality filter benchmark
+Replays a synthetic fleet one OpenSky snapshot at a time through
+PositionFilter (src/quality.py), first clean and then with faults planted
+at random: ghosts at 0°N 0°E, out-of-range coordinates, one-poll teleports,
+impossible altitudes and speeds, airborne reports without an altitude and a
+second copy of an ICAO somewhere else. One aircraft moves for good, as after
+a bad first fix.
+
+The generator parks an aircraft back at its sortie origin when it lands, so
+the first ground report after a landing is a genuine jump; only airborne
+reports count as clean. The run fails if the clean replay loses an airborne
+report from an aircraft flying at a possible speed, if a planted fault is
+missed or given the wrong reason, if the report after a teleport is not
+accepted, if the moved aircraft takes other than RELOCATE_STRIKES - 1
+rejects to be accepted, if the ingester stores a reject or does not
+quarantine it, or if a 1000-report batch takes 1ms or more to check.
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from stand_ins import InMemoryClickHouse
+from ingest_opensky import OpenSkyIngester, build_position_rows, parse_states
+from quality import MAX_SPEED, REASONS, RELOCATE_STRIKES, PositionFilter
+from tracks import great_circle_m
+
+FAULTS = ("position", "ghost", "altitude", "speed", "zero_altitude", "duplicate", "teleport")
+
+
+def top_speed(aircraft) -> float:
+    """m/s the synthetic motion model flies at; some orbits are faster than anything real"""
+    if aircraft["model"] == "shuttle":
+        (lat_a, lon_a), (lat_b, lon_b) = aircraft["base_a"], aircraft["base_b"]
+        return float(great_circle_m(lat_a, lon_a, lat_b, lon_b)) / aircraft["leg_seconds"]
+    return 2 * math.pi * aircraft["radius_deg"] * 111195 / aircraft["period_seconds"]
+
+
+def snapshots(fleet: SyntheticFleet, start: int, polls: int, interval: int):
+    for poll in range(polls):
+        yield parse_states(fleet.states_payload(start + poll * interval, missing_position_rate=0.0))
+
+
+def plant(states, rng: random.Random, rate: float, moved: str, shift: bool, first: bool = False):
+    """Copy of a snapshot with faults planted; returns (states, {index: reason}, teleported ICAOs)"""
+    states = copy.deepcopy(states)
+    planted, teleported = {}, set()
+    for i, state in enumerate(list(states)):
+        if state["icao24"] == moved:
+            if shift:
+                state["latitude"] = state["latitude"] - 30 if state["latitude"] > 0 else state["latitude"] + 30
+            continue
+        if rng.random() >= rate:
+            continue
+        fault = rng.choice(FAULTS)
+        # Nothing to jump from in the first snapshot
+        if (fault in ("altitude", "zero_altitude") and state["on_ground"]) or (fault == "teleport" and first):
+            continue
+        if fault == "position":
+            state["latitude"] = 95.0
+        elif fault == "ghost":
+            state["latitude"], state["longitude"] = 0.0, 0.0
+        elif fault == "altitude":
+            state["baro_altitude"] = 99999.0
+        elif fault == "speed":
+            state["velocity"] = 1500.0
+        elif fault == "zero_altitude":
+            state["baro_altitude"] = state["geo_altitude"] = None
+        elif fault == "duplicate":
+            twin = dict(state, latitude=-state["latitude"] if abs(state["latitude"]) > 5 else state["latitude"] + 10)
+            states.append(twin)
+            planted[len(states) - 1] = fault
+        elif fault == "teleport":
+            state["latitude"] = state["latitude"] - 20 if state["latitude"] > 0 else state["latitude"] + 20
+            teleported.add(state["icao24"])
+        planted[i] = fault
+    return states, planted, teleported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Position quality filter: accuracy and batch cost")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--polls", type=int, default=180)
+    parser.add_argument("--interval", type=int, default=10)
+    parser.add_argument("--fault-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed checks per snapshot, best kept")
+    args = parser.parse_args()
+
+    fleet = SyntheticFleet(size=args.size, background=0, seed=args.seed, hours=24)
+    received = fleet.window_start
+    start = fleet.window_seconds // 2
+    realistic = {a["icao_hex"] for a in fleet.aircraft if top_speed(a) <= MAX_SPEED * 0.9}
+    end = start + args.polls * args.interval
+    failures = []
+
+    # Clean replay: nothing from an aircraft flying at a possible speed is rejected
+    screen = PositionFilter()
+    times, clean_rows, lost = [], 0, Counter()
+    for poll, states in enumerate(snapshots(fleet, start, args.polls, args.interval)):
+        # Best of a few checks on copies of the filter, so a noisy neighbour does not decide the run
+        best = math.inf
+        for _ in range(args.repeat):
+            clone = copy.deepcopy(screen)
+            begin = time.perf_counter()
+            clone.check(states, 0.0)
+            best = min(best, time.perf_counter() - begin)
+        times.append(best / max(len(states), 1) * 1000)
+        reason, _ = screen.check(states, 0.0)
+        clean_rows += len(states)
+        for i in reason.nonzero()[0]:
+            lost[(REASONS[reason[i]], states[i]["icao24"] in realistic and not states[i]["on_ground"])] += 1
+    per_batch = statistics.median(times) * 1e3
+    print(f"{args.size} aircraft, {args.polls} snapshots every {args.interval}s "
+          f"({len(realistic)} flying at possible speeds)\n")
+    print(f"  check: {per_batch:.2f}ms per 1000 reports (median over snapshots, best of {args.repeat})")
+    print(f"  clean replay: {clean_rows} reports, rejected {sum(lost.values())}: "
+          + (", ".join(f"{n} {r}{'' if ok else ' (landing or impossible orbit)'}" for (r, ok), n in lost.items())
+             or "none"))
+    if per_batch >= 1.0:
+        failures.append(f"{per_batch:.2f}ms per 1000-report batch")
+    if sum(n for (_, ok), n in lost.items() if ok):
+        failures.append(f"clean reports rejected: {dict(lost)}")
+
+    # Planted faults, plus one aircraft moved for good halfway through
+    rng = random.Random(args.seed)
+    screen = PositionFilter()
+    moved = next(a["icao_hex"] for a in fleet.aircraft if a["icao_hex"] in realistic
+                 and fleet.is_airborne(a, start) and fleet.is_airborne(a, end))
+    caught, missed, wrong, after_teleport, extra = Counter(), [], Counter(), [0, 0], Counter()
+    moved_rejects = moved_accepted_at = None
+    pending = set()
+    for poll, states in enumerate(snapshots(fleet, start, args.polls, args.interval)):
+        shift = poll >= args.polls // 2
+        states, planted, teleported = plant(states, rng, args.fault_rate, moved, shift, first=poll == 0)
+        reason, _ = screen.check(states, 0.0)
+        faulty = {states[i]["icao24"] for i in planted}
+        for i, state in enumerate(states):
+            got, want = REASONS[reason[i]], planted.get(i, "")
+            icao = state["icao24"]
+            if state["on_ground"] and not want:
+                continue
+            if icao == moved and shift:
+                if got == "teleport":
+                    moved_rejects = (moved_rejects or 0) + 1
+                elif moved_accepted_at is None:
+                    moved_accepted_at = poll
+            elif want:
+                if got == want:
+                    caught[want] += 1
+                elif got:
+                    wrong[f"{want} as {got}"] += 1
+                else:
+                    missed.append(want)
+            elif icao in pending and icao not in faulty:
+                after_teleport[got == ""] += 1
+            elif got and icao in realistic and icao not in faulty:
+                extra[got] += 1
+        pending = teleported
+    print(f"  planted: caught {sum(caught.values())} ({', '.join(f'{n} {r}' for r, n in sorted(caught.items()))})")
+    if missed or wrong:
+        failures.append(f"missed {Counter(missed)}, misclassified {dict(wrong)}")
+    if extra:
+        failures.append(f"clean reports rejected next to planted faults: {dict(extra)}")
+    print(f"  report after a teleport: {after_teleport[1]} accepted, {after_teleport[0]} rejected")
+    if after_teleport[0] or not after_teleport[1]:
+        failures.append(f"reports after a teleport rejected: {after_teleport[0]}")
+    print(f"  moved aircraft: {moved_rejects} teleport rejects before its new position was accepted")
+    if moved_rejects != RELOCATE_STRIKES - 1 or moved_accepted_at is None:
+        failures.append(f"moved aircraft rejected {moved_rejects} times, expected {RELOCATE_STRIKES - 1}")
+
+    # Through the ingester: rejects are quarantined, never stored
+    client = InMemoryClickHouse()
+    client.on_select("FROM aircraft_profiles", [(p["icao_hex"],) for p in fleet.profiles()])
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingester = OpenSkyIngester(ch_client=client, clock=lambda: received)
+    planted_total = 0
+    for poll, states in enumerate(snapshots(fleet, start, 30, args.interval)):
+        states, planted, _ = plant(states, rng, 0.05, moved, False, first=poll == 0)
+        planted_total += len(planted)
+        states[0]["vertical_rate"] = -0.6
+        ingester.store_positions(states)
+    stored, held = client.rows("flight_positions"), client.rows("position_quarantine")
+    bad = [r for r in stored if abs(r["lat"]) > 90 or (r["lat"] == 0 and r["lon"] == 0)
+           or r["altitude"] > 25000 or r["ground_speed"] > MAX_SPEED or (not r["on_ground"] and r["altitude"] == 0)]
+    print(f"  ingester: {len(stored)} stored, {len(held)} quarantined "
+          f"({', '.join(f'{n} {r}' for r, n in Counter(r['reason'] for r in held).most_common())})")
+    if bad or len(held) < planted_total or ingester.quarantined != len(held):
+        failures.append(f"{len(bad)} implausible rows stored, {len(held)} quarantined of {planted_total} planted")
+    rounded = build_position_rows([dict(states[0], vertical_rate=-0.6, latitude=1.0, longitude=1.0)], received)
+    if rounded[0]["vertical_rate"] != -1:
+        failures.append(f"vertical rate -0.6 stored as {rounded[0]['vertical_rate']}")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("\n✓ Planted faults quarantined with the right reason, clean traffic kept, under 1ms per 1k reports")
+
+
+if __name__ == "__main__":
+    main()
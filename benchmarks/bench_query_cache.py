@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Query cache load benchmark
+Fires a burst of concurrent dashboard requests at the query cache backed by
+a stand-in ClickHouse HTTP server and reports how many reach ClickHouse.
+
+Fails if ClickHouse does not receive a query exactly as the client sent it
+(string literals and `--` comments intact), if queries differing only in
+whitespace inside a literal share a cache entry, or if queries differing only
+in whitespace outside literals do not.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from query_cache import CachedQueryService, ClickHouseHTTP, QueryCacheServer, make_handler
+
+# Same query, reformatted: one cache entry
+REFORMATTED = [
+    "SELECT region FROM panic_scores -- newest first\nWHERE region = 'Middle  East' ORDER BY timestamp DESC",
+    "SELECT region\n  FROM panic_scores -- newest first\n  WHERE region = 'Middle  East'\n  ORDER BY timestamp DESC",
+]
+# Differs from REFORMATTED only inside the literal: its own entry
+OTHER_LITERAL = "SELECT region FROM panic_scores -- newest first\nWHERE region = 'Middle East' ORDER BY timestamp DESC"
+
+# The SQL the four dashboard routes send (abridged)
+DASHBOARD_QUERIES = [
+    "SELECT region, overall_panic_score FROM panic_scores ORDER BY timestamp DESC LIMIT 10 FORMAT JSON",
+    "SELECT timestamp, overall_panic_score AS score FROM panic_scores WHERE region = 'Global' "
+    "ORDER BY timestamp ASC LIMIT 1000 FORMAT JSON",
+    "SELECT count(DISTINCT fp.icao_hex) FROM flight_positions fp JOIN aircraft_profiles ap "
+    "ON fp.icao_hex = ap.icao_hex WHERE fp.timestamp >= now() - INTERVAL 1 HOUR FORMAT JSON",
+    "SELECT fp.icao_hex, any(fp.callsign) FROM flight_positions fp JOIN aircraft_profiles ap "
+    "ON fp.icao_hex = ap.icao_hex WHERE fp.timestamp >= now() - INTERVAL 1 HOUR "
+    "GROUP BY fp.icao_hex LIMIT 50 FORMAT JSON",
+]
+
+
+def start_stand_in_clickhouse(latency: float):
+    """Local HTTP server that answers any query after `latency` seconds and counts calls"""
+    counter = {"queries": 0, "probes": 0, "received": []}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            sql = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+            is_probe = "toUnixTimestamp(max(timestamp))" in sql
+            with lock:
+                counter["probes" if is_probe else "queries"] += 1
+                if not is_probe:
+                    counter["received"].append(sql)
+            if is_probe:
+                body = b"1736942400\t1736942400\n"
+            else:
+                time.sleep(latency)
+                body = b'{"data": [{"ok": 1}]}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = QueryCacheServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query cache coalescing benchmark")
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent dashboard page loads")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated ClickHouse query latency (s)")
+    args = parser.parse_args()
+
+    backend, counter = start_stand_in_clickhouse(args.latency)
+    service = CachedQueryService(clickhouse=ClickHouseHTTP(url=f"http://127.0.0.1:{backend.server_port}"))
+    cache_server = QueryCacheServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=cache_server.serve_forever, daemon=True).start()
+    cache_url = f"http://127.0.0.1:{cache_server.server_port}/"
+
+    def page_load(_):
+        # Each page load hits all four routes, as the dashboard does
+        with requests.Session() as session:
+            for sql in DASHBOARD_QUERIES:
+                session.post(cache_url, data=sql, timeout=30).raise_for_status()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(args.clients, 64)) as pool:
+        list(pool.map(page_load, range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    requests_served = args.clients * len(DASHBOARD_QUERIES)
+    print(f"Dashboard requests:   {requests_served}")
+    print(f"ClickHouse queries:   {counter['queries']} (+{counter['probes']} version probes)")
+    print(f"Cache stats:          {service.cache.stats}")
+    print(f"Elapsed:              {elapsed:.2f}s ({requests_served / elapsed:.0f} req/s)")
+
+    failures = []
+    received = len(counter["received"])
+    for sql in REFORMATTED + [OTHER_LITERAL]:
+        requests.post(cache_url, data=sql, timeout=30).raise_for_status()
+    sent = counter["received"][received:]
+    if sent != [REFORMATTED[0], OTHER_LITERAL]:
+        failures.append(f"ClickHouse received {sent!r}, expected the first reformatted query and the "
+                        f"other literal as sent")
+
+    cache_server.shutdown()
+    backend.shutdown()
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✓ Queries reach ClickHouse as sent; only whitespace outside literals is ignored by the cache key")
+
+
+if __name__ == "__main__":
+    main()
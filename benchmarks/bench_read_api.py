@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Read API benchmark
+Serves a synthetic map, alert list and a year of score history through
+src/read_api.py, with InMemoryClickHouse answering each route's query the
+way ClickHouse would. Reports payload size per encoding against what the
+raw FORMAT JSON route returned, paging cost, and conditional-request hits.
+
+The run fails if paging the map or alerts loses or repeats a row, if a
+history response has more points than the requested width or misses a
+planted spike, or if a repeated request with If-None-Match is not a 304
+served without a query.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from stand_ins import InMemoryClickHouse
+from read_api import MAP_COLUMNS, ReadAPI, _optional
+
+# Columns the old /api/aircraft route selected for every aircraft, as FORMAT JSON rows
+ROUTE_COLUMNS = ("icao_hex", "callsign", "lat", "lon", "altitude", "ground_speed", "heading",
+                 "owner_country", "owner_org", "aircraft_type", "is_vip", "vip_tier", "last_update")
+
+
+def synthetic_map(aircraft: int, seed: int):
+    rng = random.Random(seed)
+    now = int(time.time())
+    rows = []
+    for i in range(aircraft):
+        rows.append((f"{i:06X}", f"SYN{i % 9000:04d}", round(rng.uniform(-60, 70), 5), round(rng.uniform(-180, 180), 5),
+                     rng.randrange(0, 45000, 25), rng.randrange(0, 550), rng.randrange(0, 360), int(rng.random() < 0.1),
+                     now - rng.randrange(0, 1800), rng.choice(["US", "GB", "FR", "DE", "RU", "CN", "TR", "IL"]),
+                     int(rng.random() < 0.6), int(rng.random() < 0.1), rng.choice([0, 0, 0, 1, 2, 3, 4])))
+    return rows
+
+
+def synthetic_history(days: int, interval_minutes: int, seed: int):
+    """(epoch, score) every interval, a slow wave plus noise, with a few one-sample spikes"""
+    rng = random.Random(seed)
+    now = int(time.time())
+    points = []
+    for t in range(now - days * 86400, now, interval_minutes * 60):
+        points.append([t, max(0, min(100, int(30 + 15 * (1 + (t // 86400) % 7 / 7) + rng.gauss(0, 4))))])
+    spikes = rng.sample(range(len(points)), 12)
+    for i in spikes:
+        points[i][1] = 95
+    return points, [points[i][0] for i in spikes]
+
+
+def stand_in(map_rows, history):
+    client = InMemoryClickHouse()
+    newest = max(r[8] for r in map_rows)
+    client.on_select("toUnixTimestamp(max(timestamp)) FROM panic_scores", [(history[-1][0], newest)])
+
+    def map_query(p):
+        rows = [r for r in map_rows if r[0] > p["after"]]
+        if "min_lat" in p:
+            rows = [r for r in rows if p["min_lat"] <= r[2] <= p["max_lat"] and (
+                p["min_lon"] <= r[3] <= p["max_lon"] if p["min_lon"] <= p["max_lon"]
+                else r[3] >= p["min_lon"] or r[3] <= p["max_lon"])]
+        return rows[:p["limit"]]
+
+    def history_query(p):
+        buckets = {}
+        for t, score in history:
+            if t < p["start"]:
+                continue
+            b = t // p["bucket"] * p["bucket"]
+            low, high, _ = buckets.get(b, (score, score, score))
+            buckets[b] = (min(low, score), max(high, score), score)
+        return [(b, *buckets[b]) for b in sorted(buckets)]
+
+    alerts = sorted(((t, f"Region {t % 7}", s, "narrative", 100, 5) for t, s in history if s >= 40), reverse=True)
+
+    def alerts_query(p):
+        rows = [r for r in alerts if "(timestamp, region) <" not in client.queries[-1] or (r[0], r[1]) < (p["t"], p["region"])]
+        return rows[:p["limit"]]
+
+    client.on_select("argMax(fp.lat, fp.timestamp)", map_query)
+    client.on_select("GROUP BY t", history_query)
+    client.on_select("overall_panic_score >= 40", alerts_query)
+    return client, alerts
+
+
+def page_through(api: ReadAPI, target: str, key: str):
+    """Follow next_cursor to the end; returns (pages, rows, seconds)"""
+    rows, pages, cursor = [], 0, None
+    start = time.perf_counter()
+    while True:
+        response = api.handle(target + (f"&cursor={cursor}" if cursor else ""), {})
+        body = json.loads(response.body)
+        pages += 1
+        page = body[key]
+        rows.extend(zip(*page.values()) if isinstance(page, dict) else page)
+        cursor = body.get("next_cursor")
+        if not cursor:
+            return pages, rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read API payload sizes, paging and conditional requests")
+    parser.add_argument("--aircraft", type=int, default=50000)
+    parser.add_argument("--page", type=int, default=20000, help="Map page size")
+    parser.add_argument("--days", type=int, default=365, help="Score history length")
+    parser.add_argument("--interval", type=int, default=15, help="Minutes between stored scores")
+    parser.add_argument("--width", type=int, default=800, help="History chart width in pixels")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    map_rows = synthetic_map(args.aircraft, args.seed)
+    history, spikes = synthetic_history(args.days, args.interval, args.seed)
+    client, alerts = stand_in(map_rows, history)
+    api = ReadAPI(client)
+    failures = []
+
+    # Payload per encoding for one full map page
+    old = json.dumps({"data": [dict(zip(ROUTE_COLUMNS, (r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[9], "USAF",
+                                                         "C-17A", r[11], r[12],
+                                                         datetime.fromtimestamp(r[8], timezone.utc).strftime(
+                                                             "%Y-%m-%d %H:%M:%S"))))
+                               for r in map_rows[:args.page]]}).encode("utf-8")
+    print(f"{args.aircraft} aircraft, map page of {min(args.page, args.aircraft)}\n")
+    print(f"  {'raw FORMAT JSON rows':<28} {len(old) / 1024:>8.0f}KB  gzip {len(gzip.compress(old)) / 1024:>6.0f}KB")
+    variants = [("json", "identity"), ("json", "gzip"), ("json", "br"),
+                ("msgpack", "identity"), ("msgpack", "gzip"), ("arrow", "identity"), ("arrow", "gzip")]
+    for fmt, encoding in variants:
+        if (encoding == "br" and _optional("brotli") is None) or \
+                (fmt != "json" and _optional({"msgpack": "msgpack", "arrow": "pyarrow"}[fmt]) is None):
+            print(f"  {fmt + ' ' + encoding:<28} (encoder not installed)")
+            continue
+        start = time.perf_counter()
+        response = api.handle(f"/v1/map?limit={args.page}&format={fmt}", {"accept-encoding": encoding})
+        seconds = time.perf_counter() - start
+        print(f"  {fmt + ' ' + encoding:<28} {len(response.body) / 1024:>8.0f}KB  "
+              f"{seconds * 1000:>6.0f}ms to build")
+        if response.status != 200:
+            failures.append(f"{fmt}/{encoding}: status {response.status}")
+
+    pages, rows, seconds = page_through(api, f"/v1/map?limit={args.page}", "columns")
+    print(f"\n  map paged in {pages} pages of {args.page}: {seconds * 1000:.0f}ms")
+    if sorted(r[0] for r in rows) != [r[0] for r in map_rows] or len(rows) != len(map_rows):
+        failures.append(f"map paging returned {len(rows)} rows for {len(map_rows)} aircraft")
+    if [list(r) for r in rows[:3]] != [list(r[:len(MAP_COLUMNS)]) for r in map_rows[:3]]:
+        failures.append("map columns out of order")
+
+    bbox = "35,-10,60,30"
+    _, in_box, _ = page_through(api, f"/v1/map?limit={args.page}&bbox={bbox}", "columns")
+    expected = sum(1 for r in map_rows if 35 <= r[2] <= 60 and -10 <= r[3] <= 30)
+    if len(in_box) != expected:
+        failures.append(f"bbox {bbox}: {len(in_box)} aircraft, expected {expected}")
+
+    pages, rows, seconds = page_through(api, "/v1/alerts?limit=5000", "alerts")
+    print(f"  {len(alerts)} alerts paged in {pages} pages of 5000: {seconds * 1000:.0f}ms")
+    if len(rows) != len(alerts) or len({(r["timestamp"], r["region"]) for r in rows}) != len(alerts):
+        failures.append(f"alert paging returned {len(rows)} rows for {len(alerts)} alerts")
+
+    start = time.perf_counter()
+    response = api.handle(f"/v1/history?days={args.days}&width={args.width}", {"accept-encoding": "gzip"})
+    seconds = time.perf_counter() - start
+    body = json.loads(gzip.decompress(response.body) if response.headers.get("Content-Encoding") else response.body)
+    points = body["data"]
+    print(f"  history: {len(history)} scores over {args.days} days -> {len(points)} points for "
+          f"{args.width}px, {len(response.body) / 1024:.0f}KB ({seconds * 1000:.0f}ms)")
+    if len(points) > args.width + 1:
+        failures.append(f"history returned {len(points)} points for a {args.width}px chart")
+    highs = sum(1 for p in points if p["max"] == 95)
+    spiked = len({t // body["bucket_seconds"] for t in spikes})
+    if highs != spiked:
+        failures.append(f"{highs} buckets peak at a planted spike, expected {spiked}")
+
+    queries = len(client.queries)
+    etag = api.handle(f"/v1/map?limit={args.page}", {}).headers["ETag"]
+    start = time.perf_counter()
+    repeat = api.handle(f"/v1/map?limit={args.page}", {"if-none-match": etag})
+    print(f"  conditional request: {repeat.status} in {(time.perf_counter() - start) * 1e6:.0f}us, "
+          f"{len(client.queries) - queries} queries")
+    if repeat.status != 304 or len(client.queries) != queries:
+        failures.append(f"If-None-Match answered {repeat.status} after {len(client.queries) - queries} queries")
+
+    for failure in failures[:20]:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"\n✓ Paging complete and exact, history bounded by width, 304 served without a query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+flight_positions layout benchmark
+Loads the same synthetic history into the legacy and the tuned (src/schema.py)
+layouts and reports on-disk size and the rows/bytes get_recent_flights reads
+
+Unlike the other benchmarks this one needs a running ClickHouse (the
+CLICKHOUSE_* settings from .env); it only touches the two scratch databases
+it creates and drops them afterwards unless --keep is given.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from dotenv import load_dotenv
+
+from db import ClickHousePool
+from synthetic import SyntheticFleet
+from schema import LEGACY_FLIGHT_POSITIONS_DDL, column_names, flight_positions_ddl
+from calculate_panic import PanicScoreCalculator
+
+load_dotenv()
+
+PROFILES_DDL = """
+CREATE TABLE IF NOT EXISTS {database}.aircraft_profiles (
+    icao_hex String,
+    registration String,
+    aircraft_type String,
+    owner_country String,
+    owner_org String,
+    is_military UInt8,
+    is_government UInt8,
+    is_vip UInt8,
+    is_intel UInt8,
+    vip_tier UInt8,
+    home_base_airport String,
+    notes String,
+    last_updated DateTime
+) ENGINE = ReplacingMergeTree(last_updated)
+ORDER BY icao_hex
+"""
+
+LAYOUTS = {
+    "legacy": lambda database: LEGACY_FLIGHT_POSITIONS_DDL.format(table=f"{database}.flight_positions"),
+    # No TTLs: the synthetic history must survive the load
+    "tuned": lambda database: flight_positions_ddl(table=f"{database}.flight_positions", settings={}),
+}
+
+
+def load(client: ClickHousePool, database: str, layout: str, fleet: SyntheticFleet, interval: int, batch_size: int = 100000):
+    client.execute(f"DROP DATABASE IF EXISTS {database}")
+    client.execute(f"CREATE DATABASE {database}")
+    client.execute(PROFILES_DDL.format(database=database))
+    client.execute(LAYOUTS[layout](database))
+
+    client.execute(f"INSERT INTO {database}.aircraft_profiles VALUES", fleet.profiles())
+
+    # Synthetic rows carry no squawk, which the legacy layout lacks anyway
+    columns = ", ".join(name for name in column_names() if name != "squawk")
+    batch = []
+    for row in fleet.iter_positions(interval):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            client.execute(f"INSERT INTO {database}.flight_positions ({columns}) VALUES", batch)
+            batch = []
+    if batch:
+        client.execute(f"INSERT INTO {database}.flight_positions ({columns}) VALUES", batch)
+
+    # Compare steady-state parts, not whatever the inserts happened to produce
+    client.execute(f"OPTIMIZE TABLE {database}.flight_positions FINAL")
+
+
+def disk_usage(client: ClickHousePool, database: str):
+    rows, on_disk = client.execute(
+        """
+        SELECT sum(rows), sum(bytes_on_disk)
+        FROM system.parts
+        WHERE database = %(db)s AND table = 'flight_positions' AND active
+        """,
+        {"db": database}
+    )[0]
+    # bytes_on_disk includes projection parts; report them separately
+    projection = client.execute(
+        """
+        SELECT sum(bytes_on_disk)
+        FROM system.projection_parts
+        WHERE database = %(db)s AND table = 'flight_positions' AND active
+        """,
+        {"db": database}
+    )[0][0]
+    return rows, on_disk, projection
+
+
+def measure_query(database: str, hours: int, repeat: int):
+    """Best-of-N get_recent_flights, with the rows/bytes the server read"""
+    pool = ClickHousePool(size=1, database=database)
+    with contextlib.redirect_stdout(io.StringIO()):
+        calculator = PanicScoreCalculator(ch_client=pool)
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        flights = calculator.get_recent_flights(hours=hours)
+        elapsed = time.perf_counter() - start
+        query = pool.stats.recent[-1]
+        sample = (elapsed, len(flights), query["read_rows"], query["read_bytes"])
+        if best is None or sample[0] < best[0]:
+            best = sample
+    pool.close()
+    return best
+
+
+def fmt_bytes(n):
+    return f"{n / 1024 / 1024:.1f}MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="flight_positions layout benchmark (needs ClickHouse)")
+    parser.add_argument("--size", type=int, default=2000, help="Tracked aircraft")
+    parser.add_argument("--days", type=int, default=7, help="Days of history to load")
+    parser.add_argument("--interval", type=int, default=10, help="Seconds between position reports")
+    parser.add_argument("--hours", type=int, default=12, help="get_recent_flights window")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch databases")
+    args = parser.parse_args()
+
+    # get_recent_flights filters relative to now, so the history must end now
+    epoch = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    fleet = SyntheticFleet(size=args.size, background=0, hours=args.days * 24, epoch=epoch)
+    admin = ClickHousePool(size=1, database="default")
+
+    results = {}
+    for layout in LAYOUTS:
+        database = f"sleepwatch_bench_{layout}"
+        start = time.perf_counter()
+        load(admin, database, layout, fleet, args.interval)
+        load_seconds = time.perf_counter() - start
+        rows, on_disk, projection = disk_usage(admin, database)
+        elapsed, flights, read_rows, read_bytes = measure_query(database, args.hours, args.repeat)
+        results[layout] = (rows, on_disk, read_rows, read_bytes)
+        print(f"{layout:<7} {rows} rows  load {load_seconds:.1f}s  "
+              f"disk {fmt_bytes(on_disk)} (projection {fmt_bytes(projection)})  "
+              f"get_recent_flights({args.hours}h): {flights} rows in {elapsed * 1000:.0f}ms, "
+              f"read {read_rows} rows / {fmt_bytes(read_bytes)}")
+        if not args.keep:
+            admin.execute(f"DROP DATABASE {database}")
+
+    legacy, tuned = results["legacy"], results["tuned"]
+    print(f"\ntuned vs legacy: disk {tuned[1] / max(legacy[1], 1):.2f}x, "
+          f"rows read {tuned[2] / max(legacy[2], 1):.2f}x, bytes read {tuned[3] / max(legacy[3], 1):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Scoring pipeline benchmark
+Checks the component contract of src/scoring.py on a synthetic window:
+the rows scored as contiguous shards and merged must finish exactly like
+one pass, one component thread must match several, a pipeline enabled for
+one component must fetch only that component's columns, and a component
+loaded from SCORE_PLUGINS must be fetched for, scored and weighted into the
+panic_scores row, and stored in its own column. Reports batch throughput per thread count.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from stand_ins import InMemoryClickHouse
+from bench_streaming_scores import StreamingClickHouse, fleet_now
+from calculate_panic import PanicScoreCalculator
+from scoring import Convergence, ScoringPipeline, load_plugins
+
+# SCORE_PLUGINS module: reports above FL300, a column no built-in reads
+PLUGIN = """
+from scoring import ScoreComponent, register
+
+
+@register
+class HighFlyers(ScoreComponent):
+    name, label, weight = "high", "High flyers", 0.5
+    columns = ("altitude",)
+
+    def partial(self):
+        return {"rows": 0}
+
+    def update(self, state, batch):
+        state["rows"] += int((batch.array("altitude") > 9144).sum())
+
+    def merge(self, state, other):
+        state["rows"] += other["rows"]
+        return state
+
+    def finish(self, state, window):
+        return state["rows"] / 100, {"rows": state["rows"]}
+"""
+
+
+def scan(calculator, pipeline, hours, now):
+    """The window's rows in the pipeline's columns"""
+    return list(calculator.iter_recent_flight_rows(hours=hours, now=now, columns=pipeline.columns))
+
+
+def score(pipeline, rows):
+    """(scores, state, seconds) for one pass"""
+    start = time.perf_counter()
+    state = pipeline.score_rows(rows)
+    return pipeline.finish(state), state, time.perf_counter() - start
+
+
+def sharded(pipeline, rows, shards):
+    """Each contiguous shard scored on its own, merged in order"""
+    size = -(-len(rows) // shards)
+    states = [pipeline.score_rows(rows[i:i + size]) for i in range(0, len(rows), size)]
+    state = states[0]
+    for other in states[1:]:
+        state = pipeline.merge(state, other)
+    return pipeline.finish(state), state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring pipeline: merge, threads, column pruning, plugins")
+    parser.add_argument("--sizes", default="100,1000", help="Comma-separated tracked fleet sizes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--hours", type=int, default=12)
+    parser.add_argument("--shards", type=int, default=7)
+    parser.add_argument("--threads", default="1,4", help="Component thread counts compared")
+    parser.add_argument("--interval", type=int, default=60)
+    args = parser.parse_args()
+
+    thread_counts = [int(t) for t in args.threads.split(",") if t]
+    failures = []
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        fleet = SyntheticFleet(size=size, background=0, seed=args.seed)
+        calculator = PanicScoreCalculator(ch_client=StreamingClickHouse(fleet, args.interval))
+        now = fleet_now(fleet)
+        rows = scan(calculator, calculator.pipeline, args.hours, now)
+
+        runs = {threads: score(ScoringPipeline(threads=threads), rows) for threads in thread_counts}
+        single, state, _ = runs[thread_counts[0]]
+        print(f"size {size:>5}: {len(rows):>8} rows  " + "  ".join(
+            f"{threads} thread{'s' if threads != 1 else ''} {seconds * 1000:>7.1f}ms "
+            f"({len(rows) / seconds / 1e6:.2f}M rows/s)" for threads, (_, _, seconds) in runs.items()))
+        for threads, (result, _, _) in runs.items():
+            if result != single:
+                failures.append(f"size {size}: {threads} threads differ from {thread_counts[0]}")
+
+        merged, merged_state = sharded(ScoringPipeline(threads=1), rows, args.shards)
+        same = merged == single and merged_state.rows == state.rows and merged_state.countries == state.countries
+        print(f"    {args.shards} shards merged: {'identical' if same else 'MISMATCH'}")
+        if not same:
+            diff = [name for name in single if merged[name] != single[name]]
+            failures.append(f"size {size}: merged shards differ from one pass ({', '.join(diff) or 'row counts'})")
+
+    # One component: only its columns and the base columns are fetched
+    only = ScoringPipeline(weights={"convergence": 1.0})
+    want = ("timestamp", "lat", "lon", "owner_country", "is_vip")
+    print(f"\n  convergence only fetches: {', '.join(only.columns)}")
+    if only.columns != want or only.positions:
+        failures.append(f"convergence-only pipeline fetches {only.columns}, expected {want}")
+    fleet = SyntheticFleet(size=100, background=0, seed=args.seed)
+    now = fleet_now(fleet)
+    client = StreamingClickHouse(fleet, args.interval)
+    full = PanicScoreCalculator(ch_client=client)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = full.calculate_convergence_score(full.get_recent_flights(hours=args.hours, now=now))
+        row = PanicScoreCalculator(ch_client=client, pipeline=only).calculate_panic_score(hours=args.hours, now=now)
+    if row["convergence_score"] != min(Convergence.cap, expected[0]) or row["overall_panic_score"] != int(
+            row["convergence_score"]) or row["night_flight_score"] != 0.0:
+        failures.append(f"convergence-only row {row['overall_panic_score']}/{row['convergence_score']}, "
+                        f"expected convergence {expected[0]}")
+
+    # A plugin from SCORE_PLUGINS: registered, fetched for, capped and weighted in
+    with tempfile.TemporaryDirectory() as plugins:
+        with open(os.path.join(plugins, "bench_high_flyers.py"), "w") as f:
+            f.write(PLUGIN)
+        sys.path.insert(0, plugins)
+        load_plugins("bench_high_flyers")
+        sys.path.remove(plugins)
+    pipeline = ScoringPipeline(weights={"convergence": 1.0, "high": 0.5})
+    calculator = PanicScoreCalculator(ch_client=client, pipeline=pipeline)
+    with contextlib.redirect_stdout(io.StringIO()):
+        streamed = calculator.calculate_panic_score(hours=args.hours, now=now)
+        listed = calculator.calculate_panic_score(hours=args.hours, now=now, streaming=False)
+    high = sum(1 for f in full.get_recent_flights(hours=args.hours, now=now) if f["altitude"] > 9144) / 100
+    print(f"  plugin 'high' fetches altitude: {'altitude' in pipeline.columns}, score "
+          f"{streamed.get('high_score', 0):.1f} (uncapped {high:.1f}), overall {streamed['overall_panic_score']}")
+    want_overall = int(row["convergence_score"] * 1.0 + min(100, high) * 0.5)
+    if "altitude" not in pipeline.columns or streamed.get("high_score") != min(100, high) \
+            or streamed["overall_panic_score"] != want_overall:
+        failures.append(f"plugin row {streamed.get('high_score')}/{streamed['overall_panic_score']}, "
+                        f"expected {min(100, high)}/{want_overall}")
+    if {**streamed, "timestamp": None} != {**listed, "timestamp": None}:
+        failures.append("plugin scores differ between streaming and list mode")
+    store = InMemoryClickHouse()
+    with contextlib.redirect_stdout(io.StringIO()):
+        PanicScoreCalculator(ch_client=store, pipeline=pipeline).store_panic_scores([streamed])
+    stored = store.rows("panic_scores")[0]
+    if "high_score" not in store.queries[0] or stored.get("high_score") != streamed.get("high_score"):
+        failures.append(f"plugin column not stored: panic_scores row has high_score {stored.get('high_score')}")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("\n✓ Merged shards and threaded components match one pass; pruning and plugins behave")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Sharded ingestion benchmark
+Feeds the same synthetic OpenSky snapshots through ShardedIngester with 1, 2,
+4, ... workers and reports snapshot throughput and speedup over one worker.
+The run fails if any worker count sees a different number of tracked or
+discovered aircraft than the single-process OpenSkyIngester does for the
+same snapshots.
+
+Workers store into InMemoryClickHouse stand-ins, so the numbers cover decode,
+filter, discovery, transform and dedup but not ClickHouse insert encoding.
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from stand_ins import InMemoryClickHouse
+from ingest_opensky import OpenSkyIngester
+from ingest_sharded import ShardedIngester, split_snapshot
+
+
+def fleet_client(size: int, background: int, seed: int) -> InMemoryClickHouse:
+    """Worker-side client factory (module level so spawned workers can unpickle it)"""
+    # Runs in the worker process; keep its startup chatter out of the table
+    sys.stdout = open(os.devnull, "w")
+    fleet = SyntheticFleet(size=size, background=0, seed=seed)
+    client = InMemoryClickHouse()
+    client.on_select("FROM aircraft_profiles", [(p["icao_hex"],) for p in fleet.profiles()])
+    return client
+
+
+def snapshots(fleet: SyntheticFleet, count: int, step: int = 10):
+    """count consecutive raw states/all bodies, step seconds apart"""
+    end = fleet.window_seconds
+    # Compact, as OpenSky sends it
+    return [json.dumps(fleet.states_payload(t=end - step * (count - i)), separators=(",", ":")).encode("utf-8")
+            for i in range(count)]
+
+
+def single_process(factory, raws):
+    """Reference counts and time from OpenSkyIngester on one core"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingester = OpenSkyIngester(ch_client=factory(), latest_state=False)
+    tracked = discovered = 0
+    start = time.perf_counter()
+    for raw in raws:
+        ingester._make_request = lambda endpoint, params=None, raw=raw: json.loads(raw)
+        states = ingester.get_all_states()
+        t = ingester.filter_tracked_aircraft(states)
+        d = ingester.discover_aircraft(states)
+        ingester.store_positions(t + d)
+        tracked += len(t)
+        discovered += len(d)
+    return time.perf_counter() - start, tracked, discovered
+
+
+def sharded(factory, raws, workers: int):
+    ingester = ShardedIngester(workers=workers, client_factory=factory, flush_seconds=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingester.start()
+        # Warm-up: workers import, connect and load the tracked set
+        ingester.wait(ingester.submit(raws[0]))
+        before = dict(ingester.totals)
+
+        start = time.perf_counter()
+        for raw in raws:
+            ingester.submit(raw)
+        ingester.wait()
+        elapsed = time.perf_counter() - start
+        ingester.close()
+
+    delta = {key: ingester.totals[key] - before.get(key, 0) for key in ingester.totals}
+    return elapsed, delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded ingestion throughput")
+    parser.add_argument("--size", type=int, default=5000, help="Tracked fleet size")
+    parser.add_argument("--background", type=int, default=40000, help="Untracked aircraft per snapshot")
+    parser.add_argument("--snapshots", type=int, default=20)
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker counts")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    fleet = SyntheticFleet(size=args.size, background=args.background, seed=args.seed)
+    factory = functools.partial(fleet_client, args.size, args.background, args.seed)
+    raws = snapshots(fleet, args.snapshots)
+    mb = sum(len(r) for r in raws) / 1024 / 1024
+    print(f"{args.snapshots} snapshots of {args.size + args.background} aircraft ({mb:.0f}MB), "
+          f"{os.cpu_count()} CPUs\n")
+
+    split_start = time.perf_counter()
+    for raw in raws:
+        split_snapshot(raw, 8)
+    split_ms = (time.perf_counter() - split_start) / len(raws) * 1000
+
+    base_seconds, base_tracked, base_discovered = single_process(factory, raws)
+    print(f"  {'single process':<16} {base_seconds:>7.2f}s  {len(raws) / base_seconds:>6.1f} snapshots/s")
+    print(f"  {'coordinator split':<16} {split_ms:>7.1f}ms per snapshot (8 shards)")
+
+    failures = 0
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",") if w]:
+        elapsed, delta = sharded(factory, raws, workers)
+        baseline = baseline or elapsed
+        same = delta["tracked"] == base_tracked and delta["discovered"] == base_discovered
+        failures += not same
+        print(f"  {workers:>2} worker(s)     {elapsed:>7.2f}s  {len(raws) / elapsed:>6.1f} snapshots/s  "
+              f"x{baseline / elapsed:.2f}  {delta['stored']:>8} stored  "
+              f"{delta['duplicates']:>8} repeats  {'ok' if same else 'MISMATCH'}")
+
+    if failures:
+        print(f"\n✗ {failures} worker counts saw different tracked/discovered totals")
+        sys.exit(1)
+    print("\n✓ Every worker count matched the single-process tracked/discovered totals")
+
+
+if __name__ == "__main__":
+    main()
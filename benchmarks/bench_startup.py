@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+CLI startup benchmark
+Measures what a one-shot scoring job pays before doing any work:
+
+- `python -X importtime` totals for the modules the CLI paths import
+- wall clock of a cold scoring process (interpreter start, imports,
+  clickhouse_driver, one run_once against a stand-in) against triggering the
+  same run on a resident score daemon through `score_daemon.py run`
+
+The daemon and the cold process score the same small synthetic fleet with
+InMemoryClickHouse, so the difference is startup cost, not scoring.
+
+Fails if the client side of `score_daemon.py run` imports a module outside
+the standard library and src/score_daemon.py / src/score_format.py, or if
+its wall clock, less the daemon's own scoring time, exceeds the empty
+interpreter by more than --max-overhead-ms.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from synthetic import SyntheticFleet
+from stand_ins import InMemoryClickHouse
+
+FLEET_SIZE = 50
+
+# What the daemon client may import besides the standard library
+CLIENT_MODULES = {"score_daemon", "score_format"}
+
+# Builds the stand-in calculator in a fresh interpreter and scores once
+COLD_RUN = f"""
+import sys
+sys.path[:0] = [{BENCH_DIR!r}, {SRC_DIR!r}]
+import calculate_panic, db
+db.driver()
+from synthetic import SyntheticFleet
+from stand_ins import InMemoryClickHouse
+client = InMemoryClickHouse()
+client.on_select("FROM flight_positions fp", SyntheticFleet(size={FLEET_SIZE}, background=0).recent_flight_rows(600),
+                 calculate_panic.RECENT_FLIGHT_COLUMNS)
+calculate_panic.format_score(calculate_panic.PanicScoreCalculator(ch_client=client).run_once())
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile(module: str, env: dict):
+    """(cumulative ms, [(self ms, name)] slowest first) from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    entries = [(int(m.group(1)) / 1000, int(m.group(2)) / 1000, m.group(4))
+               for m in IMPORT_LINE.finditer(result.stderr)]
+    total = next(cumulative for _, cumulative, name in entries if name == module)
+    slowest = sorted(((own, name) for own, _, name in entries), reverse=True)[:3]
+    return total, slowest
+
+
+def imported(argv, env: dict):
+    """Top-level packages a command imports, from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return {m.group(4).split(".")[0] for m in IMPORT_LINE.finditer(result.stderr)}
+
+
+def client_imports(env: dict):
+    """What `score_daemon.py run` imports beyond the standard library and site startup"""
+    names = imported(["score_daemon.py", "run", "--no-fallback"], env)
+    startup = imported(["-c", "pass"], env)
+    return sorted(names - startup - set(sys.stdlib_module_names) - CLIENT_MODULES)
+
+
+def wall_ms(argv, env: dict, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def start_daemon(path: str):
+    from calculate_panic import PanicScoreCalculator, RECENT_FLIGHT_COLUMNS
+    from score_daemon import ScoreDaemon
+
+    client = InMemoryClickHouse()
+    client.on_select("FROM flight_positions fp", SyntheticFleet(size=FLEET_SIZE, background=0).recent_flight_rows(600),
+                     RECENT_FLIGHT_COLUMNS)
+    daemon = ScoreDaemon(calculator=PanicScoreCalculator(ch_client=client), path=path)
+
+    def serve():
+        # redirect_stdout is process-wide: nothing may be printed until this thread ends
+        with contextlib.redirect_stdout(io.StringIO()):
+            daemon.serve_forever()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    while not os.path.exists(path):
+        time.sleep(0.01)
+    return daemon, thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start vs resident score daemon")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max-overhead-ms", type=float, default=40.0,
+                        help="allowed client cost of a daemon-triggered run over the empty interpreter")
+    args = parser.parse_args()
+
+    env = dict(os.environ, SCORE_WINDOWS="12", PYTHONDONTWRITEBYTECODE="1")
+
+    print("Import time (-X importtime, cumulative):")
+    for module in ("score_daemon", "db", "calculate_panic", "ingest_opensky", "clickhouse_driver"):
+        total, slowest = import_profile(module, env)
+        top = ", ".join(f"{name} {own:.0f}ms" for own, name in slowest)
+        print(f"  {module:<18} {total:>7.1f}ms   slowest: {top}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env["SCORE_SOCKET"] = os.path.join(tmp, "score.sock")
+        daemon, thread = start_daemon(env["SCORE_SOCKET"])
+
+        baseline = wall_ms([sys.executable, "-c", "pass"], env, args.repeat)
+        cold = wall_ms([sys.executable, "-c", COLD_RUN], env, args.repeat)
+        status = wall_ms([sys.executable, "score_daemon.py", "status"], env, args.repeat)
+        triggered = wall_ms([sys.executable, "score_daemon.py", "run", "--no-fallback"], env, args.repeat)
+        # The daemon's share of a triggered run, so the gate sees only the client
+        scoring = statistics.median(daemon.run()["seconds"] * 1000 for _ in range(args.repeat))
+        extra = client_imports(env)
+        daemon.handle({"command": "stop"})
+        thread.join()
+
+    print(f"\nWall clock (median of {args.repeat}):")
+    print(f"  {'empty interpreter':<28} {baseline:>7.1f}ms")
+    print(f"  {'cold run_once':<28} {cold:>7.1f}ms")
+    print(f"  {'daemon status round-trip':<28} {status:>7.1f}ms")
+    print(f"  {'daemon-triggered run':<28} {triggered:>7.1f}ms   (x{cold / triggered:.1f} faster than cold)")
+    print(f"  {'  of which daemon scoring':<28} {scoring:>7.1f}ms")
+
+    overhead = triggered - scoring - baseline
+    failures = []
+    if extra:
+        failures.append(f"daemon client imports {', '.join(extra)}")
+    if overhead > args.max_overhead_ms:
+        failures.append(f"daemon client costs {overhead:.1f}ms over the empty interpreter "
+                        f"(limit {args.max_overhead_ms:.0f}ms)")
+    if failures:
+        for failure in failures:
+            print(f"✗ {failure}")
+        sys.exit(1)
+    print(f"\n✓ Daemon client: standard library only, {overhead:.1f}ms over the empty interpreter")
+
+
+if __name__ == "__main__":
+    main()
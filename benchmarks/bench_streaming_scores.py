@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Streaming scorer benchmark
+Checks that the single-pass streaming mode of calculate_panic_score gives
+exactly the same result as the list-based scorers, then compares wall time
+and peak Python memory (tracemalloc) of the two modes
+
+Rows are produced lazily by a generator standing in for execute_iter, so
+the streaming measurement is not inflated by a pre-built result list.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from stand_ins import projection
+from calculate_panic import PanicScoreCalculator, RECENT_FLIGHT_COLUMNS
+
+
+class StreamingClickHouse:
+    """execute_iter yields the fleet's rows without materializing them, as many columns as selected"""
+
+    def __init__(self, fleet: SyntheticFleet, interval: int):
+        self.fleet = fleet
+        self.interval = interval
+
+    def execute_iter(self, query, params=None, **kwargs):
+        # Fleet timestamps are naive UTC, like ClickHouse DateTime values
+        cutoff = (params or {}).get("cutoff_time")
+        cutoff = cutoff.replace(tzinfo=None) if cutoff is not None else None
+        profiles = {p["icao_hex"]: p for p in self.fleet.profiles()}
+        pick = projection(RECENT_FLIGHT_COLUMNS, query) or (lambda row: row)
+        for pos in self.fleet.iter_positions(self.interval):
+            if cutoff is not None and pos["timestamp"] < cutoff:
+                continue
+            ap = profiles[pos["icao_hex"]]
+            yield pick((
+                pos["icao_hex"], pos["callsign"], pos["timestamp"], pos["lat"], pos["lon"],
+                pos["altitude"], pos["on_ground"], ap["owner_country"], ap["owner_org"],
+                ap["vip_tier"], ap["is_military"], ap["is_vip"], ap["aircraft_type"],
+            ))
+
+    def execute(self, query, params=None, **kwargs):
+        return list(self.execute_iter(query, params))
+
+
+def fleet_now(fleet: SyntheticFleet) -> datetime:
+    """Score as of the end of the synthetic window"""
+    return fleet.epoch.replace(tzinfo=timezone.utc)
+
+
+def score(calculator: PanicScoreCalculator, streaming: bool, now: datetime):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = calculator.calculate_panic_score(hours=12, streaming=streaming, now=now)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The timestamp is "now"; everything else must match
+    result.pop("timestamp")
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming vs list-based panic scoring")
+    parser.add_argument("--sizes", default="100,1000", help="Comma-separated tracked fleet sizes")
+    parser.add_argument("--seeds", default="1,42", help="Seeds checked for identical output")
+    parser.add_argument("--interval", type=int, default=60)
+    args = parser.parse_args()
+
+    failures = 0
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        for seed in [int(s) for s in args.seeds.split(",") if s]:
+            fleet = SyntheticFleet(size=size, background=0, seed=seed)
+            calculator = PanicScoreCalculator(ch_client=StreamingClickHouse(fleet, args.interval))
+
+            listed, list_seconds, list_peak = score(calculator, streaming=False, now=fleet_now(fleet))
+            streamed, stream_seconds, stream_peak = score(calculator, streaming=True, now=fleet_now(fleet))
+
+            same = listed == streamed
+            failures += not same
+            print(f"size {size:>5} seed {seed:>3}: {listed['flight_count']:>8} rows  "
+                  f"list {list_seconds * 1000:>8.1f}ms {list_peak / 1024 / 1024:>7.1f}MB  "
+                  f"streaming {stream_seconds * 1000:>8.1f}ms {stream_peak / 1024 / 1024:>7.1f}MB  "
+                  f"{'identical' if same else 'MISMATCH'}")
+            if not same:
+                for key in listed:
+                    if listed[key] != streamed[key]:
+                        print(f"    {key}: list={listed[key]!r} streaming={streamed[key]!r}")
+
+    if failures:
+        print(f"\n✗ {failures} mismatches")
+        sys.exit(1)
+    print("\n✓ Streaming results identical to the list-based scorers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Track reconstruction benchmark
+Takes a day of synthetic positions, punches coverage holes into it (a
+fixed set of 5° cells hears nothing, like open ocean), and runs
+tracks.reconstruct() over the remaining reports.
+
+It reports:
+- time to reconstruct the day and the point mix (observed / interpolated /
+  dead-reckoned)
+- position error of filled points against the synthetic truth
+- per-aircraft airborne time against the truth, as reconstructed and as
+  the report count times the report interval (what counting reports
+  measures)
+
+The run fails if the reconstructed airborne time is not closer to the
+truth than the report count, or if the track invariants break.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from tracks import (FLAG_NAMES, MIN_CONFIDENCE, OBSERVED, PositionColumns, epoch_seconds, great_circle_m,
+                    reconstruct)
+
+CELL_DEGREES = 5
+
+
+def in_hole(lat: float, lon: float, hole_fraction: float) -> bool:
+    """Deterministic per 5° cell: roughly hole_fraction of cells hear nothing"""
+    cell = int((lat + 90) // CELL_DEGREES) * 73 + int((lon + 180) // CELL_DEGREES)
+    return (cell * 2654435761 % 1000) < hole_fraction * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gap-aware track reconstruction")
+    parser.add_argument("--size", type=int, default=3000)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between reports")
+    parser.add_argument("--holes", type=float, default=0.3, help="Share of 5° cells with no coverage")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    fleet = SyntheticFleet(size=args.size, background=0, seed=args.seed, hours=args.hours)
+    positions = PositionColumns()
+    rows = dropped = 0
+    for row in fleet.recent_flight_rows(args.interval):
+        rows += 1
+        if in_hole(row[3], row[4], args.holes):
+            dropped += 1
+            continue
+        positions.add_row(row)
+    until = epoch_seconds(fleet.epoch)
+
+    start = time.perf_counter()
+    flights, track = reconstruct(*positions.columns(), until=until)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.size} aircraft, {args.hours}h at {args.interval}s: {rows} reports, "
+          f"{dropped} ({dropped / rows:.0%}) lost in coverage holes\n")
+    print(f"  reconstruct       {elapsed * 1000:>8.1f}ms  {len(flights.start)} flights, {len(track.times)} points")
+
+    # Position error of every point against the motion model
+    by_icao = {a["icao_hex"].upper(): a for a in fleet.aircraft}
+    window_start = epoch_seconds(fleet.window_start)
+    truth = np.array([
+        fleet.position_at(by_icao[positions.aircraft[i][0]], t - window_start)[:2]
+        for i, t in zip(track.aircraft.tolist(), track.times.tolist())
+    ])
+    errors_km = great_circle_m(track.lats, track.lons, truth[:, 0], truth[:, 1]) / 1000
+    for flag, name in enumerate(FLAG_NAMES):
+        mask = track.flags == flag
+        if mask.any():
+            print(f"  {name:<17} {int(mask.sum()):>8} points  error median {np.median(errors_km[mask]):>6.1f}km  "
+                  f"p90 {np.percentile(errors_km[mask], 90):>6.1f}km  "
+                  f"confidence {track.confidence[mask].mean():.2f}")
+
+    # Airborne time per aircraft: truth, reconstructed, report count
+    icaos = [a["icao_hex"].upper() for a in fleet.aircraft]
+    true_minutes = np.array([
+        sum(fleet.is_airborne(a, t) for t in range(0, fleet.window_seconds, args.interval)) * args.interval / 60
+        for a in fleet.aircraft
+    ])
+    minutes = positions.airborne_minutes(icaos)
+    rebuilt = np.array([minutes[icao] for icao in icaos])
+    reports = np.bincount(positions.columns()[0], minlength=len(positions.aircraft))
+    counted = np.array([reports[positions.index[icao]] if icao in positions.index else 0
+                        for icao in icaos]) * args.interval / 60
+
+    rebuilt_error = np.abs(rebuilt - true_minutes) / true_minutes
+    counted_error = np.abs(counted - true_minutes) / true_minutes
+    print(f"\n  airborne time error per aircraft (median / p90):")
+    print(f"    reconstructed   {np.median(rebuilt_error):>6.1%} / {np.percentile(rebuilt_error, 90):.1%}")
+    print(f"    report count    {np.median(counted_error):>6.1%} / {np.percentile(counted_error, 90):.1%}")
+
+    failures = []
+    if np.median(rebuilt_error) >= np.median(counted_error):
+        failures.append("reconstructed airborne time is no closer to the truth than the report count")
+    if int((track.flags == OBSERVED).sum()) != len(positions):
+        failures.append("observed points do not match the input reports")
+    if track.confidence.min() < MIN_CONFIDENCE or track.confidence.max() > 1:
+        failures.append("confidence outside [MIN_CONFIDENCE, 1]")
+    same = track.aircraft[1:] == track.aircraft[:-1]
+    if (np.diff(track.times)[same] < 0).any():
+        failures.append("track points out of time order")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"\n✓ Reconstructed a {args.hours}h day in {elapsed:.2f}s; airborne time beats report counting")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Benchmark runner for the ingest and scoring hot paths
+Results are written as JSON so runs can be compared across commits
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from stand_ins import InMemoryClickHouse
+from ingest_opensky import OpenSkyIngester
+from calculate_panic import PanicScoreCalculator
+from scoring import RECENT_FLIGHT_COLUMNS
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def make_ingester(fleet: SyntheticFleet, payload: Dict) -> OpenSkyIngester:
+    client = InMemoryClickHouse()
+    client.on_select("FROM aircraft_profiles", [(p["icao_hex"],) for p in fleet.profiles()])
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingester = OpenSkyIngester(ch_client=client)
+    # Serve the synthetic snapshot instead of calling the OpenSky API
+    ingester._make_request = lambda endpoint, params=None: payload
+    return ingester
+
+
+def make_calculator(fleet: SyntheticFleet, interval: int) -> PanicScoreCalculator:
+    client = InMemoryClickHouse()
+    client.on_select("FROM flight_positions fp", fleet.recent_flight_rows(interval), RECENT_FLIGHT_COLUMNS)
+    return PanicScoreCalculator(ch_client=client)
+
+
+def build_cases(fleet: SyntheticFleet, interval: int) -> List[Tuple[str, Callable, int]]:
+    """Return (name, callable, items processed per call) for every benchmark"""
+    payload = fleet.states_payload()
+    ingester = make_ingester(fleet, payload)
+    states = ingester.get_all_states()
+    tracked = ingester.filter_tracked_aircraft(states)
+
+    calculator = make_calculator(fleet, interval)
+    flights = calculator.get_recent_flights()
+
+    return [
+        ("ingest.get_all_states", ingester.get_all_states, len(payload["states"])),
+        ("ingest.filter_tracked_aircraft", lambda: ingester.filter_tracked_aircraft(states), len(states)),
+        ("ingest.discover_aircraft", lambda: ingester.discover_aircraft(states), len(states)),
+        ("ingest.store_positions", lambda: ingester.store_positions(tracked), len(tracked)),
+        ("score.get_recent_flights", calculator.get_recent_flights, len(flights)),
+        ("score.calculate_night_flight_score", lambda: calculator.calculate_night_flight_score(flights), len(flights)),
+        ("score.calculate_convergence_score", lambda: calculator.calculate_convergence_score(flights), len(flights)),
+        ("score.calculate_airlift_score", lambda: calculator.calculate_airlift_score(flights), len(flights)),
+        ("score.calculate_vip_score", lambda: calculator.calculate_vip_score(flights), len(flights)),
+        ("score.calculate_formation_score", lambda: calculator.calculate_formation_score(flights), len(flights)),
+        ("score.calculate_panic_score", lambda: calculator.calculate_panic_score(streaming=False), len(flights)),
+        ("score.calculate_panic_score_streaming", calculator.calculate_panic_score, len(flights)),
+    ]
+
+
+def time_case(func: Callable, repeat: int) -> List[float]:
+    """Wall-clock seconds for each of `repeat` calls (one untimed warm-up)"""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(sizes: List[int], repeat: int, seed: int, interval: int, background: int,
+        only: str = "") -> Dict:
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "interval": interval,
+            "background": background,
+        },
+        "fleets": {},
+        "results": {},
+    }
+
+    for size in sizes:
+        fleet = SyntheticFleet(size=size, background=background, seed=seed)
+        report["fleets"][str(size)] = fleet.describe()
+        print(f"Fleet size {size}:")
+
+        for name, func, items in build_cases(fleet, interval):
+            if only and only not in name:
+                continue
+            timings = time_case(func, repeat)
+            median = statistics.median(timings)
+            report["results"].setdefault(name, {})[str(size)] = {
+                "items": items,
+                "min_ms": min(timings) * 1000,
+                "median_ms": median * 1000,
+                "mean_ms": statistics.mean(timings) * 1000,
+                "items_per_sec": items / median if median > 0 else None,
+            }
+            print(f"  {name:<40} {median * 1000:>10.2f} ms  ({items} items)")
+
+    return report
+
+
+def compare(base_path: str, head_path: str):
+    """Print median timing ratios between two result files"""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+
+    print(f"base: {base['meta']['revision']}  head: {head['meta']['revision']}")
+    print(f"  {'benchmark':<40} {'size':>7} {'base ms':>10} {'head ms':>10} {'ratio':>7}")
+    for name in sorted(set(base["results"]) | set(head["results"])):
+        sizes = set(base["results"].get(name, {})) | set(head["results"].get(name, {}))
+        for size in sorted(sizes, key=int):
+            b = base["results"].get(name, {}).get(size)
+            h = head["results"].get(name, {}).get(size)
+            if not b or not h:
+                b_ms = "%.2f" % b["median_ms"] if b else "-"
+                h_ms = "%.2f" % h["median_ms"] if h else "-"
+                print(f"  {name:<40} {size:>7} {b_ms:>10} {h_ms:>10} {'n/a':>7}")
+                continue
+            ratio = h["median_ms"] / b["median_ms"] if b["median_ms"] else float("inf")
+            print(f"  {name:<40} {size:>7} {b['median_ms']:>10.2f} {h['median_ms']:>10.2f} {ratio:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ingest/scoring benchmarks on synthetic data")
+    parser.add_argument("--sizes", default="100,1000", help="Comma-separated tracked fleet sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per benchmark")
+    parser.add_argument("--seed", type=int, default=42, help="Synthetic generator seed")
+    parser.add_argument("--interval", type=int, default=120,
+                        help="Seconds between stored position reports per aircraft")
+    parser.add_argument("--background", type=int, default=10000,
+                        help="Untracked aircraft in each OpenSky snapshot")
+    parser.add_argument("--only", default="", help="Run only benchmarks whose name contains this")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<revision>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="Compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    report = run(sizes, args.repeat, args.seed, args.interval, args.background, args.only)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Full-loop simulation harness: ingest -> score -> serve under a ramping fleet
+Runs the real OpenSkyIngester against a mock OpenSky HTTP server (the
+synthetic fleet's states/all snapshots, over HTTP and JSON like the real
+API), PanicScoreCalculator on the stored rows and the read API's
+/v1/scores on what it stored. Time is simulated: every poll advances the
+clock by --poll-interval seconds and a score run happens every
+--score-interval simulated seconds, with no sleeping in between.
+
+Each fleet size runs in a fresh process so memory is its own, and reports:
+
+- poll latency percentiles (fetch, parse, filter, store) and states/s
+- score and serve latency
+- end-to-end latency: from a snapshot being ready at the mock server until
+  /v1/scores serves a score that includes it
+- realtime factor: simulated seconds per wall second spent in the loop
+  (below 1 the loop cannot keep up at this fleet size)
+- current and peak RSS
+
+Storage is InMemoryClickHouse by default (stored rows then count towards
+RSS); --clickhouse uses a scratch database on the CLICKHOUSE_* server,
+created from db_schema.sql and dropped afterwards unless --keep.
+
+Runs are deterministic for a seed: the same snapshots, stored rows and
+scores, summarized in a digest per step. Reports go to
+benchmarks/results/simulate-<revision>.json and --compare lines two up.
+
+    python benchmarks/simulate.py --steps 300,1000,3000,10000,30000,100000 --polls 12
+    python benchmarks/simulate.py --steps 1000,10000 --clickhouse
+    python benchmarks/simulate.py --compare benchmarks/results/simulate-abc1234.json benchmarks/results/simulate-def5678.json
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from synthetic import SyntheticFleet
+from stand_ins import InMemoryClickHouse
+
+DEFAULT_STEPS = "300,1000,3000,10000,30000,100000"
+PROFILE_COLUMNS = ("icao_hex", "registration", "aircraft_type", "owner_country", "owner_org", "is_military",
+                   "is_government", "is_vip", "is_intel", "vip_tier", "home_base_airport", "notes", "last_updated")
+
+
+class MockOpenSky:
+    """
+    states/all for the current simulated time, pre-encoded so the mock's own
+    JSON work stays out of the measured poll
+    """
+
+    def __init__(self, fleet: SyntheticFleet):
+        self.fleet = fleet
+        self.body = b'{"time": 0, "states": []}'
+        self.requests = 0
+        handler = self._handler()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api"
+
+    def advance(self, t: float) -> int:
+        """Serve the snapshot at t seconds into the fleet window; returns its state count"""
+        payload = self.fleet.states_payload(t)
+        self.body = json.dumps(payload).encode("utf-8")
+        return len(payload["states"])
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = mock.body
+                mock.requests += 1
+                self.send_response(200 if self.path.startswith("/api/states/all") else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+
+
+class SimClock:
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def now(self) -> datetime:
+        return self.current
+
+
+def stand_in_store(fleet: SyntheticFleet) -> InMemoryClickHouse:
+    """InMemoryClickHouse answering the ingester's, scorer's and read API's queries from what was stored"""
+    from scoring import RECENT_FLIGHT_COLUMNS
+
+    client = InMemoryClickHouse()
+    profiles = {p["icao_hex"]: p for p in fleet.profiles()}
+
+    def recent_flights(params):
+        # JOIN aircraft_profiles, newest first (batches are stored in time order)
+        rows = []
+        for batch in reversed(client.batches["flight_positions"]):
+            if batch and batch[0]["timestamp"] < params["cutoff_time"]:
+                break
+            for r in batch:
+                ap = profiles.get(r["icao_hex"])
+                if ap is not None:
+                    rows.append((r["icao_hex"], r["callsign"], r["timestamp"], r["lat"], r["lon"], r["altitude"],
+                                 r["on_ground"], ap["owner_country"], ap["owner_org"], ap["vip_tier"],
+                                 ap["is_military"], ap["is_vip"], ap["aircraft_type"]))
+        return rows
+
+    def versions(_):
+        newest = [max((r["timestamp"] for r in batches[-1]), default=None) if batches else None
+                  for batches in (client.batches["panic_scores"], client.batches["flight_positions"])]
+        return [tuple(int(t.timestamp()) if t else None for t in newest)]
+
+    def latest_scores(params):
+        latest = {}
+        for r in client.rows("panic_scores"):
+            if params.get("hours") in (None, r["window_hours"]):
+                latest[(r["region"], r["window_hours"])] = r
+        return [(r["region"], r["window_hours"], r["timestamp"], r["overall_panic_score"],
+                 r["night_flight_score"], r["convergence_score"], r["airlift_score"], r["vip_movement_score"],
+                 r["formation_score"], r["flight_count"], r["countries_involved"], r["narrative"],
+                 r["trend_delta"]) for r in latest.values()]
+
+    # The scorer's query joins aircraft_profiles, so it goes first
+    client.on_select("FROM flight_positions fp", recent_flights, RECENT_FLIGHT_COLUMNS)
+    client.on_select("FROM aircraft_profiles", [(icao.lower(),) for icao in profiles])
+    client.on_select("toUnixTimestamp(max(timestamp)) FROM panic_scores", versions)
+    client.on_select("GROUP BY region, window_hours", latest_scores)
+    return client
+
+
+def scratch_database(fleet: SyntheticFleet, database: str):
+    """Pool on a fresh database with the full schema and the fleet's profiles"""
+    from db import ClickHousePool
+    from schema import create_statements
+
+    admin = ClickHousePool(size=1, database="default")
+    admin.execute(f"DROP DATABASE IF EXISTS {database}")
+    with open(os.path.join(BENCH_DIR, "..", "src", "db_schema.sql")) as f:
+        schema = f.read().replace("airplane_watch", database)
+    for chunk in schema.split(";"):
+        statement = "\n".join(line for line in chunk.splitlines() if not line.strip().startswith("--")).strip()
+        if statement:
+            admin.execute(statement)
+    # No TTLs: simulated timestamps are in the past
+    for statement in create_statements(database=database, settings={}):
+        admin.execute(statement)
+    admin.close()
+    pool = ClickHousePool(database=database)
+    pool.execute(f"INSERT INTO aircraft_profiles ({', '.join(PROFILE_COLUMNS)}) VALUES",
+                 [{c: p[c] for c in PROFILE_COLUMNS} for p in fleet.profiles()])
+    return pool
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def run_step(size: int, args) -> Dict:
+    """One fleet size, in this process; returns the step's report"""
+    duration = args.polls * args.poll_interval
+    fleet = SyntheticFleet(size=size, background=args.background, seed=args.seed,
+                           hours=max(1, math.ceil(duration / 3600)))
+    mock = MockOpenSky(fleet)
+    os.environ["OPENSKY_URL"] = mock.url
+    # After OPENSKY_URL is set: the ingester reads it at import
+    from ingest_opensky import OpenSkyIngester
+    from calculate_panic import PanicScoreCalculator
+    from read_api import PoolDataVersion, ReadAPI
+
+    database = f"sim_{os.getpid()}"
+    client = scratch_database(fleet, database) if args.clickhouse else stand_in_store(fleet)
+    clock = SimClock(fleet.window_start.replace(tzinfo=timezone.utc))
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingester = OpenSkyIngester(ch_client=client, clock=clock.now)
+        calculator = PanicScoreCalculator(ch_client=client)
+    api = ReadAPI(client, version=PoolDataVersion(client, interval_seconds=0))
+    baseline_rss = rss_mb()
+
+    polls, scores, serves, e2e = [], [], [], []
+    waiting = []  # perf_counter of polls not yet reflected in a served score
+    digest = hashlib.sha256()
+    states = stored = 0
+    failures = []
+    last_score_at = None
+    try:
+        for i in range(args.polls):
+            t = (i + 1) * args.poll_interval
+            clock.current = fleet.window_start.replace(tzinfo=timezone.utc) + timedelta(seconds=t)
+            states += mock.advance(t)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = ingester.poll_once()
+            polls.append(time.perf_counter() - start)
+            waiting.append(start)
+            stored += result["stored_records"]
+            digest.update(f"{result['total_aircraft']}:{result['tracked_aircraft']}:"
+                          f"{result['discovered_aircraft']}:{result['stored_records']}".encode())
+
+            if last_score_at is None or t - last_score_at >= args.score_interval or i == args.polls - 1:
+                last_score_at = t
+                begin = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    score = calculator.calculate_panic_score(hours=args.hours, now=clock.current)
+                    score["timestamp"] = clock.current
+                    calculator.store_panic_score(score)
+                scored = time.perf_counter()
+                response = api.handle(f"/v1/scores?window={args.hours}", {})
+                served = time.perf_counter()
+                scores.append(scored - begin)
+                serves.append(served - scored)
+                rows = json.loads(response.body)["scores"]
+                if not any(r["timestamp"] == clock.current.strftime("%Y-%m-%d %H:%M:%S") for r in rows):
+                    failures.append(f"poll {i}: /v1/scores does not serve the score just stored")
+                e2e.extend(served - ready for ready in waiting)
+                waiting = []
+                digest.update(json.dumps([score[k] for k in (
+                    "overall_panic_score", "night_flight_score", "convergence_score", "airlift_score",
+                    "vip_movement_score", "formation_score", "flight_count")], default=str).encode())
+    finally:
+        mock.close()
+        if args.clickhouse:
+            if not args.keep:
+                client.execute(f"DROP DATABASE IF EXISTS {database}")
+            client.close()
+
+    if not stored:
+        failures.append("no rows stored")
+    busy = sum(polls) + sum(scores) + sum(serves)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "size": size,
+        "states_per_poll": states // args.polls,
+        "stored_rows": stored,
+        "polls": len(polls),
+        "score_runs": len(scores),
+        "poll_ms": {f"p{q}": ms(percentile(polls, q)) for q in (50, 95, 99)},
+        "score_ms": {"p50": ms(percentile(scores, 50)), "max": ms(max(scores))},
+        "serve_ms": {"p50": ms(percentile(serves, 50)), "max": ms(max(serves))},
+        "e2e_ms": {f"p{q}": ms(percentile(e2e, q)) for q in (50, 95, 99)},
+        "states_per_sec": round(states / sum(polls)),
+        "rows_per_sec": round(stored / sum(polls)),
+        "realtime_factor": round(args.polls * args.poll_interval / busy, 2),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_growth_mb": round(rss_mb() - baseline_rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "digest": digest.hexdigest()[:16],
+        "failures": failures,
+    }
+
+
+def step_command(size: int, args) -> List[str]:
+    command = [sys.executable, os.path.abspath(__file__), "--step", str(size), "--polls", str(args.polls),
+               "--poll-interval", str(args.poll_interval), "--score-interval", str(args.score_interval),
+               "--hours", str(args.hours), "--background", str(args.background), "--seed", str(args.seed)]
+    if args.clickhouse:
+        command.append("--clickhouse")
+    if args.keep:
+        command.append("--keep")
+    return command
+
+
+def print_step(step: Dict):
+    print(f"  {step['size']:>7} {step['states_per_poll']:>8} {step['poll_ms']['p50']:>8.1f} "
+          f"{step['poll_ms']['p95']:>8.1f} {step['score_ms']['p50']:>8.1f} {step['serve_ms']['p50']:>7.1f} "
+          f"{step['e2e_ms']['p50']:>8.1f} {step['e2e_ms']['p95']:>8.1f} {step['rows_per_sec']:>9} {step['realtime_factor']:>7.1f}x "
+          f"{step['rss_mb']:>7.0f} {step['peak_rss_mb']:>7.0f}")
+
+
+HEADER = (f"  {'fleet':>7} {'states':>8} {'poll p50':>8} {'poll p95':>8} {'score':>8} {'serve':>7} "
+          f"{'e2e p50':>8} {'e2e p95':>8} {'rows/s':>9} {'realtime':>8} {'RSS MB':>7} {'peak':>7}")
+
+
+def compare(base_path: str, head_path: str):
+    """Per-step ratios (head / base) of the headline numbers"""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+    print(f"base: {base['meta']['revision']}  head: {head['meta']['revision']}")
+    for key in ("seed", "polls", "poll_interval", "score_interval", "hours", "background", "storage"):
+        if base["meta"].get(key) != head["meta"].get(key):
+            print(f"  note: {key} differs ({base['meta'].get(key)} vs {head['meta'].get(key)})")
+    metrics = (("poll p50", lambda s: s["poll_ms"]["p50"]), ("poll p95", lambda s: s["poll_ms"]["p95"]),
+               ("score", lambda s: s["score_ms"]["p50"]), ("e2e p95", lambda s: s["e2e_ms"]["p95"]),
+               ("realtime", lambda s: s["realtime_factor"]), ("peak RSS", lambda s: s["peak_rss_mb"]))
+    print(f"  {'fleet':>7} " + " ".join(f"{name:>10}" for name, _ in metrics) + "  outputs")
+    steps = {s["size"]: s for s in base["steps"]}
+    for step in head["steps"]:
+        other = steps.get(step["size"])
+        if other is None:
+            print(f"  {step['size']:>7} (not in base)")
+            continue
+        ratios = []
+        for _, get in metrics:
+            b, h = get(other), get(step)
+            ratios.append(f"{h / b:>9.2f}x" if b and h is not None else f"{'n/a':>10}")
+        same = "same" if step["digest"] == other["digest"] else "DIFFER"
+        print(f"  {step['size']:>7} " + " ".join(ratios) + f"  {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest -> score -> serve simulation on a compressed clock")
+    parser.add_argument("--steps", default=DEFAULT_STEPS, help="Comma-separated tracked fleet sizes")
+    parser.add_argument("--polls", type=int, default=12, help="Polls per step")
+    parser.add_argument("--poll-interval", type=int, default=10, help="Simulated seconds between polls")
+    parser.add_argument("--score-interval", type=int, default=60, help="Simulated seconds between score runs")
+    parser.add_argument("--hours", type=int, default=12, help="Scoring window")
+    parser.add_argument("--background", type=int, default=10000, help="Untracked aircraft in each snapshot")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--clickhouse", action="store_true", help="Store in a scratch database on CLICKHOUSE_*")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch databases")
+    parser.add_argument("--output", help="Report file (default: benchmarks/results/simulate-<revision>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="Compare two reports")
+    parser.add_argument("--step", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.step:
+        # Child process: one step, report as the last line of stdout
+        print(json.dumps(run_step(args.step, args)))
+        return
+
+    # Not at the top: run imports the ingester, which must see the step's OPENSKY_URL
+    from run import RESULTS_DIR, git_revision
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "polls": args.polls,
+            "poll_interval": args.poll_interval,
+            "score_interval": args.score_interval,
+            "hours": args.hours,
+            "background": args.background,
+            "storage": "clickhouse" if args.clickhouse else "in-memory",
+        },
+        "steps": [],
+    }
+    print(f"{args.polls} polls every {args.poll_interval}s simulated, scored every {args.score_interval}s, "
+          f"{args.background} background aircraft, {report['meta']['storage']} storage\n")
+    print(HEADER)
+    failures = []
+    saturated = None
+    for size in [int(s) for s in args.steps.split(",") if s]:
+        output = subprocess.run(step_command(size, args), capture_output=True, text=True)
+        if output.returncode != 0:
+            failures.append(f"fleet {size}: step failed\n{output.stderr[-2000:]}")
+            break
+        step = json.loads(output.stdout.strip().splitlines()[-1])
+        report["steps"].append(step)
+        print_step(step)
+        failures.extend(f"fleet {size}: {f}" for f in step["failures"])
+        if saturated is None and step["realtime_factor"] < 1:
+            saturated = size
+
+    if saturated:
+        print(f"\n  The loop falls behind real time at {saturated} tracked aircraft")
+    report["saturated_at"] = saturated
+    path = args.output or os.path.join(RESULTS_DIR, f"simulate-{report['meta']['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"\n✓ Report written to {path}")
+
+
+if __name__ == "__main__":
+    main()
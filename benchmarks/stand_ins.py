@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+In-memory stand-ins for external services used by the benchmarks
+"""
+
+import re
+from collections import defaultdict
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+INSERT_TABLE = re.compile(r"INSERT\s+INTO\s+(\w+)", re.IGNORECASE)
+SELECT_LIST = re.compile(r"^\s*SELECT\s+(.*?)\s+FROM\s", re.IGNORECASE | re.DOTALL)
+
+
+def selected_columns(query: str) -> Optional[List[str]]:
+    """Column names in a query's SELECT list, table aliases dropped; None without one"""
+    match = SELECT_LIST.search(query)
+    if not match:
+        return None
+    return [item.strip().rsplit(".", 1)[-1] for item in match.group(1).split(",")]
+
+
+def projection(columns: Sequence[str], query: str) -> Optional[Callable[[tuple], tuple]]:
+    """row -> the columns the query selects, for rows in `columns` order; None when it selects them all"""
+    wanted = selected_columns(query)
+    if wanted is None or list(wanted) == list(columns) or not set(wanted) <= set(columns):
+        return None
+    pick = itemgetter(*[list(columns).index(c) for c in wanted])
+    return pick if len(wanted) > 1 else lambda row: (pick(row),)
+
+
+def project(rows, columns: Sequence[str], query: str):
+    """rows (tuples in `columns` order) cut down to what the query selects, when it names only those"""
+    pick = projection(columns, query)
+    return rows if pick is None else list(map(pick, rows))
+
+
+class InMemoryClickHouse:
+    """
+    Minimal clickhouse_driver.Client replacement
+
+    INSERTs are kept per table (as the batches passed in, without copying)
+    and SELECTs are answered from responses registered with on_select().
+    Unknown SELECTs return an empty result.
+    """
+
+    def __init__(self):
+        self.batches: Dict[str, List[List]] = defaultdict(list)
+        self.queries: List[str] = []
+        self._selects: List[tuple] = []
+
+    def on_select(self, fragment: str, result: Union[List, Callable[[Optional[Dict]], List]],
+                  columns: Optional[Sequence[str]] = None):
+        """
+        Answer any query containing fragment with result (or result(params));
+        with the result's column names, a query selecting fewer of them gets
+        only those
+        """
+        self._selects.append((fragment, result, columns))
+
+    def execute(self, query: str, params=None, **kwargs):
+        self.queries.append(query)
+
+        match = INSERT_TABLE.search(query)
+        if match:
+            rows = params or []
+            self.batches[match.group(1)].append(rows)
+            return len(rows)
+
+        for fragment, result, columns in self._selects:
+            if fragment in query:
+                rows = result(params) if callable(result) else result
+                return project(rows, columns, query) if columns else rows
+        return []
+
+    def execute_iter(self, query: str, params=None, **kwargs):
+        return iter(self.execute(query, params, **kwargs))
+
+    def rows(self, table: str) -> List:
+        return [row for batch in self.batches[table] for row in batch]
+
+    def row_count(self, table: str) -> int:
+        return sum(len(batch) for batch in self.batches[table])
+
+    def reset(self):
+        self.batches.clear()
+        self.queries.clear()
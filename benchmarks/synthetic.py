@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Synthetic flight generator for benchmarks
+Produces deterministic OpenSky payloads, flight_positions rows and
+aircraft_profiles rows at configurable fleet sizes
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Fixed end of the synthetic observation window (naive UTC, like clickhouse_driver)
+DEFAULT_EPOCH = datetime(2025, 1, 15, 12, 0, 0)
+
+# ISO code -> OpenSky origin_country name
+COUNTRIES = {
+    "US": "United States", "GB": "United Kingdom", "FR": "France", "DE": "Germany",
+    "IT": "Italy", "ES": "Spain", "NL": "Netherlands", "PL": "Poland",
+    "TR": "Turkey", "RU": "Russian Federation", "CN": "China", "SA": "Saudi Arabia",
+    "AE": "United Arab Emirates", "IL": "Israel", "CL": "Chile", "CO": "Colombia",
+}
+
+# (aircraft_type, is_military, is_government, is_vip, is_intel, vip_tier, weight)
+AIRCRAFT_MIX = [
+    ("Boeing KC-135R", 1, 0, 0, 0, 4, 10),
+    ("Boeing P-8A", 1, 0, 0, 1, 4, 6),
+    ("Boeing RC-135W", 1, 0, 0, 1, 3, 3),
+    ("Boeing E-3G", 1, 0, 0, 1, 3, 3),
+    ("Boeing B-52H", 1, 0, 0, 0, 3, 2),
+    ("Dassault Falcon 7X", 0, 1, 1, 0, 2, 6),
+    ("Airbus A330-243", 1, 1, 1, 0, 1, 2),
+    ("Boeing C-32A", 1, 1, 1, 0, 2, 3),
+    ("Gulfstream C-37B", 1, 1, 0, 0, 3, 5),
+    ("Bombardier Global 6000", 0, 1, 0, 0, 4, 6),
+]
+
+AIRLIFT_MIX = [
+    ("Boeing C-17A", 6),
+    ("Lockheed C-130J", 6),
+    ("Airbus A400M", 3),
+    ("Ilyushin Il-76MD", 2),
+    ("Lockheed C-5M", 1),
+]
+
+# Airlift shuttles: ground time at each base between legs, and the share
+# of a leg spent climbing (and again descending)
+SHUTTLE_TURNAROUND_SECONDS = 3600
+SHUTTLE_CLIMB = 0.1
+
+TRACKED_CALLSIGN_PREFIXES = ["RCH", "SAM", "NATO", "CNV", "GAF", "RRR", "CTM", "IAM", "RFF"]
+BACKGROUND_CALLSIGN_PREFIXES = ["UAL", "DAL", "AAL", "BAW", "DLH", "AFR", "RYR", "EZY", "UAE", "QTR"]
+
+# Commonly seen squawks; emergencies are deliberately rare
+SQUAWKS = ["1000", "2000", "7000", "1200", "4521", "6615", "3401"]
+
+
+def _weighted(rng: random.Random, mix: List[Tuple]) -> Tuple:
+    return rng.choices(mix, weights=[m[-1] for m in mix], k=1)[0]
+
+
+def _wrap_lon(lon: float) -> float:
+    return ((lon + 180.0) % 360.0) - 180.0
+
+
+def _lon_for_local_hour(utc: datetime, local_hour: float) -> float:
+    """Longitude at which the naive is_night_time() clock reads local_hour"""
+    return _wrap_lon((local_hour - utc.hour) * 15.0)
+
+
+class SyntheticFleet:
+    """
+    Deterministic fleet of tracked gov/mil/VIP aircraft plus background traffic
+
+    Each tracked aircraft follows a closed-form motion model (orbit or
+    A-to-B shuttle) so positions can be sampled at any time offset, which
+    keeps snapshots and historical rows consistent with each other.
+
+    Mix controls:
+    - night_fraction: share of sorties flown during local night (00-06)
+    - clusters / cluster_size: groups of different-country aircraft
+      orbiting a shared point (drives the convergence score)
+    - airlift_fraction: share of the fleet that are cargo types shuttling
+      between two bases for the whole window, climbing out, descending and
+      turning around on the ground at each end (drives the airlift score)
+    - formations: pairs flying the same orbit ~1km apart for their whole
+      sortie, alternately a KC-135 with a B-52 (refuelling rendezvous) and
+      two B-52s (formation); they replace the last day sorties of the fleet
+    """
+
+    def __init__(self, size: int = 1000, background: int = 10000, seed: int = 42,
+                 hours: int = 12, night_fraction: float = 0.3, clusters: int = 3,
+                 cluster_size: int = 6, airlift_fraction: float = 0.1,
+                 formations: int = 2, epoch: datetime = DEFAULT_EPOCH):
+        self.size = size
+        self.background = background
+        self.seed = seed
+        self.hours = hours
+        self.night_fraction = night_fraction
+        self.clusters = clusters
+        self.cluster_size = cluster_size
+        self.airlift_fraction = airlift_fraction
+        self.formations = formations
+        self.epoch = epoch
+        self.window_start = epoch - timedelta(hours=hours)
+        self.window_seconds = hours * 3600
+
+        rng = random.Random(seed)
+        self.aircraft = self._build_fleet(rng)
+        # After the main draw, so adding pairs leaves the rest of the fleet unchanged
+        self._pair_up()
+        self.background_icaos = self._unique_icaos(rng, background, {a["icao_hex"] for a in self.aircraft})
+
+    # ------------------------------------------------------------------
+    # Fleet construction
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _unique_icaos(rng: random.Random, count: int, taken: set) -> List[str]:
+        icaos = []
+        while len(icaos) < count:
+            icao = f"{rng.getrandbits(24):06x}"
+            if icao not in taken:
+                taken.add(icao)
+                icaos.append(icao)
+        return icaos
+
+    def _build_fleet(self, rng: random.Random) -> List[Dict]:
+        countries = list(COUNTRIES)
+        icaos = self._unique_icaos(rng, self.size, set())
+
+        cluster_centers = [
+            (rng.uniform(30, 60), rng.uniform(-10, 40)) for _ in range(self.clusters)
+        ]
+        cluster_slots = min(self.size, self.clusters * self.cluster_size)
+        airlift_count = int(self.size * self.airlift_fraction)
+
+        fleet = []
+        for i, icao in enumerate(icaos):
+            if i < cluster_slots:
+                kind = "cluster"
+            elif i < cluster_slots + airlift_count:
+                kind = "airlift"
+            elif rng.random() < self.night_fraction:
+                kind = "night"
+            else:
+                kind = "day"
+
+            if kind == "airlift":
+                aircraft_type, _ = _weighted(rng, AIRLIFT_MIX)
+                is_military, is_government, is_vip, is_intel, vip_tier = 1, 0, 0, 0, 4
+            else:
+                aircraft_type, is_military, is_government, is_vip, is_intel, vip_tier, _ = _weighted(rng, AIRCRAFT_MIX)
+
+            if kind == "cluster":
+                # Round-robin countries so every cluster mixes nationalities
+                owner_country = countries[i % len(countries)]
+            else:
+                owner_country = rng.choice(countries)
+
+            aircraft = {
+                "icao_hex": icao,
+                "registration": f"{rng.randint(10, 99)}-{rng.randint(1000, 9999)}",
+                "aircraft_type": aircraft_type,
+                "owner_country": owner_country,
+                "owner_org": f"{owner_country} AF" if is_military else f"{owner_country} Gov",
+                "is_military": is_military,
+                "is_government": is_government,
+                "is_vip": is_vip,
+                "is_intel": is_intel,
+                "vip_tier": vip_tier,
+                "home_base_airport": "",
+                "notes": f"Synthetic {kind} aircraft",
+                "callsign": f"{rng.choice(TRACKED_CALLSIGN_PREFIXES)}{rng.randint(1, 999)}",
+                "kind": kind,
+                "altitude": rng.randint(7000, 12500),
+                "speed": rng.randint(180, 260),
+            }
+            aircraft.update(self._motion(rng, kind, i, cluster_centers))
+            fleet.append(aircraft)
+
+        return fleet
+
+    def _pair_up(self):
+        """Turn the last day sorties into formation / tanker-receiver pairs"""
+        day = [a for a in self.aircraft if a["kind"] == "day"]
+        for pair in range(min(self.formations, len(day) // 2)):
+            leader, wingman = day[-2 * pair - 1], day[-2 * pair - 2]
+            types = ("Boeing KC-135R", "Boeing B-52H") if pair % 2 == 0 else ("Boeing B-52H", "Boeing B-52H")
+            for aircraft, aircraft_type in zip((leader, wingman), types):
+                aircraft.update(kind="formation", aircraft_type=aircraft_type, is_military=1,
+                                is_government=0, is_vip=0, is_intel=0, vip_tier=3,
+                                owner_org=f"{aircraft['owner_country']} AF")
+            wingman["owner_country"] = leader["owner_country"]
+            wingman["owner_org"] = leader["owner_org"]
+            # Same orbit and sortie, ~1km behind and 30m below the leader
+            for key in ("model", "sortie_start", "sortie_end", "radius_deg", "period_seconds",
+                        "center_lat", "center_lon", "speed"):
+                wingman[key] = leader[key]
+            wingman["phase"] = leader["phase"] - 0.01 / leader["radius_deg"]
+            wingman["altitude"] = leader["altitude"] - 30
+            wingman["notes"] = leader["notes"] = "Synthetic formation aircraft"
+
+    def _motion(self, rng: random.Random, kind: str, index: int,
+                cluster_centers: List[Tuple[float, float]]) -> Dict:
+        """Pick sortie timing and motion model parameters for one aircraft"""
+        window = self.window_seconds
+
+        if kind == "airlift":
+            lat_a, lon_a = rng.uniform(25, 55), rng.uniform(-100, 40)
+            base_b = (lat_a + rng.uniform(-15, 15), _wrap_lon(lon_a + rng.uniform(20, 60)))
+            leg = rng.randint(3, 6) * 3600
+            cycle = 2 * (leg + SHUTTLE_TURNAROUND_SECONDS)
+            return {
+                "model": "shuttle",
+                "sortie_start": 0,
+                "sortie_end": window,
+                "base_a": (lat_a, lon_a),
+                "base_b": base_b,
+                "leg_seconds": leg,
+                # Spread shuttles over their cycle without another draw
+                # (keeps the rest of the fleet unchanged)
+                "cycle_offset": index * 7919 * 60 % cycle,
+            }
+
+        duration = rng.randint(2, 4) * 3600
+        start = rng.randint(0, max(0, window - duration))
+        model = {
+            "model": "orbit",
+            "sortie_start": start,
+            "sortie_end": start + duration,
+            "radius_deg": rng.uniform(0.5, 3.0),
+            "period_seconds": rng.randint(1800, 7200),
+            "phase": rng.uniform(0, 2 * math.pi),
+        }
+
+        if kind == "cluster":
+            center = cluster_centers[index % len(cluster_centers)]
+            model.update(center_lat=center[0], center_lon=center[1], radius_deg=0.05)
+            return model
+
+        # Choose a longitude that puts the sortie midpoint at local night or day
+        midpoint = self.window_start + timedelta(seconds=start + duration // 2)
+        local_hour = rng.uniform(2.5, 3.5) if kind == "night" else rng.uniform(10.0, 16.0)
+        model.update(center_lat=rng.uniform(-50, 65), center_lon=_lon_for_local_hour(midpoint, local_hour))
+        return model
+
+    # ------------------------------------------------------------------
+    # Motion sampling
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def position_at(aircraft: Dict, t: float) -> Tuple[float, float, float]:
+        """Return (lat, lon, heading) at t seconds after the window start"""
+        if aircraft["model"] == "shuttle":
+            (lat_a, lon_a), (lat_b, lon_b) = aircraft["base_a"], aircraft["base_b"]
+            leg, u = SyntheticFleet._shuttle_leg(aircraft, t)
+            if leg % 2:
+                lat_a, lon_a, lat_b, lon_b = lat_b, lon_b, lat_a, lon_a
+            lat = lat_a + (lat_b - lat_a) * u
+            lon = lon_a + (lon_b - lon_a) * u
+            heading = math.degrees(math.atan2(lon_b - lon_a, lat_b - lat_a)) % 360
+            return lat, _wrap_lon(lon), heading
+
+        angle = aircraft["phase"] + 2 * math.pi * t / aircraft["period_seconds"]
+        radius = aircraft["radius_deg"]
+        lat = aircraft["center_lat"] + radius * math.sin(angle)
+        lon = aircraft["center_lon"] + radius * math.cos(angle) / max(0.2, math.cos(math.radians(lat)))
+        heading = (math.degrees(-angle)) % 360
+        return lat, _wrap_lon(lon), heading
+
+    @staticmethod
+    def _shuttle_leg(aircraft: Dict, t: float) -> Tuple[int, float]:
+        """(leg number, share of the leg flown); 1.0 while on the ground at the far base"""
+        stop = aircraft["leg_seconds"] + SHUTTLE_TURNAROUND_SECONDS
+        leg, into = divmod(t + aircraft["cycle_offset"], stop)
+        return int(leg), min(1.0, into / aircraft["leg_seconds"])
+
+    @staticmethod
+    def is_airborne(aircraft: Dict, t: float) -> bool:
+        if not aircraft["sortie_start"] <= t < aircraft["sortie_end"]:
+            return False
+        return aircraft["model"] != "shuttle" or SyntheticFleet._shuttle_leg(aircraft, t)[1] < 1.0
+
+    @staticmethod
+    def altitude_at(aircraft: Dict, t: float) -> float:
+        """Cruise altitude; shuttles climb and descend over the first and last part of each leg"""
+        if aircraft["model"] != "shuttle":
+            return aircraft["altitude"]
+        u = SyntheticFleet._shuttle_leg(aircraft, t)[1]
+        return max(150, round(aircraft["altitude"] * min(1.0, u / SHUTTLE_CLIMB, (1 - u) / SHUTTLE_CLIMB)))
+
+    # ------------------------------------------------------------------
+    # Outputs
+    # ------------------------------------------------------------------
+
+    def profiles(self) -> List[Dict]:
+        """aircraft_profiles rows (as seed_aircraft.py would insert them)"""
+        columns = [
+            "icao_hex", "registration", "aircraft_type", "owner_country", "owner_org",
+            "is_military", "is_government", "is_vip", "is_intel", "vip_tier",
+            "home_base_airport", "notes",
+        ]
+        return [
+            dict({c: a[c] for c in columns}, icao_hex=a["icao_hex"].upper(), last_updated=self.epoch)
+            for a in self.aircraft
+        ]
+
+    def tracked_icaos(self) -> set:
+        """Lower-case ICAO set, as OpenSkyIngester._load_tracked_aircraft returns it"""
+        return {a["icao_hex"] for a in self.aircraft}
+
+    def states_payload(self, t: Optional[float] = None, missing_position_rate: float = 0.02) -> Dict:
+        """
+        OpenSky states/all response at t seconds after the window start
+
+        Tracked aircraft are sampled from their motion models (on ground at
+        their sortie origin when not flying); background traffic is random
+        but deterministic per (seed, t).
+        """
+        if t is None:
+            t = self.window_seconds
+        rng = random.Random(f"{self.seed}:{t}")
+        now = int((self.window_start - datetime(1970, 1, 1)).total_seconds() + t)
+
+        states = []
+        for aircraft in self.aircraft:
+            airborne = self.is_airborne(aircraft, t)
+            # Shuttles sit at the base they last flew to; other sorties at their origin
+            parked = aircraft["model"] == "shuttle"
+            lat, lon, heading = self.position_at(aircraft, t if airborne or parked else aircraft["sortie_start"])
+            states.append(self._state_vector(
+                rng, aircraft["icao_hex"], aircraft["callsign"], COUNTRIES[aircraft["owner_country"]],
+                now, lat, lon, self.altitude_at(aircraft, t) if airborne else 0, not airborne,
+                aircraft["speed"] if airborne else 0, heading, missing_position_rate,
+            ))
+
+        country_names = list(COUNTRIES.values())
+        for icao in self.background_icaos:
+            on_ground = rng.random() < 0.15
+            states.append(self._state_vector(
+                rng, icao, f"{rng.choice(BACKGROUND_CALLSIGN_PREFIXES)}{rng.randint(1, 9999)}",
+                rng.choice(country_names), now, rng.uniform(-60, 70), rng.uniform(-180, 180),
+                0 if on_ground else rng.randint(1000, 12500), on_ground,
+                rng.uniform(0, 15) if on_ground else rng.uniform(120, 280),
+                rng.uniform(0, 360), missing_position_rate,
+            ))
+
+        return {"time": now, "states": states}
+
+    @staticmethod
+    def _state_vector(rng: random.Random, icao: str, callsign: str, country: str, now: int,
+                      lat: float, lon: float, altitude: float, on_ground: bool, velocity: float,
+                      heading: float, missing_position_rate: float) -> List:
+        """Build one 17-field OpenSky state vector"""
+        has_position = rng.random() >= missing_position_rate
+        vertical_rate = 0.0 if on_ground else round(rng.uniform(-8, 8), 2)
+        return [
+            icao,                                       # 0 icao24
+            f"{callsign:<8}",                           # 1 callsign (space padded)
+            country,                                    # 2 origin_country
+            now - rng.randint(0, 5) if has_position else None,  # 3 time_position
+            now,                                        # 4 last_contact
+            round(lon, 4) if has_position else None,    # 5 longitude
+            round(lat, 4) if has_position else None,    # 6 latitude
+            None if on_ground else float(altitude),     # 7 baro_altitude
+            on_ground,                                  # 8 on_ground
+            round(velocity, 2),                         # 9 velocity
+            round(heading, 2),                          # 10 true_track
+            vertical_rate,                              # 11 vertical_rate
+            None,                                       # 12 sensors
+            None if on_ground else float(altitude) + 60,  # 13 geo_altitude
+            rng.choice(SQUAWKS) if rng.random() < 0.9 else None,  # 14 squawk
+            False,                                      # 15 spi
+            0,                                          # 16 position_source
+        ]
+
+    def iter_positions(self, interval: int = 60) -> Iterator[Dict]:
+        """flight_positions rows for every airborne report in the window"""
+        for aircraft in self.aircraft:
+            icao = aircraft["icao_hex"].upper()
+            for t in range(aircraft["sortie_start"], aircraft["sortie_end"], interval):
+                if not self.is_airborne(aircraft, t):
+                    continue
+                lat, lon, heading = self.position_at(aircraft, t)
+                yield {
+                    "timestamp": self.window_start + timedelta(seconds=t),
+                    "icao_hex": icao,
+                    "callsign": aircraft["callsign"],
+                    "lat": lat,
+                    "lon": lon,
+                    "altitude": self.altitude_at(aircraft, t),
+                    "ground_speed": aircraft["speed"],
+                    "heading": int(heading),
+                    "vertical_rate": 0,
+                    "on_ground": 0,
+                    "source": "synthetic",
+                }
+
+    def positions(self, interval: int = 60) -> List[Dict]:
+        return list(self.iter_positions(interval))
+
+    def recent_flight_rows(self, interval: int = 60) -> List[Tuple]:
+        """
+        Rows as ClickHouse returns them for PanicScoreCalculator.get_recent_flights
+
+        Column order matches the query's SELECT list; ordered by timestamp DESC.
+        """
+        profiles = {p["icao_hex"]: p for p in self.profiles()}
+        rows = []
+        for pos in self.iter_positions(interval):
+            ap = profiles[pos["icao_hex"]]
+            rows.append((
+                pos["icao_hex"], pos["callsign"], pos["timestamp"], pos["lat"], pos["lon"],
+                pos["altitude"], pos["on_ground"], ap["owner_country"], ap["owner_org"],
+                ap["vip_tier"], ap["is_military"], ap["is_vip"], ap["aircraft_type"],
+            ))
+        rows.sort(key=lambda r: r[2], reverse=True)
+        return rows
+
+    def flight_records(self, interval: int = 60) -> List[Dict]:
+        """Dicts in the shape get_recent_flights() returns, for scorer benchmarks"""
+        keys = [
+            "icao_hex", "callsign", "timestamp", "lat", "lon", "altitude", "on_ground",
+            "owner_country", "owner_org", "vip_tier", "is_military", "is_vip", "aircraft_type",
+        ]
+        return [dict(zip(keys, row)) for row in self.recent_flight_rows(interval)]
+
+    def describe(self) -> Dict:
+        kinds = {}
+        for aircraft in self.aircraft:
+            kinds[aircraft["kind"]] = kinds.get(aircraft["kind"], 0) + 1
+        return {
+            "size": self.size,
+            "background": self.background,
+            "seed": self.seed,
+            "hours": self.hours,
+            "kinds": kinds,
+        }
@@ -1,8 +1,14 @@
 import { NextResponse } from "next/server";
 import { queryClickHouse } from "@/lib/clickhouse";
+import { queryReadApi, readApiEnabled } from "@/lib/readApi";
 
 export async function GET() {
   try {
+    if (readApiEnabled()) {
+      const { aircraft } = await queryReadApi("/v1/aircraft/active", { minutes: 60, limit: 50 });
+      return NextResponse.json({ aircraft });
+    }
+
     const aircraft = await queryClickHouse(`
       SELECT
         fp.icao_hex,
@@ -14,7 +20,7 @@ export async function GET() {
         any(ap.vip_tier) as vip_tier,
         toString(max(fp.timestamp)) as last_seen
       FROM flight_positions fp
-      JOIN aircraft_profiles ap ON fp.icao_hex = ap.icao_hex
+      JOIN (SELECT * FROM aircraft_profiles FINAL) ap ON fp.icao_hex = ap.icao_hex
       WHERE fp.timestamp >= now() - INTERVAL 1 HOUR
       GROUP BY fp.icao_hex
       ORDER BY last_seen DESC
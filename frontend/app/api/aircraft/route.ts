@@ -19,7 +19,7 @@ export async function GET() {
         ap.vip_tier,
         formatDateTime(max(fp.timestamp), '%Y-%m-%d %H:%M:%S') as last_update
       FROM flight_positions fp
-      JOIN aircraft_profiles ap ON fp.icao_hex = ap.icao_hex
+      JOIN (SELECT * FROM aircraft_profiles FINAL) ap ON fp.icao_hex = ap.icao_hex
       WHERE fp.timestamp >= now() - INTERVAL 30 MINUTE
       GROUP BY
         fp.icao_hex,
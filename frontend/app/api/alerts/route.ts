@@ -13,7 +13,7 @@ export async function GET() {
         countries_involved,
         formatDateTime(timestamp, '%Y-%m-%d %H:%M:%S') as timestamp
       FROM panic_scores
-      WHERE overall_panic_score >= 40
+      WHERE overall_panic_score >= 40 AND window_hours = 12
       ORDER BY timestamp DESC
       LIMIT 20
     `);
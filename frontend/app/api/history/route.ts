@@ -1,18 +1,26 @@
 import { NextResponse } from "next/server";
 import { queryClickHouse } from "@/lib/clickhouse";
+import { queryReadApi, readApiEnabled } from "@/lib/readApi";
 
 export async function GET(request: Request) {
   const { searchParams } = new URL(request.url);
   const region = searchParams.get("region") || "Global";
   const days = parseInt(searchParams.get("days") || "7");
+  // Chart width in pixels: the read API returns at most one point per pixel
+  const width = parseInt(searchParams.get("width") || "1000");
 
   try {
+    if (readApiEnabled()) {
+      const { data } = await queryReadApi("/v1/history", { region, days, width });
+      return NextResponse.json({ data });
+    }
+
     const data = await queryClickHouse(`
       SELECT
         formatDateTime(timestamp, '%Y-%m-%d %H:%M:%S') as timestamp,
         overall_panic_score as score
       FROM panic_scores
-      WHERE region = '${region}'
+      WHERE region = '${region}' AND window_hours = 12
       ORDER BY timestamp ASC
       LIMIT 1000
     `);
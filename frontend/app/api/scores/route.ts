@@ -11,11 +11,13 @@ export async function GET() {
         convergence_score,
         airlift_score,
         vip_movement_score,
+        formation_score,
         narrative,
         flight_count,
         countries_involved,
         formatDateTime(timestamp, '%Y-%m-%d %H:%M:%S') as timestamp
       FROM panic_scores
+      WHERE window_hours = 12
       ORDER BY timestamp DESC, region
       LIMIT 10
     `);
@@ -44,6 +46,7 @@ export async function GET() {
           convergence_score: 45.6,
           airlift_score: 8.2,
           vip_movement_score: 23.1,
+          formation_score: 0,
           narrative: "⚠️ 🇺🇸 🇬🇧 🇫🇷 jets converging • 2 VIP aircraft active",
           flight_count: 45,
           countries_involved: 8,
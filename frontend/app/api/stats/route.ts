@@ -10,7 +10,7 @@ export async function GET() {
         count(DISTINCT ap.owner_country) as countries_active,
         formatDateTime(max(fp.timestamp), '%Y-%m-%d %H:%M:%S') as last_update
       FROM flight_positions fp
-      JOIN aircraft_profiles ap ON fp.icao_hex = ap.icao_hex
+      JOIN (SELECT * FROM aircraft_profiles FINAL) ap ON fp.icao_hex = ap.icao_hex
       WHERE fp.timestamp >= now() - INTERVAL 1 HOUR
     `);
 
@@ -20,18 +20,19 @@ export async function GET() {
         max(overall_panic_score) as peak_score,
         argMax(region, overall_panic_score) as peak_region
       FROM panic_scores
+      WHERE window_hours = 12
     `);
 
     // Get total tracked aircraft profiles
     const [totalProfiles] = await queryClickHouse(`
       SELECT count() as total_profiles
-      FROM aircraft_profiles
+      FROM aircraft_profiles FINAL
     `);
 
     // Get VIP aircraft count
     const [vipCount] = await queryClickHouse(`
       SELECT count() as vip_aircraft
-      FROM aircraft_profiles
+      FROM aircraft_profiles FINAL
       WHERE is_vip = 1
     `);
 
@@ -0,0 +1,40 @@
+import { readFile } from "fs/promises";
+import path from "path";
+import { NextResponse } from "next/server";
+
+// Cards are rendered by src/cards.py; files are content-addressed and immutable
+const RENDER_DIR = process.env.RENDER_DIR || path.join(process.cwd(), "..", "data", "cards");
+
+function regionSlug(region: string) {
+  return region.toLowerCase().replace(/[^a-z0-9]+/g, "-").replace(/^-+|-+$/g, "") || "region";
+}
+
+export async function GET(request: Request, { params }: { params: { region: string } }) {
+  const slug = regionSlug(params.region.replace(/\.png$/, ""));
+
+  try {
+    const index = JSON.parse(await readFile(path.join(RENDER_DIR, "index.json"), "utf-8"));
+    const entry = index[slug];
+    if (!entry) {
+      return new NextResponse("Unknown region", { status: 404 });
+    }
+
+    const etag = `"${entry.key}"`;
+    if (request.headers.get("if-none-match") === etag) {
+      return new NextResponse(null, { status: 304, headers: { ETag: etag } });
+    }
+
+    const png = await readFile(path.join(RENDER_DIR, `${entry.key}.png`));
+    return new NextResponse(png, {
+      headers: {
+        "Content-Type": "image/png",
+        ETag: etag,
+        // The key changes whenever the card does; let caches revalidate cheaply
+        "Cache-Control": "public, max-age=300, stale-while-revalidate=3600",
+      },
+    });
+  } catch (error) {
+    console.error("Error serving share card:", error);
+    return new NextResponse("Card not rendered yet", { status: 404 });
+  }
+}
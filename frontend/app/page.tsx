@@ -25,6 +25,7 @@ interface PanicScore {
   convergence_score: number;
   airlift_score: number;
   vip_movement_score: number;
+  formation_score: number;
   narrative: string;
   flight_count: number;
   countries_involved: number;
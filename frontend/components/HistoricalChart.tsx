@@ -16,7 +16,7 @@ export default function HistoricalChart() {
   useEffect(() => {
     const fetchHistoricalData = async () => {
       try {
-        const response = await fetch("/api/history?region=Global&days=7");
+        const response = await fetch(`/api/history?region=Global&days=7&width=${Math.round(window.innerWidth)}`);
         if (response.ok) {
           const result = await response.json();
           setData(result.data || []);
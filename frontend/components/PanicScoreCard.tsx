@@ -5,6 +5,7 @@ interface PanicScore {
   convergence_score: number;
   airlift_score: number;
   vip_movement_score: number;
+  formation_score: number;
   narrative: string;
   flight_count: number;
   countries_involved: number;
@@ -75,12 +76,13 @@ export default function PanicScoreCard({ score, size }: PanicScoreCardProps) {
               {score.narrative}
             </p>
 
-            <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
+            <div className="grid grid-cols-2 md:grid-cols-5 gap-4">
               {[
                 { label: "Night Ops", value: score.night_flight_score },
                 { label: "Convergence", value: score.convergence_score },
                 { label: "Airlift", value: score.airlift_score },
                 { label: "VIP Transit", value: score.vip_movement_score },
+                { label: "Formations", value: score.formation_score },
               ].map((metric) => (
                 <div key={metric.label} className="bg-app-surface/30 rounded-lg p-3 border border-white/5">
                   <div className="text-[10px] text-gray-500 uppercase tracking-widest mb-1">{metric.label}</div>
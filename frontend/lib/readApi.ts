@@ -0,0 +1,21 @@
+// Client for the Python read API (src/read_api.py). When READ_API_URL is
+// unset, callers fall back to querying ClickHouse directly.
+
+const READ_API_URL = process.env.READ_API_URL;
+
+export function readApiEnabled() {
+  return Boolean(READ_API_URL);
+}
+
+export async function queryReadApi(path: string, params: Record<string, string | number>) {
+  const query = new URLSearchParams(Object.entries(params).map(([k, v]) => [k, String(v)]));
+  const response = await fetch(`${READ_API_URL}${path}?${query}`, {
+    headers: { "Accept-Encoding": "br, gzip" },
+  });
+
+  if (!response.ok) {
+    throw new Error(`Read API ${path} failed: ${response.status} ${await response.text()}`);
+  }
+
+  return response.json();
+}
@@ -5,12 +5,19 @@ and adding high-value military/government aircraft
 """
 
 import os
+import re
+import io
+import sys
 import csv
 import json
 import gzip
+import queue
+import argparse
+import threading
+import multiprocessing
 import urllib.request
-from datetime import datetime
-from collections import defaultdict
+from datetime import datetime, timezone
+from collections import defaultdict, deque
 
 # Priority aircraft types to add
 PRIORITY_TYPES = {
@@ -133,40 +140,229 @@ def add_high_value_aircraft(existing_aircraft):
 
     return added
 
+ADSBX_URL = "https://downloads.adsbexchange.com/downloads/basic-ac-db.json.gz"
 
-def download_adsbexchange_db():
+CSV_FIELDS = [
+    "icao_hex", "registration", "aircraft_type", "owner_country", "owner_org",
+    "is_military", "is_government", "is_vip", "is_intel", "vip_tier",
+    "home_base_airport", "notes"
+]
+
+
+def compile_type_matcher(priority_types=PRIORITY_TYPES):
     """
-    Download ADS-B Exchange database
-    Note: This is a large file (~50MB compressed, 300MB+ uncompressed)
+    Build a matcher equivalent to "first PRIORITY_TYPES key (in dict order)
+    that is a substring of the type", but in one regex scan instead of a
+    Python loop over every key
+
+    Returns (prefilter, match): prefilter is a compiled bytes regex for a
+    cheap presence test on raw input; match(type_string) returns the key.
+    """
+    keys = list(priority_types)
+    rank = {key: i for i, key in enumerate(keys)}
+    alternation = "|".join(re.escape(key) for key in keys)
+
+    # Zero-width lookahead reports every start position, so overlapping
+    # keys (e.g. "C-130" inside "MC-130") are all seen
+    scanner = re.compile(f"(?=({alternation}))")
+    prefilter = re.compile(alternation.encode("utf-8"))
+
+    def match(aircraft_type):
+        best = None
+        for m in scanner.finditer(aircraft_type):
+            key = m.group(1)
+            if best is None or rank[key] < rank[best]:
+                best = key
+                if rank[key] == 0:
+                    break
+        return best
+
+    return prefilter, match
+
+
+def open_adsbexchange_stream(source=ADSBX_URL):
+    """Open the (gzipped) database from a URL or local path as a binary stream"""
+    if os.path.exists(source):
+        raw = open(source, "rb")
+    else:
+        raw = urllib.request.urlopen(source, timeout=300)
+    return gzip.GzipFile(fileobj=raw) if source.endswith(".gz") else raw
+
+
+def _iter_object_members(stream, chunk_size=1 << 16):
+    """Incrementally yield (key, value) from one large top-level JSON object"""
+    decoder = json.JSONDecoder()
+    text = io.TextIOWrapper(stream, encoding="utf-8")
+    buf, pos, started = "", 0, False
+
+    while True:
+        chunk = text.read(chunk_size)
+        buf = buf[pos:] + chunk
+        pos = 0
+
+        if not started:
+            pos = buf.index("{") + 1
+            started = True
+
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "}":
+                return
+            try:
+                key, end = decoder.raw_decode(buf, pos)
+                end = buf.index(":", end) + 1
+                while buf[end] in " \t\r\n":
+                    end += 1
+                value, end = decoder.raw_decode(buf, end)
+            except (ValueError, IndexError):
+                break  # member straddles the chunk boundary
+            yield key, value
+            pos = end
+
+        if not chunk:
+            if buf[pos:].strip():
+                raise ValueError("Truncated ADS-B Exchange database")
+            return
+
+
+def _record_fields(icao_hex, data):
+    """Normalize both ADS-B Exchange layouts to (icao, type, registration)"""
+    aircraft_type = data.get("t") or data.get("model") or data.get("icaotype") or ""
+    registration = data.get("r") or data.get("reg") or ""
+    return icao_hex.upper(), aircraft_type, registration
+
+
+def _match_lines(lines, existing_aircraft):
+    """Match a chunk of NDJSON lines; module-level so worker processes can run it"""
+    prefilter, match = _MATCHER
+    matched = []
+    for line in lines:
+        # Most aircraft aren't priority types; skip JSON parsing for them
+        if not prefilter.search(line):
+            continue
+        data = json.loads(line)
+        icao_hex, aircraft_type, registration = _record_fields(data.get("icao", ""), data)
+        if not icao_hex or icao_hex in existing_aircraft:
+            continue
+        matched_type = match(aircraft_type)
+        if matched_type:
+            matched.append((icao_hex, aircraft_type, registration, matched_type))
+    return matched
+
+
+_MATCHER = compile_type_matcher()
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_adsbexchange_matches(stream, existing_aircraft, workers=1, chunk_lines=20000):
     """
-    url = "https://downloads.adsbexchange.com/downloads/basic-ac-db.json.gz"
+    Stream (icao_hex, aircraft_type, registration, matched_type) for priority
+    aircraft, with memory bounded by the chunk size rather than file size
 
-    print(f"Downloading ADS-B Exchange database from {url}...")
-    print("This may take a few minutes...")
+    Handles both the newline-delimited layout (one {"icao": ...} per line) and
+    the single-object layout ({"<icao>": {"t": ..., "r": ...}, ...}).
+    With workers > 1, NDJSON chunks are matched in a process pool with at
+    most 2 × workers chunks in flight.
+    """
+    stream = io.BufferedReader(stream) if not hasattr(stream, "peek") else stream
+    head = stream.peek(4096)[:4096]
+    first_line = head.split(b"\n", 1)[0]
 
     try:
-        # Download compressed file
-        with urllib.request.urlopen(url, timeout=300) as response:
-            compressed_data = response.read()
+        is_ndjson = "icao" in json.loads(first_line)
+    except ValueError:
+        is_ndjson = False
+
+    if not is_ndjson:
+        _, match = _MATCHER
+        for key, data in _iter_object_members(stream):
+            icao_hex, aircraft_type, registration = _record_fields(key, data)
+            if icao_hex in existing_aircraft:
+                continue
+            matched_type = match(aircraft_type)
+            if matched_type:
+                yield icao_hex, aircraft_type, registration, matched_type
+        return
 
-        print(f"Downloaded {len(compressed_data) / 1024 / 1024:.1f}MB")
-        print("Decompressing...")
+    chunks = _chunked(stream, chunk_lines)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _match_lines(chunk, existing_aircraft)
+        return
 
-        # Decompress
-        data = gzip.decompress(compressed_data)
-        print(f"Decompressed to {len(data) / 1024 / 1024:.1f}MB")
+    frozen = frozenset(existing_aircraft)
+    with multiprocessing.Pool(workers) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.apply_async(_match_lines, (chunk, frozen)))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().get()
+        while in_flight:
+            yield from in_flight.popleft().get()
+
+
+def iter_priority_aircraft(matches, existing_aircraft, max_per_type=50, type_counts=None):
+    """Turn matches into aircraft_profiles entries, capped per priority type"""
+    if type_counts is None:
+        type_counts = defaultdict(int)
+
+    for icao_hex, aircraft_type, registration, matched_type in matches:
+        # Chunks matched in parallel may repeat an ICAO already taken
+        if icao_hex in existing_aircraft:
+            continue
 
-        # Parse JSON
-        print("Parsing JSON...")
-        db = json.loads(data)
+        # Limit per type to avoid database bloat
+        if type_counts[matched_type] >= max_per_type:
+            continue
+
+        owner_country = "US" if icao_hex.startswith("A") else "??"
+
+        existing_aircraft.add(icao_hex)
+        type_counts[matched_type] += 1
+
+        yield {
+            "icao_hex": icao_hex,
+            "registration": registration,
+            "aircraft_type": aircraft_type,
+            "owner_country": owner_country,
+            "owner_org": "USAF" if owner_country == "US" else "Unknown",
+            **PRIORITY_TYPES[matched_type],
+            "home_base_airport": "",
+            "notes": f"Auto-added from ADS-B Exchange - {matched_type}",
+        }
+
+
+def download_adsbexchange_db(source=ADSBX_URL):
+    """
+    Download ADS-B Exchange database
+    Note: This is a large file (~50MB compressed, 300MB+ uncompressed); prefer
+    iter_adsbexchange_matches() which never holds it in memory
+    """
+    print(f"Downloading ADS-B Exchange database from {source}...")
 
+    try:
+        with open_adsbexchange_stream(source) as stream:
+            db = {}
+            for icao_hex, data in _iter_object_members(stream):
+                db[icao_hex] = data
         print(f"Loaded {len(db)} aircraft from ADS-B Exchange database")
         return db
 
     except Exception as e:
         print(f"Error downloading ADS-B Exchange database: {e}")
         print("\nYou can manually download from:")
-        print("https://downloads.adsbexchange.com/downloads/basic-ac-db.json.gz")
+        print(ADSBX_URL)
         return None
 
 
@@ -177,58 +373,122 @@ def filter_priority_aircraft(adsbex_db, existing_aircraft, max_per_type=50):
     if not adsbex_db:
         return []
 
-    added = []
-    type_counts = defaultdict(int)
-
     print("\nFiltering for priority aircraft types...")
 
+    _, match = _MATCHER
+    matches = []
     for icao_hex, aircraft_data in adsbex_db.items():
-        # Skip if we already have it
-        if icao_hex.upper() in existing_aircraft:
+        icao_hex, aircraft_type, registration = _record_fields(icao_hex, aircraft_data)
+        if icao_hex in existing_aircraft:
             continue
+        matched_type = match(aircraft_type)
+        if matched_type:
+            matches.append((icao_hex, aircraft_type, registration, matched_type))
 
-        # Check if aircraft is in our priority list
-        aircraft_type = aircraft_data.get("t", "")
+    type_counts = defaultdict(int)
+    added = list(iter_priority_aircraft(matches, existing_aircraft, max_per_type, type_counts))
+    print_type_summary(added, type_counts)
+    return added
 
-        # Find matching priority type
-        matched_type = None
-        for priority_type in PRIORITY_TYPES:
-            if priority_type in aircraft_type:
-                matched_type = priority_type
-                break
 
-        if not matched_type:
-            continue
+def print_type_summary(added, type_counts):
+    print(f"\nAdded {len(added)} aircraft:")
+    for aircraft_type, count in sorted(type_counts.items(), key=lambda x: -x[1]):
+        print(f"  {aircraft_type}: {count}")
 
-        # Limit per type to avoid database bloat
-        if type_counts[matched_type] >= max_per_type:
-            continue
 
-        # Extract data
-        registration = aircraft_data.get("r", "")
-        owner_country = "US" if icao_hex.upper().startswith("A") else "??"
+class ProfileBatchWriter:
+    """
+    Insert aircraft_profiles rows in batches from a background thread, so
+    ClickHouse round trips overlap with download/decompress/parse
+    """
 
-        # Build aircraft entry
-        entry = {
-            "icao_hex": icao_hex.upper(),
-            "registration": registration,
-            "aircraft_type": aircraft_type,
-            "owner_country": owner_country,
-            "owner_org": "USAF" if owner_country == "US" else "Unknown",
-            **PRIORITY_TYPES[matched_type],
-            "home_base_airport": "",
-            "notes": f"Auto-added from ADS-B Exchange - {matched_type}",
-        }
+    def __init__(self, client, batch_size=5000, max_pending=4):
+        from seed_aircraft import profile_hash, record_profile_changes
+
+        self.profile_hash = profile_hash
+        self.record_profile_changes = record_profile_changes
+        self.client = client
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.batch = []
+        self.written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            rows = self.queue.get()
+            if rows is None:
+                return
+            try:
+                self.client.execute(
+                    """
+                    INSERT INTO aircraft_profiles
+                    (icao_hex, registration, aircraft_type, owner_country, owner_org,
+                     is_military, is_government, is_vip, is_intel, vip_tier,
+                     home_base_airport, notes, last_updated, row_hash)
+                    VALUES
+                    """,
+                    rows
+                )
+                self.record_profile_changes(self.client, [row["icao_hex"] for row in rows], "upsert")
+                self.written += len(rows)
+            except Exception as e:
+                self.error = e
+
+    def add(self, aircraft):
+        if self.error:
+            raise self.error
+        self.batch.append(dict(
+            aircraft, last_updated=datetime.now(timezone.utc), row_hash=self.profile_hash(aircraft)
+        ))
+        if len(self.batch) >= self.batch_size:
+            self.queue.put(self.batch)
+            self.batch = []
+
+    def close(self):
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+        self.queue.put(None)
+        self.thread.join()
+        if self.error:
+            raise self.error
+
+
+def connect_clickhouse():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+    from db import get_pool
+
+    return get_pool()
+
+
+def import_adsbexchange(source, existing_aircraft, max_per_type=50, workers=1,
+                        client=None, batch_size=5000):
+    """
+    Streaming import: decompress, parse and match incrementally; rows go to
+    aircraft_profiles in batches when a client is given, else are returned
+    """
+    print(f"Streaming ADS-B Exchange database from {source}...")
 
-        added.append(entry)
-        existing_aircraft.add(icao_hex.upper())
-        type_counts[matched_type] += 1
+    type_counts = defaultdict(int)
+    writer = ProfileBatchWriter(client, batch_size) if client else None
+    added = []
 
-    # Print summary
-    print(f"\nAdded {len(added)} aircraft:")
-    for aircraft_type, count in sorted(type_counts.items(), key=lambda x: -x[1]):
-        print(f"  {aircraft_type}: {count}")
+    with open_adsbexchange_stream(source) as stream:
+        matches = iter_adsbexchange_matches(stream, existing_aircraft, workers=workers)
+        for aircraft in iter_priority_aircraft(matches, existing_aircraft, max_per_type, type_counts):
+            if writer:
+                writer.add(aircraft)
+            added.append(aircraft)
 
+    if writer:
+        writer.close()
+        print(f"  ✓ Inserted {writer.written} rows into aircraft_profiles")
+
+    print_type_summary(added, type_counts)
     return added
 
 
@@ -242,12 +502,7 @@ def save_expanded_database(new_aircraft):
 
     # Append to existing file
     with open(csv_path, 'a', newline='') as f:
-        fieldnames = [
-            "icao_hex", "registration", "aircraft_type", "owner_country", "owner_org",
-            "is_military", "is_government", "is_vip", "is_intel", "vip_tier",
-            "home_base_airport", "notes"
-        ]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
 
         for aircraft in new_aircraft:
             writer.writerow(aircraft)
@@ -255,8 +510,26 @@ def save_expanded_database(new_aircraft):
     print(f"\nAdded {len(new_aircraft)} aircraft to {csv_path}")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Expand the tracked aircraft database")
+    download = parser.add_mutually_exclusive_group()
+    download.add_argument("--adsbx", action="store_true",
+                          help="Import priority types from the ADS-B Exchange database without prompting")
+    download.add_argument("--no-adsbx", action="store_true", help="Skip the ADS-B Exchange import")
+    parser.add_argument("--source", default=ADSBX_URL, help="ADS-B Exchange database URL or local path")
+    parser.add_argument("--max-per-type", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="Matcher processes (newline-delimited layout)")
+    parser.add_argument("--to-db", action="store_true",
+                        help="Insert auto-discovered aircraft straight into aircraft_profiles "
+                             "instead of appending them to the CSV")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per aircraft_profiles insert")
+    return parser.parse_args()
+
+
 def main():
     """Main expansion process"""
+    args = parse_args()
+
     print("="*60)
     print("AIRCRAFT DATABASE EXPANSION")
     print("="*60)
@@ -265,6 +538,10 @@ def main():
     # Load existing aircraft
     print("Loading existing aircraft...")
     existing = load_existing_aircraft()
+    client = None
+    if args.to_db:
+        client = connect_clickhouse()
+        existing.update(row[0].upper() for row in client.execute("SELECT icao_hex FROM aircraft_profiles"))
     print(f"Currently tracking {len(existing)} aircraft")
     print()
 
@@ -274,26 +551,35 @@ def main():
     print(f"Added {len(manual_aircraft)} manually curated aircraft")
     print()
 
-    # Ask if user wants to download ADS-B Exchange DB
-    print("Download ADS-B Exchange database? (This will take 5-10 minutes)")
-    print("You'll get access to thousands of military aircraft.")
-    response = input("Download? (y/n): ").strip().lower()
+    # Only prompt when attached to a terminal and no flag decided for us
+    download = args.adsbx
+    if not args.adsbx and not args.no_adsbx and sys.stdin.isatty():
+        print("Download ADS-B Exchange database? (This will take 5-10 minutes)")
+        print("You'll get access to thousands of military aircraft.")
+        download = input("Download? (y/n): ").strip().lower() == 'y'
 
     auto_aircraft = []
-    if response == 'y':
-        adsbex_db = download_adsbexchange_db()
-        if adsbex_db:
-            auto_aircraft = filter_priority_aircraft(adsbex_db, existing, max_per_type=50)
-
-    # Combine all new aircraft
-    all_new = manual_aircraft + auto_aircraft
-
-    if all_new:
+    if download:
+        try:
+            auto_aircraft = import_adsbexchange(
+                args.source, existing, max_per_type=args.max_per_type,
+                workers=args.workers, client=client, batch_size=args.batch_size
+            )
+        except Exception as e:
+            print(f"Error importing ADS-B Exchange database: {e}")
+            print("\nYou can manually download from:")
+            print(ADSBX_URL)
+            print("and re-run with --source <path>")
+
+    # Combine all new aircraft (auto-discovered ones are already in the DB with --to-db)
+    all_new = manual_aircraft + ([] if args.to_db else auto_aircraft)
+
+    if manual_aircraft or auto_aircraft:
         print(f"\n{'='*60}")
-        print(f"TOTAL NEW AIRCRAFT: {len(all_new)}")
+        print(f"TOTAL NEW AIRCRAFT: {len(manual_aircraft) + len(auto_aircraft)}")
         print(f"  Manually curated: {len(manual_aircraft)}")
         print(f"  Auto-discovered: {len(auto_aircraft)}")
-        print(f"  New total: {len(existing) + len(all_new)}")
+        print(f"  New total: {len(existing)}")
         print(f"{'='*60}\n")
 
         save_expanded_database(all_new)
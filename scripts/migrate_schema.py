@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Migrate an existing flight_positions table to the tuned layout in src/schema.py
+
+If the partition and sorting keys already match, the table is converted in
+place: column types/codecs are modified, the by_time projection is added and
+materialized, and TTL/settings are applied. Otherwise a new table is built
+alongside, filled partition by partition, and swapped in with EXCHANGE
+TABLES; the old data is kept as flight_positions_legacy unless --drop-old.
+
+Columns added to smaller tables since their first release (see
+ADDED_COLUMNS) are added in place as well.
+"""
+
+import os
+import re
+import sys
+import argparse
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from db import ClickHousePool
+from airlift import AIRLIFT_FAMILY_SQL
+from schema import FLIGHT_POSITIONS_COLUMNS, column_names, flight_positions_ddl, schema_settings
+
+load_dotenv()
+
+TABLE = "flight_positions"
+TARGET_PARTITION_KEY = "toYYYYMMDD(timestamp)"
+TARGET_SORTING_KEY = "icao_hex, timestamp"
+
+# table -> [(column, definition)] added after the table first shipped
+ADDED_COLUMNS = {
+    "panic_scores": [
+        ("window_hours", "UInt16 DEFAULT 12"),
+        ("trend_delta", "Float32 DEFAULT 0"),
+        ("formation_score", "Float32 DEFAULT 0 AFTER vip_movement_score"),
+    ],
+    "aircraft_profiles": [
+        ("airlift_family", f"LowCardinality(String) MATERIALIZED {AIRLIFT_FAMILY_SQL}"),
+    ],
+}
+
+
+def codec_names(codec):
+    """'CODEC(Gorilla(8), ZSTD(1))' -> ['Gorilla', 'ZSTD'] (parameters ignored)"""
+    inner = codec.strip()
+    if inner.upper().startswith("CODEC("):
+        inner = inner[len("CODEC("):-1]
+    return re.findall(r"([A-Za-z0-9]+)(?:\([^()]*\))?(?:,\s*|$)", inner)
+
+
+def normalize_ttl(expr):
+    """Match our TTL clause against the server's rendering of it"""
+    expr = re.sub(r"INTERVAL (\d+) DAY", r"toIntervalDay(\1)", expr)
+    return re.sub(r" DELETE\b", "", expr).strip()
+
+
+def describe_table(client, database, table=TABLE):
+    result = client.execute(
+        """
+        SELECT partition_key, sorting_key, create_table_query
+        FROM system.tables
+        WHERE database = %(db)s AND name = %(table)s
+        """,
+        {"db": database, "table": table}
+    )
+    if not result:
+        return None
+    partition_key, sorting_key, create_query = result[0]
+    columns = {
+        name: (col_type, codec)
+        for name, col_type, codec in client.execute(
+            """
+            SELECT name, type, compression_codec
+            FROM system.columns
+            WHERE database = %(db)s AND table = %(table)s
+            """,
+            {"db": database, "table": table}
+        )
+    }
+    return {
+        "partition_key": partition_key,
+        "sorting_key": sorting_key,
+        "create_query": create_query,
+        "columns": columns,
+    }
+
+
+def in_place_statements(current, database, settings):
+    """ALTERs that bring a same-keyed table to the target layout"""
+    table = f"{database}.{TABLE}"
+    statements = []
+
+    for name, col_type, codec in FLIGHT_POSITIONS_COLUMNS:
+        current_type, current_codec = current["columns"].get(name, (None, ""))
+        if current_type is None:
+            statements.append(f"ALTER TABLE {table} ADD COLUMN {name} {col_type} {codec}".rstrip())
+        elif current_type != col_type or codec_names(current_codec) != codec_names(codec):
+            statements.append(f"ALTER TABLE {table} MODIFY COLUMN {name} {col_type} {codec}".rstrip())
+
+    if "PROJECTION by_time" not in current["create_query"]:
+        statements.append(f"ALTER TABLE {table} ADD PROJECTION by_time (SELECT * ORDER BY timestamp)")
+        statements.append(f"ALTER TABLE {table} MATERIALIZE PROJECTION by_time")
+
+    target = flight_positions_ddl(table=table, settings=settings)
+    ttl = re.search(r"^TTL (.+)$", target, re.MULTILINE)
+    current_ttl = re.search(r" TTL (.+?)(?: SETTINGS |$)", current["create_query"])
+    if ttl and (not current_ttl or normalize_ttl(current_ttl.group(1)) != normalize_ttl(ttl.group(1))):
+        if "ttl_only_drop_parts = 1" not in current["create_query"]:
+            statements.append(f"ALTER TABLE {table} MODIFY SETTING ttl_only_drop_parts = 1")
+        statements.append(f"ALTER TABLE {table} MODIFY TTL {ttl.group(1)}")
+
+    return statements
+
+
+def copy_and_swap(client, current, database, settings, drop_old=False, dry_run=False):
+    """Rebuild into a new table partition by partition, then swap it in"""
+    table = f"{database}.{TABLE}"
+    staging = f"{database}.{TABLE}_new"
+    legacy = f"{database}.{TABLE}_legacy"
+    # Columns the old table predates (e.g. squawk) take their defaults
+    columns = ", ".join(name for name in column_names() if name in current["columns"])
+
+    partitions = [row[0] for row in client.execute(
+        """
+        SELECT DISTINCT toYYYYMMDD(timestamp) AS day
+        FROM {table}
+        ORDER BY day
+        """.format(table=table)
+    )]
+
+    plan = [f"DROP TABLE IF EXISTS {staging}", flight_positions_ddl(table=staging, settings=settings)]
+    # Everything but the newest day is immutable; copy it while ingest continues
+    for day in partitions[:-1]:
+        plan.append(f"INSERT INTO {staging} ({columns}) SELECT {columns} FROM {table} "
+                    f"WHERE toYYYYMMDD(timestamp) = {day}")
+    plan.append(f"EXCHANGE TABLES {table} AND {staging}")
+    # After the swap the ingester writes to the new table; copy the rest of the newest day
+    if partitions:
+        plan.append(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+                    f"WHERE toYYYYMMDD(timestamp) >= {partitions[-1]}")
+    plan.append(f"DROP TABLE {staging}" if drop_old else f"RENAME TABLE {staging} TO {legacy}")
+
+    run_statements(client, plan, dry_run)
+
+
+def added_column_statements(client, database):
+    statements = []
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row[0] for row in client.execute(
+            "SELECT name FROM system.columns WHERE database = %(db)s AND table = %(table)s",
+            {"db": database, "table": table}
+        )}
+        if not existing:
+            continue
+        for name, definition in columns:
+            if name not in existing:
+                statements.append(f"ALTER TABLE {database}.{table} ADD COLUMN IF NOT EXISTS {name} {definition}")
+    return statements
+
+
+def run_statements(client, statements, dry_run):
+    for stmt in statements:
+        print(f"  {' '.join(stmt.split())[:120]}")
+        if not dry_run:
+            client.execute(stmt)
+
+
+def migrate(client, database, dry_run=False, drop_old=False, settings=None):
+    settings = schema_settings() if settings is None else settings
+
+    statements = added_column_statements(client, database)
+    if statements:
+        print("Adding columns:")
+        run_statements(client, statements, dry_run)
+
+    current = describe_table(client, database)
+
+    if current is None:
+        print(f"{database}.{TABLE} does not exist; creating it")
+        run_statements(client, [flight_positions_ddl(table=f"{database}.{TABLE}", settings=settings)], dry_run)
+        return
+
+    same_keys = (
+        current["partition_key"] == TARGET_PARTITION_KEY
+        and current["sorting_key"] == TARGET_SORTING_KEY
+    )
+
+    if same_keys:
+        statements = in_place_statements(current, database, settings)
+        if not statements:
+            print(f"{database}.{TABLE} already has the target layout")
+            return
+        print(f"Converting {database}.{TABLE} in place:")
+        run_statements(client, statements, dry_run)
+    else:
+        print(f"Rebuilding {database}.{TABLE} "
+              f"(partition by {current['partition_key']!r}, order by {current['sorting_key']!r}):")
+        copy_and_swap(client, current, database, settings, drop_old=drop_old, dry_run=dry_run)
+
+    print("\n(dry run - nothing executed)" if dry_run else "\n✓ Migration complete")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate flight_positions to the tuned layout")
+    parser.add_argument("--dry-run", action="store_true", help="Print the statements without running them")
+    parser.add_argument("--drop-old", action="store_true", help="Drop the old table after a rebuild")
+    args = parser.parse_args()
+
+    database = os.getenv("CLICKHOUSE_DB", "airplane_watch")
+    client = ClickHousePool(size=1, database=database)
+
+    migrate(client, database, dry_run=args.dry_run, drop_old=args.drop_old)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,51 @@
 #!/usr/bin/env python3
 """
-Seed aircraft_profiles table with curated gov/mil/VIP aircraft data
+Sync aircraft_profiles table with curated gov/mil/VIP aircraft data
+
+Incremental and idempotent: each profile row is hashed, compared with the
+hashes already stored, and only new or changed rows are upserted into the
+ReplacingMergeTree (keyed by icao_hex). The table is never emptied, so the
+ingester and the scorer's JOIN keep seeing a complete registry mid-sync.
+Changed ICAOs are appended to profile_changes so running services reload
+just those aircraft.
 """
 
 import os
+import sys
 import csv
+import hashlib
+import argparse
 from datetime import datetime, timezone
-from clickhouse_driver import Client
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from db import get_pool
+
 load_dotenv()
 
+PROFILE_FIELDS = [
+    "icao_hex", "registration", "aircraft_type", "owner_country", "owner_org",
+    "is_military", "is_government", "is_vip", "is_intel", "vip_tier",
+    "home_base_airport", "notes"
+]
 
-def seed_aircraft_profiles():
-    """Load aircraft profiles from CSV into ClickHouse"""
 
-    # Connect to ClickHouse
-    client = Client(
-        host=os.getenv("CLICKHOUSE_HOST", "localhost"),
-        port=int(os.getenv("CLICKHOUSE_PORT", 9000)),
-        database=os.getenv("CLICKHOUSE_DB", "airplane_watch"),
-        user=os.getenv("CLICKHOUSE_USER", "default"),
-        password=os.getenv("CLICKHOUSE_PASSWORD", "")
-    )
+def profile_hash(row):
+    """Stable 64-bit content hash of a profile (excluding last_updated)"""
+    payload = "\x1f".join(str(row[field]) for field in PROFILE_FIELDS)
+    return int.from_bytes(hashlib.blake2b(payload.encode("utf-8"), digest_size=8).digest(), "little")
 
-    # Read CSV
-    csv_path = os.path.join(
-        os.path.dirname(__file__),
-        "..",
-        "data",
-        "aircraft_profiles.csv"
-    )
 
-    rows = []
+def load_csv_profiles(csv_path):
+    """Read the curated CSV into {icao_hex: row} (last occurrence wins)"""
+    profiles = {}
     with open(csv_path, 'r') as f:
         reader = csv.DictReader(f)
         for row in reader:
-            rows.append({
-                "icao_hex": row["icao_hex"].upper(),
+            icao_hex = row["icao_hex"].upper()
+            profiles[icao_hex] = {
+                "icao_hex": icao_hex,
                 "registration": row["registration"],
                 "aircraft_type": row["aircraft_type"],
                 "owner_country": row["owner_country"],
@@ -49,28 +57,152 @@ def seed_aircraft_profiles():
                 "vip_tier": int(row["vip_tier"]),
                 "home_base_airport": row["home_base_airport"],
                 "notes": row["notes"],
-                "last_updated": datetime.now(timezone.utc)
-            })
+            }
+    return profiles
+
+
+PROFILE_CHANGES_DDL = """
+    CREATE TABLE IF NOT EXISTS profile_changes (
+        changed_at DateTime64(3),
+        icao_hex String,
+        change Enum8('upsert' = 1, 'delete' = 2)
+    ) ENGINE = MergeTree()
+    ORDER BY changed_at
+    TTL toDateTime(changed_at) + INTERVAL 7 DAY
+"""
+
+
+def ensure_replacing_engine(client):
+    """
+    Convert a pre-sync aircraft_profiles (plain MergeTree, no row_hash) in
+    place: build the new table alongside, copy, and atomically swap
+    """
+    client.execute(PROFILE_CHANGES_DDL)
 
-    print(f"Loading {len(rows)} aircraft profiles...")
+    result = client.execute(
+        "SELECT engine FROM system.tables WHERE database = currentDatabase() AND name = 'aircraft_profiles'"
+    )
+    if not result or result[0][0] == "ReplacingMergeTree":
+        return
+
+    print(f"  Migrating aircraft_profiles from {result[0][0]} to ReplacingMergeTree...")
+    client.execute("DROP TABLE IF EXISTS aircraft_profiles_new")
+    client.execute("""
+        CREATE TABLE aircraft_profiles_new AS aircraft_profiles
+        ENGINE = ReplacingMergeTree(last_updated)
+        ORDER BY icao_hex
+    """)
+    client.execute("ALTER TABLE aircraft_profiles_new ADD COLUMN IF NOT EXISTS row_hash UInt64 DEFAULT 0")
+    columns = ", ".join(PROFILE_FIELDS + ["last_updated"])
+    # row_hash stays 0, so the first sync afterwards rewrites every row once
+    client.execute(f"INSERT INTO aircraft_profiles_new ({columns}) SELECT {columns} FROM aircraft_profiles")
+    client.execute("EXCHANGE TABLES aircraft_profiles AND aircraft_profiles_new")
+    client.execute("DROP TABLE aircraft_profiles_new")
+    print("  ✓ Migrated")
+
+
+def load_stored_hashes(client):
+    """{icao_hex: row_hash} for the current version of every stored profile"""
+    result = client.execute(
+        "SELECT icao_hex, argMax(row_hash, last_updated) FROM aircraft_profiles GROUP BY icao_hex"
+    )
+    return {icao_hex: row_hash for icao_hex, row_hash in result}
 
-    # Clear existing data (optional - remove if you want to preserve manual additions)
-    print("  Clearing existing aircraft_profiles table...")
-    client.execute("TRUNCATE TABLE aircraft_profiles")
 
-    # Insert data
+def diff_profiles(profiles, stored_hashes):
+    """Split profiles into (changed rows, ICAOs only in the database)"""
+    changed = []
+    for icao_hex, row in profiles.items():
+        row_hash = profile_hash(row)
+        if stored_hashes.get(icao_hex) != row_hash:
+            changed.append(dict(row, row_hash=row_hash))
+    removed = sorted(set(stored_hashes) - set(profiles))
+    return changed, removed
+
+
+def record_profile_changes(client, icaos, change, changed_at=None):
+    """Tell running services which ICAOs to reload (see profile_changes)"""
+    if not icaos:
+        return
+    changed_at = changed_at or datetime.now(timezone.utc)
     client.execute(
-        """
-        INSERT INTO aircraft_profiles
-        (icao_hex, registration, aircraft_type, owner_country, owner_org,
-         is_military, is_government, is_vip, is_intel, vip_tier,
-         home_base_airport, notes, last_updated)
-        VALUES
-        """,
-        rows
+        "INSERT INTO profile_changes (changed_at, icao_hex, change) VALUES",
+        [{"changed_at": changed_at, "icao_hex": icao_hex, "change": change} for icao_hex in icaos]
+    )
+
+
+def upsert_profiles(client, rows, batch_size=10000):
+    now = datetime.now(timezone.utc)
+    for start in range(0, len(rows), batch_size):
+        client.execute(
+            """
+            INSERT INTO aircraft_profiles
+            (icao_hex, registration, aircraft_type, owner_country, owner_org,
+             is_military, is_government, is_vip, is_intel, vip_tier,
+             home_base_airport, notes, last_updated, row_hash)
+            VALUES
+            """,
+            [dict(row, last_updated=now) for row in rows[start:start + batch_size]]
+        )
+
+
+def sync_aircraft_profiles(client, profiles, prune=False, dry_run=False):
+    """
+    Upsert changed profiles and record them in profile_changes
+
+    Profiles present in the database but not in the source are left alone
+    (they may come from expand_aircraft_db.py --to-db) unless prune is set.
+    Returns (changed, removed) counts.
+    """
+    stored = load_stored_hashes(client)
+    changed, removed = diff_profiles(profiles, stored)
+    new = sum(1 for row in changed if row["icao_hex"] not in stored)
+
+    print(f"  {len(profiles)} in source, {len(stored)} stored")
+    print(f"  {new} new, {len(changed) - new} changed, "
+          f"{len(profiles) - len(changed)} unchanged, {len(removed)} only in database")
+
+    if dry_run:
+        return len(changed), 0
+
+    if changed:
+        upsert_profiles(client, changed)
+        record_profile_changes(client, [row["icao_hex"] for row in changed], "upsert")
+
+    if prune and removed:
+        client.execute("ALTER TABLE aircraft_profiles DELETE WHERE icao_hex IN %(icaos)s", {"icaos": removed})
+        record_profile_changes(client, removed, "delete")
+    elif removed:
+        print("  (use --prune to delete profiles missing from the CSV)")
+
+    return len(changed), len(removed) if prune else 0
+
+
+def seed_aircraft_profiles(prune=False, dry_run=False):
+    """Sync aircraft profiles from CSV into ClickHouse"""
+
+    # Connect to ClickHouse
+    client = get_pool()
+
+    # Read CSV
+    csv_path = os.path.join(
+        os.path.dirname(__file__),
+        "..",
+        "data",
+        "aircraft_profiles.csv"
     )
 
-    print(f"  ✓ Loaded {len(rows)} aircraft profiles")
+    profiles = load_csv_profiles(csv_path)
+
+    print(f"Syncing {len(profiles)} aircraft profiles...")
+    ensure_replacing_engine(client)
+    changed, removed = sync_aircraft_profiles(client, profiles, prune=prune, dry_run=dry_run)
+
+    if dry_run:
+        print("\n(dry run - nothing written)")
+        return
+
+    print(f"  ✓ Upserted {changed} profiles, deleted {removed}")
 
     # Show summary by country
     result = client.execute("""
@@ -79,7 +211,7 @@ def seed_aircraft_profiles():
             count() as total,
             sum(is_vip) as vip_count,
             sum(is_military) as military_count
-        FROM aircraft_profiles
+        FROM aircraft_profiles FINAL
         GROUP BY owner_country
         ORDER BY total DESC
     """)
@@ -94,7 +226,12 @@ def seed_aircraft_profiles():
     print("\n✓ Database seeded successfully!")
     print("\nNext step: Start the ingestion pipeline")
     print("  python src/ingest_opensky.py")
+    print("  (running ingesters pick up changed profiles automatically)")
 
 
 if __name__ == "__main__":
-    seed_aircraft_profiles()
+    parser = argparse.ArgumentParser(description="Sync aircraft_profiles from data/aircraft_profiles.csv")
+    parser.add_argument("--prune", action="store_true", help="Delete profiles that are not in the CSV")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+    seed_aircraft_profiles(prune=args.prune, dry_run=args.dry_run)
@@ -5,9 +5,14 @@ Runs the ClickHouse schema creation
 """
 
 import os
-from clickhouse_driver import Client
+import sys
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from db import ClickHousePool
+from schema import create_statements
+
 load_dotenv()
 
 
@@ -15,12 +20,8 @@ def setup_database():
     """Create database and tables"""
 
     # Connect without specifying database first
-    client = Client(
-        host=os.getenv("CLICKHOUSE_HOST", "localhost"),
-        port=int(os.getenv("CLICKHOUSE_PORT", 9000)),
-        user=os.getenv("CLICKHOUSE_USER", "default"),
-        password=os.getenv("CLICKHOUSE_PASSWORD", "")
-    )
+    # One connection, so the schema file's USE applies to later statements
+    client = ClickHousePool(size=1, database="default")
 
     # Read schema file
     schema_path = os.path.join(os.path.dirname(__file__), "..", "src", "db_schema.sql")
@@ -47,10 +48,21 @@ def setup_database():
                 print(f"  ✗ Error executing statement: {e}")
                 print(f"    Statement: {stmt[:100]}...")
 
+    # High-volume tables with tunable codecs/TTLs (see src/schema.py)
+    for stmt in create_statements(database="airplane_watch"):
+        try:
+            client.execute(stmt)
+            table_name = stmt.split("IF NOT EXISTS")[1].split("(")[0].strip()
+            print(f"  ✓ Created table: {table_name}")
+        except Exception as e:
+            print(f"  ✗ Error executing statement: {e}")
+            print(f"    Statement: {stmt[:100]}...")
+
     print("\nDatabase setup complete!")
     print("\nNext steps:")
     print("1. Populate aircraft_profiles with seed data (run scripts/seed_aircraft.py)")
     print("2. Start the ingestion pipeline (python src/ingest_opensky.py)")
+    print("\nUpgrading an existing install? Run scripts/migrate_schema.py to upgrade existing tables")
 
 
 if __name__ == "__main__":
@@ -7,6 +7,8 @@ import os
 import sys
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
 load_dotenv()
 
 def test_clickhouse_connection():
@@ -14,15 +16,9 @@ def test_clickhouse_connection():
     print("Testing ClickHouse connection...")
 
     try:
-        from clickhouse_driver import Client
-
-        client = Client(
-            host=os.getenv("CLICKHOUSE_HOST", "localhost"),
-            port=int(os.getenv("CLICKHOUSE_PORT", 9000)),
-            database=os.getenv("CLICKHOUSE_DB", "airplane_watch"),
-            user=os.getenv("CLICKHOUSE_USER", "default"),
-            password=os.getenv("CLICKHOUSE_PASSWORD", "")
-        )
+        from db import ClickHousePool
+
+        client = ClickHousePool(size=1)
 
         result = client.execute("SELECT 1")
         print("  ✓ ClickHouse connection successful")
@@ -38,14 +34,9 @@ def test_database_schema():
     print("\nTesting database schema...")
 
     try:
-        from clickhouse_driver import Client
+        from db import ClickHousePool
 
-        client = Client(
-            host=os.getenv("CLICKHOUSE_HOST", "localhost"),
-            port=int(os.getenv("CLICKHOUSE_PORT", 9000)),
-            user=os.getenv("CLICKHOUSE_USER", "default"),
-            password=os.getenv("CLICKHOUSE_PASSWORD", "")
-        )
+        client = ClickHousePool(size=1, database="default")
 
         # Check if database exists
         result = client.execute("SHOW DATABASES")
@@ -60,13 +51,7 @@ def test_database_schema():
         print(f"  ✓ Database '{db_name}' exists")
 
         # Check tables
-        client = Client(
-            host=os.getenv("CLICKHOUSE_HOST", "localhost"),
-            port=int(os.getenv("CLICKHOUSE_PORT", 9000)),
-            database=db_name,
-            user=os.getenv("CLICKHOUSE_USER", "default"),
-            password=os.getenv("CLICKHOUSE_PASSWORD", "")
-        )
+        client = ClickHousePool(size=1, database=db_name)
 
         result = client.execute("SHOW TABLES")
         tables = [row[0] for row in result]
@@ -76,7 +61,11 @@ def test_database_schema():
             "flight_positions",
             "flight_events",
             "airports",
-            "panic_scores"
+            "panic_scores",
+            "profile_changes",
+            "discovered_aircraft",
+            "geofences",
+            "geofence_events"
         ]
 
         missing_tables = [t for t in required_tables if t not in tables]
@@ -99,17 +88,11 @@ def test_aircraft_profiles():
     print("\nTesting aircraft profiles...")
 
     try:
-        from clickhouse_driver import Client
-
-        client = Client(
-            host=os.getenv("CLICKHOUSE_HOST", "localhost"),
-            port=int(os.getenv("CLICKHOUSE_PORT", 9000)),
-            database=os.getenv("CLICKHOUSE_DB", "airplane_watch"),
-            user=os.getenv("CLICKHOUSE_USER", "default"),
-            password=os.getenv("CLICKHOUSE_PASSWORD", "")
-        )
+        from db import ClickHousePool
+
+        client = ClickHousePool(size=1)
 
-        result = client.execute("SELECT count() FROM aircraft_profiles")
+        result = client.execute("SELECT count() FROM aircraft_profiles FINAL")
         count = result[0][0]
 
         if count == 0:
@@ -122,7 +105,7 @@ def test_aircraft_profiles():
         # Show sample
         result = client.execute("""
             SELECT owner_country, count() as cnt
-            FROM aircraft_profiles
+            FROM aircraft_profiles FINAL
             GROUP BY owner_country
             ORDER BY cnt DESC
             LIMIT 5
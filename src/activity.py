@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Per-aircraft activity profiles
+The scorers judge every aircraft against the same constants, so an E-4B
+that flies every night weighs as much in the night score as one that has
+never flown after dark. ActivityProfiles learns what each tail usually does
+from the ingest stream:
+
+- airborne minutes per local hour (24 bins, on the night detector's clock:
+  UTC hour + longitude / 15)
+- airborne minutes per 1° cell, as sorted (aircraft, cell) keys with counts
+- sortie count, total and squared length (mean and spread of a sortie)
+
+Everything lives in numpy arrays with one row per aircraft, so a snapshot
+(one report per aircraft) updates all of them in a handful of vector
+operations. Activity fades with a half-life of ACTIVITY_HALF_LIFE_DAYS, so a
+changed routine becomes the usual one.
+
+novelty() rates each aircraft in a scoring window from 0 (what this tail
+always does) to 1 (nothing like its history, or too little history to
+say), against its history before the window: the window's own reports,
+which the ingester has already folded in, are taken back out. The night
+scorer weights each aircraft's night flights by it.
+
+ActivityPublisher hooks the profiles into the ingester (ACTIVITY_PROFILES is
+the file). The file is replaced atomically every ACTIVITY_SAVE_SECONDS and
+the scorer reloads it when it changes. Like the latest-state table it has
+a single writer, so sharded workers do not update it.
+
+    python src/activity.py rebuild --days 30
+    python src/activity.py show AE01CE
+"""
+
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+from tracks import PositionColumns, epoch_seconds
+
+load_dotenv()
+
+CELL_DEGREES = 1
+# (aircraft row, cell) keys: row * CELL_STRIDE + cell; 180 * 360 cells fit below it
+CELL_STRIDE = 1 << 16
+# A sortie ends on the ground or after this long without a report
+SORTIE_GAP_SECONDS = 30 * 60
+# Shorter "sorties" are taxiing, touch-and-goes or ground clutter
+MIN_SORTIE_SECONDS = 5 * 60
+HALF_LIFE_DAYS = 60
+# Decay is applied in steps of this much stream time
+DECAY_STEP_SECONDS = 3600
+# Pending cell counts are merged into the sorted arrays past this many
+MERGE_PENDING = 1 << 16
+# Decayed cells below this (minutes) are dropped at the next merge
+MIN_CELL_MINUTES = 0.01
+SAVE_SECONDS = 300
+
+# Airborne history before a profile is trusted; less counts as novel
+MIN_PROFILE_MINUTES = 10 * 60
+# An hour is usual once it holds this share of the tail's airborne time
+# (half of an even spread over the day)
+HOUR_USUAL_SHARE = 1 / 48
+# A cell is usual once the tail has flown this many minutes in it
+CELL_USUAL_MINUTES = 30
+# Sorties beyond mean + SORTIE_SIGMAS * sd are long for the tail...
+SORTIE_SIGMAS = 2
+# ...once it has flown this many
+MIN_SORTIES = 3
+# Share of each part in the novelty score
+NOVELTY_WEIGHTS = {"hours": 0.4, "areas": 0.4, "sortie": 0.2}
+
+
+def local_hours(times: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Local hour bin (0-23) as is_night_time() reads it: whole UTC hour + lon / 15"""
+    utc_hours = (times // 3600) % 24
+    return (np.floor(utc_hours + lons / 15.0) % 24).astype(np.int64)
+
+
+def cell_ids(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    rows = np.clip(np.floor((lats + 90) / CELL_DEGREES), 0, 180 // CELL_DEGREES - 1)
+    cols = np.floor((lons + 180) / CELL_DEGREES) % (360 // CELL_DEGREES)
+    return (rows * (360 // CELL_DEGREES) + cols).astype(np.int64)
+
+
+class ActivityProfiles:
+    """
+    Hourly, area and sortie-length history per aircraft, in growable arrays
+
+    update() takes reports in any order and any number per aircraft, as long
+    as each aircraft's reports arrive in time order across calls (older
+    reports than the last one seen are ignored).
+    """
+
+    def __init__(self, capacity: int = 1024, half_life_days: Optional[float] = None):
+        self.index: Dict[str, int] = {}
+        self.icaos: List[str] = []
+        self.hour_minutes = np.zeros((capacity, 24), dtype=np.float32)
+        # count, total seconds, total squared seconds (float: they decay)
+        self.sorties = np.zeros((capacity, 3))
+        self.last_seen = np.zeros(capacity)  # epoch seconds, 0 = never
+        self.airborne = np.zeros(capacity, dtype=bool)
+        self.sortie_start = np.zeros(capacity)
+        self.cell_keys = np.zeros(0, dtype=np.int64)
+        self.cell_minutes = np.zeros(0, dtype=np.float32)
+        self._pending_keys: List[np.ndarray] = []
+        self._pending_minutes: List[np.ndarray] = []
+        self._pending = 0
+        if half_life_days is None:
+            half_life_days = float(os.getenv("ACTIVITY_HALF_LIFE_DAYS", HALF_LIFE_DAYS))
+        self.half_life = half_life_days * 86400
+        self.decayed_at = 0.0
+
+    def __len__(self):
+        return len(self.icaos)
+
+    def _grow(self, needed: int):
+        capacity = max(needed, 2 * len(self.last_seen))
+        for name in ("hour_minutes", "sorties", "last_seen", "airborne", "sortie_start"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def rows(self, icaos: Sequence[str]) -> np.ndarray:
+        """Profile row per ICAO, adding rows for aircraft not seen before"""
+        index = self.index
+        rows = [index.get(icao, -1) for icao in icaos]
+        if -1 in rows:
+            for i, row in enumerate(rows):
+                if row == -1:
+                    icao = icaos[i]
+                    row = index.get(icao)
+                    if row is None:
+                        row = index[icao] = len(self.icaos)
+                        self.icaos.append(icao)
+                    rows[i] = row
+            if len(self.icaos) > len(self.last_seen):
+                self._grow(len(self.icaos))
+        return np.array(rows, dtype=np.int64)
+
+    def update(self, icaos: Sequence[str], times, lats, lons, on_ground):
+        """Fold a batch of reports (epoch seconds) into the profiles"""
+        if not len(icaos):
+            return
+        rows = self.rows(icaos)
+        times = np.asarray(times, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        on_ground = np.asarray(on_ground, dtype=bool)
+
+        order = np.lexsort((times, rows))
+        rows, times, lats, lons, on_ground = rows[order], times[order], lats[order], lons[order], on_ground[order]
+        # Rank of each report within its aircraft; each rank is one snapshot
+        # with at most one report per aircraft, in time order per aircraft
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+        if len(starts) == len(rows):
+            self._snapshot(rows, times, lats, lons, on_ground)
+        else:
+            by_rank = np.argsort(rank, kind="stable")
+            bounds = np.r_[0, np.cumsum(np.bincount(rank))]
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                s = by_rank[lo:hi]
+                self._snapshot(rows[s], times[s], lats[s], lons[s], on_ground[s])
+
+        if self._pending >= MERGE_PENDING:
+            self._merge()
+        self._decay(float(times.max()))
+
+    def _snapshot(self, rows, times, lats, lons, on_ground):
+        previous = self.last_seen[rows]
+        fresh = times > previous
+        if not fresh.all():
+            rows, times, lats, lons, on_ground, previous = (
+                a[fresh] for a in (rows, times, lats, lons, on_ground, previous))
+        elapsed = times - previous
+        contiguous = (previous > 0) & (elapsed <= SORTIE_GAP_SECONDS)
+        was_airborne = self.airborne[rows]
+        airborne = ~on_ground
+
+        # Airborne time between two close reports goes to the later one's hour and cell
+        credited = contiguous & (was_airborne | airborne)
+        if credited.any():
+            r, minutes = rows[credited], elapsed[credited] / 60
+            self.hour_minutes[r, local_hours(times[credited], lons[credited])] += minutes
+            self._pending_keys.append(r * CELL_STRIDE + cell_ids(lats[credited], lons[credited]))
+            self._pending_minutes.append(minutes.astype(np.float32))
+            self._pending += len(r)
+
+        # A sortie ends on landing, or at the last report before a long gap
+        ended = was_airborne & (previous > 0) & ~(contiguous & airborne)
+        if ended.any():
+            r = rows[ended]
+            lengths = np.where(contiguous[ended], times[ended], previous[ended]) - self.sortie_start[r]
+            counted = lengths >= MIN_SORTIE_SECONDS
+            r, lengths = r[counted], lengths[counted]
+            self.sorties[r] += np.stack([np.ones(len(r)), lengths, lengths * lengths], axis=1)
+
+        started = airborne & ~(contiguous & was_airborne)
+        self.sortie_start[rows[started]] = times[started]
+        self.last_seen[rows] = times
+        self.airborne[rows] = airborne
+
+    def _merge(self):
+        """Fold pending (key, minutes) pairs into the sorted cell arrays"""
+        if not self._pending_keys:
+            return
+        keys = np.concatenate([self.cell_keys] + self._pending_keys)
+        minutes = np.concatenate([self.cell_minutes] + self._pending_minutes)
+        self._pending_keys, self._pending_minutes, self._pending = [], [], 0
+        keys, inverse = np.unique(keys, return_inverse=True)
+        minutes = np.bincount(inverse, weights=minutes, minlength=len(keys))
+        keep = minutes >= MIN_CELL_MINUTES
+        self.cell_keys, self.cell_minutes = keys[keep], minutes[keep].astype(np.float32)
+
+    def _decay(self, now: float):
+        if not self.half_life:
+            return
+        if not self.decayed_at:
+            self.decayed_at = now
+            return
+        elapsed = now - self.decayed_at
+        if elapsed < DECAY_STEP_SECONDS:
+            return
+        factor = 0.5 ** (elapsed / self.half_life)
+        self._merge()
+        self.hour_minutes *= np.float32(factor)
+        self.sorties *= factor
+        self.cell_minutes *= np.float32(factor)
+        self.decayed_at = now
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def novelty(self, positions: PositionColumns, since: Optional[float] = None) -> Dict[str, float]:
+        """
+        icao -> novelty (0-1) of each aircraft's airborne reports in the window
+
+        Mean over the aircraft's reports of how unusual their local hour and
+        cell are for it, plus how far its longest run of reports exceeds its
+        usual sortie length. Aircraft with less than MIN_PROFILE_MINUTES of
+        history get 1.0. One dict lookup per aircraft, the rest is numpy.
+
+        The ingester folds reports into the profiles as they arrive, so by
+        the time a window is scored it is already part of them. The window's
+        own contribution (see _window_share) is taken out first, so each
+        aircraft is judged against its profile as of the window start.
+        """
+        ids, times, lats, lons, _ = positions.columns(since)
+        if not len(ids):
+            return {}
+        self._merge()
+        times = times.astype(np.float64)
+        lats = lats.astype(np.float64)
+        lons = lons.astype(np.float64)
+        count = len(positions.aircraft)
+        aircraft_rows = np.array([self.index.get(a[0], -1) for a in positions.aircraft], dtype=np.int64)
+        known = aircraft_rows >= 0
+        rows = np.maximum(aircraft_rows, 0)[ids]
+        report_hours = local_hours(times, lons)
+        keys = rows * CELL_STRIDE + cell_ids(lats, lons)
+
+        # Longest run of reports without a SORTIE_GAP_SECONDS hole, per aircraft
+        order = np.lexsort((times, ids))
+        sorted_ids, sorted_times = ids[order], times[order]
+        breaks = np.r_[True, (sorted_ids[1:] != sorted_ids[:-1]) |
+                       (np.diff(sorted_times) > SORTIE_GAP_SECONDS)]
+        run_starts = np.flatnonzero(breaks)
+        run_ends = np.r_[run_starts[1:], len(order)] - 1
+        run_lengths = sorted_times[run_ends] - sorted_times[run_starts]
+        longest = np.zeros(count)
+        np.maximum.at(longest, sorted_ids[run_starts], run_lengths)
+
+        own = self._window_share(aircraft_rows, ids, times, report_hours, keys, order, breaks,
+                                 run_starts, run_ends, since)
+        hour_minutes = np.maximum(self.hour_minutes[np.maximum(aircraft_rows, 0)] - own["hours"], 0.0)
+        totals = np.where(known, hour_minutes.sum(axis=1), 0.0)
+        mature = known & (totals >= MIN_PROFILE_MINUTES)
+
+        share = hour_minutes[ids, report_hours] / np.maximum(totals[ids], 1.0)
+        hour_usual = np.minimum(1.0, share / HOUR_USUAL_SHARE)
+        at = np.minimum(np.searchsorted(self.cell_keys, keys), max(len(self.cell_keys) - 1, 0))
+        found = self.cell_minutes[at] * (self.cell_keys[at] == keys) if len(self.cell_keys) else np.zeros(len(keys))
+        cell_usual = np.minimum(1.0, np.maximum(found - own["cells"], 0.0) / CELL_USUAL_MINUTES)
+
+        reports = np.bincount(ids, minlength=count)
+        seen = reports > 0
+        per_report = np.maximum(reports, 1)
+        hours = np.bincount(ids, weights=1.0 - hour_usual, minlength=count) / per_report
+        areas = np.bincount(ids, weights=1.0 - cell_usual, minlength=count) / per_report
+
+        n, total, squares = np.maximum(self.sorties[np.maximum(aircraft_rows, 0)] - own["sorties"], 0.0).T
+        typical = n >= MIN_SORTIES
+        mean = total / np.maximum(n, 1)
+        sd = np.sqrt(np.maximum(0.0, squares / np.maximum(n, 1) - mean * mean))
+        limit = mean + SORTIE_SIGMAS * sd
+        sortie = np.where(typical, np.clip((longest - limit) / np.maximum(mean, MIN_SORTIE_SECONDS), 0, 1), 0)
+
+        weights = NOVELTY_WEIGHTS
+        sortie_weight = np.where(typical, weights["sortie"], 0.0)
+        score = ((weights["hours"] * hours + weights["areas"] * areas + sortie_weight * sortie)
+                 / (weights["hours"] + weights["areas"] + sortie_weight))
+        score = np.where(mature, score, 1.0)
+        return {positions.aircraft[i][0]: float(score[i]) for i in np.flatnonzero(seen).tolist()}
+
+    def _window_share(self, aircraft_rows, ids, times, report_hours, keys, order, breaks,
+                      run_starts, run_ends, since) -> Dict[str, np.ndarray]:
+        """
+        What the window's reports added to the profiles: hour minutes per
+        aircraft, cell minutes per report and sortie sums per aircraft
+
+        Rebuilt the way _snapshot credits them: the time since the previous
+        report, if within SORTIE_GAP_SECONDS, to the later report's hour and
+        cell, and every run that ended before the aircraft's next report as
+        a sortie. Only reports the profiles have seen count, scaled by the
+        decay applied since. The window's first report per aircraft, whose
+        credit reaches back before it, is left in; the landing, which the
+        window does not hold, is taken as one report spacing.
+        """
+        count = len(aircraft_rows)
+        known = aircraft_rows >= 0
+        rows = np.maximum(aircraft_rows, 0)
+        last_seen = np.where(known, self.last_seen[rows], 0.0)
+        absorbed = times <= last_seen[ids]
+        if self.half_life:
+            decay = 0.5 ** (np.maximum(self.decayed_at - times, 0.0) / self.half_life)
+        else:
+            decay = np.ones(len(times))
+
+        # Minutes each report was credited with, in (aircraft, time) order
+        sorted_ids, sorted_times = ids[order], times[order]
+        elapsed = np.r_[0.0, np.diff(sorted_times)]
+        credited = ~breaks & absorbed[order] & known[sorted_ids]
+        minutes = np.zeros(len(ids))
+        minutes[order[credited]] = elapsed[credited] / 60 * decay[order[credited]]
+
+        # A run followed within SORTIE_GAP_SECONDS by a report the window does
+        # not hold (the landing, on the ground) had that last stretch credited
+        # too: one report spacing of the run, at the run's last report
+        run_ids = sorted_ids[run_starts]
+        start, end = sorted_times[run_starts], sorted_times[run_ends]
+        after = np.r_[run_starts[1:], 0]
+        next_seen = np.where(np.r_[run_ids[1:] == run_ids[:-1], False], sorted_times[after], last_seen[run_ids])
+        landed = known[run_ids] & (next_seen > end) & (next_seen - end <= SORTIE_GAP_SECONDS) & (run_ends > run_starts)
+        spacing = (end - start) / np.maximum(run_ends - run_starts, 1)
+        last = order[run_ends[landed]]
+        minutes[last] += np.minimum(spacing, next_seen - end)[landed] / 60 * decay[last]
+
+        hours = np.zeros((count, 24))
+        np.add.at(hours, (ids, report_hours), minutes)
+        # Cell minutes per distinct (aircraft, cell) key, handed back per report
+        distinct, inverse = np.unique(keys, return_inverse=True)
+        cells = np.bincount(inverse, weights=minutes, minlength=len(distinct))[inverse]
+
+        # Runs the profiles have closed as sorties: heard from again afterwards
+        # (landed, or back after a gap), and begun inside the window
+        closed = known[run_ids] & (last_seen[run_ids] > end) & (end - start >= MIN_SORTIE_SECONDS)
+        if since is not None:
+            closed &= start >= since
+        lengths, weight = (end - start)[closed], decay[order[run_ends]][closed]
+        sorties = np.zeros((count, 3))
+        np.add.at(sorties, run_ids[closed], np.stack([weight, lengths * weight, lengths * lengths * weight], axis=1))
+        return {"hours": hours, "cells": cells, "sorties": sorties}
+
+    def describe(self, icao: str) -> Optional[Dict]:
+        """Readable profile of one aircraft"""
+        row = self.index.get(icao.upper())
+        if row is None:
+            return None
+        self._merge()
+        hours = self.hour_minutes[row].astype(np.float64)
+        n, total, squares = self.sorties[row]
+        mean = total / n if n else 0.0
+        lo, hi = np.searchsorted(self.cell_keys, [row * CELL_STRIDE, (row + 1) * CELL_STRIDE])
+        cells = sorted(zip(self.cell_minutes[lo:hi].tolist(), (self.cell_keys[lo:hi] - row * CELL_STRIDE).tolist()),
+                       reverse=True)
+        return {
+            "icao_hex": icao.upper(),
+            "airborne_hours": round(float(hours.sum()) / 60, 1),
+            "hour_share": [round(float(h), 3) for h in hours / max(hours.sum(), 1e-9)],
+            "sorties": round(float(n), 1),
+            "sortie_minutes": round(float(mean) / 60, 1),
+            "sortie_sd_minutes": round(float(np.sqrt(max(0.0, squares / n - mean * mean))) / 60, 1) if n else 0.0,
+            "cells": [{"lat": cell // 360 - 90, "lon": cell % 360 - 180, "minutes": round(minutes, 1)}
+                      for minutes, cell in cells[:10]],
+        }
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: str):
+        """Write an .npz snapshot, replacing `path` atomically"""
+        self._merge()
+        n = len(self.icaos)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, icaos=np.array(self.icaos, dtype="U8"), hour_minutes=self.hour_minutes[:n],
+                     sorties=self.sorties[:n], last_seen=self.last_seen[:n], airborne=self.airborne[:n],
+                     sortie_start=self.sortie_start[:n], cell_keys=self.cell_keys,
+                     cell_minutes=self.cell_minutes, decay=np.array([self.half_life, self.decayed_at]))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ActivityProfiles":
+        with np.load(path) as data:
+            icaos = data["icaos"].tolist()
+            profiles = cls(capacity=max(len(icaos), 1024))
+            n = len(icaos)
+            profiles.icaos = icaos
+            profiles.index = {icao: i for i, icao in enumerate(icaos)}
+            for name in ("hour_minutes", "sorties", "last_seen", "airborne", "sortie_start"):
+                getattr(profiles, name)[:n] = data[name]
+            profiles.cell_keys = data["cell_keys"]
+            profiles.cell_minutes = data["cell_minutes"]
+            profiles.half_life, profiles.decayed_at = data["decay"].tolist()
+        return profiles
+
+
+class ProfileFile:
+    """The scorer's side: the saved profiles, reloaded when the file changes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = None
+        self.profiles: Optional[ActivityProfiles] = None
+
+    def current(self) -> Optional[ActivityProfiles]:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return self.profiles
+        if mtime != self.mtime:
+            try:
+                self.profiles = ActivityProfiles.load(self.path)
+                self.mtime = mtime
+            except Exception as e:
+                print(f"Warning: Could not load activity profiles: {e}")
+        return self.profiles
+
+
+class ActivityPublisher:
+    """Ingester publisher: fold each stored batch into the profiles and save them now and then"""
+
+    def __init__(self, path: str, save_seconds: Optional[int] = None):
+        self.path = path
+        self.save_seconds = int(os.getenv("ACTIVITY_SAVE_SECONDS", SAVE_SECONDS)) if save_seconds is None else save_seconds
+        self.profiles = ActivityProfiles.load(path) if os.path.exists(path) else ActivityProfiles()
+        self.saved_at = time.monotonic()
+        print(f"  Loaded activity profiles for {len(self.profiles)} aircraft")
+
+    def publish(self, rows: List[Dict]):
+        if not rows:
+            return
+        try:
+            # A batch shares one poll timestamp; convert each distinct one once
+            seconds = {}
+            for timestamp in {r["timestamp"] for r in rows}:
+                seconds[timestamp] = epoch_seconds(timestamp)
+            times = [seconds[r["timestamp"]] for r in rows]
+            self.profiles.update([r["icao_hex"] for r in rows], times, [r["lat"] for r in rows],
+                                 [r["lon"] for r in rows], [r["on_ground"] for r in rows])
+            if time.monotonic() - self.saved_at >= self.save_seconds:
+                self.save()
+        except Exception as e:
+            # Profiles are best-effort; never hold up ingestion
+            print(f"  Warning: activity profile update failed: {e}")
+
+    def save(self):
+        self.saved_at = time.monotonic()
+        self.profiles.save(self.path)
+
+
+def rebuild(ch_client, days: int, batch_rows: int = 200000) -> ActivityProfiles:
+    """Profiles from the last `days` of flight_positions, streamed in time order"""
+    profiles = ActivityProfiles()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    rows = ch_client.execute_iter(
+        """
+        SELECT icao_hex, toUnixTimestamp(timestamp), lat, lon, on_ground
+        FROM flight_positions
+        WHERE timestamp >= %(cutoff)s
+        ORDER BY timestamp
+        """,
+        {"cutoff": cutoff},
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            profiles.update(*zip(*batch))
+            batch = []
+    if batch:
+        profiles.update(*zip(*batch))
+    return profiles
+
+
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Per-aircraft activity profiles")
+    parser.add_argument("--path", default=os.getenv("ACTIVITY_PROFILES", "data/activity/profiles.npz"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("rebuild", help="Rebuild the profiles from flight_positions")
+    build.add_argument("--days", type=int, default=30)
+    show = commands.add_parser("show", help="Print one aircraft's profile")
+    show.add_argument("icao_hex")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        from db import get_pool
+        start = time.perf_counter()
+        profiles = rebuild(get_pool(), args.days)
+        profiles.save(args.path)
+        print(f"✓ Profiled {len(profiles)} aircraft from {args.days} days in "
+              f"{time.perf_counter() - start:.1f}s -> {args.path}")
+    else:
+        profile = ActivityProfiles.load(args.path).describe(args.icao_hex)
+        if profile is None:
+            print(f"✗ No profile for {args.icao_hex}")
+            raise SystemExit(1)
+        print(json.dumps(profile, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Airlift missions and corridors
+Cargo aircraft are recognised by family (C-17, C-130, ...) once per
+aircraft type, not per position report: airlift_class() caches the
+substring match per distinct type string, and aircraft_profiles carries
+the same lookup as the materialized airlift_family column for SQL.
+
+Reports of those aircraft are cut into flights by tracks.segment(). A
+flight whose first and last reports are both low (climbing out of and
+descending into a base) and which ends far from where it started is a
+mission, from an origin base to a destination base. Bases are
+BASE_GRID_DEGREES cells around the end points, so repeated sorties between
+the same two fields group into a corridor ("12 C-17 sorties A → B").
+
+Flights already airborne when the window opens, or still airborne when
+it closes, count towards airborne time but not towards missions.
+
+    python src/airlift.py --hours 24
+"""
+
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from tracks import PositionColumns, great_circle_m, segment
+
+# Cargo/transport families -> category; first substring match wins
+AIRLIFT_TYPES = {
+    "C-17": "strategic",
+    "C-130": "tactical",
+    "A400M": "tactical",
+    "Il-76": "strategic",
+    "C-5": "strategic",
+    "An-124": "strategic",
+}
+
+# Same lookup in SQL, for the aircraft_profiles.airlift_family column
+AIRLIFT_FAMILY_SQL = "multiIf({}, '')".format(", ".join(
+    f"position(aircraft_type, '{family}') > 0, '{family}'" for family in AIRLIFT_TYPES
+))
+
+# Reconstructed airborne time (tracks.py) that makes an airlift aircraft active
+AIRLIFT_ACTIVE_MINUTES = 30
+
+# A report this low (metres) at the start/end of a flight is a takeoff/landing
+TERMINAL_ALTITUDE = 3000
+# Shorter hops (or a flight that lands where it took off) are not missions
+MIN_MISSION_KM = 100
+# End points snap to bases on this grid (0.5° ~ 55km, like the convergence grid)
+BASE_GRID_DEGREES = 0.5
+
+# Score points
+ACTIVE_AIRCRAFT_POINTS = 10
+SORTIE_POINTS = {"strategic": 15, "tactical": 10}
+# Every sortie after the first on a corridor (sustained shuttle = buildup)
+REPEAT_SORTIE_POINTS = 5
+
+_classes: Dict[str, Optional[Tuple[str, str]]] = {}
+
+
+def airlift_class(aircraft_type: str) -> Optional[Tuple[str, str]]:
+    """(family, category) for a cargo/transport type, None otherwise; cached per type"""
+    try:
+        return _classes[aircraft_type]
+    except KeyError:
+        pass
+    match = next(((family, category) for family, category in AIRLIFT_TYPES.items()
+                  if family in aircraft_type), None)
+    _classes[aircraft_type] = match
+    return match
+
+
+class Mission(NamedTuple):
+    icao_hex: str
+    aircraft_type: str
+    family: str
+    category: str
+    owner_country: str
+    takeoff: float  # epoch seconds of the first report
+    landing: float  # last report
+    origin: Tuple[float, float]  # base cell (lat, lon)
+    destination: Tuple[float, float]
+
+
+def base_cell(lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return (np.round(lats / BASE_GRID_DEGREES) * BASE_GRID_DEGREES,
+            np.round(lons / BASE_GRID_DEGREES) * BASE_GRID_DEGREES)
+
+
+def format_base(base: Tuple[float, float]) -> str:
+    lat, lon = base
+    return f"{abs(lat):.1f}°{'N' if lat >= 0 else 'S'} {abs(lon):.1f}°{'E' if lon >= 0 else 'W'}"
+
+
+def flights_and_missions(positions: PositionColumns, icaos, since: Optional[float] = None):
+    """
+    (airborne minutes per icao, missions) for the given aircraft from one
+    segmentation of their reports at or after `since`
+    """
+    minutes = {icao: 0.0 for icao in icaos}
+    wanted = [positions.index[icao] for icao in minutes if icao in positions.index]
+    ids, times, lats, lons, altitudes = positions.columns(since)
+    if not wanted or not len(ids):
+        return minutes, []
+    # Dead reckoning runs to the end of all data, not just these aircraft's
+    until = times.max()
+    keep = np.isin(ids, wanted)
+    ids, times, lats, lons, altitudes = ids[keep], times[keep], lats[keep], lons[keep], altitudes[keep]
+    if not len(ids):
+        return minutes, []
+    order, flights = segment(ids, times, lats, lons, altitudes, until)
+
+    seconds = np.bincount(flights.aircraft, weights=flights.airborne_seconds)
+    for aircraft_id in wanted:
+        if aircraft_id < len(seconds):
+            minutes[positions.aircraft[aircraft_id][0]] = float(seconds[aircraft_id]) / 60
+
+    lats, lons = lats[order].astype(np.float64), lons[order].astype(np.float64)
+    altitudes = altitudes[order]
+    first, last = flights.first, flights.last
+    is_mission = ((altitudes[first] <= TERMINAL_ALTITUDE) & (altitudes[last] <= TERMINAL_ALTITUDE)
+                  & (great_circle_m(lats[first], lons[first], lats[last], lons[last]) >= MIN_MISSION_KM * 1000))
+    origin_lat, origin_lon = base_cell(lats[first], lons[first])
+    destination_lat, destination_lon = base_cell(lats[last], lons[last])
+
+    missions = []
+    for i in np.flatnonzero(is_mission):
+        icao_hex, aircraft_type, owner_country = positions.aircraft[flights.aircraft[i]]
+        family, category = airlift_class(aircraft_type) or ("", "")
+        missions.append(Mission(
+            icao_hex, aircraft_type, family, category, owner_country,
+            float(flights.start[i]), float(flights.end[i]),
+            (float(origin_lat[i]), float(origin_lon[i])),
+            (float(destination_lat[i]), float(destination_lon[i])),
+        ))
+    return minutes, missions
+
+
+def corridors(missions: List[Mission]) -> List[Dict]:
+    """Missions grouped by (origin, destination), busiest first"""
+    groups: Dict[Tuple, List[Mission]] = {}
+    for m in missions:
+        groups.setdefault((m.origin, m.destination), []).append(m)
+    result = []
+    for (origin, destination), legs in groups.items():
+        result.append({
+            "origin": list(origin),
+            "destination": list(destination),
+            "sorties": len(legs),
+            "aircraft": len({m.icao_hex for m in legs}),
+            "family": Counter(m.family for m in legs).most_common(1)[0][0],
+            "countries": sorted({m.owner_country for m in legs}),
+        })
+    result.sort(key=lambda c: (-c["sorties"], c["origin"], c["destination"]))
+    return result
+
+
+def score_airlift(positions: PositionColumns, aircraft: Dict[str, bool],
+                  since: Optional[float] = None) -> Tuple[float, Dict]:
+    """
+    Airlift score (0-100) for the given cargo aircraft (icao -> is_military)
+
+    Points for every aircraft airborne at least AIRLIFT_ACTIVE_MINUTES, for
+    every completed sortie by category, and again for repeated sorties on
+    the same corridor; boosted by the military share of the aircraft.
+    """
+    if not aircraft:
+        return 0.0, {"count": 0}
+
+    airborne, missions = flights_and_missions(positions, aircraft, since)
+    active_aircraft = sum(1 for minutes in airborne.values() if minutes >= AIRLIFT_ACTIVE_MINUTES)
+    routes = corridors(missions)
+    repeats = sum(c["sorties"] - 1 for c in routes)
+
+    points = (active_aircraft * ACTIVE_AIRCRAFT_POINTS
+              + sum(SORTIE_POINTS.get(m.category, 0) for m in missions)
+              + repeats * REPEAT_SORTIE_POINTS)
+    military_ratio = sum(1 for is_military in aircraft.values() if is_military) / len(aircraft)
+    return min(100, points * (1 + military_ratio * 0.5)), {
+        "aircraft": len(aircraft),
+        "active_aircraft": active_aircraft,
+        "sorties": len(missions),
+        "airborne_hours": round(sum(airborne.values()) / 60, 1),
+        "military_ratio": military_ratio,
+        "corridors": routes[:5],
+    }
+
+
+def main():
+    import argparse
+    from datetime import datetime, timedelta, timezone
+    from db import get_pool
+
+    parser = argparse.ArgumentParser(description="Recent airlift missions and corridors")
+    parser.add_argument("--hours", type=int, default=24)
+    args = parser.parse_args()
+
+    client = get_pool()
+    # airlift_family is materialized per profile, so only cargo aircraft's
+    # reports leave the server
+    rows = client.execute_iter(
+        """
+        SELECT fp.icao_hex, fp.timestamp, fp.lat, fp.lon, fp.altitude, fp.on_ground,
+               ap.owner_country, ap.aircraft_type, ap.is_military
+        FROM flight_positions fp
+        JOIN (SELECT icao_hex, owner_country, aircraft_type, is_military
+              FROM aircraft_profiles FINAL WHERE airlift_family != '') ap
+          ON fp.icao_hex = ap.icao_hex
+        WHERE fp.timestamp >= %(cutoff)s
+        ORDER BY fp.timestamp DESC
+        """,
+        {"cutoff": datetime.now(timezone.utc) - timedelta(hours=args.hours)},
+    )
+    positions = PositionColumns()
+    aircraft = {}
+    for icao_hex, timestamp, lat, lon, altitude, on_ground, owner_country, aircraft_type, is_military in rows:
+        positions.add(icao_hex, timestamp, lat, lon, altitude, on_ground, owner_country, aircraft_type)
+        aircraft.setdefault(icao_hex, bool(is_military))
+
+    if not aircraft:
+        print(f"No airlift aircraft in the last {args.hours}h")
+        return
+    score, context = score_airlift(positions, aircraft)
+    print(f"Airlift score {score:.1f}: {context['active_aircraft']}/{context['aircraft']} aircraft active, "
+          f"{context['sorties']} sorties, {context['airborne_hours']}h airborne")
+    for c in context["corridors"]:
+        print(f"  {c['sorties']:>3} {c['family']:<6} sorties  {format_base(c['origin'])} → "
+              f"{format_base(c['destination'])}  ({c['aircraft']} aircraft, {', '.join(c['countries'])})")
+
+
+if __name__ == "__main__":
+    main()
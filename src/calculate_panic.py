@@ -6,26 +6,53 @@ Analyzes flight activity and computes regional panic scores (0-100)
 
 import os
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from collections import defaultdict
-from clickhouse_driver import Client
 from dotenv import load_dotenv
-import math
+
+import numpy as np
+
+from activity import ActivityProfiles, ProfileFile
+from airlift import airlift_class, format_base, score_airlift
+from formation import detect_formations
+from profiling import get_profiler
+from score_format import format_score
+from scoring import (BATCH_ROWS, NIGHT_TIER_WEIGHTS, RECENT_FLIGHT_COLUMNS, Airlift, Convergence, Formations,
+                     NightFlights, ScoringPipeline, VipMovement, is_night, novelty_weighted, score_formations)
+from tracks import PositionColumns, epoch_seconds
 
 load_dotenv()
 
+# Columns of get_recent_flights that come from flight_positions; the rest
+# from aircraft_profiles
+FLIGHT_POSITION_FIELDS = RECENT_FLIGHT_COLUMNS[:7]
+
+
+def score_windows() -> List[int]:
+    """Scoring horizons in hours from SCORE_WINDOWS (default: the single 12h window)"""
+    return sorted({int(h) for h in os.getenv("SCORE_WINDOWS", "12").split(",") if h.strip()})
+
 
 class PanicScoreCalculator:
     """Calculates panic scores based on unusual aircraft movements"""
 
-    def __init__(self):
-        self.ch_client = Client(
-            host=os.getenv("CLICKHOUSE_HOST", "localhost"),
-            port=int(os.getenv("CLICKHOUSE_PORT", 9000)),
-            database=os.getenv("CLICKHOUSE_DB", "airplane_watch"),
-            user=os.getenv("CLICKHOUSE_USER", "default"),
-            password=os.getenv("CLICKHOUSE_PASSWORD", "")
-        )
+    def __init__(self, ch_client=None, profiles: Optional[ActivityProfiles] = None,
+                 pipeline: Optional[ScoringPipeline] = None):
+        # ClickHouse connection (injectable for benchmarks and dry runs);
+        # db, and with it clickhouse_driver, is only imported when needed
+        if ch_client is None:
+            from db import get_pool
+            ch_client = get_pool()
+        self.ch_client = ch_client
+
+        # Per-aircraft activity profiles (activity.py): given, or the file
+        # the ingester keeps at ACTIVITY_PROFILES, reloaded when it changes
+        self.profiles = profiles
+        self.profile_file = (ProfileFile(os.getenv("ACTIVITY_PROFILES"))
+                             if profiles is None and os.getenv("ACTIVITY_PROFILES") else None)
+
+        # Enabled components and their weights (SCORE_WEIGHTS, scoring.py)
+        self.pipeline = pipeline or ScoringPipeline()
 
         # Country to emoji flag mapping
         self.country_flags = {
@@ -35,57 +62,44 @@ class PanicScoreCalculator:
             "CO": "🇨🇴"
         }
 
-    def get_recent_flights(self, hours: int = 12) -> List[Dict]:
+    def iter_recent_flight_rows(self, hours: int = 12, now: Optional[datetime] = None,
+                                columns: Tuple[str, ...] = RECENT_FLIGHT_COLUMNS) -> Iterator[tuple]:
         """
-        Get recent flight activity with aircraft metadata
+        Stream recent flight rows as tuples of `columns` (RECENT_FLIGHT_COLUMNS
+        order, or the subset the scoring pipeline reads)
 
         For MVP, we analyze raw positions. In production, you'd use
         the flight_events table with proper takeoff/landing detection.
         """
-        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
+        cutoff_time = (now or datetime.now(timezone.utc)) - timedelta(hours=hours)
+        select = ",\n            ".join(f"{'fp' if c in FLIGHT_POSITION_FIELDS else 'ap'}.{c}" for c in columns)
 
-        query = """
+        query = f"""
         SELECT
-            fp.icao_hex,
-            fp.callsign,
-            fp.timestamp,
-            fp.lat,
-            fp.lon,
-            fp.altitude,
-            fp.on_ground,
-            ap.owner_country,
-            ap.owner_org,
-            ap.vip_tier,
-            ap.is_military,
-            ap.is_vip,
-            ap.aircraft_type
+            {select}
         FROM flight_positions fp
-        JOIN aircraft_profiles ap ON fp.icao_hex = ap.icao_hex
+        JOIN (SELECT * FROM aircraft_profiles FINAL) ap ON fp.icao_hex = ap.icao_hex
         WHERE fp.timestamp >= %(cutoff_time)s
         ORDER BY fp.timestamp DESC
         """
 
-        result = self.ch_client.execute(query, {"cutoff_time": cutoff_time})
-
-        flights = []
-        for row in result:
-            flights.append({
-                "icao_hex": row[0],
-                "callsign": row[1],
-                "timestamp": row[2],
-                "lat": row[3],
-                "lon": row[4],
-                "altitude": row[5],
-                "on_ground": row[6],
-                "owner_country": row[7],
-                "owner_org": row[8],
-                "vip_tier": row[9],
-                "is_military": row[10],
-                "is_vip": row[11],
-                "aircraft_type": row[12]
-            })
+        return self.ch_client.execute_iter(query, {"cutoff_time": cutoff_time})
 
-        return flights
+    def get_recent_flights(self, hours: int = 12, now: Optional[datetime] = None) -> List[Dict]:
+        """Get recent flight activity with aircraft metadata, as dicts"""
+        return [dict(zip(RECENT_FLIGHT_COLUMNS, row)) for row in self.iter_recent_flight_rows(hours, now)]
+
+    @staticmethod
+    def position_columns(flights: List[Dict]) -> PositionColumns:
+        """PositionColumns for a get_recent_flights list (list-mode scorers)"""
+        positions = PositionColumns()
+        for f in flights:
+            positions.add(f["icao_hex"], f["timestamp"], f["lat"], f["lon"], f["altitude"],
+                          f["on_ground"], f["owner_country"], f["aircraft_type"])
+        return positions
+
+    def activity_profiles(self) -> Optional[ActivityProfiles]:
+        return self.profile_file.current() if self.profile_file is not None else self.profiles
 
     def is_night_time(self, timestamp: datetime, lat: float, lon: float) -> bool:
         """
@@ -94,12 +108,8 @@ class PanicScoreCalculator:
         For MVP: approximate. In production, use proper timezone libraries
         and astronomical calculations.
         """
-        # Rough timezone offset from longitude (15° per hour)
-        tz_offset_hours = lon / 15.0
-        local_hour = (timestamp.hour + tz_offset_hours) % 24
-
-        # Night = 00:00 - 06:00 local time
-        return 0 <= local_hour < 6
+        # Night = 00:00 - 06:00 local time, 15° of longitude per hour
+        return bool(is_night(timestamp.hour, lon))
 
     def calculate_night_flight_score(self, flights: List[Dict]) -> Tuple[float, Dict]:
         """
@@ -118,9 +128,19 @@ class PanicScoreCalculator:
 
         # Weight by VIP tier (presidents = 3x weight, regular = 1x)
         weighted_count = 0
+        night_aircraft = {}
         for flight in night_flights:
-            tier_weight = {1: 3.0, 2: 2.0, 3: 1.5, 4: 1.0}.get(flight["vip_tier"], 1.0)
+            tier_weight = NIGHT_TIER_WEIGHTS.get(flight["vip_tier"], 1.0)
             weighted_count += tier_weight
+            night_aircraft[flight["icao_hex"]] = night_aircraft.get(flight["icao_hex"], 0) + tier_weight
+
+        # Discount aircraft flying their usual routine
+        profiles = self.activity_profiles()
+        routine = None
+        if profiles is not None:
+            novelty = profiles.novelty(self.position_columns(flights))
+            tier_weighted, weighted_count = weighted_count, novelty_weighted(night_aircraft, novelty)
+            routine = tier_weighted - weighted_count
 
         # Count unique countries
         unique_countries = len(set(f["owner_country"] for f in night_flights))
@@ -137,6 +157,8 @@ class PanicScoreCalculator:
             "weighted_count": weighted_count,
             "countries": list(set(f["owner_country"] for f in night_flights))
         }
+        if routine is not None:
+            context["routine_discount"] = round(routine, 2)
 
         return final_score, context
 
@@ -192,42 +214,16 @@ class PanicScoreCalculator:
         """
         Calculate airlift score (0-100)
 
-        Detects repeated cargo/transport flights (signals logistics buildup)
+        Detects repeated cargo/transport missions (signals logistics buildup):
+        takeoff-to-landing flights grouped into corridors (see airlift.py)
         """
-        # Cargo/transport aircraft types
-        airlift_types = ["C-17", "C-130", "A400M", "Il-76", "C-5", "An-124"]
-
-        airlift_flights = [
-            f for f in flights
-            if any(aircraft_type in f["aircraft_type"] for aircraft_type in airlift_types)
-        ]
-
-        if not airlift_flights:
-            return 0.0, {"count": 0}
-
-        # Count unique aircraft making multiple position reports (= active missions)
-        aircraft_activity = defaultdict(int)
-        for flight in airlift_flights:
-            aircraft_activity[flight["icao_hex"]] += 1
-
-        # Active aircraft = more than 5 position reports in window
-        active_aircraft = sum(1 for count in aircraft_activity.values() if count > 5)
-
-        # Score based on number of active airlift missions
-        base_score = active_aircraft * 15
+        # Cargo family resolved once per aircraft type, not per row
+        airlift_aircraft = {}
+        for f in flights:
+            if f["icao_hex"] not in airlift_aircraft and airlift_class(f["aircraft_type"]) is not None:
+                airlift_aircraft[f["icao_hex"]] = bool(f["is_military"])
 
-        # Boost for military aircraft
-        military_count = sum(1 for f in airlift_flights if f["is_military"])
-        military_ratio = military_count / len(airlift_flights) if airlift_flights else 0
-        military_multiplier = 1 + (military_ratio * 0.5)
-
-        final_score = min(100, base_score * military_multiplier)
-
-        return final_score, {
-            "total_flights": len(airlift_flights),
-            "active_aircraft": active_aircraft,
-            "military_ratio": military_ratio
-        }
+        return score_airlift(self.position_columns(flights), airlift_aircraft)
 
     def calculate_vip_score(self, flights: List[Dict]) -> Tuple[float, Dict]:
         """
@@ -271,6 +267,16 @@ class PanicScoreCalculator:
 
         return final_score, {"count": unique_vips, "vips": vip_list}
 
+    def calculate_formation_score(self, flights: List[Dict]) -> Tuple[float, Dict]:
+        """
+        Calculate formation / refuelling rendezvous score (0-100)
+
+        Detects pairs of aircraft flying together for a sustained period
+        (see formation.py); a tanker with a receiver counts more than a
+        plain formation
+        """
+        return score_formations(detect_formations(self.position_columns(flights)))
+
     def generate_narrative(self, scores: Dict, contexts: Dict) -> str:
         """Generate viral-ready narrative text"""
         parts = []
@@ -293,8 +299,23 @@ class PanicScoreCalculator:
 
         # Airlift
         if scores["airlift"] > 50 and contexts["airlift"]:
-            count = contexts["airlift"]["active_aircraft"]
-            parts.append(f"{count} cargo aircraft in operation")
+            corridors = contexts["airlift"].get("corridors")
+            if corridors and corridors[0]["sorties"] > 1:
+                top = corridors[0]
+                parts.append(f"{top['sorties']} {top['family']} sorties "
+                             f"{format_base(top['origin'])} → {format_base(top['destination'])}")
+            else:
+                count = contexts["airlift"]["active_aircraft"]
+                parts.append(f"{count} cargo aircraft in operation")
+
+        # Formations / refuelling
+        if scores["formation"] > 40 and contexts["formation"]:
+            rendezvous = contexts["formation"]["rendezvous"]
+            formations = contexts["formation"]["formations"]
+            if rendezvous:
+                parts.append(f"{rendezvous} tanker rendezvous")
+            if formations:
+                parts.append(f"{formations} formation{'s' if formations != 1 else ''} airborne")
 
         # Prefix based on overall score
         prefix = ""
@@ -310,132 +331,209 @@ class PanicScoreCalculator:
 
         return prefix + " • ".join(parts)
 
-    def calculate_panic_score(self, region: str = "Global", hours: int = 12) -> Dict:
+    def calculate_panic_score(self, region: str = "Global", hours: int = 12, streaming: bool = True,
+                              now: Optional[datetime] = None) -> Dict:
         """
         Calculate composite panic score for a region
 
-        Returns dict with overall score, component scores, and narrative
+        Returns dict with overall score, component scores, and narrative.
+        By default the scoring pipeline (scoring.py) scores the rows in
+        batches as they stream in, fetching only the columns its components
+        read; streaming=False loads the window into a list and runs the
+        calculate_*_score methods, with identical results.
         """
         print(f"[{datetime.now(timezone.utc).isoformat()}] Calculating panic score for {region}...")
-
-        # Get recent flight data
-        flights = self.get_recent_flights(hours=hours)
-        print(f"  Analyzing {len(flights)} flight records")
-
-        if not flights:
-            return {
-                "region": region,
-                "timestamp": datetime.now(timezone.utc),
-                "overall_panic_score": 0,
-                "night_flight_score": 0.0,
-                "convergence_score": 0.0,
-                "airlift_score": 0.0,
-                "vip_movement_score": 0.0,
-                "flight_count": 0,
-                "countries_involved": 0,
-                "top_3_airports": [],
-                "narrative": "No data"
+        pipeline = self.pipeline
+
+        if streaming:
+            state = pipeline.score_rows(self.iter_recent_flight_rows(hours=hours, now=now, columns=pipeline.columns))
+            print(f"  Analyzed {state.rows} flight records in batches of up to {BATCH_ROWS}")
+            components = pipeline.finish(state, profiles=self.activity_profiles())
+            flight_count = state.rows
+            unique_countries = len(state.countries)
+        else:
+            # Get recent flight data
+            flights = self.get_recent_flights(hours=hours, now=now)
+            print(f"  Analyzing {len(flights)} flight records")
+            scorers = {
+                NightFlights: self.calculate_night_flight_score,
+                Convergence: self.calculate_convergence_score,
+                Airlift: self.calculate_airlift_score,
+                VipMovement: self.calculate_vip_score,
+                Formations: self.calculate_formation_score,
             }
+            components = {c.name: scorers[type(c)](flights) for c in pipeline.components if type(c) in scorers}
+            if len(components) < len(pipeline.components):
+                # Plugin components have no list-mode scorer: batch the same rows
+                state = pipeline.score_rows(tuple(f[c] for c in pipeline.columns) for f in flights)
+                finished = pipeline.finish(state, profiles=self.activity_profiles())
+                components.update((name, finished[name]) for name in finished if name not in components)
+            flight_count = len(flights)
+            unique_countries = len(set(f["owner_country"] for f in flights))
+
+        score = self.compose_panic_score(region, components, flight_count, unique_countries)
+        score["window_hours"] = hours
+        return score
 
-        # Calculate component scores
-        night_score, night_context = self.calculate_night_flight_score(flights)
-        convergence_score, convergence_context = self.calculate_convergence_score(flights)
-        airlift_score, airlift_context = self.calculate_airlift_score(flights)
-        vip_score, vip_context = self.calculate_vip_score(flights)
+    def calculate_multi_window_scores(self, region: str = "Global", horizons: Iterable[int] = (1, 6, 12, 24),
+                                      now: Optional[datetime] = None) -> List[Dict]:
+        """
+        Score several trailing windows from one scan of the longest
+
+        Each batch of rows is folded into the state of every window whose
+        cutoff its rows fall inside (the windows nest, so a 30-minute-old row
+        counts towards 1h, 6h, 12h and 24h). Night masks and grid cells are
+        derived once per batch, and the position columns are collected once
+        for all windows.
+
+        Returns one panic_scores row per horizon (shortest first), all with the
+        same timestamp. trend_delta is each window's overall score minus the
+        next longer window's (0 for the longest); component_deltas does the
+        same per component. Each row equals what calculate_panic_score(hours=h)
+        returns for that window.
+        """
+        now = now or datetime.now(timezone.utc)
+        pipeline = self.pipeline
+        horizons = sorted(set(horizons))
+        print(f"[{now.isoformat()}] Calculating panic scores for {region} "
+              f"({', '.join(f'{h}h' for h in horizons)})...")
+
+        # Shortest window first, so its cutoff is the latest
+        cutoffs = np.array([epoch_seconds(now - timedelta(hours=h)) for h in horizons])
+        positions = PositionColumns() if pipeline.positions else None
+        states = [pipeline.state(positions) for _ in horizons]
+        rows = 0
+        for batch in pipeline.batches(self.iter_recent_flight_rows(hours=horizons[-1], now=now,
+                                                                   columns=pipeline.columns)):
+            rows += len(batch)
+            # Shortest window the row falls inside; len(horizons) is outside every window
+            index = (batch.seconds[:, None] < cutoffs[None, :]).sum(axis=1)
+            inside = index < len(horizons)
+            if not inside.all():
+                batch, index = batch.take(inside), index[inside]
+            if positions is not None:
+                pipeline.add_positions(positions, batch)
+            for k, state in enumerate(states):
+                part = index <= k
+                if part.any():
+                    pipeline.update(state, batch if part.all() else batch.take(part), positions=False)
+        print(f"  Analyzed {rows} flight records in one pass")
+
+        profiles = self.activity_profiles()
+        scores = []
+        for hours, cutoff, state in zip(horizons, cutoffs.tolist(), states):
+            print(f"  {hours}h window:")
+            score = self.compose_panic_score(
+                region, pipeline.finish(state, cutoff, profiles), state.rows, len(state.countries)
+            )
+            score["timestamp"] = now
+            score["window_hours"] = hours
+            scores.append(score)
+
+        components = [c.score_column() for c in pipeline.available]
+        for shorter, longer in zip(scores, scores[1:] + [None]):
+            if longer is None:
+                shorter["trend_delta"] = 0.0
+                shorter["component_deltas"] = {c: 0.0 for c in components}
+                continue
+            shorter["trend_delta"] = float(shorter["overall_panic_score"] - longer["overall_panic_score"])
+            shorter["component_deltas"] = {c: shorter[c] - longer[c] for c in components}
+            print(f"  {shorter['window_hours']}h vs {longer['window_hours']}h: {shorter['trend_delta']:+.0f}")
 
-        print(f"  Component scores:")
-        print(f"    Night flights: {night_score:.1f}")
-        print(f"    Convergence:   {convergence_score:.1f}")
-        print(f"    Airlift:       {airlift_score:.1f}")
-        print(f"    VIP movement:  {vip_score:.1f}")
-
-        # Weighted composite score
-        weights = {
-            "night": 0.30,
-            "convergence": 0.35,  # Strongest signal
-            "airlift": 0.20,
-            "vip": 0.15
-        }
+        return scores
 
-        composite = (
-            night_score * weights["night"] +
-            convergence_score * weights["convergence"] +
-            airlift_score * weights["airlift"] +
-            vip_score * weights["vip"]
-        )
+    def compose_panic_score(self, region: str, components: Dict[str, Tuple[float, Dict]],
+                            flight_count: int, unique_countries: int) -> Dict:
+        """
+        Weight the component (score, context) pairs into the panic_scores row
 
-        overall_score = int(composite)
+        Components the pipeline has disabled score 0 with an empty context.
+        """
+        available = self.pipeline.available
+        if not flight_count:
+            row = {"region": region, "timestamp": datetime.now(timezone.utc), "overall_panic_score": 0}
+            row.update((c.score_column(), 0.0) for c in available)
+            row.update({"flight_count": 0, "countries_involved": 0, "top_3_airports": [], "narrative": "No data"})
+            return row
 
-        # Collect metadata
-        unique_countries = len(set(f["owner_country"] for f in flights))
+        scores = {name: self.pipeline.cap(name, score) for name, (score, _) in components.items()}
 
-        # Generate narrative
-        scores_dict = {
-            "overall": overall_score,
-            "night": night_score,
-            "convergence": convergence_score,
-            "airlift": airlift_score,
-            "vip": vip_score
-        }
+        print(f"  Component scores:")
+        for c in self.pipeline.components:
+            print(f"    {c.label + ':':<15}{scores[c.name]:.1f}")
 
-        contexts_dict = {
-            "night": night_context,
-            "convergence": convergence_context,
-            "airlift": airlift_context,
-            "vip": vip_context
-        }
+        # Weighted composite score (weights from SCORE_WEIGHTS)
+        overall_score = int(self.pipeline.composite(scores))
+
+        # Generate narrative
+        scores_dict = {"overall": overall_score}
+        contexts_dict = {}
+        for c in available:
+            scores_dict[c.name] = scores.get(c.name, 0.0)
+            contexts_dict[c.name] = components[c.name][1] if c.name in components else {}
 
         narrative = self.generate_narrative(scores_dict, contexts_dict)
 
         print(f"  Overall panic score: {overall_score}/100")
         print(f"  Narrative: {narrative}")
 
-        return {
-            "region": region,
-            "timestamp": datetime.now(timezone.utc),
-            "overall_panic_score": overall_score,
-            "night_flight_score": night_score,
-            "convergence_score": convergence_score,
-            "airlift_score": airlift_score,
-            "vip_movement_score": vip_score,
-            "flight_count": len(flights),
+        row = {"region": region, "timestamp": datetime.now(timezone.utc), "overall_panic_score": overall_score}
+        row.update((c.score_column(), scores_dict[c.name]) for c in available)
+        row.update({
+            "flight_count": flight_count,
             "countries_involved": unique_countries,
             "top_3_airports": [],  # TODO: extract from convergence context
             "narrative": narrative
-        }
+        })
+        return row
 
     def store_panic_score(self, score_data: Dict):
         """Store panic score to database"""
+        self.store_panic_scores([score_data])
+
+    def store_panic_scores(self, scores: List[Dict]):
+        """
+        Store one or more panic scores (e.g. every window of a run) in one insert
+
+        Every registered component's score_column() is written, plugins'
+        included, so panic_scores needs a column for each (see scoring.py).
+        """
+        components = [c.score_column() for c in self.pipeline.available]
+        required = ["overall_panic_score", "flight_count", "countries_involved", "top_3_airports", "narrative"]
+        columns = ["timestamp", "region"] + components + required + ["window_hours", "trend_delta"]
         self.ch_client.execute(
-            """
+            f"""
             INSERT INTO panic_scores
-            (timestamp, region, night_flight_score, convergence_score,
-             airlift_score, vip_movement_score, overall_panic_score,
-             flight_count, countries_involved, top_3_airports, narrative)
+            ({", ".join(columns)})
             VALUES
             """,
             [{
                 "timestamp": score_data["timestamp"],
                 "region": score_data["region"],
-                "night_flight_score": score_data["night_flight_score"],
-                "convergence_score": score_data["convergence_score"],
-                "airlift_score": score_data["airlift_score"],
-                "vip_movement_score": score_data["vip_movement_score"],
-                "overall_panic_score": score_data["overall_panic_score"],
-                "flight_count": score_data["flight_count"],
-                "countries_involved": score_data["countries_involved"],
-                "top_3_airports": score_data["top_3_airports"],
-                "narrative": score_data["narrative"]
-            }]
+                **{c: score_data.get(c, 0.0) for c in components},
+                **{c: score_data[c] for c in required},
+                "window_hours": score_data.get("window_hours", 12),
+                "trend_delta": score_data.get("trend_delta", 0.0)
+            } for score_data in scores]
         )
 
-        print(f"  ✓ Stored panic score to database")
+        print(f"  ✓ Stored {len(scores)} panic score{'s' if len(scores) != 1 else ''} to database")
 
     def run_once(self):
-        """Single calculation cycle"""
-        score = self.calculate_panic_score(region="Global", hours=12)
-        self.store_panic_score(score)
-        return score
+        """Single calculation cycle (every SCORE_WINDOWS horizon when more than one)"""
+        windows = score_windows()
+        with get_profiler().cycle("score", windows=",".join(map(str, windows))) as cycle:
+            if len(windows) == 1:
+                score = self.calculate_panic_score(region="Global", hours=windows[0])
+                self.store_panic_score(score)
+                cycle.tag(rows=score["flight_count"])
+                return score
+
+            scores = self.calculate_multi_window_scores(region="Global", horizons=windows)
+            self.store_panic_scores(scores)
+            cycle.tag(rows=max(s["flight_count"] for s in scores))
+            # The 12h row is the headline score shown on the dashboard
+            return next((s for s in scores if s["window_hours"] == 12), scores[-1])
 
     def run_continuous(self, interval_minutes: int = 15):
         """Run continuous panic score calculation"""
@@ -462,25 +560,16 @@ class PanicScoreCalculator:
 def main():
     """Main entry point"""
     calculator = PanicScoreCalculator()
+    get_profiler().install_signal()
 
     # Run once for testing
     score = calculator.run_once()
 
-    print("\n" + "="*60)
-    print("PANIC SCORE RESULT")
-    print("="*60)
-    print(f"Region: {score['region']}")
-    print(f"Overall Score: {score['overall_panic_score']}/100")
-    print(f"Narrative: {score['narrative']}")
-    print(f"\nComponent Scores:")
-    print(f"  Night Flights:  {score['night_flight_score']:.1f}/100")
-    print(f"  Convergence:    {score['convergence_score']:.1f}/100")
-    print(f"  Airlift:        {score['airlift_score']:.1f}/100")
-    print(f"  VIP Movement:   {score['vip_movement_score']:.1f}/100")
-    print(f"\nMetadata:")
-    print(f"  Flight records: {score['flight_count']}")
-    print(f"  Countries:      {score['countries_involved']}")
-    print("="*60)
+    print(format_score(score))
+
+    if hasattr(calculator.ch_client, "stats"):
+        print("\nClickHouse queries:")
+        print(calculator.ch_client.stats.report())
 
     # Uncomment to run continuously:
     # calculator.run_continuous(interval_minutes=15)
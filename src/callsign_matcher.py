@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Callsign and squawk matcher for aircraft outside the curated profile list
+Runs over the full OpenSky snapshot every poll: a state is a hit when its
+callsign starts with a known government/military/VIP prefix (SAM, RCH,
+NATO, ...) or it squawks an emergency code (7500/7600/7700).
+
+The prefixes are compiled into one trie-shaped regex, so each callsign is
+checked with a single anchored match that branches on one character at a
+time, whatever the number of prefixes.
+"""
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# prefix -> (category, description). A prefix matches when the callsign
+# continues with a digit (SAM44, RCH123) or ends there; entries ending in
+# "$" must be the whole callsign.
+CALLSIGN_PREFIXES = {
+    # United States
+    "AF1$": ("vip", "Air Force One"),
+    "AF2$": ("vip", "Air Force Two"),
+    "SAM": ("vip", "USAF Special Air Mission"),
+    "EXEC": ("vip", "US executive transport"),
+    "VENUS": ("vip", "USAF 201st Airlift Squadron"),
+    "PAT": ("vip", "US Army Priority Air Transport"),
+    "RCH": ("airlift", "USAF Air Mobility Command (Reach)"),
+    "CNV": ("airlift", "US Navy (Convoy)"),
+    "NAVY": ("military", "US Navy"),
+    # NATO and European air forces
+    "NATO": ("military", "NATO AEW&C"),
+    "ASCOT": ("airlift", "Royal Air Force transport"),
+    "RRR": ("airlift", "Royal Air Force transport"),
+    "KRF": ("vip", "The King's Flight"),
+    "CTM": ("airlift", "French Air and Space Force (COTAM)"),
+    "FAF": ("military", "French Air and Space Force"),
+    "GAF": ("military", "German Air Force"),
+    "GAM": ("military", "German Army"),
+    "NAF": ("military", "Royal Netherlands Air Force"),
+    "BAF": ("military", "Belgian Air Component"),
+    "IAM": ("military", "Italian Air Force"),
+    "AME": ("military", "Spanish Air and Space Force"),
+    "PLF": ("vip", "Polish Air Force VIP transport"),
+    "HRZ": ("military", "Croatian Air Force"),
+    "CFC": ("military", "Royal Canadian Air Force"),
+    # Other state operators
+    "RSD": ("vip", "Rossiya Special Flight Detachment"),
+    "RFF": ("military", "Russian Air Force"),
+    "TUAF": ("military", "Turkish Air Force"),
+    "UAF": ("military", "UAE Air Force"),
+    "ASY": ("military", "Royal Australian Air Force"),
+    "KIWI": ("military", "Royal New Zealand Air Force"),
+}
+
+# Transponder codes that are worth seeing whoever is squawking them
+EMERGENCY_SQUAWKS = {
+    "7500": ("hijack", "Unlawful interference"),
+    "7600": ("radio_failure", "Radio failure"),
+    "7700": ("emergency", "General emergency"),
+}
+
+
+class Match(NamedTuple):
+    """Why a state vector was picked up"""
+    kind: str       # "callsign" or "squawk"
+    pattern: str    # matched prefix or squawk code
+    category: str
+
+
+def _trie_pattern(node: Dict) -> str:
+    """Regex for a trie node; longer prefixes are tried before shorter ones"""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if "" in node:
+        branches.append(node[""])
+    if len(branches) == 1:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")"
+
+
+def compile_callsign_pattern(prefixes: Iterable[str]) -> "re.Pattern":
+    """One anchored regex matching any prefix; match.group() is the prefix"""
+    trie: Dict = {}
+    for prefix in prefixes:
+        exact = prefix.endswith("$")
+        node = trie
+        for char in prefix.rstrip("$"):
+            node = node.setdefault(char, {})
+        # The terminal entry holds the boundary this prefix needs
+        node[""] = "$" if exact else r"(?=\d|$)"
+    return re.compile(_trie_pattern(trie))
+
+
+class CallsignMatcher:
+    """Compiled callsign prefix / emergency squawk matcher"""
+
+    def __init__(self, prefixes: Optional[Dict] = None, squawks: Optional[Dict] = None):
+        self.prefixes = {p.rstrip("$"): v for p, v in (prefixes or CALLSIGN_PREFIXES).items()}
+        self.squawks = EMERGENCY_SQUAWKS if squawks is None else squawks
+        self._match_callsign = compile_callsign_pattern(prefixes or CALLSIGN_PREFIXES).match
+
+    def match(self, callsign: str, squawk: Optional[str]) -> Optional[Match]:
+        """Emergency squawks take precedence over callsign prefixes"""
+        if squawk in self.squawks:
+            return Match("squawk", squawk, self.squawks[squawk][0])
+        if callsign:
+            m = self._match_callsign(callsign)
+            if m:
+                prefix = m.group()
+                return Match("callsign", prefix, self.prefixes[prefix][0])
+        return None
+
+    def scan(self, states: List[Dict], exclude: Iterable[str] = ()) -> List[tuple]:
+        """
+        (state, Match) for every hit in a snapshot of get_all_states() dicts,
+        skipping ICAO hex codes in exclude (lower case, e.g. the tracked set)
+        """
+        # Inlined match(): this runs over every aircraft in the snapshot
+        squawks = self.squawks
+        prefixes = self.prefixes
+        match_callsign = self._match_callsign
+        hits = []
+        for state in states:
+            squawk = state["squawk"]
+            if squawk in squawks:
+                hit = Match("squawk", squawk, squawks[squawk][0])
+            else:
+                m = match_callsign(state["callsign"])
+                if m is None:
+                    continue
+                prefix = m.group()
+                hit = Match("callsign", prefix, prefixes[prefix][0])
+            if state["icao24"].lower() not in exclude:
+                hits.append((state, hit))
+        return hits
+
+
+def main():
+    """Print the compiled pattern and classify callsigns given on the command line"""
+    import sys
+
+    matcher = CallsignMatcher()
+    print(compile_callsign_pattern(CALLSIGN_PREFIXES).pattern)
+    for arg in sys.argv[1:]:
+        callsign, _, squawk = arg.partition(":")
+        print(f"  {arg:<16} {matcher.match(callsign.upper(), squawk or None)}")
+
+
+if __name__ == "__main__":
+    main()
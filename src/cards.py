@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Narrative and share-card rendering
+Turns panic_scores rows into what gets posted: a 1200x630 PNG card per
+region (served as /og/<region>.png), a tweet and a Telegram message per
+region, and the hourly digest of the busiest regions.
+
+Every output is content-addressed: its key hashes the fields it shows plus
+RENDER_VERSION, so a region whose score did not change since the last batch
+is served from the cache instead of being rendered again. The timestamp is
+not part of a card, otherwise nothing would ever hit. Cards render in a
+process pool (Pillow is CPU-bound), and the score daemon hands each run's
+rows to a background CardRenderer, so scoring never waits on them.
+
+Layout under RENDER_DIR (default data/cards):
+    <key>.png, <key>.json     card and texts, immutable
+    index.json                region slug -> key and headline numbers
+
+    python src/cards.py render [--hours 12] [--workers N]
+    python src/cards.py digest [--top 5]
+"""
+
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+# Bump when the card layout or text templates change (invalidates the cache)
+RENDER_VERSION = 1
+
+CARD_SIZE = (1200, 630)
+# Window shown on a region's card when a run stored several
+CARD_WINDOW_HOURS = 12
+TWEET_LIMIT = 280
+# Batches smaller than this render in-process (pool start-up costs more)
+POOL_MIN_CARDS = 8
+
+COMPONENTS = (
+    ("night_flight_score", "Night flights"),
+    ("convergence_score", "Convergence"),
+    ("airlift_score", "Airlift"),
+    ("vip_movement_score", "VIP movement"),
+    ("formation_score", "Formations"),
+)
+
+# Same bands as the narrative prefix in calculate_panic.generate_narrative
+LEVELS = ((75, "🚨", (220, 38, 38)), (50, "⚠️", (234, 138, 0)), (25, "👀", (234, 179, 8)), (-1, "", (34, 197, 94)))
+
+_FLAG = re.compile("[\U0001F1E6-\U0001F1FF]{2}")
+_EMOJI = re.compile("[\U0001F000-\U0001FAFF☀-➿️]")
+# Punctuation the bundled card font has no glyph for
+_CARD_PUNCTUATION = str.maketrans({"•": "·", "→": "->"})
+
+
+def render_dir() -> str:
+    return os.getenv("RENDER_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "cards"))
+
+
+def region_slug(region: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", region.lower()).strip("-") or "region"
+
+
+def level(score: float):
+    """(emoji, RGB colour) for an overall score"""
+    for threshold, emoji, colour in LEVELS:
+        if score > threshold:
+            return emoji, colour
+    return LEVELS[-1][1:]
+
+
+def plain_text(narrative: str) -> str:
+    """Narrative for the card font: flag emoji become country codes, other emoji go"""
+    text = _FLAG.sub(lambda m: "".join(chr(ord(c) - 0x1F1E6 + ord("A")) for c in m.group()), narrative)
+    return re.sub(r"\s+", " ", _EMOJI.sub("", text)).strip().translate(_CARD_PUNCTUATION)
+
+
+def card_fields(row: Dict) -> Dict:
+    """The parts of a panic_scores row that appear on a card or in a post"""
+    return {
+        "region": row["region"],
+        "window_hours": int(row.get("window_hours", CARD_WINDOW_HOURS)),
+        "overall": int(row["overall_panic_score"]),
+        "components": {name: int(round(row.get(name, 0.0))) for name, _ in COMPONENTS},
+        "narrative": row.get("narrative", ""),
+        "flight_count": int(row.get("flight_count", 0)),
+        "countries": int(row.get("countries_involved", 0)),
+        "trend": int(round(row.get("trend_delta", 0.0))),
+    }
+
+
+def content_key(fields: Dict) -> str:
+    payload = json.dumps([RENDER_VERSION, fields], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def latest_per_region(rows: Iterable[Dict]) -> List[Dict]:
+    """One row per region: its CARD_WINDOW_HOURS window, else the longest"""
+    best: Dict[str, tuple] = {}
+    for row in rows:
+        current = best.get(row["region"])
+        hours = row.get("window_hours", CARD_WINDOW_HOURS)
+        rank = (hours == CARD_WINDOW_HOURS, hours)
+        if current is None or rank > current[0]:
+            best[row["region"]] = (rank, row)
+    return [row for _, row in best.values()]
+
+
+# ----------------------------------------------------------------------
+# Texts
+# ----------------------------------------------------------------------
+
+def _trend(fields: Dict) -> str:
+    return f" ({fields['trend']:+d})" if fields["trend"] else ""
+
+
+def tweet_text(fields: Dict) -> str:
+    emoji, _ = level(fields["overall"])
+    head = f"{emoji} {fields['region']} panic score: {fields['overall']}/100{_trend(fields)}".strip()
+    tail = f"{fields['flight_count']} flights, {fields['countries']} countries, last {fields['window_hours']}h"
+    narrative = fields["narrative"]
+    room = TWEET_LIMIT - len(head) - len(tail) - 2
+    if len(narrative) > room:
+        narrative = narrative[:max(0, room - 1)].rstrip() + "…"
+    return "\n".join(part for part in (head, narrative, tail) if part)
+
+
+def telegram_text(fields: Dict) -> str:
+    """HTML parse mode"""
+    emoji, _ = level(fields["overall"])
+    components = " · ".join(f"{label} {fields['components'][name]}" for name, label in COMPONENTS)
+    return (f"{emoji} <b>{html.escape(fields['region'])}</b>: {fields['overall']}/100{_trend(fields)}\n"
+            f"{html.escape(fields['narrative'])}\n"
+            f"<i>{components}</i>").strip()
+
+
+def digest(rows: Iterable[Dict], top: int = 5) -> Dict[str, str]:
+    """Hourly summary of the highest-scoring regions as {"tweet": ..., "telegram": ...}"""
+    ranked = sorted((card_fields(r) for r in latest_per_region(rows)),
+                    key=lambda f: (-f["overall"], f["region"]))[:top]
+    if not ranked:
+        return {"tweet": "", "telegram": ""}
+    lines = [f"{i}. {f['region']} {f['overall']}{_trend(f)}" for i, f in enumerate(ranked, 1)]
+    tweet = "Panic scores this hour:\n" + "\n".join(lines)
+    while len(tweet) > TWEET_LIMIT and lines:
+        lines.pop()
+        tweet = "Panic scores this hour:\n" + "\n".join(lines)
+    telegram = "<b>Panic scores this hour</b>\n" + "\n".join(
+        f"{level(f['overall'])[0]} {html.escape(f['region'])}: <b>{f['overall']}</b>{_trend(f)}"
+        f" — {html.escape(f['narrative'])}" for f in ranked
+    )
+    return {"tweet": tweet, "telegram": telegram}
+
+
+# ----------------------------------------------------------------------
+# Cards
+# ----------------------------------------------------------------------
+
+_fonts: Dict[int, object] = {}
+
+
+def _font(size: int):
+    font = _fonts.get(size)
+    if font is None:
+        from PIL import ImageFont
+        font = _fonts[size] = ImageFont.load_default(size=size)
+    return font
+
+
+def _wrap(draw, text: str, font, width: int, max_lines: int) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if draw.textlength(candidate, font=font) <= width:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+        line = word
+    if line:
+        lines.append(line)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1].rstrip(".") + "…"
+    return lines
+
+
+def render_png(fields: Dict) -> bytes:
+    """1200x630 card (Pillow, imported on first use)"""
+    import io
+    from PIL import Image, ImageDraw
+
+    width, height = CARD_SIZE
+    _, colour = level(fields["overall"])
+    image = Image.new("RGB", CARD_SIZE, (15, 23, 42))
+    draw = ImageDraw.Draw(image)
+    muted, text = (148, 163, 184), (241, 245, 249)
+
+    draw.rectangle((0, 0, width, 12), fill=colour)
+    draw.text((60, 50), fields["region"], font=_font(56), fill=text)
+    draw.text((60, 120), f"Panic score, last {fields['window_hours']}h", font=_font(28), fill=muted)
+
+    score = str(fields["overall"])
+    draw.text((60, 170), score, font=_font(180), fill=colour)
+    score_width = draw.textlength(score, font=_font(180))
+    draw.text((80 + score_width, 300), "/100" + _trend(fields), font=_font(40), fill=muted)
+
+    # Component bars on the right
+    left, top, bar_width = 640, 90, 480
+    for i, (name, label) in enumerate(COMPONENTS):
+        y = top + i * 62
+        value = fields["components"][name]
+        draw.text((left, y), label, font=_font(24), fill=text)
+        draw.text((left + bar_width, y), str(value), font=_font(24), fill=text, anchor="ra")
+        draw.rounded_rectangle((left, y + 32, left + bar_width, y + 44), radius=6, fill=(30, 41, 59))
+        if value:
+            draw.rounded_rectangle((left, y + 32, left + bar_width * min(value, 100) // 100, y + 44),
+                                   radius=6, fill=colour)
+
+    narrative = plain_text(fields["narrative"])
+    for i, line in enumerate(_wrap(draw, narrative, _font(32), width - 120, 2)):
+        draw.text((60, 430 + i * 44), line, font=_font(32), fill=text)
+    draw.text((60, height - 60),
+              f"{fields['flight_count']:,} flight reports · {fields['countries']} countries",
+              font=_font(24), fill=muted)
+
+    out = io.BytesIO()
+    image.save(out, format="PNG", optimize=False)
+    return out.getvalue()
+
+
+def _write(path: str, data: bytes):
+    """Write via a temp file so readers never see half a card"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def render_card(fields: Dict, key: str, directory: str) -> str:
+    """Render one card and its texts into directory (pool worker entry point)"""
+    _write(os.path.join(directory, f"{key}.png"), render_png(fields))
+    texts = {"fields": fields, "tweet": tweet_text(fields), "telegram": telegram_text(fields)}
+    _write(os.path.join(directory, f"{key}.json"), json.dumps(texts, ensure_ascii=False).encode("utf-8"))
+    return key
+
+
+class CardRenderer:
+    """
+    Renders cards for batches of panic_scores rows, skipping unchanged ones
+
+    render() works synchronously; submit() queues a batch on a background
+    thread and returns at once (what the score daemon uses).
+    """
+
+    def __init__(self, directory: Optional[str] = None, workers: Optional[int] = None):
+        self.directory = directory or render_dir()
+        os.makedirs(self.directory, exist_ok=True)
+        self.workers = workers if workers is not None else int(os.getenv("RENDER_WORKERS", os.cpu_count() or 1))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._background: Optional[ThreadPoolExecutor] = None
+        self._index_lock = threading.Lock()
+        self.rendered = 0
+        self.cached = 0
+        self.last_batch: Optional[Dict] = None
+
+    def _exists(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self.directory, f"{key}.png"))
+
+    def render(self, rows: Iterable[Dict]) -> Dict:
+        """Render every region's card that is not cached yet; returns batch stats"""
+        start = time.perf_counter()
+        entries = {}
+        for row in latest_per_region(rows):
+            fields = card_fields(row)
+            entries[region_slug(fields["region"])] = (fields, content_key(fields))
+
+        missing = {key: fields for fields, key in entries.values() if not self._exists(key)}
+        if len(missing) >= POOL_MIN_CARDS and self.workers > 1:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            keys = list(missing)
+            list(self._pool.map(render_card, [missing[k] for k in keys], keys,
+                                [self.directory] * len(keys), chunksize=max(1, len(keys) // (self.workers * 4))))
+        else:
+            for key, fields in missing.items():
+                render_card(fields, key, self.directory)
+
+        self._update_index(entries)
+        self.rendered += len(missing)
+        self.cached += len(entries) - len(missing)
+        self.last_batch = {
+            "regions": len(entries),
+            "rendered": len(missing),
+            "cached": len(entries) - len(missing),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        return self.last_batch
+
+    def _update_index(self, entries: Dict):
+        with self._index_lock:
+            path = os.path.join(self.directory, "index.json")
+            try:
+                with open(path, encoding="utf-8") as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+            for slug, (fields, key) in entries.items():
+                index[slug] = {"region": fields["region"], "key": key, "overall": fields["overall"],
+                               "updated_at": int(time.time())}
+            _write(path, json.dumps(index, indent=1, ensure_ascii=False).encode("utf-8"))
+
+    def submit(self, rows: Iterable[Dict]):
+        """Render in the background; failures are logged, never raised to the caller"""
+        if self._background is None:
+            self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cards")
+        rows = list(rows)
+
+        def run():
+            try:
+                self.render(rows)
+            except Exception as e:
+                print(f"Warning: card rendering failed: {type(e).__name__}: {e}")
+
+        return self._background.submit(run)
+
+    def texts(self, region: str) -> Optional[Dict]:
+        """Cached tweet/Telegram texts of a region's current card"""
+        try:
+            with open(os.path.join(self.directory, "index.json"), encoding="utf-8") as f:
+                key = json.load(f)[region_slug(region)]["key"]
+            with open(os.path.join(self.directory, f"{key}.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def close(self):
+        if self._background is not None:
+            self._background.shutdown(wait=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+
+def latest_scores(client, hours: Optional[int] = None) -> List[Dict]:
+    """Newest panic_scores row per (region, window)"""
+    columns = ["region", "window_hours", "timestamp", "overall_panic_score", "night_flight_score",
+               "convergence_score", "airlift_score", "vip_movement_score", "formation_score",
+               "flight_count", "countries_involved", "narrative", "trend_delta"]
+    where = "WHERE window_hours = %(hours)s" if hours else ""
+    rows = client.execute(
+        f"""
+        SELECT {', '.join(f'argMax({c}, timestamp)' if c not in ('region', 'window_hours') else c
+                          for c in columns)}
+        FROM panic_scores
+        {where}
+        GROUP BY region, window_hours
+        """,
+        {"hours": hours},
+    )
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def main():
+    import argparse
+    from dotenv import load_dotenv
+    from db import get_pool
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Render share cards and social texts from panic_scores")
+    parser.add_argument("command", choices=["render", "digest"])
+    parser.add_argument("--hours", type=int, help="Only this scoring window")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--top", type=int, default=5, help="digest: regions to list")
+    args = parser.parse_args()
+
+    rows = latest_scores(get_pool(), args.hours)
+    if args.command == "digest":
+        texts = digest(rows, args.top)
+        print(texts["tweet"])
+        print("\n" + texts["telegram"])
+        return
+
+    renderer = CardRenderer(workers=args.workers)
+    try:
+        batch = renderer.render(rows)
+    finally:
+        renderer.close()
+    print(f"✓ {batch['regions']} regions: {batch['rendered']} rendered, {batch['cached']} cached "
+          f"({batch['seconds']:.2f}s) in {renderer.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Shared ClickHouse access for the services and scripts
+One place for connection settings (from the environment), a bounded
+connection pool safe to share between threads and asyncio tasks, LZ4 wire
+compression, query timeouts with a reconnect-and-retry policy for reads,
+streaming reads and per-query timing/row counts
+
+ClickHousePool exposes execute()/execute_iter() with the same call
+signature as clickhouse_driver.Client, so it can be passed anywhere a
+client was used before (and the benchmark stand-ins can be passed where a
+pool is expected).
+
+clickhouse_driver is imported on first connection rather than with this
+module: it is most of a cold start, and short-lived CLI paths (e.g. the
+score daemon client) import this module without ever connecting.
+"""
+
+import contextlib
+import functools
+import importlib.util
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from clickhouse_driver import Client
+
+load_dotenv()
+
+READ_ONLY_STATEMENT = re.compile(r"^\s*(SELECT|WITH|SHOW|DESCRIBE|EXISTS)\b", re.IGNORECASE)
+
+_warned_compression = False
+_driver = None
+
+
+def driver():
+    """The clickhouse_driver package, imported on first use"""
+    global _driver
+    if _driver is None:
+        import clickhouse_driver
+        import clickhouse_driver.errors
+        _driver = clickhouse_driver
+    return _driver
+
+
+def retryable_errors() -> tuple:
+    """Errors after which the connection is dropped and a read is retried"""
+    errors = driver().errors
+    return (errors.NetworkError, errors.SocketTimeoutError, EOFError, socket.timeout, ConnectionError)
+
+
+def server_error():
+    return driver().errors.ServerException
+
+
+def _compression_setting(name: str):
+    """'lz4'/'lz4hc'/'zstd' if the codec package is installed, else False"""
+    global _warned_compression
+    name = name.strip().lower()
+    if name in ("", "0", "false", "none", "off"):
+        return False
+    module = "lz4" if name == "lz4hc" else name
+    # Look for the codec's packages without importing clickhouse_driver itself
+    if not all(importlib.util.find_spec(package) for package in (module, "clickhouse_cityhash")):
+        if not _warned_compression:
+            print(f"  Warning: CLICKHOUSE_COMPRESSION={name} needs clickhouse-driver[{module}]; "
+                  f"continuing uncompressed")
+            _warned_compression = True
+        return False
+    return name
+
+
+def connection_settings(database: Optional[str] = None) -> Dict:
+    """clickhouse_driver.Client keyword arguments from the environment"""
+    query_timeout = int(os.getenv("CLICKHOUSE_QUERY_TIMEOUT", 300))
+    return {
+        "host": os.getenv("CLICKHOUSE_HOST", "localhost"),
+        "port": int(os.getenv("CLICKHOUSE_PORT", 9000)),
+        "database": database or os.getenv("CLICKHOUSE_DB", "airplane_watch"),
+        "user": os.getenv("CLICKHOUSE_USER", "default"),
+        "password": os.getenv("CLICKHOUSE_PASSWORD", ""),
+        "compression": _compression_setting(os.getenv("CLICKHOUSE_COMPRESSION", "lz4")),
+        "connect_timeout": int(os.getenv("CLICKHOUSE_CONNECT_TIMEOUT", 10)),
+        "send_receive_timeout": query_timeout,
+        "settings": {
+            # Server-side limit, so a runaway query is cancelled rather than abandoned
+            "max_execution_time": query_timeout,
+            "max_block_size": int(os.getenv("CLICKHOUSE_STREAM_BLOCK_SIZE", 65536)),
+        },
+    }
+
+
+def query_label(query: str) -> str:
+    """Short, stable name for a statement (first 80 chars, whitespace collapsed)"""
+    return " ".join(query.split())[:80]
+
+
+class QueryStats:
+    """
+    Per-query timing and row counts
+
+    Aggregates by query label (calls, rows, seconds, slowest) and keeps the
+    most recent individual queries for inspection.
+    """
+
+    def __init__(self, recent: int = 100):
+        self._lock = threading.Lock()
+        self.by_query: "OrderedDict[str, Dict]" = OrderedDict()
+        self.recent = deque(maxlen=recent)
+
+    def record(self, query: str, seconds: float, rows: int, read_rows: int = 0, read_bytes: int = 0,
+               error: bool = False):
+        label = query_label(query)
+        with self._lock:
+            entry = self.by_query.get(label)
+            if entry is None:
+                entry = self.by_query[label] = {
+                    "calls": 0, "errors": 0, "rows": 0, "read_rows": 0, "read_bytes": 0,
+                    "seconds": 0.0, "max_seconds": 0.0,
+                }
+            entry["calls"] += 1
+            entry["errors"] += error
+            entry["rows"] += rows
+            entry["read_rows"] += read_rows
+            entry["read_bytes"] += read_bytes
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            self.recent.append({"query": label, "seconds": seconds, "rows": rows,
+                                "read_rows": read_rows, "read_bytes": read_bytes, "error": error})
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {label: dict(entry) for label, entry in self.by_query.items()}
+
+    def report(self, limit: int = 10) -> str:
+        rows = sorted(self.summary().items(), key=lambda item: -item[1]["seconds"])[:limit]
+        lines = [f"  {'Calls':>6} {'Rows':>10} {'Total(s)':>9} {'Max(s)':>7}  Query"]
+        for label, s in rows:
+            lines.append(f"  {s['calls']:>6} {s['rows']:>10} {s['seconds']:>9.3f} {s['max_seconds']:>7.3f}  {label}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self.by_query.clear()
+            self.recent.clear()
+
+
+def _progress(client: "Client") -> Dict:
+    """Rows/bytes the server read for the client's last query"""
+    progress = getattr(getattr(client, "last_query", None), "progress", None)
+    return {"read_rows": getattr(progress, "rows", 0) or 0, "read_bytes": getattr(progress, "bytes", 0) or 0}
+
+
+class ClickHousePool:
+    """
+    Bounded pool of clickhouse_driver connections
+
+    A clickhouse_driver.Client is one connection and must not be used by two
+    threads at once; the pool hands each caller its own for the duration of a
+    query (or of a streaming read). Connections are created lazily up to
+    size; callers beyond that wait up to CLICKHOUSE_POOL_TIMEOUT seconds.
+    Async callers use the *_async methods, which run on the default executor
+    so the event loop never blocks on a socket or on the pool.
+    """
+
+    def __init__(self, size: Optional[int] = None, database: Optional[str] = None,
+                 retries: Optional[int] = None, stats: Optional[QueryStats] = None, **overrides):
+        self.size = size or int(os.getenv("CLICKHOUSE_POOL_SIZE", 4))
+        self.retries = int(os.getenv("CLICKHOUSE_RETRIES", 1)) if retries is None else retries
+        self.acquire_timeout = float(os.getenv("CLICKHOUSE_POOL_TIMEOUT", 30))
+        self.client_kwargs = dict(connection_settings(database), **overrides)
+        self.database = self.client_kwargs["database"]
+        self.stats = stats or QueryStats()
+
+        self._idle: "queue.LifoQueue[Client]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    # ------------------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------------------
+
+    def _acquire(self) -> "Client":
+        if self._closed:
+            raise RuntimeError("ClickHousePool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return driver().Client(**self.client_kwargs)
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No ClickHouse connection free after {self.acquire_timeout}s "
+                               f"(pool size {self.size})") from None
+
+    def _release(self, client: "Client", broken: bool = False):
+        if broken:
+            # The next query on this client reconnects from scratch
+            client.disconnect()
+        if self._closed:
+            client.disconnect()
+        else:
+            self._idle.put(client)
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator["Client"]:
+        """Borrow a raw client, e.g. for a multi-statement session"""
+        client = self._acquire()
+        broken = False
+        try:
+            yield client
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            self._release(client, broken)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def execute(self, query: str, params=None, **kwargs):
+        """Client.execute through a pooled connection, retrying reads on network errors"""
+        attempts = 1 + (self.retries if READ_ONLY_STATEMENT.match(query) else 0)
+        for attempt in range(attempts):
+            client = self._acquire()
+            start = time.perf_counter()
+            try:
+                result = client.execute(query, params, **kwargs)
+            except retryable_errors():
+                self._release(client, broken=True)
+                self.stats.record(query, time.perf_counter() - start, 0, error=True)
+                if attempt + 1 == attempts:
+                    raise
+                continue
+            except server_error():
+                # The server rejected the query; the connection itself is fine
+                self._release(client)
+                self.stats.record(query, time.perf_counter() - start, 0, error=True)
+                raise
+            except BaseException:
+                self._release(client, broken=True)
+                self.stats.record(query, time.perf_counter() - start, 0, error=True)
+                raise
+
+            elapsed = time.perf_counter() - start
+            # INSERTs return the number of rows written; with_column_types a (rows, types) pair
+            if isinstance(result, int):
+                rows = result
+            elif isinstance(result, tuple):
+                rows = len(result[0])
+            else:
+                rows = len(result)
+            self.stats.record(query, elapsed, rows, **_progress(client))
+            self._release(client)
+            return result
+
+    def execute_iter(self, query: str, params=None, **kwargs) -> Iterator[tuple]:
+        """
+        Stream rows block by block instead of materializing the result
+
+        The connection stays checked out until the iterator is exhausted or
+        closed; an abandoned stream still has data in flight, so its
+        connection is reset before going back to the pool.
+        """
+        attempts = 1 + self.retries
+        for attempt in range(attempts):
+            client = self._acquire()
+            start = time.perf_counter()
+            rows = 0
+            finished = False
+            try:
+                for row in client.execute_iter(query, params, **kwargs):
+                    rows += 1
+                    yield row
+                finished = True
+            except GeneratorExit:
+                # Caller stopped early
+                self.stats.record(query, time.perf_counter() - start, rows)
+                self._release(client, broken=True)
+                raise
+            except retryable_errors():
+                self.stats.record(query, time.perf_counter() - start, rows, error=True)
+                self._release(client, broken=True)
+                # Only safe to retry before anything reached the caller
+                if rows or attempt + 1 == attempts:
+                    raise
+                continue
+            except BaseException:
+                self.stats.record(query, time.perf_counter() - start, rows, error=True)
+                self._release(client, broken=True)
+                raise
+            finally:
+                if finished:
+                    self.stats.record(query, time.perf_counter() - start, rows, **_progress(client))
+                    self._release(client)
+            return
+
+    async def execute_async(self, query: str, params=None, **kwargs):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.execute, query, params, **kwargs))
+
+    async def execute_iter_async(self, query: str, params=None, **kwargs):
+        """Async generator over execute_iter; each block is fetched off the event loop"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        rows = self.execute_iter(query, params, **kwargs)
+        done = object()
+        try:
+            while True:
+                row = await loop.run_in_executor(None, next, rows, done)
+                if row is done:
+                    return
+                yield row
+        finally:
+            await loop.run_in_executor(None, rows.close)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().disconnect()
+            except queue.Empty:
+                break
+
+
+_default_pool: Optional[ClickHousePool] = None
+_default_lock = threading.Lock()
+
+
+def get_pool() -> ClickHousePool:
+    """Process-wide pool for CLICKHOUSE_DB, created on first use"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = ClickHousePool()
+        return _default_pool
+
+
+def main():
+    """Check connectivity and print the effective settings"""
+    pool = get_pool()
+    kwargs = dict(pool.client_kwargs, password="***" if pool.client_kwargs["password"] else "")
+    for key, value in kwargs.items():
+        print(f"  {key:<22} {value}")
+    version = pool.execute("SELECT version()")[0][0]
+    print(f"\n✓ Connected to ClickHouse {version} (database {pool.database})")
+
+
+if __name__ == "__main__":
+    main()
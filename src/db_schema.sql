@@ -24,26 +24,83 @@ CREATE TABLE IF NOT EXISTS aircraft_profiles (
 
     home_base_airport String,
     notes String,
-    last_updated DateTime DEFAULT now()
-) ENGINE = MergeTree()
+    last_updated DateTime DEFAULT now(),
+
+    -- Content hash used by seed_aircraft.py to upsert only changed rows
+    row_hash UInt64 DEFAULT 0,
+
+    -- Cargo family resolved once per profile (src/airlift.py AIRLIFT_TYPES,
+    -- same first-match order), so queries filter airlift aircraft without a
+    -- substring scan per position
+    airlift_family LowCardinality(String) MATERIALIZED
+        multiIf(position(aircraft_type, 'C-17') > 0, 'C-17',
+                position(aircraft_type, 'C-130') > 0, 'C-130',
+                position(aircraft_type, 'A400M') > 0, 'A400M',
+                position(aircraft_type, 'Il-76') > 0, 'Il-76',
+                position(aircraft_type, 'C-5') > 0, 'C-5',
+                position(aircraft_type, 'An-124') > 0, 'An-124',
+                '')
+) ENGINE = ReplacingMergeTree(last_updated)
 ORDER BY icao_hex;
 
--- Live position stream (high-volume, time-series optimized)
-CREATE TABLE IF NOT EXISTS flight_positions (
+-- Profile change log: services poll this to reload only affected ICAOs
+CREATE TABLE IF NOT EXISTS profile_changes (
+    changed_at DateTime64(3),
+    icao_hex String,
+    change Enum8('upsert' = 1, 'delete' = 2)
+) ENGINE = MergeTree()
+ORDER BY changed_at
+TTL toDateTime(changed_at) + INTERVAL 7 DAY;
+
+-- Aircraft outside aircraft_profiles picked up by callsign prefix or
+-- emergency squawk (src/callsign_matcher.py); one row per aircraft per poll,
+-- collapsed to the latest sighting
+CREATE TABLE IF NOT EXISTS discovered_aircraft (
+    last_seen DateTime,
+    first_seen DateTime,
+    icao_hex String,
+    callsign LowCardinality(String),
+    squawk LowCardinality(String),
+    origin_country LowCardinality(String),
+    match_kind Enum8('callsign' = 1, 'squawk' = 2),
+    match_pattern LowCardinality(String),
+    category LowCardinality(String),
+    sightings UInt32
+) ENGINE = ReplacingMergeTree(last_seen)
+ORDER BY icao_hex
+TTL last_seen + INTERVAL 90 DAY;
+
+-- User-defined regions (src/geofence.py); polygon vertices are (lat, lon),
+-- one ring, no holes, not crossing the antimeridian. Deleting a fence
+-- writes a newer row with active = 0
+CREATE TABLE IF NOT EXISTS geofences (
+    fence_id String,
+    name String,
+    owner LowCardinality(String),
+    polygon Array(Tuple(Float64, Float64)),
+    active UInt8,
+    updated_at DateTime
+) ENGINE = ReplacingMergeTree(updated_at)
+ORDER BY fence_id;
+
+-- Entry/exit of stored aircraft into geofences, written by the ingester
+-- when GEOFENCES=1
+CREATE TABLE IF NOT EXISTS geofence_events (
     timestamp DateTime,
+    fence_id String,
     icao_hex String,
     callsign String,
+    event Enum8('enter' = 1, 'exit' = 2),
     lat Float64,
-    lon Float64,
-    altitude Int32,
-    ground_speed Int32,
-    heading Int32,
-    vertical_rate Int32,
-    on_ground UInt8,
-    source String
+    lon Float64
 ) ENGINE = MergeTree()
-PARTITION BY toYYYYMMDD(timestamp)
-ORDER BY (icao_hex, timestamp);
+ORDER BY (fence_id, timestamp)
+TTL timestamp + INTERVAL 180 DAY;
+
+-- Live position stream (high-volume, time-series optimized)
+-- flight_positions is created by scripts/setup_db.py from src/schema.py
+-- (codecs, projection and retention TTLs are configured there; run
+-- `python src/schema.py` to print the DDL)
 
 -- Parsed flight events (takeoffs/landings)
 CREATE TABLE IF NOT EXISTS flight_events (
@@ -125,6 +182,8 @@ CREATE TABLE IF NOT EXISTS panic_scores (
     convergence_score Float32,
     airlift_score Float32,
     vip_movement_score Float32,
+    -- Sustained formations / tanker rendezvous (src/formation.py)
+    formation_score Float32 DEFAULT 0,
 
     -- Composite
     overall_panic_score Int32,
@@ -133,7 +192,13 @@ CREATE TABLE IF NOT EXISTS panic_scores (
     flight_count Int32,
     countries_involved Int32,
     top_3_airports Array(String),
-    narrative String
+    narrative String,
+
+    -- Trailing window the row was scored over (SCORE_WINDOWS); the
+    -- dashboard shows the 12h rows
+    window_hours UInt16 DEFAULT 12,
+    -- Overall score minus the next longer window's at the same timestamp
+    trend_delta Float32 DEFAULT 0
 ) ENGINE = MergeTree()
 ORDER BY (timestamp, region);
 
@@ -148,3 +213,25 @@ CREATE TABLE IF NOT EXISTS known_events (
     notes String
 ) ENGINE = MergeTree()
 ORDER BY event_date;
+
+-- Position reports held back by the ingester's quality filter
+-- (src/quality.py), as they arrived, with the reason and its measure:
+-- implied speed (m/s) for teleports, distance (m) between duplicates,
+-- the offending altitude or velocity for range checks
+CREATE TABLE IF NOT EXISTS position_quarantine (
+    timestamp DateTime,
+    icao_hex String,
+    callsign LowCardinality(String),
+    lat Float64,
+    lon Float64,
+    altitude Int32,
+    ground_speed Int32,
+    vertical_rate Int32,
+    on_ground UInt8,
+    source LowCardinality(String),
+    reason LowCardinality(String),
+    detail Float32
+) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(timestamp)
+ORDER BY (reason, icao_hex, timestamp)
+TTL timestamp + INTERVAL 30 DAY;
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Formation and refuelling rendezvous detection
+Finds pairs of tracked aircraft that stayed within FORMATION_DISTANCE_KM
+horizontally and FORMATION_ALTITUDE_FT vertically for at least
+FORMATION_MIN_MINUTES, e.g. a KC-135 and a B-52 flying together for 40
+minutes. A pair with exactly one tanker is a refuelling rendezvous; any
+other pair is a formation.
+
+The window is cut into BUCKET_SECONDS time slices with one position per
+aircraft per slice. Within a slice, positions are sorted by
+(latitude band, longitude) so every aircraft only looks forward along its
+own band and the next one, over a longitude span of one threshold distance
+(a sweep line). Each step is a numpy pass over the whole window at once.
+
+Positions are not wrapped across the antimeridian.
+"""
+
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from tracks import SLICE_SECONDS, PositionColumns
+
+# Tanker types (substring match against aircraft_type, like airlift.AIRLIFT_TYPES)
+TANKER_TYPES = ["KC-135", "KC-46", "KC-10", "KC-130", "MRTT", "Il-78", "Voyager"]
+
+FORMATION_DISTANCE_KM = 3.0
+FORMATION_ALTITUDE_FT = 1500
+FORMATION_MIN_MINUTES = 20
+
+# Time slice (one report per aircraft, see PositionColumns) and how far
+# apart within it two reports may be (seconds)
+BUCKET_SECONDS = SLICE_SECONDS
+MAX_SKEW_SECONDS = 30
+# Missing slices tolerated inside one encounter (dropped polls)
+MAX_GAP_BUCKETS = 2
+# Slices joined per numpy pass; bounds the temporaries to about an hour of reports
+CHUNK_BUCKETS = 60
+
+KM_PER_DEGREE = 111.32
+FEET_PER_METRE = 3.28084
+
+
+class Encounter(NamedTuple):
+    kind: str  # "rendezvous" or "formation"
+    icao_a: str
+    icao_b: str
+    type_a: str
+    type_b: str
+    country_a: str
+    country_b: str
+    start: float  # epoch seconds
+    minutes: float
+    lat: float
+    lon: float
+
+
+def detect_formations(positions: PositionColumns, since: Optional[float] = None,
+                      distance_km: float = FORMATION_DISTANCE_KM,
+                      altitude_ft: float = FORMATION_ALTITUDE_FT,
+                      min_minutes: float = FORMATION_MIN_MINUTES) -> List[Encounter]:
+    """Sustained close pairs among reports at or after `since` (epoch seconds)"""
+    if not len(positions):
+        return []
+    runs = detect_encounters(*positions.columns(since), distance_km, altitude_ft, min_minutes)
+    encounters = []
+    for a, b, start, minutes, lat, lon in runs:
+        icao_a, type_a, country_a = positions.aircraft[a]
+        icao_b, type_b, country_b = positions.aircraft[b]
+        tankers = is_tanker(type_a) + is_tanker(type_b)
+        encounters.append(Encounter(
+            "rendezvous" if tankers == 1 else "formation",
+            icao_a, icao_b, type_a, type_b, country_a, country_b, start, minutes, lat, lon,
+        ))
+    return encounters
+
+
+def is_tanker(aircraft_type: str) -> bool:
+    return any(t in aircraft_type for t in TANKER_TYPES)
+
+
+def _expand(starts: np.ndarray, counts: np.ndarray):
+    """For ranges [start, start+count): (owning range index, flat position) per element"""
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, np.repeat(starts, counts) + offsets
+
+
+def close_pairs(buckets: np.ndarray, times: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                altitudes: np.ndarray, distance_km: float, altitude_ft: float):
+    """
+    (i, j) index pairs, i != j, in the same bucket and within the distance,
+    altitude (metres in, feet threshold) and MAX_SKEW_SECONDS limits
+    """
+    lats, lons, altitudes = (np.asarray(a, dtype=np.float64) for a in (lats, lons, altitudes))
+    band_degrees = distance_km / KM_PER_DEGREE
+    bands = np.floor(lats / band_degrees).astype(np.int64)
+    bands_per_bucket = int(np.ceil(180 / band_degrees)) + 4
+    groups = (buckets - buckets.min()) * bands_per_bucket + (bands - bands.min())
+    # One sortable float: group, then longitude (0..360, well under the 1000 step)
+    keys = groups * 1000.0 + (lons + 180.0)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+
+    # Longitude span of the threshold, widened to the band's poleward edge
+    span = distance_km / (KM_PER_DEGREE * np.maximum(
+        np.cos(np.radians(np.minimum(np.abs(lats[order]) + band_degrees, 89.9))), 1e-3))
+
+    # Same band: forward from i only, so each pair is seen once
+    hi_same = np.searchsorted(keys, keys + span, side="right")
+    starts_same = np.arange(1, len(keys) + 1)
+    # Next band up: the whole longitude window
+    above = keys + 1000.0
+    lo_next = np.searchsorted(keys, above - span, side="left")
+    hi_next = np.searchsorted(keys, above + span, side="right")
+
+    left_same, right_same = _expand(starts_same, np.maximum(hi_same - starts_same, 0))
+    left_next, right_next = _expand(lo_next, hi_next - lo_next)
+    left = order[np.concatenate([left_same, left_next])]
+    right = order[np.concatenate([right_same, right_next])]
+
+    mean_lat = np.radians((lats[left] + lats[right]) / 2)
+    dx = (lons[right] - lons[left]) * np.cos(mean_lat) * KM_PER_DEGREE
+    dy = (lats[right] - lats[left]) * KM_PER_DEGREE
+    close = ((dx * dx + dy * dy <= distance_km * distance_km)
+             & (np.abs(altitudes[right] - altitudes[left]) * FEET_PER_METRE <= altitude_ft)
+             & (np.abs(times[right] - times[left]) <= MAX_SKEW_SECONDS))
+    return left[close], right[close]
+
+
+def detect_encounters(ids: np.ndarray, times: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                      altitudes: np.ndarray, distance_km: float = FORMATION_DISTANCE_KM,
+                      altitude_ft: float = FORMATION_ALTITUDE_FT,
+                      min_minutes: float = FORMATION_MIN_MINUTES) -> List[tuple]:
+    """
+    Sustained encounters as (id_a, id_b, start, minutes, lat, lon) with
+    id_a < id_b, ordered by (id_a, id_b, start); lat/lon is the mean
+    midpoint of the pair over the encounter
+    """
+    if not len(ids):
+        return []
+
+    # One report per aircraft per bucket: the earliest
+    buckets = (times // BUCKET_SECONDS).astype(np.int32)
+    order = np.lexsort((times, ids, buckets))
+    ids, buckets = ids[order], buckets[order]
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = (ids[1:] != ids[:-1]) | (buckets[1:] != buckets[:-1])
+    keep = order[first]
+    ids, buckets = ids[first], buckets[first]
+    times, lats, lons, altitudes = times[keep], lats[keep], lons[keep], altitudes[keep]
+
+    # Pairs never span buckets, so the join runs chunk by chunk
+    bounds = np.searchsorted(buckets, np.arange(buckets[0], buckets[-1] + CHUNK_BUCKETS, CHUNK_BUCKETS))
+    lefts, rights = [], []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if hi - lo < 2:
+            continue
+        chunk = slice(lo, hi)
+        left, right = close_pairs(buckets[chunk], times[chunk], lats[chunk], lons[chunk],
+                                  altitudes[chunk], distance_km, altitude_ft)
+        lefts.append(left + lo)
+        rights.append(right + lo)
+    if not lefts:
+        return []
+    left, right = np.concatenate(lefts), np.concatenate(rights)
+    if not len(left):
+        return []
+
+    a = np.minimum(ids[left], ids[right])
+    b = np.maximum(ids[left], ids[right])
+    pair_buckets = buckets[left]
+    mid_lat = (lats[left].astype(np.float64) + lats[right]) / 2
+    mid_lon = (lons[left].astype(np.float64) + lons[right]) / 2
+
+    order = np.lexsort((pair_buckets, b, a))
+    a, b, pair_buckets = a[order], b[order], pair_buckets[order]
+    mid_lat, mid_lon = mid_lat[order], mid_lon[order]
+
+    # A run breaks on a new pair or more than MAX_GAP_BUCKETS missing slices
+    breaks = np.ones(len(a), dtype=bool)
+    breaks[1:] = ((a[1:] != a[:-1]) | (b[1:] != b[:-1])
+                  | (pair_buckets[1:] - pair_buckets[:-1] > MAX_GAP_BUCKETS + 1))
+    starts = np.flatnonzero(breaks)
+    ends = np.append(starts[1:], len(a)) - 1
+    minutes = (pair_buckets[ends] - pair_buckets[starts] + 1) * BUCKET_SECONDS / 60
+    sustained = minutes >= min_minutes
+    if not sustained.any():
+        return []
+
+    counts = ends - starts + 1
+    lat_means = np.add.reduceat(mid_lat, starts) / counts
+    lon_means = np.add.reduceat(mid_lon, starts) / counts
+    return [
+        (int(a[s]), int(b[s]), float(int(pair_buckets[s]) * BUCKET_SECONDS), float(m), float(lat), float(lon))
+        for s, m, lat, lon in zip(starts[sustained], minutes[sustained],
+                                  lat_means[sustained], lon_means[sustained])
+    ]
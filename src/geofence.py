@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Geofences: user-defined regions checked against every stored position batch
+
+Fences are simple polygons (one ring of lat/lon vertices) kept in the
+geofences table. FenceIndex buckets them into a lat/lon grid. A grid cell
+that no fence edge touches is either wholly inside that fence (a "full"
+entry, no test needed) or outside it (no entry). A cell the boundary crosses
+keeps only the edges in its latitude band. Classifying a batch is then all
+numpy:
+
+1. cell key per point, looked up with searchsorted
+2. expand to (point, fence) candidates and accept the full-cell ones
+3. one ray-casting pass over the banded edges of the remaining candidates
+
+GeofenceTracker turns successive batches into per-fence entry/exit events,
+and GeofencePublisher hooks this into the ingester like the live fan-out
+publishers, writing events to geofence_events.
+
+Longitudes are not wrapped: fences must not cross the antimeridian.
+
+    python src/geofence.py add --name "Brussels" --owner me --polygon "50.7,4.2 50.95,4.2 50.95,4.55 50.7,4.55"
+    python src/geofence.py list
+    python src/geofence.py delete <fence_id>
+"""
+
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_CELL_DEGREES = 0.25
+
+# icao (24 bits) is packed below the fence index in tracker state keys
+ICAO_BITS = 24
+
+# Cells are widened by this much when matching edges, so a point that floor()
+# puts in a cell is never a rounding error outside that cell's band
+CELL_SLACK = 1e-9
+
+
+def polygon_edges(polygon: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """(lat, lon) ring -> (k, 4) array of x1, y1, x2, y2 edges (x = lon, y = lat), closed"""
+    points = np.asarray(polygon, dtype=np.float64)
+    if len(points) < 3:
+        raise ValueError("A fence needs at least 3 vertices")
+    if np.array_equal(points[0], points[-1]):
+        points = points[:-1]
+    x, y = points[:, 1], points[:, 0]
+    return np.column_stack([x, y, np.roll(x, -1), np.roll(y, -1)])
+
+
+def points_in_edges(px: np.ndarray, py: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Even-odd ray casting of every point against one polygon's edges"""
+    x1, y1, x2, y2 = (edges[:, i][None, :] for i in range(4))
+    px, py = px[:, None], py[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crosses = ((y1 > py) != (y2 > py)) & (px < (x2 - x1) * (py - y1) / (y2 - y1) + x1)
+    return (crosses.sum(axis=1) & 1).astype(bool)
+
+
+def _expand(starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """For ranges [start, start+count): (owning range index, flat position) per element"""
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, np.repeat(starts, counts) + offsets
+
+
+class FenceIndex:
+    """Grid-cell -> fence index with per-cell edge lists for vectorized classification"""
+
+    def __init__(self, fences: Sequence[Dict], cell_degrees: float = DEFAULT_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.fence_ids = [f["fence_id"] for f in fences]
+        self.fences = list(fences)
+        # Cell keys: row * COLUMNS + column, both offset to be non-negative
+        self.columns = int(np.ceil(360 / cell_degrees)) + 2
+
+        entry_keys, entry_fence, entry_full, entry_edge_start, entry_edge_end = [], [], [], [], []
+        edge_blocks, edge_count = [], 0
+
+        for fence_idx, fence in enumerate(fences):
+            edges = polygon_edges(fence["polygon"])
+            ex_min, ex_max = np.minimum(edges[:, 0], edges[:, 2]), np.maximum(edges[:, 0], edges[:, 2])
+            ey_min, ey_max = np.minimum(edges[:, 1], edges[:, 3]), np.maximum(edges[:, 1], edges[:, 3])
+
+            r0, r1 = self._cell(ey_min.min()), self._cell(ey_max.max())
+            c0, c1 = self._cell(ex_min.min()), self._cell(ex_max.max())
+            cols = np.arange(c0, c1 + 1)
+            x_lo, x_hi = cols * cell_degrees - CELL_SLACK, (cols + 1) * cell_degrees + CELL_SLACK
+
+            for row in range(r0, r1 + 1):
+                y_lo, y_hi = row * cell_degrees - CELL_SLACK, (row + 1) * cell_degrees + CELL_SLACK
+                band = (ey_min <= y_hi) & (ey_max >= y_lo)
+                # A cell is on the boundary when an edge's bounding box overlaps it
+                touched = ((ex_min[band][None, :] <= x_hi[:, None])
+                           & (ex_max[band][None, :] >= x_lo[:, None])).any(axis=1)
+                keys = (row + self.columns // 2) * self.columns + cols + self.columns // 2
+
+                if touched.any():
+                    band_edges = edges[band]
+                    edge_blocks.append(band_edges)
+                    start, edge_count = edge_count, edge_count + len(band_edges)
+                    n = int(touched.sum())
+                    entry_keys.append(keys[touched])
+                    entry_fence.append(np.full(n, fence_idx))
+                    entry_full.append(np.zeros(n, dtype=bool))
+                    entry_edge_start.append(np.full(n, start))
+                    entry_edge_end.append(np.full(n, edge_count))
+
+                # Untouched cells are wholly inside or wholly outside: test the centre
+                clear = ~touched
+                if clear.any():
+                    centres_x = (cols[clear] + 0.5) * cell_degrees
+                    centres_y = np.full(len(centres_x), (row + 0.5) * cell_degrees)
+                    inside = points_in_edges(centres_x, centres_y, edges)
+                    n = int(inside.sum())
+                    if n:
+                        entry_keys.append(keys[clear][inside])
+                        entry_fence.append(np.full(n, fence_idx))
+                        entry_full.append(np.ones(n, dtype=bool))
+                        entry_edge_start.append(np.zeros(n, dtype=np.int64))
+                        entry_edge_end.append(np.zeros(n, dtype=np.int64))
+
+        def concat(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+        keys = concat(entry_keys, np.int64)
+        order = np.argsort(keys, kind="stable")
+        self.entry_fence = concat(entry_fence, np.int64)[order]
+        self.entry_full = concat(entry_full, bool)[order]
+        self.entry_edge_start = concat(entry_edge_start, np.int64)[order]
+        self.entry_edge_end = concat(entry_edge_end, np.int64)[order]
+        self.edges = np.concatenate(edge_blocks) if edge_blocks else np.zeros((0, 4))
+
+        keys = keys[order]
+        self.cell_keys, self.cell_start, counts = np.unique(keys, return_index=True, return_counts=True)
+        self.cell_end = self.cell_start + counts
+
+        # Counters from the last classify() call
+        self.last_candidates = 0
+        self.last_edge_tests = 0
+
+    def _cell(self, degrees: float) -> int:
+        return int(np.floor(degrees / self.cell_degrees))
+
+    def cell_keys_for(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        half = self.columns // 2
+        rows = np.floor(lats / self.cell_degrees).astype(np.int64) + half
+        cols = np.floor(lons / self.cell_degrees).astype(np.int64) + half
+        return rows * self.columns + cols
+
+    def classify(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(point index, fence index) for every point inside every fence"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if not len(self.cell_keys) or not len(lats):
+            self.last_candidates = self.last_edge_tests = 0
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        keys = self.cell_keys_for(lats, lons)
+        pos = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+        hit = self.cell_keys[pos] == keys
+        counts = np.where(hit, self.cell_end[pos] - self.cell_start[pos], 0)
+        point, entry = _expand(self.cell_start[pos], counts)
+        self.last_candidates = len(entry)
+
+        full = self.entry_full[entry]
+        inside_points, inside_entries = [point[full]], [entry[full]]
+
+        b_point, b_entry = point[~full], entry[~full]
+        edge_counts = self.entry_edge_end[b_entry] - self.entry_edge_start[b_entry]
+        pair, edge = _expand(self.entry_edge_start[b_entry], edge_counts)
+        self.last_edge_tests = len(edge)
+        if len(edge):
+            px, py = lons[b_point][pair], lats[b_point][pair]
+            x1, y1, x2, y2 = self.edges[edge].T
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crosses = ((y1 > py) != (y2 > py)) & (px < (x2 - x1) * (py - y1) / (y2 - y1) + x1)
+            odd = np.bincount(pair, weights=crosses, minlength=len(b_entry)).astype(np.int64) & 1
+            inside = odd.astype(bool)
+            inside_points.append(b_point[inside])
+            inside_entries.append(b_entry[inside])
+
+        points = np.concatenate(inside_points)
+        return points, self.entry_fence[np.concatenate(inside_entries)]
+
+
+class GeofenceTracker:
+    """Inside/outside state per (fence, aircraft), turned into entry and exit events"""
+
+    def __init__(self, index: FenceIndex):
+        self.index = index
+        # Sorted keys fence_index << ICAO_BITS | icao for pairs currently inside
+        self.inside = np.zeros(0, dtype=np.int64)
+
+    def replace_index(self, index: FenceIndex):
+        """Swap in reloaded fences, keeping state for fences that still exist"""
+        new_position = {fence_id: i for i, fence_id in enumerate(index.fence_ids)}
+        remap = np.array([new_position.get(fence_id, -1) for fence_id in self.index.fence_ids] or [0],
+                         dtype=np.int64)
+        fences = remap[self.inside >> ICAO_BITS]
+        icaos = self.inside & ((1 << ICAO_BITS) - 1)
+        keep = fences >= 0
+        self.inside = np.sort((fences[keep] << ICAO_BITS) | icaos[keep])
+        self.index = index
+
+    def update(self, icaos: np.ndarray, lats: np.ndarray, lons: np.ndarray
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Classify one batch. Returns the row index into the batch for every
+        event, the fence index, and +1 for an entry / -1 for an exit.
+        Aircraft missing from the batch keep their state; an aircraft with
+        several rows (sharded ingest flushes) counts as inside if any row is.
+        """
+        icaos = np.asarray(icaos, dtype=np.int64)
+        point, fence = self.index.classify(lats, lons)
+        now = np.unique((fence << ICAO_BITS) | icaos[point])
+
+        previously = self.inside[np.isin(self.inside & ((1 << ICAO_BITS) - 1), icaos)]
+        entered = np.setdiff1d(now, previously, assume_unique=True)
+        exited = np.setdiff1d(previously, now, assume_unique=True)
+        self.inside = np.union1d(np.setdiff1d(self.inside, exited, assume_unique=True), entered)
+
+        keys = np.concatenate([entered, exited])
+        kinds = np.concatenate([np.ones(len(entered), dtype=np.int8), -np.ones(len(exited), dtype=np.int8)])
+        # Row of each event's aircraft in this batch
+        order = np.argsort(icaos, kind="stable")
+        rows = order[np.searchsorted(icaos[order], keys & ((1 << ICAO_BITS) - 1))]
+        return rows, keys >> ICAO_BITS, kinds
+
+
+def load_fences(ch_client) -> List[Dict]:
+    result = ch_client.execute(
+        """
+        SELECT fence_id, name, owner, polygon
+        FROM geofences FINAL
+        WHERE active = 1
+        ORDER BY fence_id
+        """
+    )
+    return [{"fence_id": fence_id, "name": name, "owner": owner, "polygon": list(polygon)}
+            for fence_id, name, owner, polygon in result]
+
+
+class GeofencePublisher:
+    """Ingester publisher: classify each stored batch and record entry/exit events"""
+
+    def __init__(self, ch_client, refresh_seconds: Optional[int] = None,
+                 cell_degrees: Optional[float] = None):
+        self.ch_client = ch_client
+        self.refresh_seconds = int(os.getenv("GEOFENCE_REFRESH_SECONDS", 60)) if refresh_seconds is None else refresh_seconds
+        self.cell_degrees = cell_degrees or float(os.getenv("GEOFENCE_CELL_DEGREES", DEFAULT_CELL_DEGREES))
+        self.version = None
+        self.checked_at = 0.0
+        self.tracker = GeofenceTracker(FenceIndex([], self.cell_degrees))
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the index when the geofences table changed"""
+        self.checked_at = time.monotonic()
+        try:
+            version = self.ch_client.execute("SELECT count(), max(updated_at) FROM geofences")[0]
+            if version == self.version:
+                return
+            fences = load_fences(self.ch_client)
+        except Exception as e:
+            print(f"Warning: Could not load geofences: {e}")
+            return
+        self.tracker.replace_index(FenceIndex(fences, self.cell_degrees))
+        self.version = version
+        print(f"  Loaded {len(fences)} geofences")
+
+    def publish(self, rows: List[Dict]):
+        if time.monotonic() - self.checked_at >= self.refresh_seconds:
+            self.refresh()
+        if not rows or not self.tracker.index.fence_ids:
+            return
+
+        try:
+            event_rows, fences, kinds = self.tracker.update(
+                [int(r["icao_hex"], 16) for r in rows],
+                [r["lat"] for r in rows],
+                [r["lon"] for r in rows],
+            )
+            if not len(event_rows):
+                return
+            fence_ids = self.tracker.index.fence_ids
+            self.ch_client.execute(
+                """
+                INSERT INTO geofence_events
+                (timestamp, fence_id, icao_hex, callsign, event, lat, lon)
+                VALUES
+                """,
+                [{
+                    "timestamp": rows[i]["timestamp"],
+                    "fence_id": fence_ids[f],
+                    "icao_hex": rows[i]["icao_hex"],
+                    "callsign": rows[i]["callsign"],
+                    "event": "enter" if kind > 0 else "exit",
+                    "lat": rows[i]["lat"],
+                    "lon": rows[i]["lon"],
+                } for i, f, kind in zip(event_rows.tolist(), fences.tolist(), kinds.tolist())]
+            )
+        except Exception as e:
+            # Fences are best-effort; never hold up ingestion
+            print(f"  Warning: geofence check failed: {e}")
+
+
+def parse_polygon(text: str) -> List[Tuple[float, float]]:
+    """'lat,lon lat,lon ...' -> [(lat, lon), ...]"""
+    polygon = []
+    for pair in text.replace(";", " ").split():
+        lat, lon = (float(v) for v in pair.split(","))
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Vertex out of range: {pair}")
+        polygon.append((lat, lon))
+    polygon_edges(polygon)
+    return polygon
+
+
+def main():
+    import argparse
+    from db import get_pool
+
+    parser = argparse.ArgumentParser(description="Manage geofences")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Create a fence")
+    add.add_argument("--name", required=True)
+    add.add_argument("--owner", default="")
+    add.add_argument("--polygon", required=True, help='"lat,lon lat,lon ..." (at least 3 vertices)')
+    commands.add_parser("list", help="List active fences")
+    delete = commands.add_parser("delete", help="Deactivate a fence")
+    delete.add_argument("fence_id")
+    args = parser.parse_args()
+
+    client = get_pool()
+    now = datetime.now(timezone.utc)
+
+    if args.command == "add":
+        fence_id = uuid.uuid4().hex[:12]
+        client.execute(
+            "INSERT INTO geofences (fence_id, name, owner, polygon, active, updated_at) VALUES",
+            [{"fence_id": fence_id, "name": args.name, "owner": args.owner,
+              "polygon": parse_polygon(args.polygon), "active": 1, "updated_at": now}]
+        )
+        print(f"✓ Created fence {fence_id} ({args.name})")
+    elif args.command == "list":
+        for fence in load_fences(client):
+            print(f"  {fence['fence_id']}  {fence['name']:<30} {fence['owner']:<16} "
+                  f"{len(fence['polygon'])} vertices")
+    else:
+        fences = {f["fence_id"]: f for f in load_fences(client)}
+        if args.fence_id not in fences:
+            print(f"✗ No active fence {args.fence_id}")
+            raise SystemExit(1)
+        fence = fences[args.fence_id]
+        client.execute(
+            "INSERT INTO geofences (fence_id, name, owner, polygon, active, updated_at) VALUES",
+            [dict(fence, active=0, updated_at=now)]
+        )
+        print(f"✓ Deactivated fence {args.fence_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,41 +2,168 @@
 """
 OpenSky Network data ingestion pipeline
 Polls OpenSky API and stores gov/mil/VIP aircraft positions to ClickHouse
+Aircraft outside the curated list are also kept when their callsign or
+squawk gives them away (see callsign_matcher.py)
 """
 
 import os
 import time
 import requests
-from datetime import datetime, timezone
-from typing import List, Dict, Optional
-from clickhouse_driver import Client
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Dict, Optional
 from dotenv import load_dotenv
 
+from callsign_matcher import CallsignMatcher
+from db import get_pool
+from latest_state import LatestStateWriter
+from live_fanout import LivePublisher
+from profiling import get_profiler
+from quality import QUARANTINE_COLUMNS, PositionFilter
+
 load_dotenv()
 
+# Overridable for mirrors and the simulation harness's mock server
+OPENSKY_URL = os.getenv("OPENSKY_URL", "https://opensky-network.org/api")
+
+# profiles_synced_at before any profile change (ClickHouse DateTime starts here)
+PROFILES_EPOCH = datetime(1970, 1, 1)
+
+
+def request_opensky(endpoint: str, params: Optional[Dict] = None,
+                    auth: Optional[tuple] = None) -> Optional[requests.Response]:
+    """GET an OpenSky API endpoint; None (after logging) on any request error"""
+    try:
+        response = requests.get(f"{OPENSKY_URL}/{endpoint}", params=params, auth=auth, timeout=30)
+        response.raise_for_status()
+        return response
+    except requests.exceptions.RequestException as e:
+        print(f"API request failed: {e}")
+        return None
+
+
+def parse_states(data: Optional[Dict]) -> List[Dict]:
+    """
+    OpenSky states/all payload -> list of aircraft states with fields:
+    - icao24, callsign, origin_country, time_position, last_contact
+    - longitude, latitude, baro_altitude, on_ground, velocity
+    - true_track, vertical_rate, geo_altitude, squawk
+    """
+    if not data or not data.get("states"):
+        return []
+
+    # Parse state vectors into dicts
+    states = []
+    for state in data["states"]:
+        if state is None:
+            continue
+
+        # State vector indices per OpenSky API docs
+        states.append({
+            "icao24": state[0],
+            "callsign": state[1].strip() if state[1] else "",
+            "origin_country": state[2],
+            "time_position": state[3],
+            "last_contact": state[4],
+            "longitude": state[5],
+            "latitude": state[6],
+            "baro_altitude": state[7],
+            "on_ground": state[8],
+            "velocity": state[9],
+            "true_track": state[10],
+            "vertical_rate": state[11],
+            "geo_altitude": state[13],
+            "squawk": state[14],
+        })
+
+    return states
+
+
+def build_position_rows(states: List[Dict], timestamp: datetime) -> List[Dict]:
+    """flight_positions rows for states with a known position"""
+    rows = []
+    for state in states:
+        # Skip if missing critical data
+        if state["latitude"] is None or state["longitude"] is None:
+            continue
+
+        # Rounded, not int(): truncation turned -0.6 m/s into 0 and -3.9 into -3
+        altitude = state["baro_altitude"] if state["baro_altitude"] is not None else state.get("geo_altitude")
+        rows.append({
+            "timestamp": timestamp,
+            "icao_hex": state["icao24"].upper(),
+            "callsign": state["callsign"],
+            "lat": state["latitude"],
+            "lon": state["longitude"],
+            "altitude": round(altitude) if altitude is not None else 0,
+            "ground_speed": round(state["velocity"]) if state["velocity"] is not None else 0,
+            "heading": round(state["true_track"]) % 360 if state["true_track"] is not None else 0,
+            "vertical_rate": round(state["vertical_rate"]) if state["vertical_rate"] is not None else 0,
+            "on_ground": 1 if state["on_ground"] else 0,
+            "source": state.get("source", "opensky"),
+            "squawk": state["squawk"] or "",
+        })
+    return rows
+
 
 class OpenSkyIngester:
     """Ingests aircraft position data from OpenSky Network API"""
 
-    BASE_URL = "https://opensky-network.org/api"
+    BASE_URL = OPENSKY_URL
 
-    def __init__(self):
+    def __init__(self, ch_client=None, latest_state: bool = True,
+                 clock: Optional[Callable[[], datetime]] = None):
         self.username = os.getenv("OPENSKY_USERNAME")
         self.password = os.getenv("OPENSKY_PASSWORD")
 
-        # ClickHouse connection
-        self.ch_client = Client(
-            host=os.getenv("CLICKHOUSE_HOST", "localhost"),
-            port=int(os.getenv("CLICKHOUSE_PORT", 9000)),
-            database=os.getenv("CLICKHOUSE_DB", "airplane_watch"),
-            user=os.getenv("CLICKHOUSE_USER", "default"),
-            password=os.getenv("CLICKHOUSE_PASSWORD", "")
-        )
-
-        # Cache of tracked ICAO hex codes (gov/mil/VIP only)
+        # ClickHouse connection (injectable for benchmarks and dry runs)
+        self.ch_client = ch_client or get_pool()
+        # Timestamps for stored rows (injectable for simulated time)
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+
+        # Plausibility, duplicate and jump checks before storage (quality.py)
+        self.quality = PositionFilter() if os.getenv("POSITION_FILTER", "1") != "0" else None
+        self.quarantined = 0
+
+        # Downstream consumers of each stored batch (e.g. live map fan-out)
+        self.publishers = []
+        if os.getenv("LIVE_FANOUT_URL"):
+            self.publishers.append(LivePublisher(os.getenv("LIVE_FANOUT_URL")))
+        if os.getenv("GEOFENCES", "0") == "1":
+            from geofence import GeofencePublisher
+            self.publishers.append(GeofencePublisher(self.ch_client))
+
+        # Cache of tracked ICAO hex codes (gov/mil/VIP only), kept current
+        # from profile_changes rather than reloaded wholesale
+        self.profile_refresh_seconds = int(os.getenv("PROFILE_REFRESH_SECONDS", 60))
+        # changed_at comes from the seeder's clock, so a change can become
+        # visible after later ones (concurrent seeders, clock skew): every
+        # refresh re-reads this far behind the newest change it has seen
+        self.profile_change_overlap = timedelta(seconds=int(os.getenv("PROFILE_CHANGE_OVERLAP_SECONDS", 600)))
+        self.profiles_synced_at = self._latest_profile_change()
+        self.recent_profile_changes = set()
+        self.profiles_checked_at = time.monotonic()
         self.tracked_aircraft = self._load_tracked_aircraft()
         print(f"Loaded {len(self.tracked_aircraft)} tracked aircraft from database")
 
+        # Untracked aircraft promoted by callsign prefix / emergency squawk:
+        # icao_hex -> [first_seen, sightings]
+        self.matcher = CallsignMatcher() if os.getenv("DISCOVER_AIRCRAFT", "1") != "0" else None
+        self.discovered = self._load_discovered_aircraft() if self.matcher else {}
+
+        # Shared-memory latest position per stored aircraft for same-host
+        # readers, with headroom for aircraft discovered while running. The
+        # table has a single writer, so sharded workers pass latest_state=False
+        if latest_state and os.getenv("LATEST_STATE_PATH"):
+            self.publishers.append(
+                LatestStateWriter(os.getenv("LATEST_STATE_PATH"),
+                                  capacity=len(self.tracked_aircraft) + len(self.discovered) + 1024)
+            )
+
+        # Per-aircraft activity profiles for the scorer; one writer, like the table above
+        if latest_state and os.getenv("ACTIVITY_PROFILES"):
+            from activity import ActivityPublisher
+            self.publishers.append(ActivityPublisher(os.getenv("ACTIVITY_PROFILES")))
+
     def _load_tracked_aircraft(self) -> set:
         """Load ICAO hex codes of aircraft we care about from aircraft_profiles table"""
         try:
@@ -47,21 +174,77 @@ class OpenSkyIngester:
             print("Make sure to populate aircraft_profiles table with seed data")
             return set()
 
+    def _load_discovered_aircraft(self) -> Dict[str, list]:
+        try:
+            result = self.ch_client.execute(
+                "SELECT icao_hex, first_seen, sightings FROM discovered_aircraft FINAL"
+            )
+            return {icao_hex.lower(): [first_seen, sightings] for icao_hex, first_seen, sightings in result}
+        except Exception as e:
+            print(f"Warning: Could not load discovered_aircraft: {e}")
+            return {}
+
+    def _latest_profile_change(self) -> datetime:
+        try:
+            result = self.ch_client.execute("SELECT max(changed_at) FROM profile_changes")
+            if result and result[0][0]:
+                return result[0][0]
+        except Exception as e:
+            print(f"Warning: Could not read profile_changes: {e}")
+        return PROFILES_EPOCH
+
+    def refresh_tracked_aircraft(self) -> int:
+        """
+        Apply profile changes recorded since the last refresh (per-ICAO
+        reload); returns how many were new
+
+        The overlap is replayed in changed_at order with any late arrivals
+        among it, so the tracked set ends as if every change had been seen
+        in order. Applying a change twice is harmless.
+        """
+        since = max(self.profiles_synced_at - self.profile_change_overlap, PROFILES_EPOCH)
+        try:
+            result = self.ch_client.execute(
+                """
+                SELECT changed_at, icao_hex, change
+                FROM profile_changes
+                WHERE changed_at > %(since)s
+                ORDER BY changed_at
+                """,
+                {"since": since}
+            )
+        except Exception as e:
+            print(f"Warning: Could not refresh tracked aircraft: {e}")
+            return 0
+
+        seen, new = set(), 0
+        for changed_at, icao_hex, change in result:
+            if change == "delete":
+                self.tracked_aircraft.discard(icao_hex.lower())
+            else:
+                self.tracked_aircraft.add(icao_hex.lower())
+            seen.add((changed_at, icao_hex, change))
+            new += (changed_at, icao_hex, change) not in self.recent_profile_changes
+            self.profiles_synced_at = max(self.profiles_synced_at, changed_at)
+        self.recent_profile_changes = seen
+
+        if new:
+            print(f"  Applied {new} profile changes ({len(self.tracked_aircraft)} tracked)")
+        return new
+
+    def refresh_if_due(self):
+        if time.monotonic() - self.profiles_checked_at >= self.profile_refresh_seconds:
+            self.refresh_tracked_aircraft()
+            self.profiles_checked_at = time.monotonic()
+
     def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
         """Make authenticated request to OpenSky API with rate limiting"""
-        url = f"{self.BASE_URL}/{endpoint}"
-
         auth = None
         if self.username and self.password:
             auth = (self.username, self.password)
 
-        try:
-            response = requests.get(url, params=params, auth=auth, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"API request failed: {e}")
-            return None
+        response = request_opensky(endpoint, params, auth)
+        return response.json() if response is not None else None
 
     def get_all_states(self, icao24_filter: Optional[List[str]] = None) -> List[Dict]:
         """
@@ -79,34 +262,7 @@ class OpenSkyIngester:
 
         data = self._make_request("states/all", params)
 
-        if not data or "states" not in data:
-            return []
-
-        # Parse state vectors into dicts
-        states = []
-        for state in data["states"]:
-            if state is None:
-                continue
-
-            # State vector indices per OpenSky API docs
-            states.append({
-                "icao24": state[0],
-                "callsign": state[1].strip() if state[1] else "",
-                "origin_country": state[2],
-                "time_position": state[3],
-                "last_contact": state[4],
-                "longitude": state[5],
-                "latitude": state[6],
-                "baro_altitude": state[7],
-                "on_ground": state[8],
-                "velocity": state[9],
-                "true_track": state[10],
-                "vertical_rate": state[11],
-                "geo_altitude": state[13],
-                "squawk": state[14],
-            })
-
-        return states
+        return parse_states(data)
 
     def filter_tracked_aircraft(self, states: List[Dict]) -> List[Dict]:
         """Filter state vectors to only tracked gov/mil/VIP aircraft"""
@@ -116,54 +272,108 @@ class OpenSkyIngester:
 
         return [s for s in states if s["icao24"].lower() in self.tracked_aircraft]
 
+    def discover_aircraft(self, states: List[Dict]) -> List[Dict]:
+        """
+        Untracked aircraft flying a gov/mil/VIP callsign or squawking an
+        emergency code. Each sighting is recorded in discovered_aircraft; the
+        returned states (source "discovered") are stored with the tracked ones.
+        """
+        if self.matcher is None:
+            return []
+
+        hits = self.matcher.scan(states, exclude=self.tracked_aircraft)
+        if not hits:
+            return []
+
+        now = self.clock()
+        rows = []
+        promoted = []
+        for state, match in hits:
+            icao = state["icao24"].lower()
+            seen = self.discovered.get(icao)
+            if seen is None:
+                seen = self.discovered[icao] = [now, 0]
+                print(f"  Discovered {icao.upper()} {state['callsign'] or '-'} "
+                      f"({match.kind} {match.pattern}, {match.category})")
+            seen[1] += 1
+            rows.append({
+                "last_seen": now,
+                "first_seen": seen[0],
+                "icao_hex": icao.upper(),
+                "callsign": state["callsign"],
+                "squawk": state["squawk"] or "",
+                "origin_country": state["origin_country"] or "",
+                "match_kind": match.kind,
+                "match_pattern": match.pattern,
+                "category": match.category,
+                "sightings": seen[1],
+            })
+            promoted.append(dict(state, source="discovered"))
+
+        self.ch_client.execute(
+            """
+            INSERT INTO discovered_aircraft
+            (last_seen, first_seen, icao_hex, callsign, squawk, origin_country,
+             match_kind, match_pattern, category, sightings)
+            VALUES
+            """,
+            rows
+        )
+        return promoted
+
     def store_positions(self, states: List[Dict]) -> int:
         """Store aircraft positions to ClickHouse"""
         if not states:
             return 0
 
-        # Prepare batch insert
-        rows = []
-        timestamp = datetime.now(timezone.utc)
+        now = self.clock()
+        rows = build_position_rows(self.screen_positions(states, now), now)
+        return self.insert_positions(rows)
 
-        for state in states:
-            # Skip if missing critical data
-            if state["latitude"] is None or state["longitude"] is None:
-                continue
+    def screen_positions(self, states: List[Dict], received: datetime) -> List[Dict]:
+        """States that pass the quality filter; the rest go to position_quarantine"""
+        if self.quality is None or not states:
+            return states
 
-            rows.append({
-                "timestamp": timestamp,
-                "icao_hex": state["icao24"].upper(),
-                "callsign": state["callsign"],
-                "lat": state["latitude"],
-                "lon": state["longitude"],
-                "altitude": int(state["baro_altitude"]) if state["baro_altitude"] is not None else 0,
-                "ground_speed": int(state["velocity"]) if state["velocity"] is not None else 0,
-                "heading": int(state["true_track"]) if state["true_track"] is not None else 0,
-                "vertical_rate": int(state["vertical_rate"]) if state["vertical_rate"] is not None else 0,
-                "on_ground": 1 if state["on_ground"] else 0,
-                "source": "opensky"
-            })
+        accepted, held = self.quality.split(states, received)
+        if held:
+            self.quarantined += len(held)
+            # Losing rejects must not cost the batch itself
+            try:
+                self.ch_client.execute(
+                    f"INSERT INTO position_quarantine ({', '.join(QUARANTINE_COLUMNS)}) VALUES",
+                    held
+                )
+            except Exception as e:
+                print(f"  Warning: could not store {len(held)} quarantined positions: {e}")
+        return accepted
 
+    def insert_positions(self, rows: List[Dict]) -> int:
+        """Batch insert prepared rows and hand them to the publishers"""
         if not rows:
             return 0
 
-        # Batch insert
         self.ch_client.execute(
             """
             INSERT INTO flight_positions
             (timestamp, icao_hex, callsign, lat, lon, altitude,
-             ground_speed, heading, vertical_rate, on_ground, source)
+             ground_speed, heading, vertical_rate, on_ground, source, squawk)
             VALUES
             """,
             rows
         )
 
+        for publisher in self.publishers:
+            publisher.publish(rows)
+
         return len(rows)
 
     def poll_once(self) -> Dict:
         """Single poll cycle - fetch and store data"""
         print(f"[{datetime.now(timezone.utc).isoformat()}] Polling OpenSky API...")
 
+        self.refresh_if_due()
+
         # Fetch all states (OpenSky doesn't support ICAO filter efficiently,
         # so we fetch all and filter locally for now)
         all_states = self.get_all_states()
@@ -175,32 +385,50 @@ class OpenSkyIngester:
 
         print(f"  Found {len(tracked_states)} tracked gov/mil/VIP aircraft")
 
+        # Untracked aircraft given away by callsign or squawk
+        discovered_states = self.discover_aircraft(all_states)
+
+        if discovered_states:
+            print(f"  Matched {len(discovered_states)} untracked aircraft by callsign/squawk")
+
         # Store to database
-        stored_count = self.store_positions(tracked_states)
+        quarantined = self.quarantined
+        stored_count = self.store_positions(tracked_states + discovered_states)
+        quarantined = self.quarantined - quarantined
 
         print(f"  Stored {stored_count} position records")
+        if quarantined:
+            print(f"  Quarantined {quarantined} implausible reports")
 
         return {
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "total_aircraft": len(all_states),
             "tracked_aircraft": len(tracked_states),
-            "stored_records": stored_count
+            "discovered_aircraft": len(discovered_states),
+            "stored_records": stored_count,
+            "quarantined_records": quarantined,
         }
 
     def run_continuous(self, interval_seconds: int = 10):
         """Run continuous polling loop"""
         print(f"Starting continuous ingestion (polling every {interval_seconds}s)")
         print("Press Ctrl+C to stop\n")
+        profiler = get_profiler()
 
         while True:
             try:
-                result = self.poll_once()
+                with profiler.cycle("poll") as cycle:
+                    result = self.poll_once()
+                    cycle.tag(aircraft=result.get("total_aircraft", 0), rows=result.get("stored_records", 0))
 
                 # Sleep until next poll
                 time.sleep(interval_seconds)
 
             except KeyboardInterrupt:
                 print("\nShutting down gracefully...")
+                if hasattr(self.ch_client, "stats"):
+                    print("ClickHouse queries:")
+                    print(self.ch_client.stats.report())
                 break
             except Exception as e:
                 print(f"Error in poll cycle: {e}")
@@ -211,6 +439,8 @@ class OpenSkyIngester:
 def main():
     """Main entry point"""
     ingester = OpenSkyIngester()
+    # kill -USR1 <pid> profiles the next PROFILE_CYCLES polls (profiling.py)
+    get_profiler().install_signal()
 
     poll_interval = int(os.getenv("POLL_INTERVAL", 10))
     ingester.run_continuous(interval_seconds=poll_interval)
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Multi-process OpenSky ingestion, sharded by ICAO address
+The coordinator fetches each raw states/all snapshot and splits it into
+per-shard JSON arrays without decoding it (row boundaries and ICAO codes
+are found with one regex pass). Each shard goes to its worker process through
+a shared-memory slot; the worker decodes only its own rows and runs the
+usual filter/discover/transform steps from ingest_opensky.py. It also drops
+unchanged repeat reports and batches its own inserts. An aircraft always
+lands on the same worker, so each worker's quality filter (quality.py) sees
+every report of its aircraft. Workers report
+per-snapshot stats over a queue, and the coordinator merges them with
+worker health (liveness, in-flight snapshots, restarts, errors).
+
+Each worker has two slots, so the coordinator can write snapshot N+1 while
+the worker is still on snapshot N. A slot is reused only once the worker has
+acknowledged the snapshot in it.
+"""
+
+import itertools
+import json
+import multiprocessing as mp
+import os
+import queue
+import re
+import time
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from ingest_opensky import OpenSkyIngester, build_position_rows, parse_states, request_opensky
+from profiling import get_profiler
+
+load_dotenv()
+
+SNAPSHOT_TIME = re.compile(rb'"time"\s*:\s*(\d+)')
+LOOSE_ROW_SEPARATOR = re.compile(rb"\]\s+,|\],\s+\[")
+
+SLOTS = 2
+STAT_KEYS = ("states", "tracked", "discovered", "duplicates", "quarantined", "stored", "inserts", "seconds")
+
+
+def shard_table(shards: int) -> Dict[bytes, int]:
+    """Low byte of the ICAO address (two hex digits, either case) -> shard"""
+    table = {}
+    for value in range(256):
+        for digits in itertools.product(*({c, c.upper()} for c in f"{value:02x}")):
+            table["".join(digits).encode("ascii")] = value % shards
+    return table
+
+
+def split_snapshot(raw: bytes, shards: int, table: Optional[Dict[bytes, int]] = None
+                   ) -> Tuple[Optional[int], List[bytes]]:
+    """
+    Raw states/all body -> (snapshot time, one JSON array of state vectors
+    per shard). A row goes to the shard of the low byte of its ICAO address,
+    so an aircraft always lands on the same worker.
+
+    OpenSky sends compact JSON, where "],[" only occurs between state vectors
+    (the one nested array, sensors, sits between numbers), so the rows are
+    cut apart with bytes.split instead of being decoded. Anything else is
+    decoded and re-encoded.
+    """
+    table = table or shard_table(shards)
+    time_match = SNAPSHOT_TIME.search(raw)
+    snapshot_time = int(time_match.group(1)) if time_match else None
+
+    parts: List[List[bytes]] = [[] for _ in range(shards)]
+    first = raw.find(b"[[")
+    last = raw.rfind(b"]]")
+    if first < 0 or last < first:
+        return snapshot_time, [b"[]"] * shards
+
+    body = raw[first + 2:last]
+    if LOOSE_ROW_SEPARATOR.search(body):
+        rows = [json.dumps(state, separators=(",", ":")).encode("utf-8")[1:-1]
+                for state in json.loads(raw)["states"] or [] if state is not None]
+    else:
+        rows = body.split(b"],[")
+
+    for row in rows:
+        # row is '"abcdef",...' without brackets; a null entry between two
+        # rows stays glued to the first, which is still valid JSON
+        parts[table.get(row[5:7], 0)].append(row)
+
+    return snapshot_time, [b"[[" + b"],[".join(p) + b"]]" if p else b"[]" for p in parts]
+
+
+class ShardWorker:
+    """Filter, transform, dedup and batched inserts for one shard"""
+
+    def __init__(self, ingester: OpenSkyIngester, batch_rows: int, flush_seconds: float):
+        self.ingester = ingester
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        # icao24 -> (time_position, lat, lon) of the last stored report
+        self.last_reported: Dict[str, tuple] = {}
+        self.pending: List[Dict] = []
+        self.pending_since: Optional[float] = None
+
+    def process(self, raw: bytes, fetched_at: datetime) -> Dict:
+        start = time.perf_counter()
+        self.ingester.refresh_if_due()
+
+        states = parse_states({"states": json.loads(raw)})
+        tracked = self.ingester.filter_tracked_aircraft(states)
+        discovered = self.ingester.discover_aircraft(states)
+
+        # OpenSky repeats the last known position until a new one arrives;
+        # only store a report once
+        fresh = []
+        for state in tracked + discovered:
+            key = (state["time_position"], state["latitude"], state["longitude"])
+            if self.last_reported.get(state["icao24"]) != key:
+                self.last_reported[state["icao24"]] = key
+                fresh.append(state)
+
+        quarantined = self.ingester.quarantined
+        rows = build_position_rows(self.ingester.screen_positions(fresh, fetched_at), fetched_at)
+        if rows and not self.pending:
+            self.pending_since = time.monotonic()
+        self.pending.extend(rows)
+
+        stats = self.flush_if_due()
+        stats.update(
+            states=len(states),
+            tracked=len(tracked),
+            discovered=len(discovered),
+            duplicates=len(tracked) + len(discovered) - len(fresh),
+            quarantined=self.ingester.quarantined - quarantined,
+            seconds=time.perf_counter() - start,
+        )
+        return stats
+
+    def flush_wait(self, heartbeat: float) -> float:
+        """Seconds until the pending batch is due (at most heartbeat)"""
+        if not self.pending:
+            return heartbeat
+        return max(0.0, min(heartbeat, self.pending_since + self.flush_seconds - time.monotonic()))
+
+    def flush_if_due(self) -> Dict:
+        if self.pending and (len(self.pending) >= self.batch_rows
+                             or time.monotonic() - self.pending_since >= self.flush_seconds):
+            return self.flush()
+        return {}
+
+    def flush(self) -> Dict:
+        if not self.pending:
+            return {}
+        try:
+            stored = self.ingester.insert_positions(self.pending)
+        except Exception:
+            # Keep the batch for the next attempt, but not without bound
+            overflow = len(self.pending) - 10 * self.batch_rows
+            if overflow > 0:
+                del self.pending[:overflow]
+                print(f"  Warning: dropped {overflow} buffered positions after failed inserts")
+            raise
+        self.pending = []
+        self.pending_since = None
+        return {"stored": stored, "inserts": 1}
+
+
+def _worker_main(index: int, conn, results, client_factory: Optional[Callable],
+                 batch_rows: int, flush_seconds: float, heartbeat: float):
+    """Worker process: receive shard slots, process them, report stats"""
+    ingester = OpenSkyIngester(ch_client=client_factory() if client_factory else None, latest_state=False)
+    worker = ShardWorker(ingester, batch_rows, flush_seconds)
+    segments: Dict[str, shared_memory.SharedMemory] = {}
+
+    def report(kind, seq, payload):
+        results.put((kind, index, seq, payload))
+
+    try:
+        while True:
+            if not conn.poll(worker.flush_wait(heartbeat)):
+                try:
+                    report("stats", None, worker.flush_if_due())
+                except Exception as e:
+                    report("error", None, f"{type(e).__name__}: {e}")
+                continue
+
+            message = conn.recv()
+            if message is None:
+                break
+            seq, name, length, fetched_at = message
+
+            segment = segments.get(name)
+            if segment is None:
+                # First snapshot in this slot, or the slot was replaced by a larger one
+                segment = segments[name] = shared_memory.SharedMemory(name=name)
+            raw = bytes(segment.buf[:length])
+
+            try:
+                report("done", seq, worker.process(raw, fetched_at))
+            except Exception as e:
+                report("error", seq, f"{type(e).__name__}: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            report("stats", None, worker.flush())
+        except Exception as e:
+            report("error", None, f"{type(e).__name__}: {e}")
+        for segment in segments.values():
+            segment.close()
+
+
+class _Shard:
+    """Coordinator-side state of one worker"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.slots: List[Optional[shared_memory.SharedMemory]] = [None] * SLOTS
+        self.in_flight: Dict[int, int] = {}    # seq -> slot
+        self.last_message = time.monotonic()
+        self.restarts = 0
+        self.errors = 0
+        self.last_error = ""
+        self.totals = dict.fromkeys(STAT_KEYS, 0)
+
+
+class ShardedIngester:
+    """
+    Fans OpenSky snapshots out to worker processes by ICAO hash
+
+    client_factory builds each worker's ClickHouse client (it must be
+    picklable, e.g. a module-level function); None uses the shared pool.
+    """
+
+    def __init__(self, workers: Optional[int] = None, client_factory: Optional[Callable] = None,
+                 batch_rows: Optional[int] = None, flush_seconds: Optional[float] = None,
+                 slot_bytes: int = 1 << 22):
+        self.workers = workers or int(os.getenv("INGEST_WORKERS", 0)) or os.cpu_count() or 1
+        self.client_factory = client_factory
+        self.batch_rows = batch_rows or int(os.getenv("INGEST_BATCH_ROWS", 50000))
+        self.flush_seconds = float(os.getenv("INGEST_FLUSH_SECONDS", 5)) if flush_seconds is None else flush_seconds
+        self.heartbeat = 5.0
+        self.slot_bytes = slot_bytes
+
+        self.username = os.getenv("OPENSKY_USERNAME")
+        self.password = os.getenv("OPENSKY_PASSWORD")
+
+        # Spawned, not forked: workers open their own ClickHouse connections
+        self.context = mp.get_context("spawn")
+        self.results = self.context.Queue()
+        self.shards = [_Shard(index) for index in range(self.workers)]
+        self.shard_table = shard_table(self.workers)
+        self.seq = 0
+        self.closing = False
+        self.totals = dict.fromkeys(STAT_KEYS, 0)
+        self.totals.update(snapshots=0, lost=0, split_seconds=0.0)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def start(self):
+        for shard in self.shards:
+            self._spawn(shard)
+        print(f"Started {self.workers} ingest workers")
+
+    def _spawn(self, shard: _Shard):
+        reader, writer = self.context.Pipe(duplex=False)
+        shard.process = self.context.Process(
+            target=_worker_main,
+            args=(shard.index, reader, self.results, self.client_factory,
+                  self.batch_rows, self.flush_seconds, self.heartbeat),
+            name=f"ingest-shard-{shard.index}",
+            daemon=True,
+        )
+        shard.process.start()
+        reader.close()
+        shard.conn = writer
+        shard.last_message = time.monotonic()
+
+    def _check_workers(self):
+        if self.closing:
+            return
+        for shard in self.shards:
+            if shard.process is not None and not shard.process.is_alive():
+                print(f"  Warning: ingest worker {shard.index} exited "
+                      f"(code {shard.process.exitcode}); restarting")
+                self.totals["lost"] += len(shard.in_flight)
+                shard.in_flight.clear()
+                shard.restarts += 1
+                shard.conn.close()
+                self._spawn(shard)
+
+    def _collect(self, timeout: float) -> bool:
+        """Merge one worker message; False if none arrived in time"""
+        try:
+            kind, index, seq, payload = self.results.get(timeout=timeout)
+        except queue.Empty:
+            self._check_workers()
+            return False
+
+        shard = self.shards[index]
+        shard.last_message = time.monotonic()
+        if seq is not None:
+            shard.in_flight.pop(seq, None)
+        if kind == "error":
+            shard.errors += 1
+            shard.last_error = payload
+            print(f"  Warning: ingest worker {index}: {payload}")
+            return True
+        for key, value in payload.items():
+            shard.totals[key] += value
+            self.totals[key] += value
+        return True
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def _slot(self, shard: _Shard, length: int) -> Tuple[int, shared_memory.SharedMemory]:
+        while len(shard.in_flight) >= SLOTS:
+            self._collect(timeout=1.0)
+        busy = set(shard.in_flight.values())
+        slot = next(i for i in range(SLOTS) if i not in busy)
+
+        segment = shard.slots[slot]
+        if segment is None or segment.size < length:
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+            segment = shard.slots[slot] = shared_memory.SharedMemory(
+                create=True, size=max(self.slot_bytes, length + length // 2)
+            )
+        return slot, segment
+
+    def submit(self, raw: bytes, fetched_at: Optional[datetime] = None) -> int:
+        """Split a raw snapshot and hand each shard to its worker; returns its seq"""
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        start = time.perf_counter()
+        _, parts = split_snapshot(raw, self.workers, self.shard_table)
+        self.totals["split_seconds"] += time.perf_counter() - start
+
+        self.seq += 1
+        for shard, part in zip(self.shards, parts):
+            slot, segment = self._slot(shard, len(part))
+            segment.buf[:len(part)] = part
+            shard.in_flight[self.seq] = slot
+            shard.conn.send((self.seq, segment.name, len(part), fetched_at))
+        self.totals["snapshots"] += 1
+        return self.seq
+
+    def wait(self, seq: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """Block until every snapshot up to seq (default: all) is processed"""
+        seq = self.seq if seq is None else seq
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(s <= seq for shard in self.shards for s in shard.in_flight):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._collect(timeout=1.0)
+        return True
+
+    def poll_once(self) -> Dict:
+        """Fetch one snapshot, fan it out and wait for the workers"""
+        print(f"[{datetime.now(timezone.utc).isoformat()}] Polling OpenSky API...")
+
+        auth = (self.username, self.password) if self.username and self.password else None
+        response = request_opensky("states/all", auth=auth)
+        if response is None:
+            return {"timestamp": datetime.now(timezone.utc).isoformat(), "total_aircraft": 0}
+
+        before = dict(self.totals)
+        self.wait(self.submit(response.content))
+        delta = {key: self.totals[key] - before[key] for key in STAT_KEYS}
+
+        print(f"  Received {delta['states']} total aircraft across {self.workers} workers")
+        print(f"  Found {delta['tracked']} tracked, {delta['discovered']} discovered "
+              f"({delta['duplicates']} unchanged reports skipped)")
+        print(f"  Stored {delta['stored']} position records in {delta['inserts']} inserts")
+        if delta["quarantined"]:
+            print(f"  Quarantined {delta['quarantined']} implausible reports")
+
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "total_aircraft": delta["states"],
+            "tracked_aircraft": delta["tracked"],
+            "discovered_aircraft": delta["discovered"],
+            "stored_records": delta["stored"],
+            "quarantined_records": delta["quarantined"],
+        }
+
+    # ------------------------------------------------------------------
+    # Health and lifecycle
+    # ------------------------------------------------------------------
+
+    def health(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "workers": [
+                {
+                    "index": shard.index,
+                    "pid": shard.process.pid if shard.process else None,
+                    "alive": bool(shard.process and shard.process.is_alive()),
+                    "in_flight": len(shard.in_flight),
+                    "last_message_age": round(now - shard.last_message, 1),
+                    "restarts": shard.restarts,
+                    "errors": shard.errors,
+                    "last_error": shard.last_error,
+                    "totals": dict(shard.totals),
+                }
+                for shard in self.shards
+            ],
+            "totals": dict(self.totals),
+        }
+
+    def report(self) -> str:
+        lines = [f"  {'Worker':>6} {'PID':>7} {'Alive':>5} {'States':>10} {'Stored':>9} "
+                 f"{'Dups':>9} {'Busy(s)':>8} {'Errors':>6}"]
+        for w in self.health()["workers"]:
+            t = w["totals"]
+            lines.append(f"  {w['index']:>6} {w['pid'] or '-':>7} {'yes' if w['alive'] else 'no':>5} "
+                         f"{t['states']:>10} {t['stored']:>9} {t['duplicates']:>9} "
+                         f"{t['seconds']:>8.2f} {w['errors']:>6}")
+        return "\n".join(lines)
+
+    def close(self, timeout: float = 30.0):
+        """Stop the workers after they flush their batches"""
+        self.closing = True
+        for shard in self.shards:
+            if shard.process is not None and shard.process.is_alive():
+                shard.conn.send(None)
+        deadline = time.monotonic() + timeout
+        while any(s.process is not None and s.process.is_alive() for s in self.shards):
+            if time.monotonic() >= deadline:
+                break
+            self._collect(timeout=0.2)
+        while self._collect(timeout=0.05):
+            pass
+        for shard in self.shards:
+            if shard.process is not None:
+                shard.process.join(timeout=1)
+                if shard.process.is_alive():
+                    shard.process.terminate()
+            for segment in shard.slots:
+                if segment is not None:
+                    segment.close()
+                    segment.unlink()
+            shard.slots = [None] * SLOTS
+
+    def run_continuous(self, interval_seconds: int = 10):
+        """Run continuous polling loop"""
+        self.start()
+        print(f"Starting sharded ingestion (polling every {interval_seconds}s)")
+        print("Press Ctrl+C to stop\n")
+        profiler = get_profiler()
+
+        try:
+            while True:
+                try:
+                    # Profiles the coordinator: splitting and waiting on workers
+                    with profiler.cycle("poll-sharded") as cycle:
+                        result = self.poll_once()
+                        cycle.tag(aircraft=result.get("total_aircraft", 0), rows=result.get("stored_records", 0))
+                    time.sleep(interval_seconds)
+                except KeyboardInterrupt:
+                    raise
+                except Exception as e:
+                    print(f"Error in poll cycle: {e}")
+                    print("Waiting 30s before retry...")
+                    time.sleep(30)
+        except KeyboardInterrupt:
+            print("\nShutting down gracefully...")
+        finally:
+            self.close()
+            print("Ingest workers:")
+            print(self.report())
+
+
+def main():
+    """Main entry point"""
+    ingester = ShardedIngester()
+    get_profiler().install_signal()
+
+    poll_interval = int(os.getenv("POLL_INTERVAL", 10))
+    ingester.run_continuous(interval_seconds=poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped latest-state table
+The ingester keeps the most recent position of every tracked aircraft in a
+fixed-layout file (ideally on /dev/shm) so the scorer, API and other
+processes on the same host can read it without a database round trip
+
+Layout (little-endian):
+
+    header  64 bytes   magic, layout version, record size, capacity,
+                       batch counter, last batch timestamp
+    slots   capacity × 48 bytes, open-addressed by ICAO:
+            seq u32 | icao u32 | timestamp i64 | lat f64 | lon f64 |
+            altitude i32 | ground_speed i32 | heading i16 | flags u16 | pad
+
+Each slot is guarded by its own seqlock: the writer bumps seq to odd, writes
+the record and bumps it back to even. Readers retry while seq is odd or
+changed under them. The writer never waits on readers.
+
+The live file is never resized in place, since readers hold mmaps of it.
+When the table needs another size (a restart with more tracked aircraft,
+or more than 3/4 of the slots used) the writer builds a new file beside it,
+moves the records in, dropping aircraft not seen for
+LATEST_STATE_RETAIN_HOURS, and swaps it in with os.replace. It then marks
+the old file's header retired, and readers remap on their next lookup.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"SWLS"
+LAYOUT_VERSION = 1
+
+HEADER = struct.Struct("<4sHHIIqq")
+HEADER_SIZE = 64
+RECORD = struct.Struct("<IIqddiihH4x")
+SEQ = struct.Struct("<I")
+# Header state word, after magic/version/record size/capacity
+STATE = struct.Struct("<I")
+STATE_OFFSET = 12
+STATE_RETIRED = 0x1
+
+# Aircraft not seen for this long lose their slot when the table is rebuilt
+RETAIN_HOURS = float(os.getenv("LATEST_STATE_RETAIN_HOURS", 24))
+
+FLAG_USED = 0x1
+FLAG_ON_GROUND = 0x2
+
+# Fibonacci hashing spreads sequentially allocated ICAO blocks across slots
+_HASH_MULTIPLIER = 2654435761
+
+
+def _slot_offset(index: int) -> int:
+    return HEADER_SIZE + index * RECORD.size
+
+
+def _capacity(aircraft: int) -> int:
+    # Power of two keeps probing a mask; 2x headroom keeps probe chains short
+    return 1 << max(4, (max(1, aircraft) * 2 - 1).bit_length())
+
+
+def _open_table(path: str) -> Optional[Tuple[object, mmap.mmap]]:
+    """(file, writable mmap) of an existing latest-state file, or None"""
+    try:
+        f = open(path, "r+b")
+    except OSError:
+        return None
+    try:
+        buf = mmap.mmap(f.fileno(), 0)
+        _LatestStateFile(buf)
+        return f, buf
+    except (ValueError, OSError, struct.error):
+        f.close()
+        return None
+
+
+def _unix(timestamp) -> int:
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp())
+
+
+class _LatestStateFile:
+    """Shared slot addressing for reader and writer"""
+
+    def __init__(self, buf):
+        self.buf = buf
+        magic, version, record_size, capacity, _, _, _ = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION or record_size != RECORD.size:
+            raise ValueError("Not a latest-state file (or incompatible layout version)")
+        self.capacity = capacity
+        self.mask = capacity - 1
+
+    def _home(self, icao: int) -> int:
+        return ((icao * _HASH_MULTIPLIER) >> 8) & self.mask
+
+    def _used(self) -> Iterator[Tuple[int, tuple]]:
+        """(index, record) of every occupied slot, without seqlock retries"""
+        for index in range(self.capacity):
+            record = RECORD.unpack_from(self.buf, _slot_offset(index))
+            if record[8] & FLAG_USED:
+                yield index, record
+
+    @property
+    def batches(self) -> int:
+        return HEADER.unpack_from(self.buf, 0)[5]
+
+    @property
+    def last_batch_time(self) -> int:
+        return HEADER.unpack_from(self.buf, 0)[6]
+
+
+class LatestStateWriter(_LatestStateFile):
+    """
+    Single-writer side, owned by the ingester
+
+    Also usable as an ingester publisher: publish(rows) takes the same rows
+    store_positions inserts into flight_positions.
+    """
+
+    def __init__(self, path: str, capacity: int = 8192, retain_hours: float = RETAIN_HOURS):
+        self.path = path
+        self.min_capacity = capacity
+        self.retain_seconds = int(retain_hours * 3600)
+        self.rebuilds = 0
+        self._file = None
+
+        existing = _open_table(path)
+        if existing is not None:
+            f, buf = existing
+            table = _LatestStateFile(buf)
+            if table.capacity >= _capacity(capacity):
+                # Adopt the live table as it is; readers keep their mapping
+                self._file = f
+                super().__init__(buf)
+                self._slots = {record[1]: index for index, record in self._used()}
+                return
+            self._file, self.buf = f, buf
+            records = [record for _, record in table._used()]
+            self._rebuild(records, _capacity(max(capacity, len(records))), table.batches, table.last_batch_time)
+        else:
+            self._rebuild([], _capacity(capacity), 0, 0)
+
+    def _rebuild(self, records: List[tuple], capacity: int, batches: int, last_batch_time: int):
+        """Build a table of `capacity` slots holding records beside the live file and swap it in"""
+        size = HEADER_SIZE + capacity * RECORD.size
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        f = open(tmp, "w+b")
+        f.truncate(size)
+        buf = mmap.mmap(f.fileno(), size)
+        HEADER.pack_into(buf, 0, MAGIC, LAYOUT_VERSION, RECORD.size, capacity, 0, batches, last_batch_time)
+
+        old = (self._file, self.buf) if self._file is not None else None
+        self._file = f
+        super().__init__(buf)
+        self._slots: Dict[int, int] = {}
+        for _, icao, *fields in records:
+            # Fresh slots start with an even seq, as if never written
+            RECORD.pack_into(buf, _slot_offset(self._slot_for(icao)), 0, icao, *fields)
+        os.replace(tmp, self.path)
+
+        if old is not None:
+            old_file, old_buf = old
+            STATE.pack_into(old_buf, STATE_OFFSET, STATE_RETIRED)
+            old_buf.close()
+            old_file.close()
+
+    def compact(self, now: Optional[int] = None, room: int = 0):
+        """
+        Rebuild without aircraft not seen for retain_seconds before now
+        (default: the last batch), sized for the rest plus room new ones
+        """
+        now = self.last_batch_time if now is None else now
+        cutoff = now - self.retain_seconds
+        records = [record for _, record in self._used() if record[2] >= cutoff]
+        capacity = _capacity(max(self.min_capacity, len(records) + room))
+        dropped = len(self._slots) - len(records)
+        self.rebuilds += 1
+        self._rebuild(records, capacity, self.batches, self.last_batch_time)
+        print(f"  Latest-state table rebuilt: {len(records)} aircraft in {capacity} slots, "
+              f"{dropped} not seen for {self.retain_seconds // 3600}h dropped")
+
+    def _slot_for(self, icao: int) -> int:
+        index = self._slots.get(icao)
+        if index is not None:
+            return index
+        index = self._home(icao)
+        while True:
+            _, _, _, _, _, _, _, _, flags = RECORD.unpack_from(self.buf, _slot_offset(index))
+            if not flags & FLAG_USED:
+                self._slots[icao] = index
+                return index
+            index = (index + 1) & self.mask
+
+    def write(self, icao: int, timestamp: int, lat: float, lon: float, altitude: int,
+              ground_speed: int, heading: int, flags: int = 0):
+        if icao not in self._slots and (len(self._slots) + 1) * 4 > self.capacity * 3:
+            # Past 3/4 full: reclaim stale slots, growing if the rest still need it
+            self.compact(max(self.last_batch_time, timestamp), room=1)
+        offset = _slot_offset(self._slot_for(icao))
+        seq = SEQ.unpack_from(self.buf, offset)[0]
+        SEQ.pack_into(self.buf, offset, (seq + 1) & 0xFFFFFFFF)
+        RECORD.pack_into(
+            self.buf, offset, (seq + 1) & 0xFFFFFFFF, icao, timestamp, lat, lon,
+            altitude, ground_speed, heading, flags | FLAG_USED,
+        )
+        SEQ.pack_into(self.buf, offset, (seq + 2) & 0xFFFFFFFF)
+
+    def publish(self, rows: List[Dict]):
+        """Write a store_positions batch"""
+        if not rows:
+            return
+        batch_time = 0
+        for row in rows:
+            timestamp = _unix(row["timestamp"])
+            batch_time = max(batch_time, timestamp)
+            self.write(
+                int(row["icao_hex"], 16), timestamp, row["lat"], row["lon"],
+                row["altitude"], row["ground_speed"], row["heading"],
+                FLAG_ON_GROUND if row["on_ground"] else 0,
+            )
+
+        HEADER.pack_into(self.buf, 0, MAGIC, LAYOUT_VERSION, RECORD.size, self.capacity,
+                         0, self.batches + 1, batch_time)
+
+    def close(self):
+        self.buf.flush()
+        self.buf.close()
+        self._file.close()
+
+
+class LatestStateReader(_LatestStateFile):
+    """Read-only, lock-free view for any process on the same host"""
+
+    MAX_RETRIES = 100
+
+    def __init__(self, path: str):
+        self.path = path
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, "rb")
+        super().__init__(mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ))
+        self._index: Dict[int, int] = {}
+
+    def _follow(self):
+        """Remap if the writer has swapped a rebuilt table in"""
+        if STATE.unpack_from(self.buf, STATE_OFFSET)[0] & STATE_RETIRED:
+            old_buf, old_file = self.buf, self._file
+            self._open()
+            old_buf.close()
+            old_file.close()
+
+    def _read_slot(self, index: int) -> Optional[tuple]:
+        offset = _slot_offset(index)
+        for _ in range(self.MAX_RETRIES):
+            before = SEQ.unpack_from(self.buf, offset)[0]
+            if before & 1:
+                continue
+            record = RECORD.unpack_from(self.buf, offset)
+            if SEQ.unpack_from(self.buf, offset)[0] == before:
+                return record
+        return None
+
+    def get(self, icao: int) -> Optional[Dict]:
+        """Latest state for one aircraft (ICAO as int), or None if never seen"""
+        self._follow()
+        index = self._index.get(icao)
+        if index is None:
+            index = self._home(icao)
+            for _ in range(self.capacity):
+                record = self._read_slot(index)
+                if record is None or not record[8] & FLAG_USED:
+                    return None
+                if record[1] == icao:
+                    # Slots are never reassigned within a file, so the mapping
+                    # can be cached until the next remap
+                    self._index[icao] = index
+                    break
+                index = (index + 1) & self.mask
+            else:
+                return None
+        record = self._read_slot(index)
+        return self._as_dict(record) if record else None
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Consistent per-aircraft records for every occupied slot"""
+        self._follow()
+        for index in range(self.capacity):
+            record = self._read_slot(index)
+            if record is not None and record[8] & FLAG_USED:
+                yield self._as_dict(record)
+
+    def positions(self, max_age_seconds: Optional[int] = None) -> List[Dict]:
+        states = list(self)
+        if max_age_seconds is not None:
+            cutoff = self.last_batch_time - max_age_seconds
+            states = [s for s in states if s["timestamp"] >= cutoff]
+        return states
+
+    @staticmethod
+    def _as_dict(record: tuple) -> Dict:
+        _, icao, timestamp, lat, lon, altitude, speed, heading, flags = record
+        return {
+            "icao": icao,
+            "icao_hex": f"{icao:06X}",
+            "timestamp": timestamp,
+            "lat": lat,
+            "lon": lon,
+            "altitude": altitude,
+            "ground_speed": speed,
+            "heading": heading,
+            "on_ground": bool(flags & FLAG_ON_GROUND),
+            "flags": flags,
+        }
+
+    def close(self):
+        self.buf.close()
+        self._file.close()
+
+
+def main():
+    """Print the current latest-state table"""
+    path = sys.argv[1] if len(sys.argv) > 1 else os.getenv("LATEST_STATE_PATH", "/dev/shm/sleepwatch_latest_state")
+    reader = LatestStateReader(path)
+    states = sorted(reader.positions(), key=lambda s: -s["timestamp"])
+
+    last = datetime.fromtimestamp(reader.last_batch_time, timezone.utc).isoformat() if reader.batches else "never"
+    print(f"{path}: {len(states)} aircraft, {reader.batches} batches, last batch {last}")
+    print(f"  {'ICAO':<8} {'Age(s)':>7} {'Lat':>9} {'Lon':>10} {'Alt':>6} {'Spd':>5} {'Hdg':>4}")
+    for s in states[:50]:
+        age = reader.last_batch_time - s["timestamp"]
+        print(f"  {s['icao_hex']:<8} {age:>7} {s['lat']:>9.4f} {s['lon']:>10.4f} "
+              f"{s['altitude']:>6} {s['ground_speed']:>5} {s['heading']:>4}")
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Live position fan-out server
+Receives the ingester's position batches, keeps the current position per
+tracked ICAO in memory and pushes viewport-filtered diffs to map clients
+over Server-Sent Events
+
+Clients connect with:
+    GET /stream?bbox=<min_lat>,<min_lon>,<max_lat>,<max_lon>
+
+and receive a "snapshot" event followed by "diff" events. Aircraft are
+keyed by integer ICAO and positions are fixed-point (lat/lon × 10^4), so a
+diff is compact JSON:
+
+    {"seq": 42, "t": 1736942400.1,
+     "a": [[icao, lat, lon, alt, speed, heading, on_ground, callsign], ...],  # entered / new
+     "d": [[icao, dlat, dlon, dalt, speed, heading, on_ground], ...],         # moved (deltas)
+     "r": [icao, ...]}                                                        # left / stale
+
+Viewports are snapped outward to a coarse grid and clients sharing a
+snapped viewport share one group, so each diff is encoded once per group
+rather than once per client.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+COORD_SCALE = 10000  # lat/lon fixed point (~11m resolution)
+VIEWPORT_GRID_DEG = 1.0
+WORLD = (-90.0, -180.0, 90.0, 180.0)
+
+# (lat, lon, altitude, ground_speed, heading, on_ground, callsign)
+Position = Tuple[int, int, int, int, int, int, str]
+
+
+def encode_row(row: Dict) -> List:
+    """Compact wire form of a flight_positions row, as sent by the ingester"""
+    timestamp = row["timestamp"]
+    return [
+        row["icao_hex"], row["callsign"], row["lat"], row["lon"], row["altitude"],
+        row["ground_speed"], row["heading"], row["on_ground"],
+        timestamp.timestamp() if hasattr(timestamp, "timestamp") else timestamp,
+    ]
+
+
+def parse_rows(rows) -> List[Tuple[int, Position]]:
+    """
+    (icao, position) per encoded row; ValueError if the batch is not a list
+    of rows shaped like encode_row's, so a bad batch changes nothing
+    """
+    if not isinstance(rows, list):
+        raise ValueError("batch is not a list of rows")
+    parsed = []
+    for row in rows:
+        try:
+            icao_hex, callsign, lat, lon, altitude, speed, heading, on_ground, _ = row
+            if not isinstance(icao_hex, str) or not isinstance(callsign, str):
+                raise TypeError("icao_hex and callsign must be strings")
+            parsed.append((int(icao_hex, 16), (
+                int(round(lat * COORD_SCALE)), int(round(lon * COORD_SCALE)),
+                int(altitude), int(speed), int(heading), int(on_ground), callsign,
+            )))
+        except (TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f"malformed row {str(row)[:80]}: {e}") from None
+    return parsed
+
+
+def sse_event(event: str, payload: Dict, event_id: Optional[int] = None) -> bytes:
+    body = json.dumps(payload, separators=(",", ":"))
+    head = f"event: {event}\n" + (f"id: {event_id}\n" if event_id is not None else "")
+    return f"{head}data: {body}\n\n".encode("utf-8")
+
+
+class LiveState:
+    """Current position per tracked ICAO, with change detection"""
+
+    def __init__(self, stale_seconds: float = 300.0):
+        self.stale_seconds = stale_seconds
+        self.positions: Dict[int, Position] = {}
+        self.last_seen: Dict[int, float] = {}
+        self.seq = 0
+
+    def apply(self, rows: Iterable[Tuple[int, Position]]) -> Dict[int, Optional[Position]]:
+        """
+        Merge a batch of parse_rows() output; return {icao: position} for
+        aircraft that changed, with None for aircraft that went stale
+        """
+        changed: Dict[int, Optional[Position]] = {}
+        now = time.time()
+
+        for icao, position in rows:
+            self.last_seen[icao] = now
+            if self.positions.get(icao) != position:
+                self.positions[icao] = position
+                changed[icao] = position
+
+        cutoff = now - self.stale_seconds
+        for icao in [i for i, seen in self.last_seen.items() if seen < cutoff]:
+            del self.last_seen[icao]
+            del self.positions[icao]
+            changed[icao] = None
+
+        self.seq += 1
+        return changed
+
+
+def snap_viewport(bbox: Tuple[float, float, float, float]) -> Tuple[int, int, int, int]:
+    """Snap (min_lat, min_lon, max_lat, max_lon) outward to the viewport grid, fixed point"""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    g = VIEWPORT_GRID_DEG
+    return (
+        int(max(-90.0, math.floor(min_lat / g) * g) * COORD_SCALE),
+        int(max(-180.0, math.floor(min_lon / g) * g) * COORD_SCALE),
+        int(min(90.0, math.ceil(max_lat / g) * g) * COORD_SCALE),
+        int(min(180.0, math.ceil(max_lon / g) * g) * COORD_SCALE),
+    )
+
+
+class ViewportGroup:
+    """Clients sharing a snapped viewport, and what has been sent to them"""
+
+    def __init__(self, viewport: Tuple[int, int, int, int]):
+        self.viewport = viewport
+        self.clients: Set[asyncio.StreamWriter] = set()
+        self.sent: Dict[int, Position] = {}
+
+    def contains(self, position: Position) -> bool:
+        min_lat, min_lon, max_lat, max_lon = self.viewport
+        lat, lon = position[0], position[1]
+        if not min_lat <= lat <= max_lat:
+            return False
+        if min_lon <= max_lon:
+            return min_lon <= lon <= max_lon
+        # Viewport crosses the antimeridian
+        return lon >= min_lon or lon <= max_lon
+
+    def seed(self, positions: Dict[int, Position]):
+        self.sent = {icao: p for icao, p in positions.items() if self.contains(p)}
+
+    def snapshot(self, seq: int) -> bytes:
+        return sse_event("snapshot", {
+            "seq": seq,
+            "t": time.time(),
+            "a": [[icao, *p] for icao, p in self.sent.items()],
+        }, seq)
+
+    def diff(self, changed: Dict[int, Optional[Position]], seq: int) -> Optional[bytes]:
+        """Encode the changes visible to this group, or None if there are none"""
+        added, deltas, removed = [], [], []
+
+        for icao, position in changed.items():
+            previous = self.sent.get(icao)
+            if position is not None and self.contains(position):
+                if previous is None or previous[6] != position[6]:
+                    added.append([icao, *position])
+                else:
+                    deltas.append([
+                        icao, position[0] - previous[0], position[1] - previous[1],
+                        position[2] - previous[2], position[3], position[4], position[5],
+                    ])
+                self.sent[icao] = position
+            elif previous is not None:
+                removed.append(icao)
+                del self.sent[icao]
+
+        if not (added or deltas or removed):
+            return None
+
+        payload = {"seq": seq, "t": time.time()}
+        if added:
+            payload["a"] = added
+        if deltas:
+            payload["d"] = deltas
+        if removed:
+            payload["r"] = removed
+        return sse_event("diff", payload, seq)
+
+
+class LiveFanoutServer:
+    """asyncio HTTP server: POST /ingest from the ingester, GET /stream for map clients"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8125,
+                 heartbeat_seconds: float = 15.0, max_buffer_bytes: int = 1 << 20,
+                 stale_seconds: float = 300.0):
+        self.host = host
+        self.port = port
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_buffer_bytes = max_buffer_bytes
+        self.state = LiveState(stale_seconds=stale_seconds)
+        self.groups: Dict[Tuple[int, int, int, int], ViewportGroup] = {}
+        self.stats = {"clients": 0, "batches": 0, "events": 0, "bytes": 0, "dropped_slow": 0}
+
+    # ------------------------------------------------------------------
+    # Fan-out
+    # ------------------------------------------------------------------
+
+    def publish(self, rows: List[List]) -> int:
+        """
+        Apply an ingest batch and push diffs; returns number of changed
+        aircraft. Raises ValueError, before touching any state, if the batch
+        is malformed
+        """
+        changed = self.state.apply(parse_rows(rows))
+        self.stats["batches"] += 1
+        if not changed:
+            return 0
+
+        for group in list(self.groups.values()):
+            payload = group.diff(changed, self.state.seq)
+            if payload is None:
+                continue
+            for writer in list(group.clients):
+                self._send(group, writer, payload)
+
+        return len(changed)
+
+    def _send(self, group: ViewportGroup, writer: asyncio.StreamWriter, payload: bytes):
+        if writer.is_closing():
+            group.clients.discard(writer)
+            return
+        if writer.transport.get_write_buffer_size() > self.max_buffer_bytes:
+            # Slow consumer: drop it rather than buffer without bound; the
+            # browser's EventSource reconnects and gets a fresh snapshot
+            self.stats["dropped_slow"] += 1
+            group.clients.discard(writer)
+            writer.close()
+            return
+        writer.write(payload)
+        self.stats["events"] += 1
+        self.stats["bytes"] += len(payload)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            for group in list(self.groups.values()):
+                for writer in list(group.clients):
+                    self._send(group, writer, b":\n\n")
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2:
+                writer.close()
+                return
+            method, target = parts[0], urlparse(parts[1])
+
+            if method == "POST" and target.path == "/ingest":
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                try:
+                    changed = self.publish(json.loads(body))
+                except ValueError as e:
+                    # Bad JSON or a batch of the wrong shape; nothing was applied
+                    self._respond(writer, 400, json.dumps({"error": str(e)}).encode("utf-8"), "application/json")
+                else:
+                    self._respond(writer, 200, json.dumps({"changed": changed}).encode("utf-8"), "application/json")
+            elif method == "GET" and target.path == "/stream":
+                await self._stream(reader, writer, parse_qs(target.query))
+                return
+            elif method == "GET" and target.path == "/health":
+                body = dict(self.stats, aircraft=len(self.state.positions), groups=len(self.groups))
+                self._respond(writer, 200, json.dumps(body).encode("utf-8"), "application/json")
+            else:
+                self._respond(writer, 404, b"Not found", "text/plain")
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            print(f"Request failed: {e}")
+        finally:
+            if not writer.is_closing():
+                writer.close()
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str):
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}.get(status, "")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+
+    async def _stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, query: Dict):
+        try:
+            bbox = tuple(float(v) for v in query.get("bbox", [""])[0].split(","))
+            if len(bbox) != 4:
+                raise ValueError
+        except ValueError:
+            bbox = WORLD
+
+        viewport = snap_viewport(bbox)
+        group = self.groups.get(viewport)
+        if group is None:
+            group = self.groups[viewport] = ViewportGroup(viewport)
+            group.seed(self.state.positions)
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\nAccess-Control-Allow-Origin: *\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+            + group.snapshot(self.state.seq)
+        )
+        group.clients.add(writer)
+        self.stats["clients"] += 1
+
+        try:
+            # Clients never send anything after the request; EOF means they left
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            group.clients.discard(writer)
+            self.stats["clients"] -= 1
+            if not group.clients and self.groups.get(viewport) is group:
+                del self.groups[viewport]
+            writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        heartbeat = asyncio.ensure_future(self._heartbeat())
+        print(f"Live fan-out listening on http://{self.host}:{self.port}")
+        print("  POST /ingest   (ingester batches)")
+        print("  GET  /stream?bbox=min_lat,min_lon,max_lat,max_lon")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            heartbeat.cancel()
+
+
+class LivePublisher:
+    """Ingester-side client that forwards each stored batch to the fan-out server"""
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        self.url = url.rstrip("/") + "/ingest"
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def publish(self, rows: List[Dict]):
+        try:
+            self.session.post(
+                self.url,
+                data=json.dumps([encode_row(r) for r in rows], separators=(",", ":")),
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
+            )
+        except requests.exceptions.RequestException as e:
+            # Live view is best-effort; never hold up ingestion
+            print(f"  Warning: live fan-out publish failed: {e}")
+
+
+def _raise_fd_limit():
+    """Each SSE client holds a socket; lift the soft fd limit to the hard limit"""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def main():
+    """Main entry point"""
+    _raise_fd_limit()
+    server = LiveFanoutServer(
+        host=os.getenv("LIVE_FANOUT_HOST", "127.0.0.1"),
+        port=int(os.getenv("LIVE_FANOUT_PORT", 8125)),
+    )
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\nShutting down gracefully...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,693 @@
+#!/usr/bin/env python3
+"""
+Outbound alert dispatcher
+Posts panic alerts and geofence events to Telegram, Discord and Twitter/X.
+It runs as its own process and only reads panic_scores and geofence_events,
+so the scorer and the ingester never wait on a chat API.
+
+A region alerts when its NOTIFY_WINDOW_HOURS score reaches NOTIFY_THRESHOLD,
+again only if it climbs RENOTIFY_DELTA further, and re-arms once it falls
+REARM_MARGIN below the threshold; a region sitting at 65 all day posts once.
+
+Every alert is written to an SQLite outbox (one row per channel) in the same
+transaction that advances the source watermark, so a restart neither drops
+nor re-reads anything. Each channel then:
+
+- holds new alerts for COALESCE_SECONDS, and for as long as its token bucket
+  is empty, and posts whatever piled up as one message (a digest when more
+  than one alert did)
+- sends at most one message at a time and marks it sent before the next, so
+  a clean restart never double-sends (a hard kill during an in-flight
+  request can resend that one message)
+- retries 429s and 5xx with exponential back-off, honouring Retry-After, and
+  gives up after MAX_ATTEMPTS or on any other 4xx
+
+    python src/notify.py serve [--poll 30]
+    python src/notify.py status
+    python src/notify.py retry          # requeue messages that gave up
+"""
+
+import asyncio
+import html
+import json
+import os
+import random
+import signal
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from cards import card_fields, level, telegram_text, tweet_text
+
+NOTIFY_THRESHOLD = 60
+# Alert again for a region already alerted only if it climbs this much more
+RENOTIFY_DELTA = 10
+# ... and forget the last alert once it drops this far below the threshold
+REARM_MARGIN = 10
+# The headline window; shorter and longer windows of the same run would repeat it
+NOTIFY_WINDOW_HOURS = 12
+COALESCE_SECONDS = 60.0
+MAX_ATTEMPTS = 8
+BACKOFF_SECONDS = 2.0
+BACKOFF_CAP_SECONDS = 900.0
+# How far back the first poll of a fresh outbox looks
+BACKFILL_SECONDS = 3600
+# Sharded ingester workers stamp geofence events with the coordinator's
+# fetch time but insert them when they flush (up to INGEST_FLUSH_SECONDS
+# later), so events can appear behind the watermark. Each poll re-reads
+# this far back; the outbox key drops the repeats
+FENCE_LAG_SECONDS = 60
+HTTP_TIMEOUT = 10.0
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    channel TEXT NOT NULL,
+    key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    message_id INTEGER,
+    PRIMARY KEY (channel, key)
+);
+CREATE INDEX IF NOT EXISTS alerts_pending ON alerts (channel, message_id);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    channel TEXT NOT NULL,
+    text TEXT NOT NULL,
+    alerts INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    sent_at REAL,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def outbox_path() -> str:
+    return os.getenv("NOTIFY_OUTBOX", os.path.join(os.path.dirname(__file__), "..", "data", "notify", "outbox.sqlite3"))
+
+
+# ----------------------------------------------------------------------
+# Rate limiting
+# ----------------------------------------------------------------------
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is now)"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            wait = self.delay()
+            if wait <= 0:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(wait)
+
+
+# ----------------------------------------------------------------------
+# Channels
+# ----------------------------------------------------------------------
+
+class Channel:
+    """One destination: how to post a text there and how often it may be posted to"""
+
+    name = ""
+    # Longest text the API accepts
+    limit = 4096
+    # "html" for Telegram's parse mode, else plain text
+    style = "plain"
+    # Alert kinds posted here
+    kinds = ("panic", "geofence")
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+
+    def request(self, text: str) -> Tuple[str, Dict, Dict]:
+        """(url, JSON body, headers) for posting text"""
+        raise NotImplementedError
+
+    def send(self, session, text: str) -> Tuple[bool, bool, float, str]:
+        """
+        Post text; returns (sent, retryable, retry_after seconds, error).
+        Blocking, so the dispatcher runs it in a thread.
+        """
+        import requests
+
+        url, body, headers = self.request(text)
+        try:
+            response = session.post(url, json=body, headers=headers, timeout=HTTP_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            return False, True, 0.0, f"{type(e).__name__}: {e}"
+        if response.status_code < 300:
+            return True, False, 0.0, ""
+        retryable = response.status_code == 429 or response.status_code >= 500
+        return False, retryable, retry_after(response), f"HTTP {response.status_code}: {response.text[:200]}"
+
+
+def retry_after(response) -> float:
+    """Retry-After header, else the retry_after field Telegram and Discord put in the body"""
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        pass
+    try:
+        body = response.json()
+        return float(body.get("retry_after") or body.get("parameters", {}).get("retry_after") or 0)
+    except (ValueError, AttributeError, TypeError):
+        return 0.0
+
+
+class TelegramChannel(Channel):
+    name = "telegram"
+    style = "html"
+
+    def __init__(self, token: str, chat_id: str, api: str = "https://api.telegram.org",
+                 rate: float = 1 / 3, burst: float = 3):
+        # Bots may post about 20 messages a minute to one group
+        super().__init__(rate, burst)
+        self.url = f"{api.rstrip('/')}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+
+    def request(self, text: str):
+        return self.url, {"chat_id": self.chat_id, "text": text, "parse_mode": "HTML",
+                          "disable_web_page_preview": True}, {}
+
+
+class DiscordChannel(Channel):
+    name = "discord"
+    limit = 2000
+
+    def __init__(self, webhook_url: str, rate: float = 0.5, burst: float = 5):
+        super().__init__(rate, burst)
+        self.url = webhook_url
+
+    def request(self, text: str):
+        return self.url, {"content": text}, {}
+
+
+class TwitterChannel(Channel):
+    name = "twitter"
+    limit = 280
+    # Fence names are private; tweets only carry scores
+    kinds = ("panic",)
+
+    def __init__(self, token: str, api: str = "https://api.twitter.com",
+                 rate: float = 4 / 3600, burst: float = 2):
+        super().__init__(rate, burst)
+        self.url = f"{api.rstrip('/')}/2/tweets"
+        self.token = token
+
+    def request(self, text: str):
+        return self.url, {"text": text}, {"Authorization": f"Bearer {self.token}"}
+
+
+def configured_channels() -> List[Channel]:
+    """Channels whose credentials are set in the environment"""
+    channels = []
+    if os.getenv("NOTIFY_TELEGRAM_TOKEN") and os.getenv("NOTIFY_TELEGRAM_CHAT"):
+        channels.append(TelegramChannel(os.environ["NOTIFY_TELEGRAM_TOKEN"], os.environ["NOTIFY_TELEGRAM_CHAT"],
+                                        os.getenv("NOTIFY_TELEGRAM_API", "https://api.telegram.org")))
+    if os.getenv("NOTIFY_DISCORD_WEBHOOK"):
+        channels.append(DiscordChannel(os.environ["NOTIFY_DISCORD_WEBHOOK"]))
+    if os.getenv("NOTIFY_TWITTER_TOKEN"):
+        per_hour = float(os.getenv("NOTIFY_TWITTER_PER_HOUR", 4))
+        channels.append(TwitterChannel(os.environ["NOTIFY_TWITTER_TOKEN"],
+                                       os.getenv("NOTIFY_TWITTER_API", "https://api.twitter.com"),
+                                       rate=per_hour / 3600))
+    return channels
+
+
+# ----------------------------------------------------------------------
+# Texts
+# ----------------------------------------------------------------------
+
+def _geofence_line(alert: Dict, style: str) -> str:
+    who = alert["callsign"].strip() or alert["icao_hex"]
+    verb = "entered" if alert["event"] == "enter" else "left"
+    fence = alert["fence"]
+    if style == "html":
+        return f"📍 <b>{html.escape(who)}</b> ({alert['icao_hex']}) {verb} {html.escape(fence)}"
+    return f"📍 {who} ({alert['icao_hex']}) {verb} {fence}"
+
+
+def _panic_line(fields: Dict, style: str) -> str:
+    trend = f" ({fields['trend']:+d})" if fields["trend"] else ""
+    region = html.escape(fields["region"]) if style == "html" else fields["region"]
+    return f"{level(fields['overall'])[0]} {region}: {fields['overall']}/100{trend}".strip()
+
+
+def compose(alerts: List[Tuple[str, Dict]], channel: Channel) -> str:
+    """One alert's own text, or a digest of several [(kind, payload)] cut to the channel's limit"""
+    if len(alerts) == 1:
+        kind, payload = alerts[0]
+        if kind == "geofence":
+            return _geofence_line(payload, channel.style)[:channel.limit]
+        return telegram_text(payload) if channel.style == "html" else tweet_text(payload)
+
+    panic = sorted((p for k, p in alerts if k == "panic"), key=lambda f: (-f["overall"], f["region"]))
+    fences = [p for k, p in alerts if k == "geofence"]
+    head = ", ".join(part for part in (
+        f"{len(panic)} panic alert{'s' if len(panic) != 1 else ''}" if panic else "",
+        f"{len(fences)} geofence event{'s' if len(fences) != 1 else ''}" if fences else "",
+    ) if part)
+    head = f"<b>{head}</b>" if channel.style == "html" else head
+    lines = [_panic_line(f, channel.style) for f in panic] + [_geofence_line(a, channel.style) for a in fences]
+
+    text, shown = head, 0
+    for i, line in enumerate(lines):
+        more = len(lines) - i - 1
+        # Always leave room to say how many did not fit
+        reserve = len(f"\n…and {more} more") if more else 0
+        if len(text) + 1 + len(line) + reserve > channel.limit:
+            break
+        text += "\n" + line
+        shown += 1
+    if shown < len(lines):
+        text += f"\n…and {len(lines) - shown} more"
+    return text
+
+
+# ----------------------------------------------------------------------
+# Outbox
+# ----------------------------------------------------------------------
+
+class Outbox:
+    """SQLite store of alerts, the messages they were sent in, and source watermarks"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or outbox_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Shared by the event loop and the poller thread, one statement at a time
+        self.db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(OUTBOX_SCHEMA)
+        self.lock = threading.Lock()
+
+    def transaction(self, work: Callable[[sqlite3.Connection], object]):
+        """Run work(db) in one write transaction"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self.db)
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+            return result
+
+    def get_state(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        with self.lock:
+            row = self.db.execute("SELECT value FROM state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def pending(self, channel: str) -> Tuple[int, float]:
+        """(alerts not yet in a message, created_at of the oldest)"""
+        with self.lock:
+            count, oldest = self.db.execute(
+                "SELECT count(*), min(created_at) FROM alerts WHERE channel = ? AND message_id IS NULL",
+                (channel,),
+            ).fetchone()
+        return count, oldest or 0.0
+
+    def coalesce(self, channel: Channel) -> Optional[int]:
+        """Put every pending alert of a channel into one new message; returns its id"""
+        def work(db):
+            rows = db.execute(
+                "SELECT key, kind, payload FROM alerts WHERE channel = ? AND message_id IS NULL ORDER BY created_at, key",
+                (channel.name,),
+            ).fetchall()
+            if not rows:
+                return None
+            text = compose([(kind, json.loads(payload)) for _, kind, payload in rows], channel)
+            now = time.time()
+            message_id = db.execute(
+                "INSERT INTO messages (channel, text, alerts, created_at, next_attempt) VALUES (?, ?, ?, ?, ?)",
+                (channel.name, text, len(rows), now, now),
+            ).lastrowid
+            db.executemany("UPDATE alerts SET message_id = ? WHERE channel = ? AND key = ?",
+                           [(message_id, channel.name, key) for key, _, _ in rows])
+            return message_id
+
+        return self.transaction(work)
+
+    def next_message(self, channel: str) -> Optional[Tuple[int, str, int, float]]:
+        """Oldest unsent message of a channel as (id, text, attempts, next_attempt)"""
+        with self.lock:
+            return self.db.execute(
+                "SELECT id, text, attempts, next_attempt FROM messages "
+                "WHERE channel = ? AND sent_at IS NULL AND failed = 0 ORDER BY id LIMIT 1",
+                (channel,),
+            ).fetchone()
+
+    def mark_sent(self, message_id: int):
+        with self.lock:
+            self.db.execute("UPDATE messages SET sent_at = ?, attempts = attempts + 1, error = NULL WHERE id = ?",
+                            (time.time(), message_id))
+
+    def mark_failed(self, message_id: int, error: str, next_attempt: Optional[float]):
+        """Record a failed attempt; next_attempt None means give up"""
+        with self.lock:
+            self.db.execute(
+                "UPDATE messages SET attempts = attempts + 1, error = ?, next_attempt = coalesce(?, next_attempt), "
+                "failed = ? WHERE id = ?",
+                (error, next_attempt, int(next_attempt is None), message_id),
+            )
+
+    def retry_failed(self) -> int:
+        with self.lock:
+            return self.db.execute(
+                "UPDATE messages SET failed = 0, attempts = 0, next_attempt = ? WHERE failed = 1", (time.time(),)
+            ).rowcount
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            pending = dict(self.db.execute(
+                "SELECT channel, count(*) FROM alerts WHERE message_id IS NULL GROUP BY channel").fetchall())
+            messages = self.db.execute(
+                "SELECT channel, sum(sent_at IS NULL AND failed = 0), sum(sent_at IS NOT NULL), sum(failed), "
+                "sum(CASE WHEN sent_at IS NOT NULL THEN alerts ELSE 0 END) FROM messages GROUP BY channel"
+            ).fetchall()
+        summary = {channel: {"pending_alerts": count, "queued": 0, "sent": 0, "failed": 0, "alerts_sent": 0}
+                   for channel, count in pending.items()}
+        for channel, queued, sent, failed, alerts in messages:
+            summary.setdefault(channel, {"pending_alerts": 0}).update(
+                queued=queued or 0, sent=sent or 0, failed=failed or 0, alerts_sent=alerts or 0)
+        return summary
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+# ----------------------------------------------------------------------
+# Dispatcher
+# ----------------------------------------------------------------------
+
+class Dispatcher:
+    """Turns new panic_scores/geofence_events rows into alerts and delivers them"""
+
+    def __init__(self, channels: List[Channel], outbox: Optional[Outbox] = None,
+                 threshold: float = NOTIFY_THRESHOLD, window_hours: int = NOTIFY_WINDOW_HOURS,
+                 coalesce_seconds: float = COALESCE_SECONDS, max_attempts: int = MAX_ATTEMPTS,
+                 backoff_seconds: float = BACKOFF_SECONDS, fence_lag_seconds: float = FENCE_LAG_SECONDS):
+        self.channels = channels
+        self.outbox = outbox or Outbox()
+        self.threshold = threshold
+        self.window_hours = window_hours
+        self.coalesce_seconds = coalesce_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.fence_lag_seconds = fence_lag_seconds
+        self.stats = {"polls": 0, "alerts": 0, "attempts": 0, "sent": 0, "retries": 0, "gave_up": 0}
+        self._stopping: Optional[asyncio.Event] = None
+        self._wakes: Dict[str, asyncio.Event] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------
+
+    def _panic_alerts(self, db: sqlite3.Connection, rows: Iterable[Dict]) -> List[Tuple[str, str, Dict]]:
+        """Threshold crossings among score rows (in timestamp order), updating per-region state"""
+        alerts = []
+        for row in rows:
+            if int(row.get("window_hours", NOTIFY_WINDOW_HOURS)) != self.window_hours:
+                continue
+            name = f"region:{row['region']}"
+            stored = db.execute("SELECT value FROM state WHERE name = ?", (name,)).fetchone()
+            last = float(stored[0]) if stored else None
+            score = row["overall_panic_score"]
+            if last is not None and score < self.threshold - REARM_MARGIN:
+                db.execute("DELETE FROM state WHERE name = ?", (name,))
+                continue
+            if score < self.threshold or (last is not None and score < last + RENOTIFY_DELTA):
+                continue
+            db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (name, str(score)))
+            fields = card_fields(row)
+            alerts.append(("panic", f"panic:{row['region']}:{self.window_hours}:{_epoch(row['timestamp'])}", fields))
+        return alerts
+
+    @staticmethod
+    def _geofence_alerts(rows: Iterable[Dict]) -> List[Tuple[str, str, Dict]]:
+        return [("geofence", f"geofence:{r['fence_id']}:{r['icao_hex']}:{r['event']}:{_epoch(r['timestamp'])}",
+                 {"fence": r["fence"] or r["fence_id"], "icao_hex": r["icao_hex"], "callsign": r["callsign"],
+                  "event": r["event"], "at": _epoch(r["timestamp"])})
+                for r in rows]
+
+    def ingest(self, scores: Iterable[Dict] = (), fence_events: Iterable[Dict] = (),
+               watermarks: Optional[Dict[str, int]] = None) -> int:
+        """
+        Record alerts for new rows and advance the source watermarks in one
+        transaction; returns the number of (channel, alert) rows added
+        """
+        def work(db):
+            alerts = self._panic_alerts(db, scores) + self._geofence_alerts(fence_events)
+            now = time.time()
+            added = 0
+            for channel in self.channels:
+                added += db.executemany(
+                    "INSERT OR IGNORE INTO alerts (channel, key, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(channel.name, key, kind, json.dumps(payload, ensure_ascii=False), now)
+                     for kind, key, payload in alerts if kind in channel.kinds],
+                ).rowcount
+            for name, value in (watermarks or {}).items():
+                db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (f"watermark:{name}", str(value)))
+            return added
+
+        added = self.outbox.transaction(work)
+        self.stats["alerts"] += added
+        if added:
+            self._wake_all()
+        return added
+
+    def _wake_all(self):
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(lambda: [event.set() for event in self._wakes.values()])
+
+    def poll_once(self, client) -> int:
+        """
+        Read rows newer than the watermarks from ClickHouse and ingest them
+
+        Geofence events are re-read from fence_lag_seconds behind their
+        watermark. Score rows are not: each scorer run inserts its rows in
+        one batch, and replaying an old score could alert again on a region
+        that has re-armed since.
+        """
+        default = int(time.time()) - BACKFILL_SECONDS
+        since_scores = int(self.outbox.get_state("watermark:panic_scores", default))
+        since_fences = int(self.outbox.get_state("watermark:geofence_events", default))
+
+        columns = ["timestamp", "region", "window_hours", "overall_panic_score", "night_flight_score",
+                   "convergence_score", "airlift_score", "vip_movement_score", "formation_score",
+                   "flight_count", "countries_involved", "narrative", "trend_delta"]
+        scores = [dict(zip(columns, row)) for row in client.execute(
+            f"""
+            SELECT {', '.join(columns)}
+            FROM panic_scores
+            WHERE timestamp > toDateTime(%(since)s) AND window_hours = %(hours)s
+            ORDER BY timestamp, region
+            """,
+            {"since": since_scores, "hours": self.window_hours},
+        )]
+
+        fence_columns = ["timestamp", "fence_id", "fence", "icao_hex", "callsign", "event"]
+        fence_events = [dict(zip(fence_columns, row)) for row in client.execute(
+            """
+            SELECT e.timestamp, e.fence_id, f.name, e.icao_hex, e.callsign, toString(e.event)
+            FROM geofence_events AS e
+            LEFT JOIN (
+                SELECT fence_id, argMax(name, updated_at) AS name FROM geofences GROUP BY fence_id
+            ) AS f USING (fence_id)
+            WHERE e.timestamp > toDateTime(%(since)s)
+            ORDER BY e.timestamp
+            """,
+            {"since": since_fences - int(self.fence_lag_seconds)},
+        )] if any("geofence" in c.kinds for c in self.channels) else []
+
+        watermarks = {}
+        if scores:
+            watermarks["panic_scores"] = max(_epoch(r["timestamp"]) for r in scores)
+        if fence_events:
+            # The overlap never moves the watermark back
+            watermarks["geofence_events"] = max(since_fences, max(_epoch(r["timestamp"]) for r in fence_events))
+        self.stats["polls"] += 1
+        return self.ingest(scores, fence_events, watermarks)
+
+    # ------------------------------------------------------------------
+    # Delivery
+    # ------------------------------------------------------------------
+
+    def _backoff(self, attempts: int, retry_after_seconds: float) -> float:
+        delay = min(BACKOFF_CAP_SECONDS, self.backoff_seconds * 2 ** (attempts - 1))
+        # Jitter so channels that failed together do not retry together
+        return max(retry_after_seconds, delay * random.uniform(0.8, 1.2))
+
+    def _next_wait(self, channel: Channel) -> Optional[float]:
+        """
+        Seconds to wait before this channel has something to post, None if
+        it has a message due or ready to be coalesced now
+        """
+        message = self.outbox.next_message(channel.name)
+        if message is not None:
+            wait = message[3] - time.time()
+            return wait if wait > 0 else None
+        count, oldest = self.outbox.pending(channel.name)
+        if not count:
+            return 60.0
+        # Keep coalescing while the window is open or the channel has no token
+        wait = max(oldest + self.coalesce_seconds - time.time(), channel.bucket.delay())
+        if wait > 0:
+            return wait
+        self.outbox.coalesce(channel)
+        return None
+
+    async def _deliver(self, channel: Channel, session):
+        wake = self._wakes[channel.name]
+        while not self._stopping.is_set():
+            wait = self._next_wait(channel)
+            if wait is not None:
+                wake.clear()
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            message_id, text, attempts, _ = self.outbox.next_message(channel.name)
+            await channel.bucket.acquire()
+            self.stats["attempts"] += 1
+            sent, retryable, retry_after_seconds, error = await asyncio.to_thread(channel.send, session, text)
+            if sent:
+                self.outbox.mark_sent(message_id)
+                self.stats["sent"] += 1
+            elif retryable and attempts + 1 < self.max_attempts:
+                self.outbox.mark_failed(message_id, error, time.time() + self._backoff(attempts + 1, retry_after_seconds))
+                self.stats["retries"] += 1
+            else:
+                self.outbox.mark_failed(message_id, error, None)
+                self.stats["gave_up"] += 1
+                print(f"  ✗ {channel.name}: gave up on message {message_id}: {error}")
+
+    async def _poll(self, client, interval: float):
+        while not self._stopping.is_set():
+            try:
+                added = await asyncio.to_thread(self.poll_once, client)
+                if added:
+                    print(f"  {added} alert{'s' if added != 1 else ''} queued")
+            except Exception as e:
+                print(f"Warning: notify poll failed: {type(e).__name__}: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, client=None, poll_seconds: float = 30.0):
+        """Deliver until stop(); also poll ClickHouse when a client is given"""
+        import requests
+
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._wakes = {c.name: asyncio.Event() for c in self.channels}
+        sessions = [requests.Session() for _ in self.channels]
+        tasks = [asyncio.ensure_future(self._deliver(c, s)) for c, s in zip(self.channels, sessions)]
+        if client is not None:
+            tasks.append(asyncio.ensure_future(self._poll(client, poll_seconds)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for session in sessions:
+                session.close()
+            self._loop = None
+
+    def stop(self):
+        """Finish in-flight sends and return from run(); safe from any thread"""
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stopping.set)
+        self._wake_all()
+
+
+def _epoch(value) -> int:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def main():
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Post panic alerts and geofence events to chat channels")
+    parser.add_argument("command", choices=["serve", "status", "retry"])
+    parser.add_argument("--poll", type=float, default=float(os.getenv("NOTIFY_POLL_SECONDS", 30)),
+                        help="serve: seconds between ClickHouse polls")
+    args = parser.parse_args()
+
+    outbox = Outbox()
+    if args.command == "status":
+        print(json.dumps(outbox.summary(), indent=2))
+        return
+    if args.command == "retry":
+        print(f"✓ Requeued {outbox.retry_failed()} messages")
+        return
+
+    channels = configured_channels()
+    if not channels:
+        print("✗ No channels configured (NOTIFY_TELEGRAM_*, NOTIFY_DISCORD_WEBHOOK, NOTIFY_TWITTER_TOKEN)")
+        raise SystemExit(1)
+
+    from db import get_pool
+    dispatcher = Dispatcher(
+        channels, outbox,
+        threshold=float(os.getenv("NOTIFY_THRESHOLD", NOTIFY_THRESHOLD)),
+        coalesce_seconds=float(os.getenv("NOTIFY_COALESCE_SECONDS", COALESCE_SECONDS)),
+        fence_lag_seconds=float(os.getenv("NOTIFY_FENCE_LAG_SECONDS", FENCE_LAG_SECONDS)),
+    )
+    print(f"Notify dispatcher: {', '.join(c.name for c in channels)} "
+          f"(threshold {dispatcher.threshold:.0f}, outbox {outbox.path})")
+
+    async def serve():
+        # Let an in-flight send finish and be recorded rather than cancelling it
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, dispatcher.stop)
+        await dispatcher.run(get_pool(), args.poll)
+
+    try:
+        asyncio.run(serve())
+        print("\nShut down gracefully")
+    finally:
+        outbox.close()
+
+
+if __name__ == "__main__":
+    main()
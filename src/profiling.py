@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+On-demand cycle profiling
+When a poll or a scoring run is slow in production there is nothing to look
+at afterwards. CycleProfiler is armed at runtime for the next N cycles and
+records, for each of them:
+
+- a sampling profile of the thread running the cycle: a background thread
+  reads its stack every PROFILE_INTERVAL_MS (sys._current_frames, so no
+  tracing hooks and no dependency). Pool threads the cycle hands work to
+  (WORKER_THREADS, e.g. the scoring pipeline's component threads) are read
+  too while busy, each under a root frame named after the thread, so the
+  samples count thread time rather than wall time
+- a tracemalloc snapshot of the blocks the cycle allocated and still held at
+  its end, plus the peak traced size (PROFILE_ALLOCATIONS=0 skips it)
+
+Sampling adds next to nothing; tracemalloc is what slows a profiled cycle
+down, about 4x with the allocating line alone and over 10x with
+PROFILE_TRACE_FRAMES of 8 or more, so deeper allocation stacks are opt-in.
+
+Each cycle is written to PROFILE_DIR as <cycle_id>.collapsed (folded stacks
+for flamegraph.pl or speedscope), <cycle_id>.speedscope.json (time and, when
+traced, allocated bytes) and <cycle_id>.json with the cycle's tags: kind,
+sequence number, duration and the row counts the caller reported.
+
+Disarmed, cycle() is one integer test returning a shared no-op context, so
+the hooks in the ingester and the scorer cost well under a microsecond.
+
+Arming: SIGUSR1 to the ingester or the score daemon arms PROFILE_CYCLES
+cycles, and the daemon also takes {"command": "profile", "cycles": N}.
+
+    kill -USR1 <ingester pid>
+    python src/score_daemon.py profile --cycles 3
+    python src/profiling.py top data/profiles/poll-20260101T000000-12.collapsed
+"""
+
+import concurrent.futures.thread
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+# Allocation sites written per cycle (largest first); the rest is one "other" line
+TOP_ALLOCATIONS = 200
+# Name prefixes of the pool threads a cycle's work runs on (scoring.ScoringPipeline)
+WORKER_THREADS = ("score",)
+# A pool thread with nothing but these files on its stack is waiting for work
+_POOL_FILES = frozenset((threading.__file__, concurrent.futures.thread.__file__))
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+class _IdleCycle:
+    """Context returned while disarmed: no clock reads, no allocation"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def tag(self, **tags):
+        pass
+
+
+_IDLE = _IdleCycle()
+
+
+class _Sampler(threading.Thread):
+    """Reads one thread's stack, and its busy pool threads', every interval into folded-stack counts"""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+
+    def run(self):
+        frames = sys._current_frames
+        while not self._done.wait(self.interval):
+            current = frames()
+            self._sample(current.get(self.thread_id))
+            for thread in threading.enumerate():
+                if thread.name.startswith(WORKER_THREADS) and thread.ident in current:
+                    self._sample(current[thread.ident], worker=thread.name)
+
+    def _sample(self, frame, worker: Optional[str] = None):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        if worker is not None:
+            # Drop the pool's own frames; none left means it is idle
+            stack = stack[next((i for i, f in enumerate(stack) if f[1] not in _POOL_FILES), len(stack)):]
+            if stack:
+                stack.insert(0, (worker, "<thread>", 0))
+        if stack:
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    def finish(self) -> Counter:
+        self._done.set()
+        self.join()
+        return self.stacks
+
+
+class _ProfiledCycle:
+    def __init__(self, profiler: "CycleProfiler", kind: str, tags: Dict):
+        self.profiler = profiler
+        self.kind = kind
+        self.tags = dict(tags)
+        self.sampler: Optional[_Sampler] = None
+        self.tracing = False
+
+    def tag(self, **tags):
+        """Attach row counts etc. known only once the cycle has run"""
+        self.tags.update(tags)
+
+    def __enter__(self):
+        profiler = self.profiler
+        self.started_at = datetime.now(timezone.utc)
+        self.cycle_id = f"{self.kind}-{self.started_at:%Y%m%dT%H%M%S}-{profiler.next_sequence(self.kind)}"
+        # Someone else's tracemalloc session is left running and not reset
+        if profiler.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(profiler.trace_frames)
+            self.tracing = True
+        self.sampler = _Sampler(threading.get_ident(), profiler.interval)
+        self.sampler.start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        stacks = self.sampler.finish()
+        allocations, traced = None, None
+        if self.tracing:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+            traced = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            allocations = snapshot.statistics("traceback")
+        if exc_type is not None:
+            self.tags["error"] = f"{exc_type.__name__}: {exc}"
+        try:
+            self.profiler.write(self, seconds, stacks, allocations, traced)
+        except OSError as e:
+            print(f"⚠ Could not write profile {self.cycle_id}: {e}")
+        return False
+
+
+class CycleProfiler:
+    """Profiles the next N cycles of whichever loops call cycle()"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("PROFILE_DIR", "data/profiles")
+        self.remaining = 0
+        self.interval = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000
+        self.allocations = os.getenv("PROFILE_ALLOCATIONS", "1") == "1"
+        # Frames kept per allocation traceback: 1 is the allocating line alone
+        self.trace_frames = int(os.getenv("PROFILE_TRACE_FRAMES", 1))
+        self.written = []
+        self._sequence: Counter = Counter()
+        # Re-entrant: the SIGUSR1 handler may run while the main thread holds it
+        self._lock = threading.RLock()
+
+    def arm(self, cycles: Optional[int] = None, interval_ms: Optional[float] = None,
+            allocations: Optional[bool] = None) -> Dict:
+        """Profile the next `cycles` cycles (0 disarms); returns the new state"""
+        with self._lock:
+            self.remaining = int(os.getenv("PROFILE_CYCLES", 3)) if cycles is None else max(0, int(cycles))
+            if interval_ms is not None:
+                self.interval = float(interval_ms) / 1000
+            if allocations is not None:
+                self.allocations = bool(allocations)
+        return self.state()
+
+    def state(self) -> Dict:
+        return {"remaining": self.remaining, "interval_ms": self.interval * 1000,
+                "allocations": self.allocations, "directory": self.directory,
+                "written": self.written[-10:]}
+
+    def next_sequence(self, kind: str) -> int:
+        with self._lock:
+            self._sequence[kind] += 1
+            return self._sequence[kind]
+
+    def cycle(self, kind: str, **tags):
+        """Context for one poll/scoring cycle; profiled only while armed"""
+        if not self.remaining:
+            return _IDLE
+        with self._lock:
+            if not self.remaining:
+                return _IDLE
+            self.remaining -= 1
+        return _ProfiledCycle(self, kind, tags)
+
+    def install_signal(self, signum: int = getattr(signal, "SIGUSR1", 0)) -> bool:
+        """Arm PROFILE_CYCLES cycles on `signum`; main thread only, POSIX only"""
+        if not signum or threading.current_thread() is not threading.main_thread():
+            return False
+        signal.signal(signum, lambda *_: self.arm())
+        return True
+
+    # ------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------
+
+    def write(self, cycle: _ProfiledCycle, seconds: float, stacks: Counter, allocations, traced):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, cycle.cycle_id)
+        interval_ms = self.interval * 1000
+
+        with open(base + ".collapsed", "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(";".join(frame_name(frame) for frame in stack) + f" {count}\n")
+
+        frames, index = [], {}
+
+        def frame_index(frame: Frame) -> int:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            return index[frame]
+
+        label = f"{cycle.cycle_id} " + " ".join(f"{k}={v}" for k, v in cycle.tags.items())
+        profiles = [{
+            "type": "sampled", "name": f"{label} (time)", "unit": "milliseconds",
+            "startValue": 0, "endValue": round(sum(stacks.values()) * interval_ms, 3),
+            "samples": [[frame_index(f) for f in stack] for stack in stacks],
+            "weights": [count * interval_ms for count in stacks.values()],
+        }]
+        meta = {"cycle_id": cycle.cycle_id, "kind": cycle.kind, "started_at": cycle.started_at.isoformat(),
+                "seconds": round(seconds, 6), "samples": sum(stacks.values()), "interval_ms": interval_ms,
+                "tags": cycle.tags}
+
+        if allocations is not None:
+            top = allocations[:TOP_ALLOCATIONS]
+            samples = [[frame_index(("", frame.filename, frame.lineno)) for frame in stat.traceback]
+                       for stat in top]
+            weights = [stat.size for stat in top]
+            rest = sum(stat.size for stat in allocations[TOP_ALLOCATIONS:])
+            if rest:
+                samples.append([frame_index(("other", "", 0))])
+                weights.append(rest)
+            profiles.append({
+                "type": "sampled", "name": f"{label} (live allocations)", "unit": "bytes",
+                "startValue": 0, "endValue": sum(weights), "samples": samples, "weights": weights,
+            })
+            meta["allocations"] = {"live_bytes": traced[0], "peak_bytes": traced[1],
+                                   "blocks": sum(stat.count for stat in allocations)}
+
+        # Allocation frames carry no function name; show them as file:line
+        for frame in frames:
+            if not frame["name"]:
+                frame["name"] = f"{os.path.basename(frame['file'])}:{frame['line']}"
+        document = {"$schema": "https://www.speedscope.app/file-format-schema.json",
+                    "name": label, "exporter": "sleepwatch profiling.py",
+                    "shared": {"frames": frames}, "profiles": profiles}
+        with open(base + ".speedscope.json", "w") as f:
+            json.dump(document, f)
+        with open(base + ".json", "w") as f:
+            json.dump(meta, f, indent=2, default=str)
+
+        self.written.append(cycle.cycle_id)
+        print(f"  Profiled {cycle.cycle_id}: {meta['samples']} samples over {seconds:.2f}s -> {base}.*")
+
+
+def frame_name(frame: Frame) -> str:
+    # Folded stacks split frames on ';' and the count off at the last space
+    return f"{frame[0]} ({os.path.basename(frame[1])}:{frame[2]})".replace(";", ":")
+
+
+_profiler: Optional[CycleProfiler] = None
+
+
+def get_profiler() -> CycleProfiler:
+    """The process-wide profiler the ingest and scoring loops report to"""
+    global _profiler
+    if _profiler is None:
+        _profiler = CycleProfiler()
+    return _profiler
+
+
+def top_frames(path: str, limit: int = 25):
+    """(self samples, total samples, frame) from a .collapsed file, by self time"""
+    own, total, samples = Counter(), Counter(), 0
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            count = int(count)
+            frames = stack.split(";")
+            samples += count
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+    return samples, [(own[frame], total[frame], frame) for frame, _ in own.most_common(limit)]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Arm cycle profiling and read its output")
+    sub = parser.add_subparsers(dest="command", required=True)
+    arm = sub.add_parser("signal", help="Arm profiling in a running ingester or score daemon")
+    arm.add_argument("pid", type=int)
+    show = sub.add_parser("top", help="Frames with the most self time in a .collapsed file")
+    show.add_argument("path")
+    show.add_argument("--limit", type=int, default=25)
+    args = parser.parse_args()
+
+    if args.command == "signal":
+        os.kill(args.pid, signal.SIGUSR1)
+        print(f"✓ Sent SIGUSR1 to {args.pid}; profiles appear in PROFILE_DIR after its next cycles")
+        return
+
+    samples, rows = top_frames(args.path, args.limit)
+    print(f"{samples} samples\n\n  {'self':>6} {'total':>6}  frame")
+    for own, total, frame in rows:
+        print(f"  {own / samples:>6.1%} {total / samples:>6.1%}  {frame}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Position quality filter
+store_positions used to drop only reports without a position, so ghosts at
+0°N 0°E, teleport jumps, airborne reports without an altitude (stored as 0)
+and other impossible values reached flight_positions and from there the
+convergence and night scores. PositionFilter checks each batch before it is
+stored and routes rejects to position_quarantine with a reason:
+
+- position: latitude/longitude out of range
+- ghost: within GHOST_DEGREES of 0°N 0°E
+- altitude: outside MIN_ALTITUDE..MAX_ALTITUDE
+- speed: reported velocity above MAX_SPEED (MAX_GROUND_SPEED on the ground)
+- zero_altitude: airborne without a barometric or geometric altitude, or at
+  exactly 0 m
+- duplicate: the same ICAO in one batch twice, further apart than it could
+  have flown between the two reports (a spoofed or mis-decoded address);
+  every copy is rejected, there is no telling which one is real
+- teleport: further from the aircraft's last accepted fix than MAX_SPEED
+  allows for the time between them, plus JUMP_SLACK_METRES
+
+The last accepted fix per aircraft lives in numpy arrays with one row per
+ICAO, so a batch is checked in a handful of vector operations. A rejected
+report never moves that fix; after RELOCATE_STRIKES jumps in a row the
+aircraft is taken to really be somewhere else (e.g. its previous fix was the
+bad one) and the new fix is accepted.
+
+Reports without a position pass through untouched, and build_position_rows
+skips them as before. POSITION_FILTER=0 turns the filter off.
+
+    python src/quality.py --hours 24
+"""
+
+from collections import Counter
+from datetime import datetime
+from operator import itemgetter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from tracks import EARTH_RADIUS_M, epoch_seconds, great_circle_m
+
+REASONS = ("", "position", "ghost", "altitude", "speed", "zero_altitude", "duplicate", "teleport")
+POSITION, GHOST, ALTITUDE, SPEED, ZERO_ALTITUDE, DUPLICATE, TELEPORT = range(1, len(REASONS))
+
+GHOST_DEGREES = 0.01
+MIN_ALTITUDE = -500.0   # m; the lowest airfields are around -400 m
+MAX_ALTITUDE = 25000.0  # m; above the U-2 and Global Hawk ceilings
+# Rejecting, not segmenting, so well above tracks.MAX_SPEED: ~Mach 2 at altitude
+MAX_SPEED = 600.0       # m/s
+MAX_GROUND_SPEED = 100.0  # m/s, ~195 kt; faster is a take-off roll flagged as airborne
+# Position quantization and time_position jitter between two fixes
+JUMP_SLACK_METRES = 5000.0
+RELOCATE_STRIKES = 3
+
+QUARANTINE_COLUMNS = ("timestamp", "icao_hex", "callsign", "lat", "lon", "altitude", "ground_speed",
+                      "vertical_rate", "on_ground", "source", "reason", "detail")
+
+
+# The numeric fields check() reads, in the order of its columns
+_FIELDS = ("latitude", "longitude", "velocity", "baro_altitude", "time_position")
+_COLUMNS = tuple(map(itemgetter, _FIELDS))
+_ON_GROUND = itemgetter("on_ground")
+_ICAO = itemgetter("icao24")
+METRES_PER_DEGREE = EARTH_RADIUS_M * np.pi / 180
+
+
+class PositionFilter:
+    """Vectorized plausibility, duplicate and jump checks with per-ICAO state"""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.icaos: List[str] = []
+        self.last_time = np.full(0, np.nan)
+        self.last_lat = np.zeros(0)
+        self.last_lon = np.zeros(0)
+        self.strikes = np.zeros(0, dtype=np.int8)
+        self.totals: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self.icaos)
+
+    def _grow(self, size: int):
+        size = max(size, 2 * len(self.last_time), 1024)
+        extra = size - len(self.last_time)
+        self.last_time = np.concatenate([self.last_time, np.full(extra, np.nan)])
+        self.last_lat = np.concatenate([self.last_lat, np.zeros(extra)])
+        self.last_lon = np.concatenate([self.last_lon, np.zeros(extra)])
+        self.strikes = np.concatenate([self.strikes, np.zeros(extra, dtype=np.int8)])
+
+    def rows(self, icaos: Sequence[str]) -> np.ndarray:
+        """State row per ICAO, adding rows for aircraft not seen before"""
+        index = self.index
+        try:
+            # All seen before: one pass, no list in between
+            return np.fromiter(map(index.__getitem__, icaos), dtype=np.int64, count=len(icaos))
+        except KeyError:
+            pass
+        rows = list(map(index.get, icaos))
+        if None in rows:
+            for i, row in enumerate(rows):
+                if row is None:
+                    icao = icaos[i]
+                    row = index.get(icao)
+                    if row is None:
+                        row = index[icao] = len(self.icaos)
+                        self.icaos.append(icao)
+                    rows[i] = row
+            if len(self.icaos) > len(self.last_time):
+                self._grow(len(self.icaos))
+        return np.array(rows, dtype=np.int64)
+
+    def check(self, states: Sequence[Dict], received: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (reason code per state, 0 = accepted; detail per state) and the
+        accepted fixes folded into the per-aircraft state. received (epoch
+        seconds) stands in for a missing time_position/last_contact.
+        """
+        n = len(states)
+        reason = np.zeros(n, dtype=np.int8)
+        detail = np.zeros(n)
+        if not n:
+            return reason, detail
+
+        # One C-level pass over the states per column, converted as it goes
+        # (None becomes NaN) with no tuple per state in between; the
+        # fallbacks only for the rows missing a value
+        lats, lons, velocity, altitudes, times = (
+            np.fromiter(map(field, states), dtype=np.float64, count=n) for field in _COLUMNS)
+        on_ground = np.fromiter(map(_ON_GROUND, states), dtype=bool, count=n)
+        # Most ground reports have no altitude and keep NaN, which no range check flags
+        airborne = ~on_ground
+        zero_altitude = airborne & ~(np.abs(altitudes) > 0)
+        if zero_altitude.any():
+            missing = np.flatnonzero(zero_altitude)
+            altitudes[missing] = np.array([states[i]["geo_altitude"] for i in missing.tolist()], dtype=np.float64)
+            zero_altitude = airborne & ~(np.abs(altitudes) > 0)
+        missing = np.flatnonzero(np.isnan(times))
+        if len(missing):
+            times[missing] = np.array([states[i]["last_contact"] for i in missing.tolist()], dtype=np.float64)
+            times[np.isnan(times)] = received
+
+        # Applied last to first, so a report keeps the first reason it matches;
+        # NaN compares false, so reports without a position pass the first two.
+        # Most batches fail none, and then nothing is assigned at all
+        lat_size, lon_size = np.abs(lats), np.abs(lons)
+        checks = (
+            (POSITION, (lat_size > 90) | (lon_size > 180), None),
+            (GHOST, (lat_size < GHOST_DEGREES) & (lon_size < GHOST_DEGREES), None),
+            (ALTITUDE, (altitudes < MIN_ALTITUDE) | (altitudes > MAX_ALTITUDE), altitudes),
+            (SPEED, (velocity > MAX_SPEED) | (on_ground & (velocity > MAX_GROUND_SPEED)), velocity),
+            (ZERO_ALTITUDE, zero_altitude, None),
+        )
+        unpositioned = np.isnan(lats) | np.isnan(lons)
+        if any(mask.any() for _, mask, _ in checks):
+            for code, mask, value in reversed(checks):
+                reason[mask] = code
+                detail[mask] = 0.0 if value is None else value[mask]
+            reason[unpositioned] = 0
+            detail[unpositioned] = 0.0
+            candidates = np.flatnonzero(~unpositioned & (reason == 0))
+        elif unpositioned.any():
+            candidates = np.flatnonzero(~unpositioned)
+        else:
+            candidates = None
+        if candidates is not None and not len(candidates):
+            return reason, detail
+
+        rows = self.rows(list(map(_ICAO, states)))
+        if candidates is None:
+            # Everything positioned and plausible, as in most snapshots
+            candidates, t, lat, lon = np.arange(n), times, lats, lons
+        else:
+            rows = rows[candidates]
+            t, lat, lon = times[candidates], lats[candidates], lons[candidates]
+        if np.bincount(rows).max() == 1:
+            # One report per aircraft, as in a single snapshot
+            self._jumps(candidates, rows, t, lat, lon, reason, detail)
+        else:
+            self._repeats(candidates, rows, t, lat, lon, reason, detail)
+
+        if reason.any():
+            counts = np.bincount(reason, minlength=len(REASONS)).tolist()
+            self.totals.update({REASONS[code]: count for code, count in enumerate(counts) if code and count})
+        return reason, detail
+
+    def _repeats(self, candidates, rows, t, lat, lon, reason, detail):
+        """Batches with several reports of some aircraft: duplicates, then one rank at a time"""
+        order = np.lexsort((t, rows))
+        candidates, rows, t, lat, lon = candidates[order], rows[order], t[order], lat[order], lon[order]
+
+        # Same ICAO twice in the batch, in places it could not have flown between
+        same = rows[1:] == rows[:-1]
+        if same.any():
+            pair = np.flatnonzero(same)
+            metres = great_circle_m(lat[pair], lon[pair], lat[pair + 1], lon[pair + 1])
+            conflict = metres > MAX_SPEED * (t[pair + 1] - t[pair]) + JUMP_SLACK_METRES
+            if conflict.any():
+                spoofed = np.isin(rows, rows[pair[conflict]])
+                reason[candidates[spoofed]] = DUPLICATE
+                detail[candidates[pair[conflict]]] = metres[conflict]
+                detail[candidates[pair[conflict] + 1]] = metres[conflict]
+                keep = ~spoofed
+                candidates, rows, t, lat, lon = candidates[keep], rows[keep], t[keep], lat[keep], lon[keep]
+
+        # Rank of each report within its aircraft; each rank is checked
+        # against the fixes accepted in the ranks before it
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        if len(starts) == len(rows):
+            rounds = [np.arange(len(rows))]
+        else:
+            rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+            rounds = [np.flatnonzero(rank == r) for r in range(int(rank.max()) + 1)]
+        for s in rounds:
+            self._jumps(candidates[s], rows[s], t[s], lat[s], lon[s], reason, detail)
+
+    def _jumps(self, candidates, rows, t, lat, lon, reason, detail):
+        """One report per aircraft against its last accepted fix"""
+        previous = self.last_time[rows]
+        elapsed = np.maximum(t - previous, 0)
+        last_lat, last_lon = self.last_lat[rows], self.last_lon[rows]
+        limit = MAX_SPEED * elapsed + JUMP_SLACK_METRES
+        # North-south plus east-west degrees bound the distance from above, so
+        # the haversine only runs for fixes that could be beyond the limit
+        # (a NaN limit, no fix yet, is never exceeded)
+        far = np.flatnonzero((np.abs(lat - last_lat) + np.abs(lon - last_lon)) * METRES_PER_DEGREE > limit)
+        if len(far):
+            metres = np.zeros(len(rows))
+            metres[far] = great_circle_m(last_lat[far], last_lon[far], lat[far], lon[far])
+            jump = metres > limit
+        if not len(far) or not jump.any():
+            # Nothing beyond its limit: every strike count resets
+            self.strikes[rows] = 0
+            rejected = None
+        else:
+            strikes = np.where(jump, self.strikes[rows] + 1, 0)
+            rejected = jump & (strikes < RELOCATE_STRIKES)
+            reason[candidates[rejected]] = TELEPORT
+            detail[candidates[rejected]] = metres[rejected] / np.maximum(elapsed[rejected], 1)
+            self.strikes[rows] = np.where(rejected, strikes, 0)
+
+        # Accepted fixes become the anchor unless older than it (a repeated
+        # or late report)
+        late = previous > t
+        if rejected is None and not late.any():
+            self.last_time[rows], self.last_lat[rows], self.last_lon[rows] = t, lat, lon
+            return
+        move = ~late if rejected is None else ~rejected & ~late
+        r = rows[move]
+        self.last_time[r], self.last_lat[r], self.last_lon[r] = t[move], lat[move], lon[move]
+
+    def split(self, states: List[Dict], received: datetime) -> Tuple[List[Dict], List[Dict]]:
+        """(accepted states, position_quarantine rows for the rejected ones)"""
+        reason, detail = self.check(states, epoch_seconds(received))
+        rejected = np.flatnonzero(reason)
+        if not len(rejected):
+            return states, []
+        keep = reason == 0
+        accepted = [state for state, ok in zip(states, keep.tolist()) if ok]
+        return accepted, [quarantine_row(states[i], received, REASONS[reason[i]], float(detail[i]))
+                          for i in rejected.tolist()]
+
+
+def _int(value, limit: int = 2 ** 31 - 1) -> int:
+    # Rejected values can be anything; keep them inside Int32
+    if value is None or value != value:
+        return 0
+    return int(max(-limit, min(limit, round(value))))
+
+
+def quarantine_row(state: Dict, received: datetime, reason: str, detail: float) -> Dict:
+    """position_quarantine row: the report as it arrived, with why it was held back"""
+    return {
+        "timestamp": received,
+        "icao_hex": state["icao24"].upper(),
+        "callsign": state["callsign"],
+        "lat": state["latitude"],
+        "lon": state["longitude"],
+        "altitude": _int(state["baro_altitude"] if state["baro_altitude"] is not None
+                         else state.get("geo_altitude")),
+        "ground_speed": _int(state["velocity"]),
+        "vertical_rate": _int(state["vertical_rate"]),
+        "on_ground": 1 if state["on_ground"] else 0,
+        "source": state.get("source", "opensky"),
+        "reason": reason,
+        "detail": detail,
+    }
+
+
+def summarize(ch_client, hours: int = 24) -> List[Tuple]:
+    """(reason, reports, aircraft) quarantined over the last `hours`"""
+    return ch_client.execute(
+        """
+        SELECT reason, count() AS reports, uniqExact(icao_hex) AS aircraft
+        FROM position_quarantine
+        WHERE timestamp >= now() - INTERVAL %(hours)s HOUR
+        GROUP BY reason
+        ORDER BY reports DESC
+        """,
+        {"hours": hours}
+    )
+
+
+def main():
+    import argparse
+
+    from db import get_pool
+
+    parser = argparse.ArgumentParser(description="Quarantined position reports by reason")
+    parser.add_argument("--hours", type=int, default=24)
+    args = parser.parse_args()
+
+    rows = summarize(get_pool(), args.hours)
+    print(f"Quarantined reports, last {args.hours}h\n")
+    print(f"  {'Reason':<14} {'Reports':>9} {'Aircraft':>9}")
+    for reason, reports, aircraft in rows:
+        print(f"  {reason:<14} {reports:>9} {aircraft:>9}")
+    if not rows:
+        print("  (none)")
+
+
+if __name__ == "__main__":
+    main()
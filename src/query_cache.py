@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Read-side query cache for the dashboard
+Sits between the Next.js API routes and ClickHouse's HTTP interface so
+dashboard traffic spikes don't turn into ClickHouse load spikes
+
+Speaks the same protocol as ClickHouse HTTP (POST raw SQL, get the
+formatted result back), so the frontend only needs CLICKHOUSE_URL
+pointed at this service instead of ClickHouse.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Tables whose contents determine when a cached result goes stale. A query is
+# keyed on the latest write timestamp of every table it references.
+VERSIONED_TABLES = ("panic_scores", "flight_positions")
+
+READ_ONLY_STATEMENT = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+# What normalize() must not collapse: quoted literals and identifiers, and
+# comments (a line comment with the whitespace after it), then runs of whitespace
+SQL_TOKEN = re.compile(r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`(?:[^`\\]|\\.)*`|(--[^\n]*)\s*|/\*.*?\*/|\s+""",
+                       re.DOTALL)
+
+
+def _normal_token(match) -> str:
+    token = match.group()
+    if match.group(1) is not None:
+        # A line comment ends at its newline, however the next line is indented
+        return match.group(1).rstrip() + "\n"
+    return " " if token.isspace() else token
+
+
+class _Pending:
+    """In-flight computation that concurrent identical requests wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class QueryCache:
+    """
+    Thread-safe TTL + LRU cache with request coalescing
+
+    Concurrent misses for the same key run the loader once; the other
+    callers block until it finishes and share its result (or its error).
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[float, object]]" = OrderedDict()
+        self._pending: Dict[Tuple, _Pending] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "errors": 0}
+
+    def get(self, key: Tuple, loader: Callable[[], object], timeout: float = 60.0):
+        """Return the cached value for key, calling loader() at most once per miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+                del self._entries[key]
+
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _Pending()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not owner:
+            if not pending.event.wait(timeout):
+                raise TimeoutError("Timed out waiting for coalesced query")
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = loader()
+        except BaseException as e:
+            pending.error = e
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        else:
+            self._store(key, pending.value)
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.event.set()
+
+        return pending.value
+
+    def _store(self, key: Tuple, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ClickHouseHTTP:
+    """Thin client for ClickHouse's HTTP interface (same endpoint the frontend uses)"""
+
+    def __init__(self, url: Optional[str] = None, database: Optional[str] = None):
+        self.url = (url or os.getenv("CLICKHOUSE_HTTP_URL", "http://localhost:8123")).rstrip("/")
+        self.database = database or os.getenv("CLICKHOUSE_DB", "airplane_watch")
+        self.auth = None
+        if os.getenv("CLICKHOUSE_USER"):
+            self.auth = (os.getenv("CLICKHOUSE_USER"), os.getenv("CLICKHOUSE_PASSWORD", ""))
+        # requests.Session isn't thread-safe; keep one keep-alive session per thread
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def post(self, sql: str) -> Tuple[int, bytes, str]:
+        """Run sql and return (status, body, content_type) unchanged"""
+        response = self.session.post(
+            f"{self.url}/", params={"database": self.database},
+            data=sql.encode("utf-8"), auth=self.auth, timeout=30
+        )
+        return (
+            response.status_code,
+            response.content,
+            response.headers.get("Content-Type", "text/plain; charset=UTF-8"),
+        )
+
+
+class DataVersion:
+    """
+    Latest write timestamp per versioned table, probed at most every interval
+
+    store_positions stamps a whole batch with one timestamp, so the latest
+    flight_positions timestamp identifies the latest ingest batch. Likewise
+    panic_scores only moves when the scorer stores a new row.
+    """
+
+    PROBE_SQL = (
+        "SELECT "
+        "(SELECT toUnixTimestamp(max(timestamp)) FROM panic_scores), "
+        "(SELECT toUnixTimestamp(max(timestamp)) FROM flight_positions) "
+        "FORMAT TabSeparated"
+    )
+
+    def __init__(self, clickhouse: ClickHouseHTTP, interval_seconds: float = 5.0):
+        self.clickhouse = clickhouse
+        self.interval_seconds = interval_seconds
+        self._versions: Dict[str, str] = {}
+        self._probed_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Dict[str, str]:
+        with self._lock:
+            if time.monotonic() - self._probed_at >= self.interval_seconds:
+                self._probe()
+            return self._versions
+
+    def _probe(self):
+        try:
+            status, body, _ = self.clickhouse.post(self.PROBE_SQL)
+            if status == 200:
+                values = body.decode("utf-8").strip().split("\t")
+                self._versions = dict(zip(VERSIONED_TABLES, values))
+        except requests.exceptions.RequestException as e:
+            # Keep serving on the last known versions; TTL still bounds staleness
+            print(f"Warning: version probe failed: {e}")
+        self._probed_at = time.monotonic()
+
+    def key_for(self, sql: str) -> Tuple:
+        """Versions of the tables referenced by sql, as a hashable key part"""
+        versions = self.current()
+        return tuple(
+            (table, versions.get(table))
+            for table in VERSIONED_TABLES
+            if re.search(rf"\b{table}\b", sql)
+        )
+
+
+class CachedQueryService:
+    """Read-only, versioned, coalescing front for ClickHouse queries"""
+
+    def __init__(self, clickhouse: Optional[ClickHouseHTTP] = None,
+                 cache: Optional[QueryCache] = None,
+                 version: Optional[DataVersion] = None):
+        self.clickhouse = clickhouse or ClickHouseHTTP()
+        self.cache = cache or QueryCache(
+            max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 512)),
+            ttl_seconds=float(os.getenv("CACHE_TTL_SECONDS", 60)),
+        )
+        self.version = version or DataVersion(
+            self.clickhouse, interval_seconds=float(os.getenv("CACHE_VERSION_INTERVAL", 5))
+        )
+
+    @staticmethod
+    def normalize(sql: str) -> str:
+        """Cache key form of sql: whitespace collapsed outside literals and comments"""
+        return SQL_TOKEN.sub(_normal_token, sql).strip()
+
+    def query(self, sql: str) -> Tuple[int, bytes, str]:
+        if not READ_ONLY_STATEMENT.match(sql):
+            return 403, b"Only SELECT queries are served by the cache", "text/plain; charset=UTF-8"
+
+        # Only the key is normalized; ClickHouse gets the query as sent
+        key = (self.normalize(sql), self.version.key_for(sql))
+
+        try:
+            return self.cache.get(key, lambda: self._load(sql))
+        except _UncacheableResult as e:
+            return e.result
+
+    def _load(self, sql: str) -> Tuple[int, bytes, str]:
+        result = self.clickhouse.post(sql)
+        if result[0] != 200:
+            # Don't cache errors, but still share them with coalesced waiters
+            raise _UncacheableResult(result)
+        return result
+
+
+class _UncacheableResult(Exception):
+    def __init__(self, result: Tuple[int, bytes, str]):
+        super().__init__(result[0])
+        self.result = result
+
+
+class QueryCacheServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Dashboard bursts open many connections at once; the default backlog is 5
+    request_queue_size = 1024
+
+
+def make_handler(service: CachedQueryService):
+    class QueryCacheHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _serve_query(self, sql: str):
+            try:
+                self._send(*service.query(sql))
+            except requests.exceptions.RequestException as e:
+                self._send(502, f"ClickHouse unavailable: {e}".encode("utf-8"), "text/plain; charset=UTF-8")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self._serve_query(self.rfile.read(length).decode("utf-8"))
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path == "/ping":
+                self._send(200, b"Ok.\n", "text/plain; charset=UTF-8")
+            elif parsed.path == "/stats":
+                body = (
+                    "\n".join(f"{k}\t{v}" for k, v in service.cache.stats.items())
+                    + f"\nentries\t{len(service.cache)}\n"
+                )
+                self._send(200, body.encode("utf-8"), "text/plain; charset=UTF-8")
+            else:
+                query = parse_qs(parsed.query).get("query", [""])[0]
+                self._serve_query(query)
+
+        def log_message(self, format, *args):
+            pass
+
+    return QueryCacheHandler
+
+
+def main():
+    """Main entry point"""
+    host = os.getenv("CACHE_HOST", "127.0.0.1")
+    port = int(os.getenv("CACHE_PORT", 8124))
+
+    service = CachedQueryService()
+    server = QueryCacheServer((host, port), make_handler(service))
+
+    print(f"Query cache listening on http://{host}:{port} → {service.clickhouse.url}")
+    print(f"  TTL {service.cache.ttl_seconds:.0f}s, max {service.cache.max_entries} entries")
+    print("Press Ctrl+C to stop\n")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down gracefully...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
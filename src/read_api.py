@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Read API for the dashboard and third parties
+Serves bounded, pre-aggregated results over the native ClickHouse pool
+instead of letting callers post raw SQL and take whole FORMAT JSON results:
+
+    GET /v1/scores                 latest score per region (?window=12)
+    GET /v1/history                ?region=Global&days=7&width=800
+    GET /v1/alerts                 ?limit=20&cursor=...
+    GET /v1/aircraft/active        ?minutes=60&limit=500&cursor=...
+    GET /v1/map                    ?bbox=min_lat,min_lon,max_lat,max_lon&format=json|msgpack|arrow
+    GET /v1/stats
+
+- Lists are keyset-paginated: each page returns `next_cursor` (opaque, the
+  last row's sort key) until the last one. Pages are capped at MAX_LIMIT.
+- History is aggregated in ClickHouse into one bucket per pixel of the
+  requested chart width, keeping each bucket's min, max and last score,
+  so spikes survive and a year costs no more than a day.
+- The map is columnar, as JSON, MessagePack (msgpack) or an Arrow IPC
+  stream (pyarrow), chosen by ?format= or the Accept header.
+- Bodies over COMPRESS_MIN_BYTES are compressed with brotli (if installed)
+  or gzip, per Accept-Encoding.
+- ETags hash the route, its parameters and the data version of the tables
+  behind it (latest panic_scores / flight_positions write, as in
+  query_cache.py), so If-None-Match is answered with a 304 before any
+  query runs. Encoded bodies are cached under the same key.
+
+    python src/read_api.py              # listens on READ_API_PORT (8126)
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from query_cache import QueryCache
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+# The map is fetched whole by the live view, so it pages in larger steps
+MAP_DEFAULT_LIMIT = 20000
+MAP_MAX_LIMIT = 100000
+# History chart widths accepted, in pixels (points returned)
+MIN_WIDTH, MAX_WIDTH = 10, 4000
+MAX_HISTORY_DAYS = 365
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+FORMATS = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+MAP_COLUMNS = ("icao_hex", "callsign", "lat", "lon", "altitude", "ground_speed", "heading",
+               "on_ground", "t", "owner_country", "is_military", "is_vip", "vip_tier")
+# Arrow column types for the map: float32 keeps positions to ~1m, repeated
+# strings are dictionary-encoded
+MAP_ARROW_TYPES = {
+    "icao_hex": "string", "callsign": "dictionary", "lat": "float32", "lon": "float32",
+    "altitude": "int32", "ground_speed": "int16", "heading": "int16", "on_ground": "uint8",
+    "t": "uint32", "owner_country": "dictionary", "is_military": "uint8", "is_vip": "uint8", "vip_tier": "uint8",
+}
+
+_codecs: Dict[str, object] = {}
+
+
+def _optional(module: str):
+    """Optional encoder module, or None when it is not installed (imported once)"""
+    if module not in _codecs:
+        try:
+            _codecs[module] = __import__(module)
+        except ImportError:
+            _codecs[module] = None
+    return _codecs[module]
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class Response(NamedTuple):
+    status: int
+    body: bytes
+    headers: Dict[str, str]
+
+
+# ----------------------------------------------------------------------
+# Encoding
+# ----------------------------------------------------------------------
+
+def encode_cursor(key: List) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise BadRequest("invalid cursor")
+    if not isinstance(key, list):
+        raise BadRequest("invalid cursor")
+    return key
+
+
+def encode_body(payload: Dict, fmt: str) -> bytes:
+    """Serialize a response; "columns" payloads (the map) become Arrow tables"""
+    if fmt == "json":
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    if fmt == "msgpack":
+        return _optional("msgpack").packb(payload, use_bin_type=True)
+    pa = _optional("pyarrow")
+    arrays = {}
+    for name, values in payload["columns"].items():
+        arrow_type = MAP_ARROW_TYPES.get(name, "string")
+        if arrow_type == "dictionary":
+            arrays[name] = pa.array(values, pa.string()).dictionary_encode()
+        else:
+            arrays[name] = pa.array(values, getattr(pa, arrow_type)())
+    table = pa.table(arrays)
+    metadata = {k: json.dumps(v) for k, v in payload.items() if k != "columns"}
+    table = table.replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    offered = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if "br" in offered and _optional("brotli") is not None:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return "identity"
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return _optional("brotli").compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+def choose_format(requested: Optional[str], accept: str) -> str:
+    if requested is None:
+        requested = next((name for name, mime in FORMATS.items() if mime in accept), "json")
+    if requested not in FORMATS:
+        raise BadRequest(f"unknown format {requested!r}")
+    return requested
+
+
+def _available(fmt: str) -> bool:
+    return fmt == "json" or _optional({"msgpack": "msgpack", "arrow": "pyarrow"}[fmt]) is not None
+
+
+# ----------------------------------------------------------------------
+# Data version
+# ----------------------------------------------------------------------
+
+class PoolDataVersion:
+    """
+    Latest write timestamp of panic_scores and flight_positions over the
+    native pool, probed at most every interval (query_cache.DataVersion
+    does the same over HTTP)
+    """
+
+    PROBE_SQL = (
+        "SELECT "
+        "(SELECT toUnixTimestamp(max(timestamp)) FROM panic_scores), "
+        "(SELECT toUnixTimestamp(max(timestamp)) FROM flight_positions)"
+    )
+
+    def __init__(self, client, interval_seconds: float = 5.0):
+        self.client = client
+        self.interval_seconds = interval_seconds
+        self._versions: Dict[str, int] = {}
+        self._probed_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Dict[str, int]:
+        with self._lock:
+            if time.monotonic() - self._probed_at >= self.interval_seconds:
+                try:
+                    rows = self.client.execute(self.PROBE_SQL)
+                    if rows:
+                        self._versions = dict(zip(("panic_scores", "flight_positions"), rows[0]))
+                except Exception as e:
+                    # Keep serving on the last known versions; the cache TTL bounds staleness
+                    print(f"Warning: version probe failed: {type(e).__name__}: {e}")
+                self._probed_at = time.monotonic()
+            return self._versions
+
+
+# ----------------------------------------------------------------------
+# Routes
+# ----------------------------------------------------------------------
+
+def _format_time(epoch: int) -> str:
+    """Same layout the Next.js routes produce with formatDateTime"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+
+def _int(params: Dict[str, str], name: str, default: int, low: int, high: int) -> int:
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    return max(low, min(high, value))
+
+
+class ReadAPI:
+    """Routes, caching and conditional requests; transport-agnostic (see make_handler)"""
+
+    # path -> (handler name, table whose version keys the response)
+    ROUTES = {
+        "/v1/scores": ("scores", "panic_scores"),
+        "/v1/history": ("history", "panic_scores"),
+        "/v1/alerts": ("alerts", "panic_scores"),
+        "/v1/aircraft/active": ("active_aircraft", "flight_positions"),
+        "/v1/map": ("map", "flight_positions"),
+        "/v1/stats": ("dashboard_stats", "flight_positions"),
+    }
+
+    def __init__(self, client=None, cache: Optional[QueryCache] = None,
+                 version: Optional[PoolDataVersion] = None):
+        if client is None:
+            from db import get_pool
+            client = get_pool()
+        self.client = client
+        self.cache = cache or QueryCache(
+            max_entries=int(os.getenv("READ_API_CACHE_ENTRIES", 1024)),
+            ttl_seconds=float(os.getenv("CACHE_TTL_SECONDS", 60)),
+        )
+        self.version = version or PoolDataVersion(
+            client, interval_seconds=float(os.getenv("CACHE_VERSION_INTERVAL", 5)))
+        self.stats = {"requests": 0, "not_modified": 0, "bytes_raw": 0, "bytes_sent": 0}
+
+    def handle(self, target: str, headers: Dict[str, str]) -> Response:
+        """Answer a GET; headers are lower-cased names"""
+        url = urlparse(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        route = self.ROUTES.get(url.path.rstrip("/"))
+        self.stats["requests"] += 1
+        if route is None:
+            return Response(404, b'{"error":"not found"}', {"Content-Type": "application/json"})
+        handler, table = route
+
+        try:
+            fmt = choose_format(params.pop("format", None), headers.get("accept", ""))
+            if fmt != "json" and handler != "map":
+                raise BadRequest(f"{fmt} is only offered for /v1/map")
+            if not _available(fmt):
+                return Response(406, f'{{"error":"{fmt} encoder not installed"}}'.encode("utf-8"),
+                                {"Content-Type": "application/json"})
+            encoding = choose_encoding(headers.get("accept-encoding", ""))
+            version = self.version.current().get(table)
+            tag = hashlib.sha256(json.dumps(
+                [handler, sorted(params.items()), fmt, version]).encode("utf-8")).hexdigest()[:20]
+            # Weak: every content coding of a representation shares it
+            etag = f'W/"{tag}"'
+            common = {"ETag": etag, "Vary": "Accept, Accept-Encoding", "Cache-Control": "no-cache"}
+            if etag in (t.strip() for t in headers.get("if-none-match", "").split(",")):
+                self.stats["not_modified"] += 1
+                return Response(304, b"", common)
+
+            def load() -> Tuple[bytes, int]:
+                raw = encode_body(getattr(self, handler)(params), fmt)
+                body = compress(raw, encoding) if len(raw) >= COMPRESS_MIN_BYTES else raw
+                return body, len(raw)
+
+            body, raw_size = self.cache.get((tag, encoding), load)
+        except BadRequest as e:
+            return Response(400, json.dumps({"error": str(e)}).encode("utf-8"), {"Content-Type": "application/json"})
+
+        self.stats["bytes_raw"] += raw_size
+        self.stats["bytes_sent"] += len(body)
+        response_headers = dict(common, **{"Content-Type": FORMATS[fmt]})
+        if len(body) != raw_size:
+            response_headers["Content-Encoding"] = encoding
+        return Response(200, body, response_headers)
+
+    # ------------------------------------------------------------------
+
+    def scores(self, params: Dict[str, str]) -> Dict:
+        from cards import latest_scores
+
+        window = _int(params, "window", 12, 1, 24 * 7)
+        rows = latest_scores(self.client, window)
+        for row in rows:
+            row["timestamp"] = row["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
+        rows.sort(key=lambda r: (-r["overall_panic_score"], r["region"]))
+        return {"scores": rows}
+
+    def history(self, params: Dict[str, str]) -> Dict:
+        """One point per pixel column: (bucket start, min, max, last score)"""
+        days = _int(params, "days", 7, 1, MAX_HISTORY_DAYS)
+        width = _int(params, "width", 1000, MIN_WIDTH, MAX_WIDTH)
+        bucket = max(1, math.ceil(days * 86400 / width))
+        # Align buckets to the bucket size so neighbouring requests share them
+        start = (int(time.time()) - days * 86400) // bucket * bucket
+        rows = self.client.execute(
+            """
+            SELECT
+                intDiv(toUnixTimestamp(timestamp), %(bucket)s) * %(bucket)s AS t,
+                min(overall_panic_score),
+                max(overall_panic_score),
+                argMax(overall_panic_score, timestamp)
+            FROM panic_scores
+            WHERE region = %(region)s AND window_hours = %(window)s
+              AND timestamp >= toDateTime(%(start)s)
+            GROUP BY t
+            ORDER BY t
+            """,
+            {"bucket": bucket, "region": params.get("region", "Global"),
+             "window": _int(params, "window", 12, 1, 24 * 7), "start": start},
+        )
+        return {
+            "bucket_seconds": bucket,
+            "data": [{"timestamp": _format_time(t),
+                      "score": last, "min": low, "max": high} for t, low, high, last in rows],
+        }
+
+    def alerts(self, params: Dict[str, str]) -> Dict:
+        limit = _int(params, "limit", 20, 1, MAX_LIMIT)
+        after = decode_cursor(params["cursor"]) if "cursor" in params else None
+        rows = self.client.execute(
+            f"""
+            SELECT toUnixTimestamp(timestamp) AS t, region, overall_panic_score, narrative,
+                   flight_count, countries_involved
+            FROM panic_scores
+            WHERE overall_panic_score >= 40 AND window_hours = 12
+              {"AND (timestamp, region) < (toDateTime(%(t)s), %(region)s)" if after else ""}
+            ORDER BY timestamp DESC, region DESC
+            LIMIT %(limit)s
+            """,
+            {"t": after[0] if after else 0, "region": after[1] if after else "", "limit": limit + 1},
+        )
+        page = rows[:limit]
+        return {
+            "alerts": [{
+                "region": region, "score": score, "narrative": narrative, "flight_count": flights,
+                "countries_involved": countries, "timestamp": _format_time(t),
+                "type": "extreme" if score >= 75 else "high" if score >= 60 else "elevated",
+            } for t, region, score, narrative, flights, countries in page],
+            "next_cursor": encode_cursor([page[-1][0], page[-1][1]]) if len(rows) > limit else None,
+        }
+
+    def active_aircraft(self, params: Dict[str, str]) -> Dict:
+        limit = _int(params, "limit", DEFAULT_LIMIT, 1, MAX_LIMIT)
+        after = decode_cursor(params["cursor"])[0] if "cursor" in params else ""
+        columns = ("icao_hex", "callsign", "owner_country", "owner_org", "aircraft_type",
+                   "is_vip", "vip_tier", "last_seen")
+        rows = self.client.execute(
+            """
+            SELECT
+                fp.icao_hex,
+                argMax(fp.callsign, fp.timestamp),
+                any(ap.owner_country),
+                any(ap.owner_org),
+                any(ap.aircraft_type),
+                any(ap.is_vip),
+                any(ap.vip_tier),
+                toUnixTimestamp(max(fp.timestamp))
+            FROM flight_positions fp
+            JOIN (SELECT * FROM aircraft_profiles FINAL) ap ON fp.icao_hex = ap.icao_hex
+            WHERE fp.timestamp >= now() - INTERVAL %(minutes)s MINUTE AND fp.icao_hex > %(after)s
+            GROUP BY fp.icao_hex
+            ORDER BY fp.icao_hex
+            LIMIT %(limit)s
+            """,
+            {"minutes": _int(params, "minutes", 60, 1, 24 * 60), "after": after, "limit": limit + 1},
+        )
+        page = rows[:limit]
+        return {
+            "aircraft": [dict(zip(columns, row[:-1]), last_seen=_format_time(row[-1])) for row in page],
+            "next_cursor": encode_cursor([page[-1][0]]) if len(rows) > limit else None,
+        }
+
+    def map(self, params: Dict[str, str]) -> Dict:
+        """Latest position per tracked aircraft, as columns"""
+        limit = _int(params, "limit", MAP_DEFAULT_LIMIT, 1, MAP_MAX_LIMIT)
+        after = decode_cursor(params["cursor"])[0] if "cursor" in params else ""
+        having = ""
+        bbox_params = {}
+        if "bbox" in params:
+            try:
+                min_lat, min_lon, max_lat, max_lon = (float(v) for v in params["bbox"].split(","))
+            except ValueError:
+                raise BadRequest("bbox must be min_lat,min_lon,max_lat,max_lon")
+            # A bbox crossing the antimeridian has min_lon > max_lon
+            lon_test = "lon >= %(min_lon)s AND lon <= %(max_lon)s" if min_lon <= max_lon else \
+                "(lon >= %(min_lon)s OR lon <= %(max_lon)s)"
+            having = f"HAVING lat >= %(min_lat)s AND lat <= %(max_lat)s AND {lon_test}"
+            bbox_params = {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon}
+        rows = self.client.execute(
+            f"""
+            SELECT
+                fp.icao_hex,
+                argMax(fp.callsign, fp.timestamp),
+                argMax(fp.lat, fp.timestamp) AS lat,
+                argMax(fp.lon, fp.timestamp) AS lon,
+                argMax(fp.altitude, fp.timestamp),
+                argMax(fp.ground_speed, fp.timestamp),
+                argMax(fp.heading, fp.timestamp),
+                argMax(fp.on_ground, fp.timestamp),
+                toUnixTimestamp(max(fp.timestamp)),
+                any(ap.owner_country),
+                any(ap.is_military),
+                any(ap.is_vip),
+                any(ap.vip_tier)
+            FROM flight_positions fp
+            JOIN (SELECT * FROM aircraft_profiles FINAL) ap ON fp.icao_hex = ap.icao_hex
+            WHERE fp.timestamp >= now() - INTERVAL %(minutes)s MINUTE AND fp.icao_hex > %(after)s
+            GROUP BY fp.icao_hex
+            {having}
+            ORDER BY fp.icao_hex
+            LIMIT %(limit)s
+            """,
+            dict(bbox_params, minutes=_int(params, "minutes", 30, 1, 24 * 60), after=after, limit=limit + 1),
+        )
+        page = rows[:limit]
+        columns = {name: list(values) for name, values in zip(MAP_COLUMNS, zip(*page))} if page else \
+            {name: [] for name in MAP_COLUMNS}
+        return {
+            "columns": columns,
+            "count": len(page),
+            "next_cursor": encode_cursor([page[-1][0]]) if len(rows) > limit else None,
+        }
+
+    def dashboard_stats(self, params: Dict[str, str]) -> Dict:
+        (active, countries, last_update), = self.client.execute(
+            """
+            SELECT
+                count(DISTINCT fp.icao_hex),
+                count(DISTINCT ap.owner_country),
+                toUnixTimestamp(max(fp.timestamp))
+            FROM flight_positions fp
+            JOIN (SELECT * FROM aircraft_profiles FINAL) ap ON fp.icao_hex = ap.icao_hex
+            WHERE fp.timestamp >= now() - INTERVAL 1 HOUR
+            """
+        ) or [(0, 0, None)]
+        (profiles, vip), = self.client.execute(
+            "SELECT count(), countIf(is_vip = 1) FROM aircraft_profiles FINAL") or [(0, 0)]
+        (peak, peak_region), = self.client.execute(
+            "SELECT max(overall_panic_score), argMax(region, overall_panic_score) "
+            "FROM panic_scores WHERE window_hours = 12 AND timestamp >= today()") or [(0, "")]
+        return {"stats": {
+            "active_aircraft": active, "countries_active": countries, "total_profiles": profiles,
+            "vip_aircraft": vip, "peak_score_today": peak, "peak_region": peak_region or "N/A",
+            "last_update": _format_time(last_update) if active else None,
+        }}
+
+
+# ----------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------
+
+class ReadAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def make_handler(api: ReadAPI):
+    class ReadAPIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if urlparse(self.path).path == "/health":
+                status, body, headers = 200, json.dumps(dict(api.stats, cache=api.cache.stats)).encode("utf-8"), \
+                    {"Content-Type": "application/json"}
+            else:
+                try:
+                    status, body, headers = api.handle(self.path, {k.lower(): v for k, v in self.headers.items()})
+                except Exception as e:
+                    print(f"Request failed: {self.path}: {type(e).__name__}: {e}")
+                    status, body, headers = 502, b'{"error":"upstream query failed"}', \
+                        {"Content-Type": "application/json"}
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReadAPIHandler
+
+
+def main():
+    """Main entry point"""
+    host = os.getenv("READ_API_HOST", "127.0.0.1")
+    port = int(os.getenv("READ_API_PORT", 8126))
+
+    api = ReadAPI()
+    server = ReadAPIServer((host, port), make_handler(api))
+    encoders = [name for name in ("brotli", "msgpack", "pyarrow") if _optional(name) is not None]
+    print(f"Read API listening on http://{host}:{port} (optional encoders: {', '.join(encoders) or 'none'})")
+    print("Press Ctrl+C to stop\n")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down gracefully...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
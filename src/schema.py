@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+ClickHouse physical layout for the high-volume tables
+
+flight_positions is the only table that grows with time, so its layout is
+defined here (rather than in db_schema.sql) with tunable retention:
+
+- daily partitions, so TTL moves/drops whole parts and the 12h scoring
+  window touches at most two partitions
+- ORDER BY (icao_hex, timestamp) for per-aircraft track reads and the
+  icao_hex join, plus a projection ordered by timestamp for the
+  "everything in the last N hours" scans
+- DoubleDelta on timestamps, Gorilla on coordinates, Delta on slowly
+  changing integers, LowCardinality for callsign, source and squawk
+- optional TTL move to a cold volume and TTL delete
+
+Running this module prints the DDL for the current settings.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# (name, type, codec) in insert order; matches store_positions()
+FLIGHT_POSITIONS_COLUMNS = [
+    ("timestamp", "DateTime", "CODEC(DoubleDelta, ZSTD(1))"),
+    ("icao_hex", "String", "CODEC(ZSTD(1))"),
+    ("callsign", "LowCardinality(String)", ""),
+    ("lat", "Float64", "CODEC(Gorilla, ZSTD(1))"),
+    ("lon", "Float64", "CODEC(Gorilla, ZSTD(1))"),
+    ("altitude", "Int32", "CODEC(Delta, ZSTD(1))"),
+    ("ground_speed", "Int32", "CODEC(Delta, ZSTD(1))"),
+    ("heading", "Int32", "CODEC(Delta, ZSTD(1))"),
+    ("vertical_rate", "Int32", "CODEC(T64, ZSTD(1))"),
+    ("on_ground", "UInt8", "CODEC(T64, ZSTD(1))"),
+    ("source", "LowCardinality(String)", ""),
+    ("squawk", "LowCardinality(String)", ""),
+]
+
+# The layout before this module existed, kept for migrations and benchmarks
+LEGACY_FLIGHT_POSITIONS_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    timestamp DateTime,
+    icao_hex String,
+    callsign String,
+    lat Float64,
+    lon Float64,
+    altitude Int32,
+    ground_speed Int32,
+    heading Int32,
+    vertical_rate Int32,
+    on_ground UInt8,
+    source String
+) ENGINE = MergeTree()
+PARTITION BY toYYYYMMDD(timestamp)
+ORDER BY (icao_hex, timestamp)
+"""
+
+
+def schema_settings() -> Dict[str, Optional[str]]:
+    """Retention knobs from the environment"""
+    return {
+        # Move parts older than this to the cold volume (needs a storage policy)
+        "cold_after_days": os.getenv("POSITIONS_COLD_AFTER_DAYS"),
+        "cold_volume": os.getenv("POSITIONS_COLD_VOLUME", "cold"),
+        "storage_policy": os.getenv("POSITIONS_STORAGE_POLICY"),
+        # Drop parts older than this (empty = keep forever)
+        "retention_days": os.getenv("POSITIONS_RETENTION_DAYS"),
+    }
+
+
+def flight_positions_ddl(table: str = "flight_positions", settings: Optional[Dict] = None) -> str:
+    """CREATE TABLE statement for the tuned flight_positions layout"""
+    settings = schema_settings() if settings is None else settings
+
+    columns = ",\n".join(
+        f"    {name} {col_type}{' ' + codec if codec else ''}"
+        for name, col_type, codec in FLIGHT_POSITIONS_COLUMNS
+    )
+
+    ttl = []
+    if settings.get("cold_after_days") and settings.get("storage_policy"):
+        ttl.append(f"timestamp + INTERVAL {int(settings['cold_after_days'])} DAY "
+                   f"TO VOLUME '{settings['cold_volume']}'")
+    if settings.get("retention_days"):
+        ttl.append(f"timestamp + INTERVAL {int(settings['retention_days'])} DAY DELETE")
+
+    table_settings = ["index_granularity = 8192"]
+    if ttl:
+        # TTL acts on whole daily parts instead of rewriting them row by row
+        table_settings.append("ttl_only_drop_parts = 1")
+    if settings.get("storage_policy"):
+        table_settings.append(f"storage_policy = '{settings['storage_policy']}'")
+
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table} (\n"
+        f"{columns},\n"
+        f"    PROJECTION by_time (SELECT * ORDER BY timestamp)\n"
+        f") ENGINE = MergeTree()\n"
+        f"PARTITION BY toYYYYMMDD(timestamp)\n"
+        f"ORDER BY (icao_hex, timestamp)\n"
+        + (f"TTL {', '.join(ttl)}\n" if ttl else "")
+        + f"SETTINGS {', '.join(table_settings)}"
+    )
+
+
+def create_statements(database: Optional[str] = None, settings: Optional[Dict] = None) -> List[str]:
+    """Statements setup_db.py runs after db_schema.sql"""
+    prefix = f"{database}." if database else ""
+    return [flight_positions_ddl(table=f"{prefix}flight_positions", settings=settings)]
+
+
+def column_names() -> List[str]:
+    return [name for name, _, _ in FLIGHT_POSITIONS_COLUMNS]
+
+
+def main():
+    for stmt in create_statements():
+        print(stmt + ";\n")
+
+
+if __name__ == "__main__":
+    main()
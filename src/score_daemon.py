@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Resident panic score daemon
+Keeps one PanicScoreCalculator (imports loaded, ClickHouse connections open,
+.env read once) and runs it on request from a local Unix socket, so cron and
+`make calculate` trigger a run without paying a cold start each time.
+
+    python src/score_daemon.py serve [--interval MINUTES]
+    python src/score_daemon.py run        # trigger a run and print the result
+    python src/score_daemon.py status | stats | reload | stop
+    python src/score_daemon.py profile --cycles 3   # see profiling.py
+
+The client side imports only the standard library and score_format.py, which
+is stdlib-only too; when no daemon is listening, `run` falls back to scoring
+in-process. The protocol is one JSON object per line each way:
+{"command": "run"} -> {"ok": true, ...}.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_SOCKET = "/tmp/sleepwatch-score.sock"
+
+
+def socket_path() -> str:
+    # Read straight from the environment: the client must not pay for dotenv
+    return os.environ.get("SCORE_SOCKET", DEFAULT_SOCKET)
+
+
+def request(command: str, path: Optional[str] = None, timeout: float = 600.0, **fields) -> Dict:
+    """Send one command to the daemon; raises OSError if none is listening"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path or socket_path())
+        sock.sendall(json.dumps({"command": command, **fields}).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as reply:
+            line = reply.readline()
+    if not line:
+        raise ConnectionError("score daemon closed the connection without replying")
+    return json.loads(line)
+
+
+class ScoreDaemon:
+    """Serves run/status/stats/reload/profile/stop on a Unix socket"""
+
+    def __init__(self, calculator=None, path: Optional[str] = None,
+                 interval_minutes: Optional[float] = None, cards=None):
+        if calculator is None:
+            from calculate_panic import PanicScoreCalculator
+            calculator = PanicScoreCalculator()
+        self.calculator = calculator
+        # Share cards render on a background thread after each run (cards.py)
+        if cards is None and os.getenv("RENDER_CARDS", "0") == "1":
+            from cards import CardRenderer
+            cards = CardRenderer()
+        self.cards = cards
+        self.path = path or socket_path()
+        self.interval_minutes = interval_minutes
+
+        self.started_at = time.time()
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[Dict] = None
+        # One scoring run at a time; status/stats stay answerable meanwhile
+        self._run_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+    # ------------------------------------------------------------------
+    # Commands
+    # ------------------------------------------------------------------
+
+    def run(self) -> Dict:
+        with self._run_lock:
+            start = time.perf_counter()
+            try:
+                score = self.calculator.run_once()
+            except Exception as e:
+                self.failures += 1
+                return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.runs += 1
+            self.last_run = {
+                "at": time.time(),
+                "seconds": round(time.perf_counter() - start, 3),
+                "overall_panic_score": score["overall_panic_score"],
+            }
+            if self.cards is not None:
+                self.cards.submit([score])
+            return {"ok": True, "score": score, "seconds": self.last_run["seconds"]}
+
+    def status(self) -> Dict:
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "runs": self.runs,
+            "failures": self.failures,
+            "running": self._run_lock.locked(),
+            "last_run": self.last_run,
+            "last_cards": self.cards.last_batch if self.cards is not None else None,
+            "interval_minutes": self.interval_minutes,
+        }
+
+    def stats(self) -> Dict:
+        stats = getattr(self.calculator.ch_client, "stats", None)
+        return {"ok": True, "report": stats.report() if stats else ""}
+
+    def reload(self) -> Dict:
+        """
+        Re-read .env, e.g. after changing SCORE_WINDOWS, and rebuild the scoring
+        pipeline, which reads SCORE_WEIGHTS, SCORE_PLUGINS and SCORE_THREADS once
+        """
+        from dotenv import load_dotenv
+        from scoring import ScoringPipeline
+        load_dotenv(override=True)
+        try:
+            pipeline = ScoringPipeline()
+        except (ImportError, ValueError) as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        # Not while a run is using the old pipeline's threads
+        with self._run_lock:
+            old, self.calculator.pipeline = self.calculator.pipeline, pipeline
+        old.close()
+        return {"ok": True, "components": pipeline.weights, "threads": pipeline.threads}
+
+    def profile(self, cycles: Optional[int] = None, interval_ms: Optional[float] = None) -> Dict:
+        """Profile the next runs (PROFILE_CYCLES when cycles is omitted, 0 disarms)"""
+        from profiling import get_profiler
+        return {"ok": True, **get_profiler().arm(cycles, interval_ms)}
+
+    def stop(self) -> Dict:
+        self._stopping.set()
+        # shutdown() waits for serve_forever to return, so not from a handler thread
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+        return {"ok": True}
+
+    def handle(self, message: Dict) -> Dict:
+        command = message.get("command")
+        handler = {"run": self.run, "status": self.status, "stats": self.stats,
+                   "reload": self.reload, "stop": self.stop}.get(command)
+        if command == "profile":
+            return self.profile(message.get("cycles"), message.get("interval_ms"))
+        if handler is None:
+            return {"ok": False, "error": f"unknown command {command!r}"}
+        return handler()
+
+    # ------------------------------------------------------------------
+    # Serving
+    # ------------------------------------------------------------------
+
+    def _claim_socket(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            request("status", self.path, timeout=2)
+        except OSError:
+            # Left behind by a daemon that did not shut down cleanly
+            os.unlink(self.path)
+            return
+        raise RuntimeError(f"A score daemon is already listening on {self.path}")
+
+    def _schedule(self):
+        while not self._stopping.wait(self.interval_minutes * 60):
+            result = self.run()
+            if not result["ok"]:
+                print(f"Error in scheduled run: {result['error']}")
+
+    def serve_forever(self):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        reply = daemon.handle(json.loads(line))
+                    except ValueError as e:
+                        reply = {"ok": False, "error": f"bad request: {e}"}
+                    self.wfile.write(json.dumps(reply, default=str).encode("utf-8") + b"\n")
+
+        self._claim_socket()
+        self.server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        self.server.daemon_threads = True
+        os.chmod(self.path, 0o600)
+
+        from profiling import get_profiler
+        get_profiler().install_signal()
+
+        if self.interval_minutes:
+            threading.Thread(target=self._schedule, name="score-schedule", daemon=True).start()
+
+        print(f"Score daemon listening on {self.path} (pid {os.getpid()})")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nShutting down gracefully...")
+        finally:
+            self._stopping.set()
+            self.server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            if self.cards is not None:
+                self.cards.close()
+
+
+def run_in_process() -> Dict:
+    """Cold-start fallback when no daemon is listening"""
+    from calculate_panic import PanicScoreCalculator
+    return {"ok": True, "score": PanicScoreCalculator().run_once(), "fallback": True}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Resident panic score daemon and its client")
+    parser.add_argument("command", choices=["serve", "run", "status", "stats", "reload", "profile", "stop"])
+    parser.add_argument("--interval", type=float, help="serve: also score every N minutes")
+    parser.add_argument("--no-fallback", action="store_true",
+                        help="run: fail instead of scoring in-process when no daemon is listening")
+    parser.add_argument("--cycles", type=int, help="profile: runs to profile (default PROFILE_CYCLES, 0 disarms)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        ScoreDaemon(interval_minutes=args.interval).serve_forever()
+        return
+
+    try:
+        reply = request(args.command, cycles=args.cycles) if args.command == "profile" else request(args.command)
+    except OSError as e:
+        if args.command != "run" or args.no_fallback:
+            print(f"✗ No score daemon on {socket_path()}: {e}")
+            sys.exit(1)
+        reply = run_in_process()
+
+    if not reply.get("ok"):
+        print(f"✗ {reply.get('error')}")
+        sys.exit(1)
+
+    if args.command == "run":
+        from score_format import format_score
+        print(format_score(reply["score"]))
+        if "seconds" in reply:
+            print(f"Scored by daemon in {reply['seconds']:.2f}s")
+    elif args.command == "stats":
+        print(reply["report"])
+    else:
+        print(json.dumps({k: v for k, v in reply.items() if k != "ok"}, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Panic score result formatting
+The printable block shown by calculate_panic.py and by `score_daemon.py run`.
+Standard library only: the daemon client imports it, and must not pay for
+numpy or the scoring modules to print a score it was handed.
+"""
+
+from typing import Dict
+
+
+def format_score(score: Dict) -> str:
+    """Printable result block for one run_once result"""
+    lines = [
+        "\n" + "="*60,
+        "PANIC SCORE RESULT",
+        "="*60,
+        f"Region: {score['region']} ({score['window_hours']}h window)",
+        f"Overall Score: {score['overall_panic_score']}/100",
+        f"Narrative: {score['narrative']}",
+        f"\nComponent Scores:",
+        f"  Night Flights:  {score['night_flight_score']:.1f}/100",
+        f"  Convergence:    {score['convergence_score']:.1f}/100",
+        f"  Airlift:        {score['airlift_score']:.1f}/100",
+        f"  VIP Movement:   {score['vip_movement_score']:.1f}/100",
+        f"  Formations:     {score.get('formation_score', 0.0):.1f}/100",
+    ]
+    if "trend_delta" in score:
+        lines.append(f"\nTrend vs next longer window: {score['trend_delta']:+.0f}")
+    lines += [
+        f"\nMetadata:",
+        f"  Flight records: {score['flight_count']}",
+        f"  Countries:      {score['countries_involved']}",
+        "="*60,
+    ]
+    return "\n".join(lines)
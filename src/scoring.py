@@ -0,0 +1,656 @@
+#!/usr/bin/env python3
+"""
+Scoring pipeline
+The panic score is a weighted sum of components: night flights,
+convergence, airlift, VIP movement and formations. Each is a plugin
+registered here, and each declares:
+
+- columns: the get_recent_flights columns it reads, so the scan fetches
+  only the union of what the enabled components need
+- update(state, batch): folds a FlightBatch (numpy arrays per column, with
+  derived values such as the night mask computed once per batch) into a
+  partial state from partial()
+- merge(state, other): folds another partial in as if its rows had come
+  after state's, so contiguous shards of a scan can be scored in parallel
+  and combined
+- finish(state, window): (score, context), reading the shared airborne
+  PositionColumns when the component sets `positions`
+
+ScoringPipeline enables the components named in SCORE_WEIGHTS with those
+weights (default: every registered component at its own weight), caps each
+score at the component's `cap` when composing, and runs the components of a
+batch concurrently on SCORE_THREADS threads.
+
+Partial states keep countries and aircraft in first-seen order and turn
+them into sets only in finish(), so contexts list them in the same order as
+the list-mode calculate_*_score methods. Tier weights are multiples of 0.5,
+so night sums are exact however batches and partials are split.
+
+A component from elsewhere is a module named in SCORE_PLUGINS that calls
+register() when imported; a plugin registered under a built-in name
+replaces it. Its score is stored in panic_scores under score_column(), which
+has to be added first:
+
+    ALTER TABLE panic_scores ADD COLUMN my_score Float32 DEFAULT 0
+
+    SCORE_WEIGHTS=night=0.25,convergence=0.30,airlift=0.15,vip=0.15,formation=0.15
+    SCORE_PLUGINS=my_components
+"""
+
+import importlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from airlift import airlift_class, score_airlift
+from formation import detect_formations
+from tracks import PositionColumns, epoch_seconds
+
+# Column order of the get_recent_flights query
+RECENT_FLIGHT_COLUMNS = (
+    "icao_hex", "callsign", "timestamp", "lat", "lon", "altitude", "on_ground",
+    "owner_country", "owner_org", "vip_tier", "is_military", "is_vip", "aircraft_type",
+)
+# What PositionColumns is filled from, for components that set `positions`
+POSITION_COLUMNS = ("icao_hex", "timestamp", "lat", "lon", "altitude", "on_ground", "owner_country",
+                    "aircraft_type")
+# Every scan needs these: windows cut on timestamp, the row counts countries
+BASE_COLUMNS = ("timestamp", "owner_country")
+
+# Rows per FlightBatch
+BATCH_ROWS = int(os.getenv("SCORE_BATCH_ROWS", 8192))
+
+# Night flight weight by VIP tier (presidents = 3x weight, regular = 1x)
+NIGHT_TIER_WEIGHTS = {1: 3.0, 2: 2.0, 3: 1.5, 4: 1.0}
+
+# With activity profiles, an aircraft's night weight is scaled from this
+# (its usual routine, activity.novelty() = 0) up to 1 (novel)
+NOVELTY_FLOOR = 0.2
+
+# Points per sustained encounter (formation.py), scaled by duration up to 2x at 60 min
+ENCOUNTER_POINTS = {"rendezvous": 25, "formation": 15}
+
+
+def is_night(hour, lon):
+    """
+    Night (00:00-06:00 local) from the whole UTC hour and a rough timezone
+    offset from longitude (15° per hour); scalars or numpy arrays
+    """
+    local_hour = (hour + lon / 15.0) % 24
+    return (0 <= local_hour) & (local_hour < 6)
+
+
+def novelty_weighted(night_weights: Dict[str, float], novelty: Dict[str, float]) -> float:
+    """Sum of per-aircraft night weights, each scaled by the aircraft's novelty"""
+    return sum(weight * (NOVELTY_FLOOR + (1 - NOVELTY_FLOOR) * novelty.get(icao_hex, 1.0))
+               for icao_hex, weight in night_weights.items())
+
+
+def score_formations(encounters: List) -> Tuple[float, Dict]:
+    """Formation/refuelling rendezvous score (0-100) from detected encounters"""
+    if not encounters:
+        return 0.0, {"formations": 0, "rendezvous": 0, "encounters": []}
+
+    points = sum(ENCOUNTER_POINTS[e.kind] * min(2.0, e.minutes / 30) for e in encounters)
+
+    # Boost for multinational pairs (signals coordination)
+    countries = set()
+    for e in encounters:
+        countries.update((e.country_a, e.country_b))
+    country_multiplier = 1 + (len(countries) - 1) * 0.2
+
+    longest = sorted(encounters, key=lambda e: (-e.minutes, e.start))[:5]
+    return min(100, points * country_multiplier), {
+        "formations": sum(1 for e in encounters if e.kind == "formation"),
+        "rendezvous": sum(1 for e in encounters if e.kind == "rendezvous"),
+        "encounters": [{
+            "kind": e.kind,
+            "aircraft": [e.icao_a, e.icao_b],
+            "types": [e.type_a, e.type_b],
+            "minutes": e.minutes,
+            "lat": round(e.lat, 2),
+            "lon": round(e.lon, 2),
+        } for e in longest],
+    }
+
+
+def first_seen(codes: np.ndarray) -> np.ndarray:
+    """Distinct values of codes in order of first appearance"""
+    values, first = np.unique(codes, return_index=True)
+    return values[np.argsort(first)]
+
+
+def first_seen_codes(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """factorize() for a numeric array: (code per value, index of each code's first value)"""
+    _, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[inverse.ravel()], first[order]
+
+
+def factorize(values: Sequence) -> Tuple[np.ndarray, List]:
+    """(code per value, distinct values in first-seen order)"""
+    distinct = list(dict.fromkeys(values))
+    lookup = {value: code for code, value in enumerate(distinct)}
+    return np.fromiter(map(lookup.__getitem__, values), dtype=np.int64, count=len(values)), distinct
+
+
+def as_set(ordered: Iterable) -> set:
+    # One add per element in first-seen order, as the list-mode scorers fill
+    # theirs; set(dict) would presize the table and iterate differently
+    return set(list(ordered))
+
+
+class FlightBatch:
+    """A run of get_recent_flights rows as columns, derived values computed once"""
+
+    def __init__(self, columns: Dict[str, Sequence]):
+        self.columns = columns
+        self.size = len(next(iter(columns.values()))) if columns else 0
+        self._arrays: Dict[Tuple[str, type], np.ndarray] = {}
+        self._codes: Dict[str, Tuple[np.ndarray, List]] = {}
+        self._seconds = self._night = None
+
+    @classmethod
+    def from_rows(cls, names: Sequence[str], rows: Sequence[tuple]) -> "FlightBatch":
+        return cls(dict(zip(names, zip(*rows))) if rows else {name: () for name in names})
+
+    def __len__(self) -> int:
+        return self.size
+
+    def values(self, name: str) -> Sequence:
+        """The column as it came from the driver"""
+        return self.columns[name]
+
+    def array(self, name: str, dtype=np.float64) -> np.ndarray:
+        key = (name, dtype)
+        if key not in self._arrays:
+            self._arrays[key] = np.array(self.columns[name], dtype=dtype)
+        return self._arrays[key]
+
+    def codes(self, name: str) -> Tuple[np.ndarray, List]:
+        """(code per row, distinct values in first-seen order)"""
+        if name not in self._codes:
+            self._codes[name] = factorize(self.columns[name])
+        return self._codes[name]
+
+    @property
+    def seconds(self) -> np.ndarray:
+        """Epoch seconds per row; rows arrive grouped by poll, so converted per distinct timestamp"""
+        if self._seconds is None:
+            codes, timestamps = self.codes("timestamp")
+            self._seconds = np.array([epoch_seconds(t) for t in timestamps], dtype=np.float64)[codes]
+        return self._seconds
+
+    @property
+    def night(self) -> np.ndarray:
+        if self._night is None:
+            codes, timestamps = self.codes("timestamp")
+            hours = np.array([t.hour for t in timestamps], dtype=np.int64)[codes]
+            self._night = is_night(hours, self.array("lon"))
+        return self._night
+
+    def take(self, mask: np.ndarray) -> "FlightBatch":
+        """The rows where mask is set, in order"""
+        rows = np.flatnonzero(mask).tolist()
+        return FlightBatch({name: [values[i] for i in rows] for name, values in self.columns.items()})
+
+
+class Window(NamedTuple):
+    """What finish() scores against besides the partial state"""
+    positions: PositionColumns
+    since: Optional[float]  # epoch seconds; None for every report in positions
+    profiles: object  # activity.ActivityProfiles or None
+
+
+class ScoreComponent:
+    """A panic score component; subclasses are made available with register()"""
+
+    name = ""
+    label = ""  # component breakdown line
+    column = ""  # panic_scores column; defaults to "<name>_score"
+    columns: Tuple[str, ...] = ()
+    positions = False  # reads the shared airborne PositionColumns in finish()
+    weight = 0.0  # when SCORE_WEIGHTS is unset
+    cap = 100.0
+
+    def partial(self):
+        """Empty partial state"""
+        raise NotImplementedError
+
+    def update(self, state, batch: FlightBatch):
+        """Fold a batch of rows into state (in place)"""
+        raise NotImplementedError
+
+    def merge(self, state, other):
+        """state with other's rows folded in after its own; returns state"""
+        raise NotImplementedError
+
+    def finish(self, state, window: Window) -> Tuple[float, Dict]:
+        raise NotImplementedError
+
+    def score_column(self) -> str:
+        return self.column or f"{self.name}_score"
+
+
+_registry: Dict[str, type] = {}
+
+
+def register(component: type) -> type:
+    """Class decorator adding a ScoreComponent to the registry"""
+    _registry[component.name] = component
+    return component
+
+
+def registered() -> List[ScoreComponent]:
+    """One instance of every registered component, in registration order"""
+    load_plugins()
+    return [component() for component in _registry.values()]
+
+
+def load_plugins(modules: Optional[str] = None):
+    """Import the modules in SCORE_PLUGINS (comma-separated) so they can register()"""
+    for module in (modules if modules is not None else os.getenv("SCORE_PLUGINS", "")).split(","):
+        if module.strip():
+            importlib.import_module(module.strip())
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """"night=0.25,convergence=0.3" -> {"night": 0.25, "convergence": 0.3}"""
+    weights = {}
+    for item in text.split(","):
+        if item.strip():
+            name, _, weight = item.partition("=")
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+# ----------------------------------------------------------------------
+# Built-in components
+# ----------------------------------------------------------------------
+
+@register
+class NightFlights(ScoreComponent):
+    """Unusual gov/mil flights during night hours (00:00-06:00 local)"""
+
+    name, label, column, weight = "night", "Night flights", "night_flight_score", 0.25
+    columns = ("icao_hex", "timestamp", "lon", "vip_tier", "owner_country")
+    # Activity profiles scale night weights by novelty, which reads positions
+    positions = True
+
+    def partial(self):
+        # aircraft: icao -> tier-weighted night rows
+        return {"count": 0, "weighted": 0.0, "countries": {}, "aircraft": {}}
+
+    def update(self, state, batch: FlightBatch):
+        rows = np.flatnonzero(batch.night)
+        if not len(rows):
+            return
+        tiers = batch.array("vip_tier")[rows]
+        weights = np.ones(len(rows))
+        for tier, weight in NIGHT_TIER_WEIGHTS.items():
+            weights[tiers == tier] = weight
+        state["count"] += len(rows)
+        state["weighted"] += float(weights.sum())
+
+        codes, icaos = batch.codes("icao_hex")
+        totals = np.bincount(codes[rows], weights=weights, minlength=len(icaos))
+        aircraft = state["aircraft"]
+        for code in first_seen(codes[rows]).tolist():
+            aircraft[icaos[code]] = aircraft.get(icaos[code], 0) + float(totals[code])
+
+        codes, countries = batch.codes("owner_country")
+        state["countries"].update(dict.fromkeys(countries[code] for code in first_seen(codes[rows]).tolist()))
+
+    def merge(self, state, other):
+        state["count"] += other["count"]
+        state["weighted"] += other["weighted"]
+        for country in other["countries"]:
+            state["countries"].setdefault(country)
+        aircraft = state["aircraft"]
+        for icao_hex, weight in other["aircraft"].items():
+            aircraft[icao_hex] = aircraft.get(icao_hex, 0) + weight
+        return state
+
+    def finish(self, state, window: Window) -> Tuple[float, Dict]:
+        if not state["count"]:
+            return 0.0, {"count": 0, "countries": []}
+        weighted_count = state["weighted"]
+        routine = None
+        if window.profiles is not None:
+            novelty = window.profiles.novelty(window.positions, window.since)
+            weighted_count = novelty_weighted(state["aircraft"], novelty)
+            routine = state["weighted"] - weighted_count
+        raw_score = min(100, weighted_count * 8)
+        country_multiplier = 1 + (len(state["countries"]) - 1) * 0.2
+        context = {
+            "count": state["count"],
+            "weighted_count": weighted_count,
+            "countries": list(as_set(state["countries"])),
+        }
+        if routine is not None:
+            context["routine_discount"] = round(routine, 2)
+        return min(100, raw_score * country_multiplier), context
+
+
+@register
+class Convergence(ScoreComponent):
+    """Different countries' aircraft in the same 0.5° grid cell"""
+
+    name, label, column, weight = "convergence", "Convergence", "convergence_score", 0.30
+    columns = ("lat", "lon", "owner_country", "is_vip")
+
+    def partial(self):
+        # (grid_lat, grid_lon) -> [countries, has_vip, flight_count]
+        return {}
+
+    def update(self, state, batch: FlightBatch):
+        if not len(batch):
+            return
+        # round() and np.round both round half to even; cells are numbered by
+        # their half-degree indices and named once per distinct cell
+        half_lats, half_lons = np.round(batch.array("lat") * 2), np.round(batch.array("lon") * 2)
+        cell_codes, first = first_seen_codes((half_lats + 180) * 1000 + (half_lons + 360))
+        # + 0.0 turns -0.0 into 0.0, as int / 2 gives
+        keys = list(zip((half_lats[first] / 2 + 0.0).tolist(), (half_lons[first] / 2 + 0.0).tolist()))
+        country_codes, countries = batch.codes("owner_country")
+        counts = np.bincount(cell_codes, minlength=len(keys)).tolist()
+        vip = np.bincount(cell_codes, weights=batch.array("is_vip", bool), minlength=len(keys)) > 0
+
+        for key, count, has_vip in zip(keys, counts, vip.tolist()):
+            cell = state.get(key)
+            if cell is None:
+                cell = state[key] = [{}, False, 0]
+            cell[1] = cell[1] or has_vip
+            cell[2] += count
+        # (cell, country) pairs in first-seen order give each cell's countries in order
+        pairs = first_seen(cell_codes * len(countries) + country_codes)
+        for cell_code, country_code in zip(*map(np.ndarray.tolist, np.divmod(pairs, len(countries)))):
+            state[keys[cell_code]][0].setdefault(countries[country_code])
+
+    def merge(self, state, other):
+        for key, (countries, has_vip, count) in other.items():
+            cell = state.get(key)
+            if cell is None:
+                state[key] = [dict(countries), has_vip, count]
+                continue
+            for country in countries:
+                cell[0].setdefault(country)
+            cell[1] = cell[1] or has_vip
+            cell[2] += count
+        return state
+
+    def finish(self, state, window: Window) -> Tuple[float, Dict]:
+        max_convergence = 0
+        top_location = None
+        for location, (countries, has_vip, flight_count) in state.items():
+            country_count = len(countries)
+            if country_count < 2:
+                continue
+            # Non-linear scoring: more countries = exponentially more interesting
+            convergence_score = (country_count ** 1.5) * 12
+            if has_vip:
+                convergence_score *= 1.5
+            if convergence_score > max_convergence:
+                max_convergence = convergence_score
+                top_location = {
+                    "lat": location[0],
+                    "lon": location[1],
+                    "countries": list(as_set(countries)),
+                    "flight_count": flight_count
+                }
+        return min(100, max_convergence), top_location or {}
+
+
+@register
+class Airlift(ScoreComponent):
+    """Repeated cargo/transport missions (see airlift.py)"""
+
+    name, label, column, weight = "airlift", "Airlift", "airlift_score", 0.15
+    columns = ("icao_hex", "is_military", "aircraft_type")
+    positions = True
+
+    def partial(self):
+        # icao -> is_military, in first-seen order
+        return {}
+
+    def update(self, state, batch: FlightBatch):
+        # Cargo family resolved once per aircraft type, not per row
+        type_codes, types = batch.codes("aircraft_type")
+        cargo = np.array([airlift_class(t) is not None for t in types], dtype=bool)
+        rows = np.flatnonzero(cargo[type_codes])
+        if not len(rows):
+            return
+        codes, icaos = batch.codes("icao_hex")
+        military = batch.values("is_military")
+        _, first = np.unique(codes[rows], return_index=True)
+        for row in np.sort(rows[first]).tolist():
+            state.setdefault(icaos[codes[row]], bool(military[row]))
+
+    def merge(self, state, other):
+        for icao_hex, is_military in other.items():
+            state.setdefault(icao_hex, is_military)
+        return state
+
+    def finish(self, state, window: Window) -> Tuple[float, Dict]:
+        return score_airlift(window.positions, state, window.since)
+
+
+@register
+class VipMovement(ScoreComponent):
+    """Movement of heads of state / senior officials (tier 1 and 2)"""
+
+    name, label, column, weight = "vip", "VIP movement", "vip_movement_score", 0.15
+    columns = ("icao_hex", "timestamp", "lon", "owner_country", "owner_org", "vip_tier", "is_vip")
+
+    def partial(self):
+        # first: icao -> {country, org, tier} of its first row
+        return {"first": {}, "tier1": 0, "night": 0}
+
+    def update(self, state, batch: FlightBatch):
+        tiers = batch.array("vip_tier")
+        rows = np.flatnonzero(batch.array("is_vip", bool) & (tiers <= 2))
+        if not len(rows):
+            return
+        state["tier1"] += int((tiers[rows] == 1).sum())
+        state["night"] += int(batch.night[rows].sum())
+        codes, icaos = batch.codes("icao_hex")
+        countries, orgs, raw_tiers = (batch.values(c) for c in ("owner_country", "owner_org", "vip_tier"))
+        first = state["first"]
+        _, heads = np.unique(codes[rows], return_index=True)
+        for row in np.sort(rows[heads]).tolist():
+            icao_hex = icaos[codes[row]]
+            if icao_hex not in first:
+                first[icao_hex] = {"country": countries[row], "org": orgs[row], "tier": raw_tiers[row]}
+
+    def merge(self, state, other):
+        for icao_hex, vip in other["first"].items():
+            state["first"].setdefault(icao_hex, vip)
+        state["tier1"] += other["tier1"]
+        state["night"] += other["night"]
+        return state
+
+    def finish(self, state, window: Window) -> Tuple[float, Dict]:
+        if not state["first"]:
+            return 0.0, {"count": 0, "vips": []}
+        unique_vips = len(state["first"])
+        # Each VIP aircraft = 25 points, tier 1 rows 15, night rows 10
+        final_score = min(100, unique_vips * 25 + state["tier1"] * 15 + state["night"] * 10)
+        return final_score, {
+            "count": unique_vips,
+            "vips": [state["first"][icao_hex] for icao_hex in as_set(state["first"])]
+        }
+
+
+@register
+class Formations(ScoreComponent):
+    """Pairs flying together for a sustained period; tanker rendezvous count more (formation.py)"""
+
+    name, label, column, weight = "formation", "Formations", "formation_score", 0.15
+    positions = True
+
+    def partial(self):
+        # Everything it needs is in the shared position columns
+        return None
+
+    def update(self, state, batch: FlightBatch):
+        pass
+
+    def merge(self, state, other):
+        return state
+
+    def finish(self, state, window: Window) -> Tuple[float, Dict]:
+        return score_formations(detect_formations(window.positions, window.since))
+
+
+# ----------------------------------------------------------------------
+# Engine
+# ----------------------------------------------------------------------
+
+class ScoreState:
+    """Partial states of the enabled components plus what the panic_scores row counts"""
+
+    def __init__(self, partials: Dict, positions: Optional[PositionColumns]):
+        self.partials = partials
+        self.positions = positions
+        self.rows = 0
+        self.countries: Dict[str, None] = {}
+
+
+class ScoringPipeline:
+    """Enabled components, their weights, and the batched scan that feeds them"""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, threads: Optional[int] = None):
+        available = registered()
+        if weights is None and os.getenv("SCORE_WEIGHTS"):
+            weights = parse_weights(os.getenv("SCORE_WEIGHTS"))
+        if weights is None:
+            weights = {c.name: c.weight for c in available}
+        unknown = set(weights) - {c.name for c in available}
+        if unknown:
+            raise ValueError(f"No score component named {', '.join(sorted(unknown))} "
+                             f"(registered: {', '.join(c.name for c in available)})")
+
+        self.available = available
+        self.components = [c for c in available if weights.get(c.name, 0)]
+        self.weights = {c.name: float(weights[c.name]) for c in self.components}
+        self.caps = {c.name: c.cap for c in available}
+        self.positions = any(c.positions for c in self.components)
+
+        wanted = set(BASE_COLUMNS).union(*(c.columns for c in self.components))
+        if self.positions:
+            wanted.update(POSITION_COLUMNS)
+        self.columns = tuple(c for c in RECENT_FLIGHT_COLUMNS if c in wanted)
+
+        threads = int(os.getenv("SCORE_THREADS", 0)) if threads is None else threads
+        self.threads = threads or min(len(self.components), os.cpu_count() or 1)
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _map(self, fn, items: List) -> List:
+        """fn over items, on the component threads when there is more than one"""
+        if self.threads <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="score")
+        return list(self._pool.map(fn, items))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def state(self, positions: Optional[PositionColumns] = None) -> ScoreState:
+        """Empty state; windows of one scan pass the scan's shared positions"""
+        if positions is None and self.positions:
+            positions = PositionColumns()
+        return ScoreState({c.name: c.partial() for c in self.components}, positions)
+
+    def batches(self, rows: Iterable[tuple]) -> Iterator[FlightBatch]:
+        """Rows in self.columns order, BATCH_ROWS at a time"""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, BATCH_ROWS))
+            if not chunk:
+                return
+            yield FlightBatch.from_rows(self.columns, chunk)
+
+    def add_positions(self, positions: PositionColumns, batch: FlightBatch):
+        positions.add_columns(batch.values("icao_hex"), batch.seconds, batch.array("lat"), batch.array("lon"),
+                              batch.array("altitude"), batch.array("on_ground", bool),
+                              batch.values("owner_country"), batch.values("aircraft_type"))
+
+    def update(self, state: ScoreState, batch: FlightBatch, positions: bool = True):
+        """Fold a batch into state; positions=False when the caller fills shared positions itself"""
+        if not len(batch):
+            return
+        state.rows += len(batch)
+        _, countries = batch.codes("owner_country")
+        state.countries.update(dict.fromkeys(countries))
+        if positions and self.positions:
+            self.add_positions(state.positions, batch)
+        # Threads may both fill one of the batch's caches; they fill it alike
+        self._map(lambda c: c.update(state.partials[c.name], batch), self.components)
+
+    def merge(self, state: ScoreState, other: ScoreState) -> ScoreState:
+        """state with other's rows folded in after its own"""
+        for c in self.components:
+            state.partials[c.name] = c.merge(state.partials[c.name], other.partials[c.name])
+        state.rows += other.rows
+        for country in other.countries:
+            state.countries.setdefault(country)
+        if other.positions is not None and other.positions is not state.positions:
+            state.positions.merge(other.positions)
+        return state
+
+    def finish(self, state: ScoreState, since: Optional[float] = None,
+               profiles=None) -> Dict[str, Tuple[float, Dict]]:
+        """name -> (score, context) for every enabled component"""
+        window = Window(state.positions, since, profiles)
+        results = self._map(lambda c: c.finish(state.partials[c.name], window), self.components)
+        return {c.name: result for c, result in zip(self.components, results)}
+
+    def score_rows(self, rows: Iterable[tuple]) -> ScoreState:
+        """State for rows in self.columns order (finish() it for the scores)"""
+        state = self.state()
+        for batch in self.batches(rows):
+            self.update(state, batch)
+        return state
+
+    def composite(self, scores: Dict[str, float]) -> float:
+        """Weighted sum of the (capped) component scores, in registration order"""
+        total = 0.0
+        for c in self.components:
+            total += scores[c.name] * self.weights[c.name]
+        return total
+
+    def cap(self, name: str, score: float) -> float:
+        # Not min(): a score at the cap keeps its own type (the VIP score is an int)
+        cap = self.caps[name]
+        return score if score <= cap else cap
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Registered score components and the columns they fetch")
+    parser.parse_args()
+
+    pipeline = ScoringPipeline()
+    print(f"Score components ({pipeline.threads} thread{'s' if pipeline.threads != 1 else ''})\n")
+    print(f"  {'Component':<12} {'Weight':>6}  {'Column':<20} Reads")
+    for c in pipeline.available:
+        weight = pipeline.weights.get(c.name, 0.0)
+        reads = " + ".join(filter(None, (", ".join(c.columns), "positions" if c.positions else "")))
+        print(f"  {c.name:<12} {weight:>6g}  {c.score_column():<20} {reads or '-'}")
+    print(f"\n  Scan fetches: {', '.join(pipeline.columns)}")
+    skipped = [c for c in RECENT_FLIGHT_COLUMNS if c not in pipeline.columns]
+    if skipped:
+        print(f"  Not fetched:  {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Track reconstruction for sparse coverage
+flight_positions only has rows where a receiver heard the aircraft, so a
+C-17 crossing the Atlantic leaves a hole of several hours, while the same
+aircraft over Europe reports every poll. Counting reports measures coverage
+as much as activity. This module turns reports into flights and fills
+the holes:
+
+- segment: per aircraft, a new flight starts after MAX_GAP_SECONDS, after a
+  gap the aircraft could not have flown (faster than MAX_SPEED) or after a
+  long gap with almost no progress (it landed out of coverage)
+- fill: gaps longer than GAP_SECONDS get a point every RESAMPLE_SECONDS
+  along the great circle between the reports either side (INTERPOLATED)
+- dead reckoning: a flight whose last report is high and well before the
+  end of the data is carried on at its last velocity for up to
+  DEAD_RECKON_SECONDS (DEAD_RECKONED)
+
+Every output point carries its flag and a confidence that falls with the
+time to the nearest real report. Flight durations give scorers airborne
+time, which does not depend on how often the aircraft was heard.
+
+Everything is numpy over all tracks at once (sorted by aircraft, time).
+
+    python src/tracks.py --hours 24
+"""
+
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+OBSERVED, INTERPOLATED, DEAD_RECKONED = 0, 1, 2
+FLAG_NAMES = ("observed", "interpolated", "dead_reckoned")
+
+# PositionColumns keeps one report per aircraft per slice
+SLICE_SECONDS = 60
+RESAMPLE_SECONDS = SLICE_SECONDS
+# Reports further apart than this are a gap to fill
+GAP_SECONDS = 150
+MAX_GAP_SECONDS = 4 * 3600
+# A gap at least this long covered slower than LANDED_SPEED means it landed
+LANDING_GAP_SECONDS = 20 * 60
+LANDED_SPEED = 50.0  # m/s, ~100 kt
+MAX_SPEED = 350.0  # m/s, ~680 kt ground speed
+DEAD_RECKON_SECONDS = 15 * 60
+# Below this (metres) a vanished aircraft is assumed to be landing
+DEAD_RECKON_MIN_ALTITUDE = 1500
+# Confidence reaches its floor this far (seconds) from a real report
+CONFIDENCE_HORIZON_SECONDS = 3600
+MIN_CONFIDENCE = 0.1
+
+EARTH_RADIUS_M = 6371008.8
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = _EPOCH.replace(tzinfo=timezone.utc)
+
+
+def epoch_seconds(timestamp: datetime) -> float:
+    """Seconds since 1970 for naive (UTC, as clickhouse_driver returns) or aware datetimes"""
+    return (timestamp - (_EPOCH if timestamp.tzinfo is None else _EPOCH_UTC)).total_seconds()
+
+
+class PositionColumns:
+    """
+    Compact airborne-report columns, filled one row at a time or a batch of
+    rows at a time (add_columns), and mergeable
+
+    Keeps the first report of each aircraft in each SLICE_SECONDS slice
+    (24 bytes) plus one entry per aircraft, so the streaming scorer can feed
+    it without holding the rows themselves. Rows come newest first from
+    get_recent_flights, so that is the latest report in the slice, which
+    for two aircraft seen by the same poll is the same poll.
+    """
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.aircraft: List[tuple] = []  # (icao_hex, aircraft_type, owner_country)
+        self.last_slice: List[int] = []  # per aircraft
+        self.ids = array("i")
+        self.times = array("d")
+        self.lats = array("f")
+        self.lons = array("f")
+        self.altitudes = array("f")
+        # Rows arrive grouped by poll timestamp; convert each one once
+        self._last_timestamp = None
+        self._last_seconds = 0.0
+        self._last_slice = 0
+
+    def __len__(self):
+        return len(self.times)
+
+    def add(self, icao_hex: str, timestamp: datetime, lat: float, lon: float, altitude: float,
+            on_ground, owner_country: str, aircraft_type: str):
+        if on_ground:
+            return
+        if timestamp != self._last_timestamp:
+            self._last_timestamp, self._last_seconds = timestamp, epoch_seconds(timestamp)
+            self._last_slice = int(self._last_seconds // SLICE_SECONDS)
+        aircraft_id = self.index.get(icao_hex)
+        if aircraft_id is None:
+            aircraft_id = self.index[icao_hex] = len(self.aircraft)
+            self.aircraft.append((icao_hex, aircraft_type, owner_country))
+            self.last_slice.append(self._last_slice)
+        elif self.last_slice[aircraft_id] == self._last_slice:
+            return
+        else:
+            self.last_slice[aircraft_id] = self._last_slice
+        self.ids.append(aircraft_id)
+        self.times.append(self._last_seconds)
+        self.lats.append(lat)
+        self.lons.append(lon)
+        self.altitudes.append(altitude)
+
+    def add_row(self, row: tuple):
+        """Add a get_recent_flights row (RECENT_FLIGHT_COLUMNS order)"""
+        self.add(row[0], row[2], row[3], row[4], row[5], row[6], row[7], row[12])
+
+    def add_columns(self, icao_hex: List[str], seconds: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                    altitudes: np.ndarray, on_ground: np.ndarray, owner_country: List[str],
+                    aircraft_type: List[str]):
+        """add() for a run of rows given as columns (times in epoch seconds), same result"""
+        airborne = np.flatnonzero(~on_ground)
+        if not len(airborne):
+            return
+        rows = airborne.tolist()
+        icaos = [icao_hex[i] for i in rows]
+        # New aircraft are numbered in first-seen order, from their first airborne row
+        first_row = dict(zip(reversed(icaos), reversed(rows)))
+        for icao in dict.fromkeys(icaos):
+            if icao not in self.index:
+                self.index[icao] = len(self.aircraft)
+                self.aircraft.append((icao, aircraft_type[first_row[icao]], owner_country[first_row[icao]]))
+                self.last_slice.append(None)
+        ids = np.fromiter(map(self.index.__getitem__, icaos), dtype=np.int64, count=len(icaos))
+        slices = (seconds[airborne] // SLICE_SECONDS).astype(np.int64)
+        self._append(ids, slices, seconds[airborne], lats[airborne], lons[airborne], altitudes[airborne])
+
+    def merge(self, other: "PositionColumns"):
+        """Append other's reports as if its rows had been added after this one's"""
+        if not len(other):
+            return
+        mapping = np.empty(len(other.aircraft), dtype=np.int64)
+        for other_id, entry in enumerate(other.aircraft):
+            aircraft_id = self.index.get(entry[0])
+            if aircraft_id is None:
+                aircraft_id = self.index[entry[0]] = len(self.aircraft)
+                self.aircraft.append(entry)
+                self.last_slice.append(None)
+            mapping[other_id] = aircraft_id
+        ids, times, lats, lons, altitudes = other.columns()
+        # other already dropped its repeats; only each aircraft's first report can
+        # fall in the slice this one ended on, and _append checks exactly that
+        self._append(mapping[ids], (times // SLICE_SECONDS).astype(np.int64), times, lats, lons, altitudes)
+
+    def _append(self, ids: np.ndarray, slices: np.ndarray, times, lats, lons, altitudes):
+        """Keep each report unless its aircraft's previous report (here or before) is in the same slice"""
+        order = np.argsort(ids, kind="stable")
+        ids_sorted, slices_sorted = ids[order], slices[order]
+        first = np.r_[True, ids_sorted[1:] != ids_sorted[:-1]]
+        previous = np.empty(len(ids), dtype=np.int64)
+        previous[1:] = slices_sorted[:-1]
+        heads = np.flatnonzero(first)
+        # New aircraft have no previous slice: their first report is always kept
+        previous[heads] = [s if s is not None else -1 - slices_sorted[h]
+                           for s, h in zip((self.last_slice[i] for i in ids_sorted[heads].tolist()),
+                                           heads.tolist())]
+        keep = np.empty(len(ids), dtype=bool)
+        keep[order] = slices_sorted != previous
+        tails = np.r_[heads[1:] - 1, len(ids) - 1]
+        for aircraft_id, last in zip(ids_sorted[heads].tolist(), slices_sorted[tails].tolist()):
+            self.last_slice[aircraft_id] = last
+        self.ids.frombytes(ids[keep].astype(np.int32).tobytes())
+        self.times.frombytes(np.asarray(times, dtype=np.float64)[keep].tobytes())
+        for column, values in ((self.lats, lats), (self.lons, lons), (self.altitudes, altitudes)):
+            column.frombytes(np.asarray(values)[keep].astype(np.float32).tobytes())
+
+    def columns(self, since: Optional[float] = None):
+        """(ids, times, lats, lons, altitudes) arrays, optionally only reports at or after `since`"""
+        # Views on the arrays, no copy; positions stay float32
+        ids = np.frombuffer(self.ids, dtype=np.int32) if len(self) else np.zeros(0, dtype=np.int32)
+        times = np.frombuffer(self.times, dtype=np.float64) if len(self) else np.zeros(0)
+        lats, lons, altitudes = (np.frombuffer(a, dtype=np.float32) if len(self) else np.zeros(0, dtype=np.float32)
+                                 for a in (self.lats, self.lons, self.altitudes))
+        if since is not None:
+            keep = times >= since
+            ids, times, lats, lons, altitudes = ids[keep], times[keep], lats[keep], lons[keep], altitudes[keep]
+        return ids, times, lats, lons, altitudes
+
+    def airborne_minutes(self, icaos: Iterable[str], since: Optional[float] = None) -> Dict[str, float]:
+        """Reconstructed airborne minutes of the given aircraft (0 if never airborne)"""
+        minutes = {icao: 0.0 for icao in icaos}
+        wanted = [self.index[icao] for icao in minutes if icao in self.index]
+        ids, times, lats, lons, altitudes = self.columns(since)
+        if not wanted or not len(ids):
+            return minutes
+        # Dead reckoning runs to the end of all data, not just these aircraft's
+        until = times.max()
+        keep = np.isin(ids, wanted)
+        seconds = airborne_seconds_by_aircraft(ids[keep], times[keep], lats[keep], lons[keep],
+                                               altitudes[keep], until)
+        for aircraft_id in wanted:
+            if aircraft_id < len(seconds):
+                minutes[self.aircraft[aircraft_id][0]] = float(seconds[aircraft_id]) / 60
+        return minutes
+
+
+def _unit_vectors(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(lats), np.radians(lons)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _lat_lon(vectors: np.ndarray):
+    x, y, z = vectors.T
+    return np.degrees(np.arctan2(z, np.hypot(x, y))), np.degrees(np.arctan2(y, x))
+
+
+def great_circle_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Haversine distance in metres, elementwise"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def slerp(lat1, lon1, lat2, lon2, fraction):
+    """Points `fraction` (0..1) of the way along the great circle from 1 to 2"""
+    a, b = _unit_vectors(lat1, lon1), _unit_vectors(lat2, lon2)
+    omega = np.arccos(np.clip(np.einsum("ij,ij->i", a, b), -1, 1))
+    fraction = np.asarray(fraction, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sin_omega = np.sin(omega)
+        wa = np.where(omega > 1e-9, np.sin((1 - fraction) * omega) / sin_omega, 1 - fraction)
+        wb = np.where(omega > 1e-9, np.sin(fraction * omega) / sin_omega, fraction)
+    return _lat_lon(wa[:, None] * a + wb[:, None] * b)
+
+
+def _expand(starts: np.ndarray, counts: np.ndarray):
+    """For ranges [start, start+count): (owning range index, flat position) per element"""
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, np.repeat(starts, counts) + offsets
+
+
+class Flights(NamedTuple):
+    """Per-flight arrays, ordered by (aircraft, start)"""
+    aircraft: np.ndarray
+    start: np.ndarray  # first report, epoch seconds
+    end: np.ndarray  # last report
+    reports: np.ndarray
+    dead_reckoned: np.ndarray  # seconds carried on past the last report
+    first: np.ndarray  # index of the first report in the sorted reports
+    last: np.ndarray
+
+    @property
+    def airborne_seconds(self) -> np.ndarray:
+        return self.end - self.start + self.dead_reckoned
+
+    @property
+    def coverage(self) -> np.ndarray:
+        """Share of each flight's slices with a report (reports at most one per slice)"""
+        slices = self.airborne_seconds // RESAMPLE_SECONDS + 1
+        return np.minimum(1.0, self.reports / slices)
+
+
+class Track(NamedTuple):
+    """Reconstructed points, ordered by (aircraft, time)"""
+    aircraft: np.ndarray
+    flight: np.ndarray
+    times: np.ndarray
+    lats: np.ndarray
+    lons: np.ndarray
+    altitudes: np.ndarray
+    flags: np.ndarray
+    confidence: np.ndarray
+
+
+def segment(ids: np.ndarray, times: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+            altitudes: np.ndarray, until: Optional[float] = None):
+    """
+    Sort reports by (aircraft, time) and split them into flights
+
+    Returns (order, Flights); order sorts the input arrays.
+    """
+    order = np.lexsort((times, ids))
+    ids, times = ids[order], times[order]
+    lats = np.asarray(lats, dtype=np.float64)[order]
+    lons = np.asarray(lons, dtype=np.float64)[order]
+    n = len(ids)
+
+    dt = np.diff(times)
+    speed = np.zeros(0)
+    if n > 1:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed = great_circle_m(lats[:-1], lons[:-1], lats[1:], lons[1:]) / np.maximum(dt, 1)
+    breaks = np.ones(n, dtype=bool)
+    breaks[1:] = ((ids[1:] != ids[:-1]) | (dt > MAX_GAP_SECONDS)
+                  | ((dt > GAP_SECONDS) & (speed > MAX_SPEED))
+                  | ((dt >= LANDING_GAP_SECONDS) & (speed < LANDED_SPEED)))
+    first = np.flatnonzero(breaks)
+    last = np.append(first[1:], n) - 1
+
+    # Dead reckoning: high, not heard for a while before the data ends,
+    # and with a previous report in the same flight to take a velocity from
+    until = times.max() if until is None and n else until
+    silent = (until - times[last]) if n else np.zeros(0)
+    can_reckon = ((last > first) & (silent > GAP_SECONDS)
+                  & (np.asarray(altitudes, dtype=np.float64)[order][last] >= DEAD_RECKON_MIN_ALTITUDE))
+    dead_reckoned = np.where(can_reckon, np.minimum(silent, DEAD_RECKON_SECONDS), 0.0)
+
+    return order, Flights(ids[first], times[first], times[last], last - first + 1,
+                          dead_reckoned, first, last)
+
+
+def reconstruct(ids: np.ndarray, times: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                altitudes: np.ndarray, until: Optional[float] = None):
+    """
+    Flights plus a gap-filled, dead-reckoned Track of every report
+
+    until is the end of the data (default: the latest report); a flight
+    that goes quiet more than GAP_SECONDS before it is dead-reckoned.
+    """
+    order, flights = segment(ids, times, lats, lons, altitudes, until)
+    ids, times = np.asarray(ids)[order], np.asarray(times, dtype=np.float64)[order]
+    lats = np.asarray(lats, dtype=np.float64)[order]
+    lons = np.asarray(lons, dtype=np.float64)[order]
+    altitudes = np.asarray(altitudes, dtype=np.float64)[order]
+    flight_of = np.repeat(np.arange(len(flights.start)), flights.reports)
+
+    # Gaps inside a flight: (left report, right report) pairs
+    same_flight = flight_of[:-1] == flight_of[1:]
+    left = np.flatnonzero(same_flight & (np.diff(times) > GAP_SECONDS))
+    gap = times[left + 1] - times[left]
+    fills = np.ceil(gap / RESAMPLE_SECONDS).astype(np.int64) - 1
+    owner, step = _expand(np.ones(len(left), dtype=np.int64), fills)
+    g = left[owner]
+    fraction = step * RESAMPLE_SECONDS / gap[owner]
+    fill_lat, fill_lon = slerp(lats[g], lons[g], lats[g + 1], lons[g + 1], fraction)
+    fill_time = times[g] + step * RESAMPLE_SECONDS
+    fill_alt = altitudes[g] + (altitudes[g + 1] - altitudes[g]) * fraction
+    nearest = np.minimum(fill_time - times[g], times[g + 1] - fill_time)
+
+    # Dead-reckoned tails: last velocity from the final two reports
+    tails = np.flatnonzero(flights.dead_reckoned > 0)
+    t_owner, t_step = _expand(np.ones(len(tails), dtype=np.int64),
+                              (flights.dead_reckoned[tails] // RESAMPLE_SECONDS).astype(np.int64))
+    last = flights.last[tails][t_owner]
+    elapsed = t_step * RESAMPLE_SECONDS
+    span = np.maximum(times[last] - times[last - 1], 1)
+    # Extend the great circle through the last two reports past its end
+    dr_lat, dr_lon = slerp(lats[last - 1], lons[last - 1], lats[last], lons[last], 1 + elapsed / span)
+    dr_time = times[last] + elapsed
+    dr_alt = altitudes[last]
+
+    def confidence(seconds):
+        return np.maximum(MIN_CONFIDENCE, 1 - seconds / CONFIDENCE_HORIZON_SECONDS)
+
+    aircraft = np.concatenate([ids, ids[g], ids[last]])
+    point_times = np.concatenate([times, fill_time, dr_time])
+    merged = np.lexsort((point_times, aircraft))
+    track = Track(
+        aircraft[merged],
+        np.concatenate([flight_of, flight_of[g], flight_of[last]])[merged],
+        point_times[merged],
+        np.concatenate([lats, fill_lat, dr_lat])[merged],
+        np.concatenate([lons, fill_lon, dr_lon])[merged],
+        np.concatenate([altitudes, fill_alt, dr_alt])[merged],
+        np.concatenate([np.full(len(ids), OBSERVED, dtype=np.int8),
+                        np.full(len(g), INTERPOLATED, dtype=np.int8),
+                        np.full(len(last), DEAD_RECKONED, dtype=np.int8)])[merged],
+        np.concatenate([np.ones(len(ids)), confidence(nearest),
+                        confidence(elapsed) * 0.5])[merged],
+    )
+    return flights, track
+
+
+def airborne_seconds_by_aircraft(ids: np.ndarray, times: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                                 altitudes: np.ndarray, until: Optional[float] = None) -> np.ndarray:
+    """Reconstructed airborne seconds per aircraft id (indexable by id)"""
+    if not len(ids):
+        return np.zeros(0)
+    _, flights = segment(ids, times, lats, lons, altitudes, until)
+    return np.bincount(flights.aircraft, weights=flights.airborne_seconds, minlength=int(ids.max()) + 1)
+
+
+def main():
+    import argparse
+    from datetime import datetime, timedelta, timezone
+    from db import get_pool
+
+    parser = argparse.ArgumentParser(description="Reconstruct recent tracks and report coverage")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--top", type=int, default=10, help="Least-covered flights to list")
+    args = parser.parse_args()
+
+    client = get_pool()
+    now = datetime.now(timezone.utc)
+    columns = PositionColumns()
+    rows = client.execute_iter(
+        """
+        SELECT icao_hex, timestamp, lat, lon, altitude, on_ground
+        FROM flight_positions
+        WHERE timestamp >= %(cutoff)s
+        ORDER BY timestamp DESC
+        """,
+        {"cutoff": now - timedelta(hours=args.hours)},
+    )
+    for icao_hex, timestamp, lat, lon, altitude, on_ground in rows:
+        columns.add(icao_hex, timestamp, lat, lon, altitude, on_ground, "", "")
+
+    flights, track = reconstruct(*columns.columns(), until=now.timestamp())
+    flags = np.bincount(track.flags, minlength=3)
+    print(f"{len(columns.aircraft)} aircraft, {len(flights.start)} flights over {args.hours}h")
+    print("  " + "  ".join(f"{name}: {count}" for name, count in zip(FLAG_NAMES, flags)))
+    print(f"  airborne: {flights.airborne_seconds.sum() / 3600:.0f}h, "
+          f"median coverage {np.median(flights.coverage) * 100:.0f}%")
+
+    print(f"\nLeast covered flights:")
+    for i in np.argsort(flights.coverage)[:args.top]:
+        icao_hex = columns.aircraft[flights.aircraft[i]][0]
+        print(f"  {icao_hex}  {flights.airborne_seconds[i] / 60:>6.0f} min  "
+              f"{flights.reports[i]:>5} reports  {flights.coverage[i] * 100:>5.1f}% covered")
+
+
+if __name__ == "__main__":
+    main()